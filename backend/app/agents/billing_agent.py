@@ -47,7 +47,8 @@ def get_billing_agent():
         "- The supervisor agent only sees your final message - include everything in that message\n"
         "- Be precise, concise without redundancies, and accurate - billing information must be correct\n"
         "- **FOR COMPARATIVE QUERIES** (e.g., 'highest', 'most valuable', 'which company'):\n"
-        "  * Review ALL retrieved invoices carefully\n"
+        "  * If search_billing_kb returns an invoice aggregates table, use its exact totals as-is - do not recompute them\n"
+        "  * Otherwise review ALL retrieved invoices carefully\n"
         "  * Calculate totals for each company by summing all their invoices\n"
         "  * Compare the totals to identify the highest value\n"
         "  * Provide a clear answer with specific amounts and company names\n"
@@ -57,6 +58,8 @@ def get_billing_agent():
         "Hybrid RAG/CAG Strategy:\n"
         "- Use search_billing_kb for billing-specific queries (pricing, invoices, contracts)\n"
         "- Use get_cached_policy_info for policy-related queries (regulations, compliance)\n"
+        "- If search_billing_kb returns near-identical excerpts (e.g., invoices sharing a template), "
+        "search again with diversify=True to see more distinct documents\n"
         "- The get_cached_policy_info tool will cache policy information in session memory\n"
         "- Subsequent queries in the same session will use cached policy data when applicable\n"
         "- Combine both billing and policy information when answering queries that span both domains\n\n"
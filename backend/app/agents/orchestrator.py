@@ -16,6 +16,8 @@ from app.state.conversation_state import get_checkpointer
 from app.agents.policy_agent import get_policy_agent_singleton
 from app.agents.technical_agent import get_technical_agent_singleton
 from app.agents.billing_agent import get_billing_agent_singleton
+from app.retrieval.context_packer import pack_context
+from app.retrieval.multi_search import asearch_all_kbs, search_all_kbs
 from app.utils.config import config
 from app.utils.logger import app_logger
 
@@ -197,6 +199,157 @@ def policy_tool(request: str) -> str:
         )
 
 
+# Knowledge base labels used in fan-out search results
+KNOWLEDGE_BASE_LABELS = {
+    config.COLLECTION_BILLING: "billing",
+    config.COLLECTION_TECHNICAL: "technical",
+    config.COLLECTION_POLICY: "policy",
+}
+
+
+def _format_fan_out(result: dict) -> str:
+    """
+    Format a fan-out search result as one packed context section per knowledge base
+    
+    Hits below the collection's minimum relevance score are dropped, so a knowledge
+    base without relevant content is reported as such instead of padding the context.
+    
+    Args:
+        result: Dictionary returned by search_all_kbs / asearch_all_kbs
+        
+    Returns:
+        Formatted context string grouped by knowledge base
+    """
+    query = result["query"]
+    sections = []
+    empty = []
+    
+    for collection_name, hits in result["per_collection"].items():
+        label = KNOWLEDGE_BASE_LABELS.get(collection_name, collection_name)
+        min_score = config.get_retrieval_min_score(collection_name)
+        relevant = [(doc, score) for doc, score in hits if score >= min_score]
+        if relevant:
+            sections.append(pack_context(relevant, query, label))
+        elif collection_name in result["errors"]:
+            empty.append(f"{label} (search failed)")
+        else:
+            empty.append(label)
+    
+    if not sections:
+        return f"No relevant documents found in any knowledge base for query: '{query}'"
+    
+    if empty:
+        sections.append(f"No relevant documents found in: {', '.join(empty)}")
+    
+    return "\n\n".join(sections)
+
+
+@tool
+def search_knowledge_bases(query: str) -> str:
+    """
+    Search the billing, technical and policy knowledge bases at once.
+    Use this tool when a query spans several areas, to see which knowledge bases hold
+    relevant content before routing. The query is embedded once and all knowledge bases
+    are searched concurrently; worker agents asked the same question in this request
+    reuse these results instead of searching again.
+    
+    Args:
+        query: User query to search for
+        
+    Returns:
+        Relevant excerpts with source citations, grouped by knowledge base
+    """
+    try:
+        app_logger.info(f"Knowledge base fan-out search called with query: {query[:100]}")
+        return _format_fan_out(search_all_kbs(query))
+    except Exception as e:
+        app_logger.error(f"Error searching knowledge bases: {e}")
+        return f"Error searching knowledge bases: {str(e)}. Route the query to the worker agents instead."
+
+
+async def asearch_knowledge_bases(query: str) -> str:
+    """Async counterpart of search_knowledge_bases, used by LangChain under ainvoke/astream"""
+    try:
+        app_logger.info(f"Knowledge base fan-out search called with query: {query[:100]}")
+        return _format_fan_out(await asearch_all_kbs(query))
+    except Exception as e:
+        app_logger.error(f"Error searching knowledge bases: {e}")
+        return f"Error searching knowledge bases: {str(e)}. Route the query to the worker agents instead."
+
+
+async def _ainvoke_worker(agent, request: str) -> str:
+    """
+    Invoke a worker agent asynchronously and return its final message content
+    
+    Awaiting the worker keeps its retrieval tools on their async (asearch_*)
+    implementations, so a slow retrieval does not stall other streams.
+    
+    Args:
+        agent: Worker agent instance
+        request: User query for the worker
+        
+    Returns:
+        Final message content from the worker agent
+    """
+    result = await agent.ainvoke({
+        "messages": [{"role": "user", "content": request}]
+    })
+    
+    if "messages" in result and result["messages"]:
+        final_message = result["messages"][-1]
+        return final_message.content if hasattr(final_message, "content") else str(final_message)
+    return str(result)
+
+
+async def _arun_worker_tool(name: str, get_agent, request: str, inquiry: str, contact: str) -> str:
+    """
+    Run a worker agent for an async supervisor tool, with its logging and error reply
+    
+    Args:
+        name: Worker name used in log messages (e.g. "Billing")
+        get_agent: Singleton getter for the worker agent
+        request: User query for the worker
+        inquiry: Inquiry type used in the error reply (e.g. "billing")
+        contact: Contact address offered in the error reply
+        
+    Returns:
+        Final message content from the worker agent, or an apology if it failed
+    """
+    try:
+        app_logger.info(f"{name} tool called with request: {request[:100]}")
+        response_content = await _ainvoke_worker(get_agent(), request)
+        app_logger.info(f"{name} agent response generated (length: {len(response_content)})")
+        return response_content
+    except Exception as e:
+        app_logger.error(f"Error invoking {name.lower()} agent: {e}")
+        return (
+            f"I apologize, but I encountered an error processing your {inquiry} inquiry: {str(e)}. "
+            f"Please try again or contact {contact} for assistance."
+        )
+
+
+async def abilling_tool(request: str) -> str:
+    """Async counterpart of billing_tool, used by LangChain under ainvoke/astream"""
+    return await _arun_worker_tool("Billing", get_billing_agent_singleton, request, "billing", "billing@aerospace-co.com")
+
+
+async def atechnical_tool(request: str) -> str:
+    """Async counterpart of technical_tool, used by LangChain under ainvoke/astream"""
+    return await _arun_worker_tool("Technical", get_technical_agent_singleton, request, "technical", "technical@aerospace-co.com")
+
+
+async def apolicy_tool(request: str) -> str:
+    """Async counterpart of policy_tool, used by LangChain under ainvoke/astream"""
+    return await _arun_worker_tool("Policy", get_policy_agent_singleton, request, "policy", "compliance@aerospace-co.com")
+
+
+# Run the async implementations when the supervisor is driven through ainvoke/astream
+billing_tool.coroutine = abilling_tool
+technical_tool.coroutine = atechnical_tool
+policy_tool.coroutine = apolicy_tool
+search_knowledge_bases.coroutine = asearch_knowledge_bases
+
+
 def get_supervisor_agent():
     """
     Create or get supervisor agent instance
@@ -224,7 +377,10 @@ def get_supervisor_agent():
         "2. **technical_tool** (Technical Tool Agent): Use for technical questions, component specifications, bug reports, "
         "technical manuals, troubleshooting, engineering questions, or system documentation.\n"
         "3. **policy_tool** (Policy Tool Agent): Use for regulatory compliance questions, FAA/EASA regulations, DFARs policies, "
-        "data governance, customer support policies, terms of service, privacy policies, or legal compliance.\n\n"
+        "data governance, customer support policies, terms of service, privacy policies, or legal compliance.\n"
+        "4. **search_knowledge_bases**: Searches the billing, technical and policy knowledge bases at once. "
+        "Use it when a query spans several areas or it is unclear which worker agent should answer; "
+        "worker agents asked the same question afterwards reuse its results.\n\n"
         
         "Routing Guidelines:\n"
         "- Analyze the query intent carefully before routing with the help of your accessible LLM\n"
@@ -294,7 +450,7 @@ def get_supervisor_agent():
             # Use Bedrock model
             supervisor = create_agent(
                 model=bedrock_model,
-                tools=[detect_emergency, billing_tool, technical_tool, policy_tool],
+                tools=[detect_emergency, billing_tool, technical_tool, policy_tool, search_knowledge_bases],
                 system_prompt=supervisor_prompt,
                 checkpointer=checkpointer,
                 name="supervisor_agent"
@@ -306,7 +462,7 @@ def get_supervisor_agent():
             app_logger.warning("Using OpenAI model for supervisor agent (Bedrock not available or connection failed)")
             supervisor = create_agent(
                 model="openai:gpt-4o-mini",
-                tools=[detect_emergency, billing_tool, technical_tool, policy_tool],
+                tools=[detect_emergency, billing_tool, technical_tool, policy_tool, search_knowledge_bases],
                 system_prompt=supervisor_prompt,
                 checkpointer=checkpointer,
                 name="supervisor_agent"
@@ -321,7 +477,7 @@ def get_supervisor_agent():
         try:
             supervisor = create_agent(
                 model="openai:gpt-4o-mini",
-                tools=[detect_emergency, billing_tool, technical_tool, policy_tool],
+                tools=[detect_emergency, billing_tool, technical_tool, policy_tool, search_knowledge_bases],
                 system_prompt=supervisor_prompt,
                 checkpointer=checkpointer,
                 name="supervisor_agent"
@@ -11,6 +11,7 @@ This module implements the Technical Support Agent using Pure RAG retrieval stra
 from typing import Optional
 from langchain.agents import create_agent
 from app.retrieval.rag_retriever import search_technical_kb
+from app.retrieval.bug_report_index import query_bug_reports
 from app.state.conversation_state import get_checkpointer
 from app.utils.config import config
 from app.utils.logger import app_logger
@@ -21,7 +22,7 @@ def get_technical_agent():
     Create or get Technical Support Agent instance
     
     Returns:
-        Technical Support Agent configured with RAG retrieval tool
+        Technical Support Agent configured with RAG retrieval and bug report query tools
     """
     checkpointer = get_checkpointer()
     
@@ -41,6 +42,10 @@ def get_technical_agent():
         
         "CRITICAL INSTRUCTIONS:\n"
         "- **ALWAYS** use the search_technical_kb tool to retrieve relevant technical documents before answering\n"
+        "- **FOR COUNTING OR STATUS QUESTIONS ABOUT BUG REPORTS** (e.g., 'How many bugs were resolved this year?'), "
+        "use the query_bug_reports tool - its counts are exact across all bug reports, not limited to retrieved excerpts\n"
+        "- If search_technical_kb returns near-identical excerpts (e.g., repeated bug-report boilerplate), "
+        "search again with diversify=True to see more distinct documents\n"
         "- **ALWAYS** include ALL results, findings, and details in your final response\n"
         "- **ALWAYS** cite your sources using the document names and excerpts provided by search_technical_kb\n"
         "- The supervisor agent only sees your final message - include everything in that message\n"
@@ -65,7 +70,7 @@ def get_technical_agent():
         # Create technical agent using create_agent() from langchain.agents
         technical_agent = create_agent(
             model="openai:gpt-4o-mini",  # OpenAI model as specified
-            tools=[search_technical_kb],
+            tools=[search_technical_kb, query_bug_reports],
             system_prompt=technical_prompt,
             checkpointer=checkpointer,
             name="technical_support_agent"  # Descriptive name as required
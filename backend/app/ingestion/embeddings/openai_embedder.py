@@ -7,21 +7,23 @@ Last Verified: November 2025
 """
 
 from typing import List
-from langchain_openai import OpenAIEmbeddings  # pyright: ignore[reportMissingImports]
+from langchain_core.embeddings import Embeddings
+from app.retrieval.embedding_scheduler import get_scheduled_embeddings
+from app.retrieval.persistent_embedding_cache import with_persistent_cache
 from app.utils.config import config
 from app.utils.logger import app_logger
 
 
-def get_embedder() -> OpenAIEmbeddings:
+def get_embedder() -> Embeddings:
     """
-    Get OpenAI embeddings instance
+    Get OpenAI embeddings instance behind the embedding scheduler and the persistent embedding cache
     
     Returns:
-        OpenAIEmbeddings instance
+        Embeddings instance (OpenAIEmbeddings when both are disabled)
     """
-    return OpenAIEmbeddings(
+    return with_persistent_cache(
+        get_scheduled_embeddings(),
         model=config.OPENAI_EMBEDDING_MODEL,
-        openai_api_key=config.OPENAI_API_KEY,
         dimensions=config.OPENAI_EMBEDDING_DIMENSIONS,
     )
 
@@ -6,6 +6,7 @@ Documentation Reference: https://docs.langchain.com/oss/python/langchain/documen
 Last Verified: November 2025
 """
 
+import hashlib
 import os
 from pathlib import Path
 from typing import List, Optional, Dict, Any
@@ -15,6 +16,10 @@ from langchain_core.documents import Document
 from app.ingestion.parsers.parser_factory import parse_document
 from app.ingestion.chunkers.recursive_chunker import chunk_documents
 from app.retrieval.chroma_client import get_chroma_client
+from app.retrieval.cag_retriever import refresh_policy_cache
+from app.retrieval.bug_report_index import get_bug_report_index
+from app.retrieval.invoice_index import get_invoice_index
+from app.retrieval.versioning import replace_source_chunks
 from app.utils.config import config
 from app.utils.logger import app_logger
 
@@ -380,6 +385,216 @@ def enrich_metadata(
     return enriched_documents
 
 
+def chunk_ids(chunks: List[Document], source_name: str) -> List[str]:
+    """
+    Deterministic chunk IDs derived from the source file name and the chunk content
+    
+    Re-ingesting an unchanged file yields the same IDs, so its chunks are recognized
+    as already stored. Identical chunks within one file are told apart by occurrence.
+    
+    Args:
+        chunks: Chunks of one source file, in order
+        source_name: Source file name (metadata source_file)
+        
+    Returns:
+        One 32-character hex ID per chunk
+    """
+    ids = []
+    occurrences: Dict[str, int] = {}
+    for chunk in chunks:
+        content_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()
+        occurrence = occurrences.get(content_hash, 0)
+        occurrences[content_hash] = occurrence + 1
+        key = f"{source_name}\x00{content_hash}\x00{occurrence}"
+        ids.append(hashlib.sha256(key.encode("utf-8")).hexdigest()[:32])
+    return ids
+
+
+# Chunk metadata that depends on the chunk's position in its file. Other fields such as
+# upload_timestamp and source_path change on every upload and are not worth a rewrite.
+POSITIONAL_METADATA = ("chunk_index", "total_chunks")
+
+
+def plan_chunk_writes(vectorstore: Any, prepared: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compare a prepared document's chunk IDs with what the collection stores for its source
+    
+    A chunk whose content is already stored keeps its vector, but its chunk_index and
+    total_chunks may have changed (e.g. after an edit earlier in the file); its metadata
+    is then rewritten in the swap without re-embedding. Re-uploading an identical file
+    therefore writes nothing.
+    
+    Args:
+        vectorstore: Vector store of the target collection
+        prepared: Result of prepare_document
+        
+    Returns:
+        Dictionary with new_ids and new_chunks (to embed and store), unchanged_chunks
+        (count already stored), updated_ids and updated_chunks (stored chunks whose
+        position changed) and removed_ids (stored for the source, no longer in it)
+    """
+    stored = vectorstore.get(where={"source_file": prepared["file_name"]}, include=["metadatas"])
+    stored_metadata = dict(zip(stored["ids"], stored.get("metadatas") or [{}] * len(stored["ids"])))
+    new = []
+    updated = []
+    for chunk_id, chunk in zip(prepared["chunk_ids"], prepared["chunks"]):
+        if chunk_id not in stored_metadata:
+            new.append((chunk_id, chunk))
+        elif any(
+            (stored_metadata[chunk_id] or {}).get(field) != chunk.metadata.get(field)
+            for field in POSITIONAL_METADATA
+        ):
+            updated.append((chunk_id, chunk))
+    return {
+        "new_ids": [chunk_id for chunk_id, _ in new],
+        "new_chunks": [chunk for _, chunk in new],
+        "unchanged_chunks": len(prepared["chunks"]) - len(new),
+        "updated_ids": [chunk_id for chunk_id, _ in updated],
+        "updated_chunks": [chunk for _, chunk in updated],
+        "removed_ids": sorted(set(stored_metadata) - set(prepared["chunk_ids"])),
+    }
+
+
+def prepare_document(
+    file_path: str | Path,
+    target_collection: Optional[str] = None,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    auto_map: bool = False,
+    upload_timestamp: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    CPU-bound ingestion steps: validate, parse, categorize, chunk and enrich metadata
+    
+    Touches neither ChromaDB nor the embeddings API, and everything it returns is
+    picklable, so the multi-file pipeline (see pipeline.py) runs it in worker processes.
+    
+    Args:
+        file_path: Path to file to ingest
+        target_collection: Target ChromaDB collection name (None for auto-map)
+        chunk_size: Chunk size for text splitting (default: 1000)
+        chunk_overlap: Chunk overlap for text splitting (default: 200)
+        auto_map: Whether to auto-categorize document (default: False)
+        upload_timestamp: Upload timestamp stored on every chunk (default: current time)
+        
+    Returns:
+        Dictionary with file_path, file_name, target_collection, documents_count,
+        chunks (enriched Document chunks), chunk_ids (see chunk_ids), text (full
+        parsed text) and upload_timestamp
+        
+    Raises:
+        ValueError: If the file is invalid, yields no documents or the collection is unknown
+    """
+    if upload_timestamp is None:
+        upload_timestamp = datetime.utcnow()
+    source_path = Path(file_path)
+    
+    # Step 1: Validate file
+    app_logger.info(f"Validating file: {source_path}")
+    is_valid, error = validate_file(source_path)
+    if not is_valid:
+        raise ValueError(f"File validation failed: {error}")
+    
+    # Step 2: Parse document
+    app_logger.info(f"Parsing document: {source_path}")
+    documents = parse_document(source_path)
+    
+    if not documents:
+        raise ValueError("No documents extracted from file")
+    
+    # Step 3: Determine target collection
+    if auto_map or target_collection is None:
+        # Auto-categorize based on content
+        content = "\n".join([doc.page_content for doc in documents])
+        target_collection = categorize_document(content, source_path.name)
+        app_logger.info(f"Auto-categorized document to: {target_collection}")
+    else:
+        # Use provided target collection
+        app_logger.info(f"Using provided target collection: {target_collection}")
+    
+    # Validate target collection
+    if target_collection not in config.get_all_collections():
+        raise ValueError(
+            f"Invalid target collection: {target_collection}. "
+            f"Valid collections: {config.get_all_collections()}"
+        )
+    
+    # Step 4: Chunk documents
+    app_logger.info(f"Chunking documents (chunk_size={chunk_size}, chunk_overlap={chunk_overlap})")
+    chunks = chunk_documents(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    
+    # Step 5: Enrich metadata
+    app_logger.info("Enriching metadata")
+    enriched_chunks = enrich_metadata(
+        chunks,
+        source_path,
+        target_collection,
+        upload_timestamp,
+    )
+    
+    return {
+        "file_path": str(source_path),
+        "file_name": source_path.name,
+        "target_collection": target_collection,
+        "documents_count": len(documents),
+        "chunks": enriched_chunks,
+        "chunk_ids": chunk_ids(enriched_chunks, source_path.name),
+        "text": "\n".join(doc.page_content for doc in documents),
+        "upload_timestamp": upload_timestamp,
+    }
+
+
+def index_structured_fields(prepared: Dict[str, Any]) -> None:
+    """
+    Extract invoice or bug report fields of a stored document into the structured indexes
+    
+    Args:
+        prepared: Result of prepare_document
+    """
+    target_collection = prepared["target_collection"]
+    
+    # Billing documents: extract invoice fields into the structured invoice index
+    if target_collection == config.COLLECTION_BILLING:
+        try:
+            get_invoice_index().index_document(prepared["text"], prepared["file_name"])
+        except Exception as e:
+            app_logger.warning(f"Could not index invoice fields for {prepared['file_name']}: {e}")
+    
+    # Technical documents: extract bug report fields into the structured bug report index
+    if target_collection == config.COLLECTION_TECHNICAL:
+        try:
+            get_bug_report_index().index_document(prepared["text"], prepared["file_name"])
+        except Exception as e:
+            app_logger.warning(f"Could not index bug report fields for {prepared['file_name']}: {e}")
+
+
+def ingestion_result(prepared: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the result dictionary of a stored document
+    
+    Args:
+        prepared: Result of prepare_document, updated with plan_chunk_writes
+        
+    Returns:
+        Dictionary with ingestion results, including new, unchanged and removed chunk counts
+    """
+    start_time = prepared["upload_timestamp"]
+    duration = (datetime.utcnow() - start_time).total_seconds()
+    return {
+        "success": True,
+        "file_path": prepared["file_path"],
+        "file_name": prepared["file_name"],
+        "target_collection": prepared["target_collection"],
+        "documents_count": prepared["documents_count"],
+        "chunks_count": len(prepared["chunks"]),
+        "new_chunks": len(prepared["new_ids"]),
+        "unchanged_chunks": prepared["unchanged_chunks"],
+        "removed_chunks": len(prepared["removed_ids"]),
+        "duration_seconds": duration,
+        "upload_timestamp": start_time.isoformat(),
+    }
+
+
 def ingest_document(
     file_path: str | Path,
     target_collection: Optional[str] = None,
@@ -400,83 +615,57 @@ def ingest_document(
     Returns:
         Dictionary with ingestion results
     """
-    start_time = datetime.utcnow()
     source_path = Path(file_path)
     
     try:
-        # Step 1: Validate file
-        app_logger.info(f"Validating file: {source_path}")
-        is_valid, error = validate_file(source_path)
-        if not is_valid:
-            raise ValueError(f"File validation failed: {error}")
-        
-        # Step 2: Parse document
-        app_logger.info(f"Parsing document: {source_path}")
-        documents = parse_document(source_path)
-        
-        if not documents:
-            raise ValueError("No documents extracted from file")
-        
-        # Step 3: Determine target collection
-        if auto_map or target_collection is None:
-            # Auto-categorize based on content
-            content = "\n".join([doc.page_content for doc in documents])
-            target_collection = categorize_document(content, source_path.name)
-            app_logger.info(f"Auto-categorized document to: {target_collection}")
-        else:
-            # Use provided target collection
-            app_logger.info(f"Using provided target collection: {target_collection}")
-        
-        # Validate target collection
-        if target_collection not in config.get_all_collections():
-            raise ValueError(
-                f"Invalid target collection: {target_collection}. "
-                f"Valid collections: {config.get_all_collections()}"
-            )
-        
-        # Step 4: Chunk documents
-        app_logger.info(f"Chunking documents (chunk_size={chunk_size}, chunk_overlap={chunk_overlap})")
-        chunks = chunk_documents(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        
-        # Step 5: Enrich metadata
-        app_logger.info("Enriching metadata")
-        enriched_chunks = enrich_metadata(
-            chunks,
-            source_path,
-            target_collection,
-            start_time,
-        )
+        # Steps 1-5: Validate, parse, categorize, chunk and enrich metadata
+        prepared = prepare_document(source_path, target_collection, chunk_size, chunk_overlap, auto_map)
+        target_collection = prepared["target_collection"]
+        enriched_chunks = prepared["chunks"]
         
         # Step 6: Get ChromaDB collection
         app_logger.info(f"Getting ChromaDB collection: {target_collection}")
         client = get_chroma_client()
         vectorstore = client.get_or_create_collection(target_collection)
         
-        # Step 7: Store vectors in ChromaDB
-        app_logger.info(f"Storing {len(enriched_chunks)} chunks in ChromaDB")
-        vectorstore.add_documents(enriched_chunks)
+        # Step 7: Diff against the chunks stored for this source file (the document key)
+        prepared.update(plan_chunk_writes(vectorstore, prepared))
+        new_chunks = prepared["new_chunks"]
+        removed_ids = prepared["removed_ids"]
+        updated_ids = prepared["updated_ids"]
+        changed = bool(new_chunks or removed_ids or updated_ids)
+        
+        # Step 8: Embed only the new chunks, then swap them in, the removed ones out and the
+        # chunk_index/total_chunks of the moved ones up to date atomically
+        if changed:
+            app_logger.info(
+                f"Storing {len(new_chunks)} new chunks in ChromaDB "
+                f"({prepared['unchanged_chunks']} unchanged, {len(updated_ids)} moved, "
+                f"{len(removed_ids)} removed)"
+            )
+            replace_source_chunks(
+                vectorstore, target_collection, prepared["new_ids"], new_chunks, removed_ids,
+                updated_ids=updated_ids, updated_documents=prepared["updated_chunks"],
+            )
+            
+            # Persist to disk
+            vectorstore.persist()
+        else:
+            app_logger.info(f"All {len(enriched_chunks)} chunks of {source_path.name} are already stored")
         
-        # Persist to disk
-        vectorstore.persist()
+        index_structured_fields(prepared)
         
-        end_time = datetime.utcnow()
-        duration = (end_time - start_time).total_seconds()
+        # Policy documents are served from the preloaded CAG snapshot - reload it
+        if changed and target_collection == config.COLLECTION_POLICY and config.POLICY_CAG_ENABLED:
+            refresh_policy_cache()
         
-        result = {
-            "success": True,
-            "file_path": str(source_path),
-            "file_name": source_path.name,
-            "target_collection": target_collection,
-            "documents_count": len(documents),
-            "chunks_count": len(enriched_chunks),
-            "duration_seconds": duration,
-            "upload_timestamp": start_time.isoformat(),
-        }
+        result = ingestion_result(prepared)
         
         app_logger.info(
             f"Successfully ingested {source_path.name}: "
-            f"{len(enriched_chunks)} chunks stored in {target_collection} "
-            f"({duration:.2f}s)"
+            f"{len(enriched_chunks)} chunks in {target_collection} "
+            f"({result['new_chunks']} new, {result['unchanged_chunks']} unchanged, "
+            f"{result['removed_chunks']} removed; {result['duration_seconds']:.2f}s)"
         )
         
         return result
@@ -499,6 +688,10 @@ def ingest_multiple_documents(
     """
     Ingest multiple documents
     
+    With INGEST_PIPELINE_ENABLED, several files go through the pipelined engine
+    (see pipeline.py): parsing in worker processes, concurrent embedding requests
+    and one batched writer.
+    
     Args:
         file_paths: List of file paths to ingest
         target_collection: Target ChromaDB collection name (None for auto-map)
@@ -507,8 +700,14 @@ def ingest_multiple_documents(
         auto_map: Whether to auto-categorize documents
         
     Returns:
-        List of ingestion results
+        List of ingestion results, in the order of file_paths
     """
+    if config.INGEST_PIPELINE_ENABLED and len(file_paths) > 1:
+        from app.ingestion.pipeline import IngestionPipeline
+        
+        pipeline = IngestionPipeline(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        return pipeline.run(file_paths, target_collection=target_collection, auto_map=auto_map)
+    
     results = []
     
     for file_path in file_paths:
@@ -530,4 +729,3 @@ def ingest_multiple_documents(
             })
     
     return results
-
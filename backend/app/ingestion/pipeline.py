@@ -0,0 +1,408 @@
+"""
+Pipelined multi-file ingestion engine
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/document-loaders
+Last Verified: November 2025
+
+ingest_document runs parse, categorize, chunk, embed and store strictly in
+sequence, one file at a time. IngestionPipeline overlaps those stages across
+files:
+
+1. prepare_document (validate, parse, categorize, chunk, enrich, hash chunk
+   IDs) runs in a process pool, so PDF parsing and chunking use every core.
+2. Chunks whose content-addressed ID is already stored are skipped; the new
+   ones are embedded in batches on a bounded thread pool, keeping
+   INGEST_EMBED_CONCURRENCY embedding requests in flight. The process-wide
+   embedding scheduler (see embedding_scheduler.py) coalesces them, together
+   with concurrent uploads and searches, into token-bounded API calls.
+3. A single writer thread swaps the embedded chunks in and the removed ones
+   out (see versioning.py), coalescing consecutive files for the same
+   collection into one batched swap, then updates the structured indexes.
+
+At most INGEST_MAX_IN_FLIGHT files are between parsing and writing at any time,
+so memory stays bounded on bulk loads. Results come back in input order; a file
+that fails at any stage gets a {"success": False, ...} result without stopping
+the others.
+
+Usage:
+    python -m app.ingestion.pipeline docs/ --auto-map
+    python -m app.ingestion.pipeline invoices/*.pdf --collection billing_knowledge_base
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+
+from app.ingestion.ingest_data import (
+    index_structured_fields,
+    ingestion_result,
+    plan_chunk_writes,
+    prepare_document,
+)
+from app.retrieval.cag_retriever import refresh_policy_cache
+from app.retrieval.chroma_client import get_chroma_client
+from app.retrieval.versioning import replace_source_chunks
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md", ".markdown", ".json")
+
+# (input position, prepare_document result, one vector per chunk or None to let the store embed)
+WriteItem = Tuple[int, Dict[str, Any], Optional[List[List[float]]]]
+
+
+def failed_result(file_path: str | Path, error: Exception) -> Dict[str, Any]:
+    """
+    Build the result dictionary of a file that could not be ingested
+
+    Args:
+        file_path: Path of the file
+        error: Exception raised while ingesting it
+
+    Returns:
+        Dictionary with success False and the error message
+    """
+    app_logger.error(f"Failed to ingest {file_path}: {error}")
+    return {
+        "success": False,
+        "file_path": str(file_path),
+        "error": str(error),
+    }
+
+
+def _parse_process_context() -> multiprocessing.context.BaseContext:
+    """
+    Start parse workers from a fork server that has already imported the ingestion modules
+
+    The parent runs ChromaDB and embedding threads, which a plain fork would copy
+    mid-lock; spawn is safe but re-imports the application in every worker. The
+    fork server imports it once and forks cheap workers from that single-threaded
+    process (spawn where fork servers are unavailable).
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["app.ingestion.ingest_data"])
+    return context
+
+
+class _FileEmbedding:
+    """Collects the embedding batches of one file and hands the file to the writer once all are done"""
+
+    def __init__(
+        self,
+        batches: int,
+        on_complete: Callable[[List[List[float]]], None],
+        on_error: Callable[[Exception], None],
+    ):
+        self._vectors: List[Optional[List[List[float]]]] = [None] * batches
+        self._remaining = batches
+        self._failed = False
+        self._lock = threading.Lock()
+        self._on_complete = on_complete
+        self._on_error = on_error
+
+    def done(self, position: int, vectors: List[List[float]]) -> None:
+        with self._lock:
+            if self._failed:
+                return
+            self._vectors[position] = vectors
+            self._remaining -= 1
+            if self._remaining:
+                return
+        self._on_complete([vector for batch in self._vectors for vector in batch])
+
+    def failed(self, error: Exception) -> None:
+        with self._lock:
+            if self._failed:
+                return
+            self._failed = True
+        self._on_error(error)
+
+
+class _BatchedWriter(threading.Thread):
+    """Single writer thread storing embedded files, coalescing consecutive files per collection"""
+
+    _CLOSE = object()
+
+    def __init__(self, client: Any, write_batch_size: int, on_done: Callable[[int, Dict[str, Any]], None]):
+        super().__init__(name="ingest-writer", daemon=True)
+        self.client = client
+        self.write_batch_size = max(1, write_batch_size)
+        self.on_done = on_done
+        self.written_collections: set = set()
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+
+    def put(self, index: int, prepared: Dict[str, Any], vectors: Optional[List[List[float]]]) -> None:
+        self._queue.put((index, prepared, vectors))
+
+    def close(self) -> None:
+        """Write everything queued so far and stop the thread"""
+        self._queue.put(self._CLOSE)
+        self.join()
+
+    def run(self) -> None:
+        pending: Any = None
+        while True:
+            item = pending if pending is not None else self._queue.get()
+            pending = None
+            if item is self._CLOSE:
+                return
+
+            batch: List[WriteItem] = [item]
+            size = len(item[1]["new_chunks"])
+            collection_name = item[1]["target_collection"]
+            while size < self.write_batch_size:
+                try:
+                    following = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if following is self._CLOSE or following[1]["target_collection"] != collection_name:
+                    pending = following
+                    break
+                batch.append(following)
+                size += len(following[1]["new_chunks"])
+            self._write(collection_name, batch)
+
+    def _write(self, collection_name: str, batch: List[WriteItem]) -> None:
+        chunks = [chunk for _, prepared, _ in batch for chunk in prepared["new_chunks"]]
+        chunk_ids = [chunk_id for _, prepared, _ in batch for chunk_id in prepared["new_ids"]]
+        removed_ids = [chunk_id for _, prepared, _ in batch for chunk_id in prepared["removed_ids"]]
+        updated_ids = [chunk_id for _, prepared, _ in batch for chunk_id in prepared["updated_ids"]]
+        updated_chunks = [chunk for _, prepared, _ in batch for chunk in prepared["updated_chunks"]]
+        try:
+            vectorstore = self.client.get_or_create_collection(collection_name)
+            if chunks or removed_ids or updated_ids:
+                app_logger.info(
+                    f"Storing {len(chunks)} new chunks, updating metadata of {len(updated_ids)} and "
+                    f"deleting {len(removed_ids)} removed ones from {len(batch)} files in {collection_name}"
+                )
+                embeddings = None
+                if all(vectors is not None for _, _, vectors in batch):
+                    embeddings = [vector for _, _, vectors in batch for vector in vectors]
+                # One atomic swap for the whole batch (lexical index and generation included)
+                replace_source_chunks(
+                    vectorstore, collection_name, chunk_ids, chunks, removed_ids, embeddings, self.write_batch_size,
+                    updated_ids=updated_ids, updated_documents=updated_chunks,
+                )
+                vectorstore.persist()
+                self.written_collections.add(collection_name)
+        except Exception as e:
+            for index, prepared, _ in batch:
+                self.on_done(index, failed_result(prepared["file_path"], e))
+            return
+
+        for index, prepared, _ in batch:
+            index_structured_fields(prepared)
+            self.on_done(index, ingestion_result(prepared))
+
+
+class IngestionPipeline:
+    """Parse/chunk processes, bounded embedding threads and a single batched writer"""
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        parse_workers: Optional[int] = None,
+        embed_concurrency: Optional[int] = None,
+        embed_batch_size: Optional[int] = None,
+        write_batch_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        use_processes: bool = True,
+    ):
+        """
+        Initialize ingestion pipeline (None arguments default to the INGEST_* settings)
+
+        Args:
+            chunk_size: Chunk size for text splitting
+            chunk_overlap: Chunk overlap for text splitting
+            parse_workers: Worker processes for parse/categorize/chunk (0: one per CPU core)
+            embed_concurrency: Embedding requests in flight at once
+            embed_batch_size: Chunk texts per embedding request
+            write_batch_size: Maximum records per vector store upsert
+            max_in_flight: Files between parsing and writing at any time
+            use_processes: Parse in worker processes (False: in threads, e.g. for tests)
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        parse_workers = config.INGEST_PARSE_WORKERS if parse_workers is None else parse_workers
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.embed_concurrency = max(1, embed_concurrency or config.INGEST_EMBED_CONCURRENCY)
+        self.embed_batch_size = max(1, embed_batch_size or config.INGEST_EMBED_BATCH_SIZE)
+        self.write_batch_size = max(1, write_batch_size or config.INGEST_WRITE_BATCH_SIZE)
+        self.max_in_flight = max(1, max_in_flight or config.INGEST_MAX_IN_FLIGHT)
+        self.use_processes = use_processes
+
+    def _parse_executor(self, file_count: int) -> Executor:
+        workers = max(1, min(self.parse_workers, file_count))
+        if self.use_processes and workers > 1:
+            return ProcessPoolExecutor(max_workers=workers, mp_context=_parse_process_context())
+        # A single parse worker gains nothing from a separate process
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-parse")
+
+    def run(
+        self,
+        file_paths: List[str | Path],
+        target_collection: Optional[str] = None,
+        auto_map: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Ingest files through the pipeline
+
+        Args:
+            file_paths: List of file paths to ingest
+            target_collection: Target ChromaDB collection name (None for auto-map)
+            auto_map: Whether to auto-categorize documents
+
+        Returns:
+            List of ingestion results, in the order of file_paths
+        """
+        if not file_paths:
+            return []
+
+        started = datetime.utcnow()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        client = get_chroma_client()
+        # The retrieval server embeds writes itself (see retrieval_server.py)
+        embed = client.backend != "remote"
+
+        def finish(index: int, result: Dict[str, Any]) -> None:
+            results[index] = result
+            slots.release()
+
+        writer = _BatchedWriter(client, self.write_batch_size, finish)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(self.embed_concurrency, thread_name_prefix="ingest-embed") as embed_pool, \
+                    self._parse_executor(len(file_paths)) as parse_pool:
+
+                def parsed(index: int, file_path: str | Path, future: Future) -> None:
+                    try:
+                        prepared = future.result()
+                        # Skip chunks already stored before paying for their embeddings
+                        vectorstore = client.get_or_create_collection(prepared["target_collection"])
+                        prepared.update(plan_chunk_writes(vectorstore, prepared))
+                    except Exception as e:
+                        finish(index, failed_result(file_path, e))
+                        return
+
+                    texts = [chunk.page_content for chunk in prepared["new_chunks"]]
+                    if not embed or not texts:
+                        writer.put(index, prepared, None if not embed else [])
+                        return
+
+                    batches = [
+                        texts[start:start + self.embed_batch_size]
+                        for start in range(0, len(texts), self.embed_batch_size)
+                    ]
+                    state = _FileEmbedding(
+                        len(batches),
+                        on_complete=lambda vectors: writer.put(index, prepared, vectors),
+                        on_error=lambda error: finish(index, failed_result(file_path, error)),
+                    )
+                    for position, batch in enumerate(batches):
+                        embed_pool.submit(self._embed_batch, client, state, position, batch)
+
+                for index, file_path in enumerate(file_paths):
+                    # Backpressure: wait for a file to be written before parsing another
+                    slots.acquire()
+                    future = parse_pool.submit(
+                        prepare_document,
+                        file_path,
+                        target_collection,
+                        self.chunk_size,
+                        self.chunk_overlap,
+                        auto_map,
+                        datetime.utcnow(),
+                    )
+                    future.add_done_callback(functools.partial(parsed, index, file_path))
+        finally:
+            writer.close()
+
+        # Policy documents are served from the preloaded CAG snapshot - reload it once
+        if config.COLLECTION_POLICY in writer.written_collections and config.POLICY_CAG_ENABLED:
+            refresh_policy_cache()
+
+        succeeded = [result for result in results if result and result["success"]]
+        app_logger.info(
+            f"Ingested {len(succeeded)}/{len(file_paths)} files "
+            f"({sum(result['chunks_count'] for result in succeeded)} chunks, "
+            f"{sum(result['new_chunks'] for result in succeeded)} new) in "
+            f"{(datetime.utcnow() - started).total_seconds():.2f}s"
+        )
+        return [
+            result or failed_result(file_path, RuntimeError("Ingestion did not complete"))
+            for result, file_path in zip(results, file_paths)
+        ]
+
+    @staticmethod
+    def _embed_batch(client: Any, state: _FileEmbedding, position: int, texts: List[str]) -> None:
+        try:
+            vectors = client.embeddings.embed_documents(texts)
+        except Exception as e:
+            state.failed(e)
+            return
+        state.done(position, vectors)
+
+
+def expand_paths(paths: List[str]) -> List[Path]:
+    """
+    Expand directories into the supported files they contain (recursively, sorted)
+
+    Args:
+        paths: File and directory paths
+
+    Returns:
+        List of file paths
+    """
+    files: List[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(
+                sorted(child for child in path.rglob("*") if child.suffix.lower() in SUPPORTED_EXTENSIONS)
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Bulk-ingest files and directories through the pipeline"""
+    parser = argparse.ArgumentParser(description="Pipelined multi-file ingestion")
+    parser.add_argument("paths", nargs="+", help="Files or directories (searched recursively)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--collection", choices=config.get_all_collections())
+    target.add_argument(
+        "--auto-map", action="store_true", help="Categorize each document (default without --collection)"
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--parse-workers", type=int, help="Default: INGEST_PARSE_WORKERS")
+    parser.add_argument("--embed-concurrency", type=int, help="Default: INGEST_EMBED_CONCURRENCY")
+    args = parser.parse_args(argv)
+
+    pipeline = IngestionPipeline(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        parse_workers=args.parse_workers,
+        embed_concurrency=args.embed_concurrency,
+    )
+    for result in pipeline.run(expand_paths(args.paths), args.collection, auto_map=args.collection is None):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ from contextlib import asynccontextmanager
 
 from app.routers import health, collections, upload, sessions, chat, feedback
 from app.retrieval.chroma_client import initialize_knowledge_bases
+from app.retrieval.cag_retriever import refresh_policy_cache
 from app.utils.config import config
 from app.utils.logger import app_logger
 
@@ -37,6 +38,10 @@ async def lifespan(app: FastAPI):
         app_logger.error(f"Failed to initialize ChromaDB collections: {e}")
         raise
     
+    # Preload policy documents for Pure CAG (policy queries then make no vector calls)
+    if config.POLICY_CAG_ENABLED and not refresh_policy_cache():
+        app_logger.warning("Policy CAG cache could not be loaded; policy search will use vector retrieval")
+    
     app_logger.info("Application started successfully")
     
     yield
@@ -11,19 +11,88 @@ from app.retrieval.chroma_client import (
     initialize_knowledge_bases,
     ChromaDBClient,
 )
-from app.retrieval.cag_retriever import search_policy_kb, format_policy_context
-from app.retrieval.rag_retriever import search_technical_kb, format_technical_context
-from app.retrieval.hybrid_retriever import search_billing_kb, get_cached_policy_info, format_billing_context
+from app.retrieval.numpy_store import NumpyVectorStore, quantization_report
+from app.retrieval.hnsw_tuning import rebuild_collection, sweep_hnsw
+from app.retrieval.retrieval_server import RetrievalClient, RetrievalServer
+from app.retrieval.embedding_cache import get_query_embedding_cache, QueryEmbeddingCache
+from app.retrieval.persistent_embedding_cache import get_persistent_embedding_cache, PersistentEmbeddingCache
+from app.retrieval.embedding_scheduler import get_embedding_scheduler, EmbeddingScheduler
+from app.retrieval.context_packer import pack_context, get_packing_stats
+from app.retrieval.result_cache import (
+    get_retrieval_result_cache,
+    bump_collection_generation,
+    RetrievalResultCache,
+)
+from app.retrieval.negative_cache import get_negative_result_cache, NegativeResultCache
+from app.retrieval.versioning import replace_source_chunks, get_collection_swap_lock
+from app.retrieval.policy_semantic_cache import get_policy_semantic_cache, PolicySemanticCache
+from app.retrieval.query_filters import extract_query_filters, resolve_query_filters
+from app.retrieval.rerank import Reranker, LexicalFieldReranker, register_reranker, get_reranker
+from app.retrieval.cag_retriever import (
+    search_policy_kb,
+    asearch_policy_kb,
+    format_policy_context,
+    get_policy_cache,
+    refresh_policy_cache,
+)
+from app.retrieval.rag_retriever import search_technical_kb, asearch_technical_kb, format_technical_context
+from app.retrieval.hybrid_retriever import (
+    search_billing_kb,
+    asearch_billing_kb,
+    get_cached_policy_info,
+    format_billing_context,
+)
+from app.retrieval.multi_search import search_all_kbs, asearch_all_kbs, retrieval_request_scope
+from app.retrieval.bug_report_index import query_bug_reports, get_bug_report_index
 
 __all__ = [
     "get_chroma_client",
     "initialize_knowledge_bases",
     "ChromaDBClient",
+    "NumpyVectorStore",
+    "quantization_report",
+    "rebuild_collection",
+    "sweep_hnsw",
+    "RetrievalClient",
+    "RetrievalServer",
+    "get_query_embedding_cache",
+    "QueryEmbeddingCache",
+    "get_persistent_embedding_cache",
+    "PersistentEmbeddingCache",
+    "get_embedding_scheduler",
+    "EmbeddingScheduler",
+    "pack_context",
+    "get_packing_stats",
+    "get_retrieval_result_cache",
+    "bump_collection_generation",
+    "RetrievalResultCache",
+    "get_negative_result_cache",
+    "NegativeResultCache",
+    "replace_source_chunks",
+    "get_collection_swap_lock",
+    "get_policy_semantic_cache",
+    "PolicySemanticCache",
+    "extract_query_filters",
+    "resolve_query_filters",
+    "Reranker",
+    "LexicalFieldReranker",
+    "register_reranker",
+    "get_reranker",
     "search_policy_kb",
+    "asearch_policy_kb",
     "format_policy_context",
+    "get_policy_cache",
+    "refresh_policy_cache",
     "search_technical_kb",
+    "asearch_technical_kb",
     "format_technical_context",
     "search_billing_kb",
+    "asearch_billing_kb",
     "get_cached_policy_info",
     "format_billing_context",
+    "search_all_kbs",
+    "asearch_all_kbs",
+    "retrieval_request_scope",
+    "query_bug_reports",
+    "get_bug_report_index",
 ]
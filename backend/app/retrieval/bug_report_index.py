@@ -0,0 +1,459 @@
+"""
+Structured bug-report index (SQLite sidecar) for counting and status questions
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/tools
+Last Verified: November 2025
+
+Questions such as "How many high priority bugs were resolved this year?" cannot be
+answered reliably from k retrieved chunks. Bug reports ingested into the technical
+knowledge base are parsed into a structured table (ID, status, severity, priority,
+component, dates), and the query_bug_reports tool answers counts, filters and
+group-bys over it exactly, at any corpus size.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Any, Dict, List, Optional
+from langchain_core.tools import tool
+from app.retrieval.executor import run_in_retrieval_executor
+from app.retrieval.invoice_index import parse_document_date
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+_BUG_ID_PATTERN = re.compile(
+    r"(?:bug|issue|defect|ticket)\s*(?:id|no\.?|number|#)\s*[:#]?\s*([A-Z0-9][A-Z0-9\-_]*)",
+    re.IGNORECASE,
+)
+# Fallback for reports that only mention bare IDs such as "BUG-101: Hydraulic pump fault"
+_BARE_BUG_ID_PATTERN = re.compile(r"\b((?:BUG|ISSUE|DEFECT|DEF)-\d+)\b", re.IGNORECASE)
+# Field labels must start the line (after any list or emphasis markup) so that labels
+# such as "Operating System:" are not read as the "System:" component field
+_FIELD_PATTERNS = {
+    "title": re.compile(r"(?:title|summary|subject)\s*:\s*(.+)", re.IGNORECASE),
+    "status": re.compile(r"status\s*:\s*(.+)", re.IGNORECASE),
+    "severity": re.compile(r"severity\s*:\s*(.+)", re.IGNORECASE),
+    "priority": re.compile(r"priority\s*:\s*(.+)", re.IGNORECASE),
+    "component": re.compile(
+        r"^[\s>*#|-]*(?:component|module|subsystem|system)\s*:\s*(.+)",
+        re.IGNORECASE | re.MULTILINE,
+    ),
+    "reported_date": re.compile(
+        r"(?:reported|created|opened|date\s*reported|report\s*date|submitted)(?:\s*(?:on|date))?\s*:\s*(.+)",
+        re.IGNORECASE,
+    ),
+    "resolved_date": re.compile(
+        r"(?:resolved|resolution|closed|fixed)(?:\s*(?:on|date))?\s*:\s*(.+)",
+        re.IGNORECASE,
+    ),
+}
+
+# Status values treated as equivalent when filtering
+STATUS_SYNONYMS = {
+    "resolved": ["resolved", "closed", "fixed", "done", "verified"],
+    "open": ["open", "new", "reopened", "in progress", "in-progress", "investigating", "assigned"],
+}
+
+# Longest first so "in progress" wins over shorter synonyms it might start with
+_STATUS_PREFIXES = sorted((synonym for values in STATUS_SYNONYMS.values() for synonym in values), key=len, reverse=True)
+
+GROUP_BY_COLUMNS = {
+    "status": "status",
+    "severity": "severity",
+    "priority": "priority",
+    "component": "component",
+    "month": "substr(COALESCE(resolved_date, reported_date), 1, 7)",
+    "year": "substr(COALESCE(resolved_date, reported_date), 1, 4)",
+}
+
+
+def _first_line(value: Optional[str]) -> Optional[str]:
+    return value.splitlines()[0].strip() if value else None
+
+
+def normalize_status(value: Optional[str]) -> Optional[str]:
+    """
+    Reduce a free-text status to the synonym it starts with
+
+    "Resolved - fixed in v2" is stored as "resolved" so status filters, which compare
+    against the STATUS_SYNONYMS lists, match it. Statuses that start with no known
+    synonym are kept as lower-cased text.
+
+    Args:
+        value: Status text as written in the report
+
+    Returns:
+        Normalized status, or None when there is none
+    """
+    if not value:
+        return None
+    status = value.strip().lower()
+    for synonym in _STATUS_PREFIXES:
+        if re.match(rf"{re.escape(synonym)}\b", status):
+            return synonym
+    return status
+
+
+def extract_bug_reports(text: str, source_file: str) -> List[Dict[str, Any]]:
+    """
+    Extract bug report fields from document text
+
+    The text is split at each bug ID marker ("Bug ID: BUG-101") so documents that
+    list several bug reports yield one record each.
+
+    Args:
+        text: Full document text
+        source_file: Source file name (stored for citations)
+
+    Returns:
+        List of bug report record dictionaries
+    """
+    matches = list(_BUG_ID_PATTERN.finditer(text))
+    if not matches:
+        seen = set()
+        for match in _BARE_BUG_ID_PATTERN.finditer(text):
+            if match.group(1).upper() not in seen:
+                seen.add(match.group(1).upper())
+                matches.append(match)
+    records = []
+
+    for position, match in enumerate(matches):
+        section_start = match.start() if position > 0 else 0
+        section_end = matches[position + 1].start() if position + 1 < len(matches) else len(text)
+        section = text[section_start:section_end]
+
+        fields = {}
+        for field, pattern in _FIELD_PATTERNS.items():
+            field_match = pattern.search(section)
+            fields[field] = _first_line(field_match.group(1)) if field_match else None
+
+        records.append({
+            "bug_id": match.group(1).upper(),
+            "title": fields["title"],
+            "status": normalize_status(fields["status"]),
+            "severity": fields["severity"].lower() if fields["severity"] else None,
+            "priority": fields["priority"].lower() if fields["priority"] else None,
+            "component": fields["component"],
+            # Only ISO dates are stored so date range filters compare correctly
+            "reported_date": parse_document_date(fields["reported_date"]),
+            "resolved_date": parse_document_date(fields["resolved_date"]),
+            "source_file": source_file,
+        })
+
+    return records
+
+
+class BugReportIndex:
+    """SQLite-backed table of bug report fields extracted at ingest time"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize bug report index
+
+        Args:
+            db_path: SQLite file path (default: structured index path from config)
+        """
+        self.db_path = db_path or config.get_structured_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bug_reports (
+                    bug_id TEXT PRIMARY KEY,
+                    title TEXT,
+                    status TEXT,
+                    severity TEXT,
+                    priority TEXT,
+                    component TEXT,
+                    reported_date TEXT,
+                    resolved_date TEXT,
+                    source_file TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bug_reports_status ON bug_reports(status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bug_reports_source ON bug_reports(source_file)")
+            # Rows indexed before statuses were normalized stored the raw text
+            for (status,) in conn.execute("SELECT DISTINCT status FROM bug_reports WHERE status IS NOT NULL").fetchall():
+                if normalize_status(status) != status:
+                    conn.execute(
+                        "UPDATE bug_reports SET status = ? WHERE status = ?", (normalize_status(status), status)
+                    )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def index_document(self, text: str, source_file: str) -> int:
+        """
+        Extract bug reports from a document and replace any rows from the same source
+
+        Args:
+            text: Full document text
+            source_file: Source file name
+
+        Returns:
+            Number of bug report records stored
+        """
+        records = extract_bug_reports(text, source_file)
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM bug_reports WHERE source_file = ?", (source_file,))
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO bug_reports
+                    (bug_id, title, status, severity, priority, component,
+                     reported_date, resolved_date, source_file)
+                VALUES
+                    (:bug_id, :title, :status, :severity, :priority, :component,
+                     :reported_date, :resolved_date, :source_file)
+                """,
+                records,
+            )
+
+        if records:
+            app_logger.info(f"Indexed {len(records)} bug reports from {source_file}")
+        return len(records)
+
+    def count(self) -> int:
+        """Number of indexed bug reports"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM bug_reports").fetchone()[0]
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        severity: Optional[str] = None,
+        component: Optional[str] = None,
+        date_field: str = "resolved",
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        group_by: Optional[str] = None,
+        limit: int = 25,
+    ) -> Dict[str, Any]:
+        """
+        Count, filter and group bug reports
+
+        Args:
+            status: Status filter (e.g. "resolved" also matches closed/fixed)
+            severity: Severity or priority filter (e.g. "high")
+            component: Component substring filter
+            date_field: Date used by date_from/date_to ("resolved" or "reported")
+            date_from: Inclusive ISO start date (YYYY-MM-DD)
+            date_to: Inclusive ISO end date (YYYY-MM-DD)
+            group_by: Optional grouping (status, severity, priority, component, month, year)
+            limit: Maximum number of matching bug reports to list
+
+        Returns:
+            Dictionary with total count, optional groups and matching rows
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+
+        if status:
+            values = STATUS_SYNONYMS.get(status.lower(), [status.lower()])
+            clauses.append(f"status IN ({','.join('?' for _ in values)})")
+            params.extend(values)
+        if severity:
+            clauses.append("(severity = ? OR priority = ?)")
+            params.extend([severity.lower(), severity.lower()])
+        if component:
+            clauses.append("component LIKE ?")
+            params.append(f"%{component}%")
+
+        date_column = "resolved_date" if date_field == "resolved" else "reported_date"
+        if date_from:
+            clauses.append(f"{date_column} >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append(f"{date_column} <= ?")
+            params.append(date_to)
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM bug_reports{where}", params).fetchone()[0]
+
+            groups = []
+            if group_by:
+                if group_by not in GROUP_BY_COLUMNS:
+                    raise ValueError(
+                        f"Invalid group_by: {group_by}. Valid values: {list(GROUP_BY_COLUMNS)}"
+                    )
+                column = GROUP_BY_COLUMNS[group_by]
+                groups = [
+                    {"group": row[0] or "unknown", "count": row[1]}
+                    for row in conn.execute(
+                        f"SELECT {column}, COUNT(*) FROM bug_reports{where} "
+                        f"GROUP BY {column} ORDER BY COUNT(*) DESC",
+                        params,
+                    )
+                ]
+
+            rows = [
+                dict(row)
+                for row in conn.execute(
+                    f"SELECT * FROM bug_reports{where} ORDER BY bug_id LIMIT ?",
+                    params + [limit],
+                )
+            ]
+
+        return {"total": total, "groups": groups, "rows": rows}
+
+
+def format_bug_report_summary(result: Dict[str, Any], filters: Dict[str, Any]) -> str:
+    """
+    Format a bug report query result as a compact table
+
+    Args:
+        result: Result of BugReportIndex.query
+        filters: Filters that were applied (for the header)
+
+    Returns:
+        Formatted summary string with source citations
+    """
+    applied = ", ".join(f"{name}={value}" for name, value in filters.items() if value) or "none"
+    lines = [
+        f"Bug report query (exact values from the structured bug report index; filters: {applied})",
+        f"Matching bug reports: {result['total']}",
+    ]
+
+    if result["groups"]:
+        lines += ["", "| Group | Count |", "|---|---|"]
+        lines += [f"| {group['group']} | {group['count']} |" for group in result["groups"]]
+
+    if result["rows"]:
+        lines += [
+            "",
+            "| Bug ID | Status | Severity | Priority | Component | Reported | Resolved | Source |",
+            "|---|---|---|---|---|---|---|---|",
+        ]
+        lines += [
+            f"| {row['bug_id']} | {row['status'] or '-'} | {row['severity'] or '-'} | "
+            f"{row['priority'] or '-'} | {row['component'] or '-'} | {row['reported_date'] or '-'} | "
+            f"{row['resolved_date'] or '-'} | {row['source_file']} |"
+            for row in result["rows"]
+        ]
+        if result["total"] > len(result["rows"]):
+            lines.append(f"({result['total'] - len(result['rows'])} more matching bug reports not listed)")
+
+    return "\n".join(lines)
+
+
+# Global bug report index instance
+_bug_report_index: Optional[BugReportIndex] = None
+
+
+def get_bug_report_index() -> BugReportIndex:
+    """
+    Get or create global bug report index instance
+
+    Returns:
+        BugReportIndex instance
+    """
+    global _bug_report_index
+
+    if _bug_report_index is None:
+        _bug_report_index = BugReportIndex()
+
+    return _bug_report_index
+
+
+@tool
+def query_bug_reports(
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    component: Optional[str] = None,
+    date_field: str = "resolved",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    group_by: Optional[str] = None,
+) -> str:
+    """
+    Count, filter and group bug reports from the structured bug report index (exact results).
+
+    Use this tool for counting and status questions about bug reports, e.g.:
+    - "How many bugs were resolved this year?" -> status="resolved", date_from="<year>-01-01"
+    - "How many high priority bugs are open?" -> status="open", severity="high"
+    - "Bugs per component" -> group_by="component"
+
+    Args:
+        status: Status filter such as "resolved" (also matches closed/fixed) or "open"
+        severity: Severity or priority level such as "high", "medium", "low", "critical"
+        component: Component name (partial match)
+        date_field: Which date date_from/date_to apply to: "resolved" (default) or "reported"
+        date_from: Inclusive start date in YYYY-MM-DD format
+        date_to: Inclusive end date in YYYY-MM-DD format
+        group_by: Optional grouping: status, severity, priority, component, month or year
+
+    Returns:
+        Exact count, optional group counts and matching bug reports with source files
+    """
+    try:
+        index = get_bug_report_index()
+        if index.count() == 0:
+            return (
+                "No bug reports have been indexed yet. "
+                "Use search_technical_kb to look for bug report information instead."
+            )
+
+        result = index.query(
+            status=status,
+            severity=severity,
+            component=component,
+            date_field=date_field,
+            date_from=date_from,
+            date_to=date_to,
+            group_by=group_by,
+        )
+
+        app_logger.info(f"Bug report query matched {result['total']} reports")
+
+        return format_bug_report_summary(result, {
+            "status": status,
+            "severity": severity,
+            "component": component,
+            "date_field": date_field if (date_from or date_to) else None,
+            "date_from": date_from,
+            "date_to": date_to,
+            "group_by": group_by,
+        })
+
+    except Exception as e:
+        app_logger.error(f"Error querying bug reports: {e}")
+        return (
+            f"Error querying bug reports: {str(e)}. "
+            "Please try again or contact support if the issue persists."
+        )
+
+
+async def aquery_bug_reports(
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    component: Optional[str] = None,
+    date_field: str = "resolved",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    group_by: Optional[str] = None,
+) -> str:
+    """Async counterpart of query_bug_reports (SQLite work runs on the retrieval executor)"""
+    return await run_in_retrieval_executor(
+        query_bug_reports.func,
+        status=status,
+        severity=severity,
+        component=component,
+        date_field=date_field,
+        date_from=date_from,
+        date_to=date_to,
+        group_by=group_by,
+    )
+
+
+# Run the async implementation when the tool is used through ainvoke/astream
+query_bug_reports.coroutine = aquery_bug_reports
@@ -7,21 +7,267 @@ Last Verified: November 2025
 
 Pure CAG strategy: Uses static/cached policy documents without vector retrieval per query.
 Optimized for fast, consistent answers from static policy documents.
+
+Every policy chunk is loaded into an in-process PolicyCAGCache at startup (and again
+after any ingest into the policy collection), together with its stored embedding.
+Chunks are ranked per query in memory: cosine similarity against the snapshot's
+embeddings fused with a local BM25 index, with the same adaptive cutoff as the
+vector path (see search_pipeline.rank_results). Serving policy context needs no
+vector-store call, but it does embed the query: BM25 alone cannot tell a relevant
+chunk from one that only shares common words. Repeated questions are answered by
+the query embedding cache, and questions known to find nothing (negative cache)
+are answered before embedding. The vector path is only used as a fallback when
+the cache could not be loaded.
+
+The snapshot records the policy collection generation it was loaded at, so a worker
+process reloads it on next use after another process ingested policy documents.
 """
 
+import threading
+import numpy as np
+from datetime import datetime
 from typing import List, Optional, Dict, Any
 from langchain_core.tools import tool
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 from app.retrieval.chroma_client import get_chroma_client
+from app.retrieval.context_packer import pack_context
+from app.retrieval.lexical_index import BM25Index
+from app.retrieval.executor import run_in_retrieval_executor
+from app.retrieval.negative_cache import known_empty_note
+from app.retrieval.relevance import ScoredDocuments
+from app.retrieval.result_cache import get_collection_generations
+from app.retrieval.search_pipeline import (
+    asearch_collection_scored,
+    check_known_empty,
+    rank_results,
+    record_if_empty,
+    search_collection_scored,
+)
 from app.utils.config import config
 from app.utils.logger import app_logger
 
 
+class PolicyCAGCache:
+    """In-memory snapshot of the policy collection, ranked without vector-store calls"""
+    
+    def __init__(self):
+        """Initialize an empty (not yet loaded) policy cache"""
+        self._lock = threading.Lock()
+        self._documents: List[Document] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._index = BM25Index()
+        self.loaded = False
+        self.loaded_at: Optional[str] = None
+        self.generation: Optional[int] = None
+        self.loads = 0
+        self.served = 0
+    
+    def load(self, vectorstore: Optional[Chroma] = None) -> bool:
+        """
+        Load every policy chunk and its embedding from ChromaDB into memory
+        
+        Args:
+            vectorstore: Policy collection (default: resolved through get_chroma_client)
+            
+        Returns:
+            True if the snapshot was loaded, False otherwise
+        """
+        try:
+            if vectorstore is None:
+                vectorstore = get_chroma_client().get_or_create_collection(
+                    collection_name=config.COLLECTION_POLICY
+                )
+            
+            # Read before the snapshot so a write during the load triggers another reload
+            generation = get_collection_generations().current(config.COLLECTION_POLICY)
+            data = vectorstore.get(include=["documents", "metadatas", "embeddings"])
+            if not isinstance(data, dict):
+                app_logger.warning("Policy CAG cache load skipped: unexpected collection payload")
+                return False
+            
+            contents = data.get("documents") or []
+            metadatas = data.get("metadatas") or [{}] * len(contents)
+            documents = [
+                Document(page_content=content or "", metadata=metadata or {})
+                for content, metadata in zip(contents, metadatas)
+            ]
+            order = sorted(range(len(documents)), key=lambda position: (
+                str(documents[position].metadata.get("source_file", "")),
+                documents[position].metadata.get("chunk_index", 0)
+                if isinstance(documents[position].metadata.get("chunk_index", 0), int) else 0,
+            ))
+            documents = [documents[position] for position in order]
+            vectors = _normalized_rows(data.get("embeddings"), order)
+            
+            index = BM25Index()
+            index.add_documents([str(position) for position in range(len(documents))], documents)
+            
+            with self._lock:
+                self._documents = documents
+                self._vectors = vectors
+                self._index = index
+                self.loaded = True
+                self.loaded_at = datetime.utcnow().isoformat()
+                self.generation = generation
+                self.loads += 1
+            
+            app_logger.info(
+                f"Policy CAG cache loaded {len(documents)} policy chunks "
+                f"({'with' if vectors is not None else 'without'} embeddings)"
+            )
+            return True
+            
+        except Exception as e:
+            app_logger.error(f"Error loading policy CAG cache: {e}")
+            return False
+    
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next access reloads it"""
+        with self._lock:
+            self._documents = []
+            self._vectors = None
+            self._index = BM25Index()
+            self.loaded = False
+    
+    @property
+    def is_current(self) -> bool:
+        """Whether the snapshot is loaded and no policy write happened since (in any worker process)"""
+        return self.loaded and self.generation == get_collection_generations().current(config.COLLECTION_POLICY)
+    
+    @property
+    def has_vectors(self) -> bool:
+        """Whether the snapshot holds the stored embeddings (semantic ranking is possible)"""
+        return self._vectors is not None
+    
+    def search(
+        self, query: str, k: int = 5, query_vector: Optional[List[float]] = None
+    ) -> List[Document]:
+        """
+        Select the most relevant cached policy chunks for a query (no vector-store calls)
+        
+        Args:
+            query: User query
+            k: Maximum number of chunks to return
+            query_vector: Query embedding (default: rank with BM25 only)
+            
+        Returns:
+            List of Document objects, best first
+        """
+        return [doc for doc, _ in self.search_with_scores(query, k, query_vector)]
+    
+    def search_with_scores(
+        self, query: str, k: int = 5, query_vector: Optional[List[float]] = None
+    ) -> ScoredDocuments:
+        """
+        Same as search, with relevance scores
+        
+        Cosine-similarity hits against the snapshot's embeddings and BM25 hits are
+        cut with the adaptive k rules and fused by reciprocal rank, exactly like a
+        collection search. Chunks that match neither way are never returned, and
+        nothing is returned when the best chunk scores below the minimum relevance.
+        
+        Args:
+            query: User query
+            k: Maximum number of chunks to return
+            query_vector: Query embedding (default: rank with BM25 only)
+            
+        Returns:
+            List of (Document, score) tuples, best first
+        """
+        with self._lock:
+            documents = self._documents
+            vectors = self._vectors
+            index = self._index
+        
+        vector_hits = []
+        if vectors is not None and query_vector is not None and len(documents):
+            query_array = np.asarray(query_vector, dtype=np.float32)
+            similarities = vectors @ (query_array / (np.linalg.norm(query_array) or 1.0))
+            best = np.argsort(-similarities)[:k]
+            vector_hits = [
+                (documents[position], max(0.0, min(1.0, float(similarities[position])))) for position in best
+            ]
+        lexical_hits = [(documents[int(doc_id)], score) for doc_id, score in index.search(query, k=k)]
+        
+        results = rank_results(
+            config.COLLECTION_POLICY, query, k, vector_hits, lexical_hits, config.ADAPTIVE_K_ENABLED
+        )
+        self.served += 1
+        return results
+    
+    @property
+    def size(self) -> int:
+        """Number of cached policy chunks"""
+        return len(self._documents)
+    
+    def documents(self) -> List[Document]:
+        """All cached policy documents"""
+        return list(self._documents)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+        
+        Returns:
+            Dictionary with load state, size and counters
+        """
+        return {
+            "loaded": self.loaded,
+            "loaded_at": self.loaded_at,
+            "generation": self.generation,
+            "chunks": self.size,
+            "loads": self.loads,
+            "served": self.served,
+        }
+
+
+def _normalized_rows(embeddings: Any, order: List[int]) -> Optional[np.ndarray]:
+    """Stored embeddings in snapshot order as unit-length float32 rows (None when unavailable)"""
+    if embeddings is None or len(embeddings) != len(order) or not len(order):
+        return None
+    matrix = np.asarray([embeddings[position] for position in order], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# Global policy CAG cache instance
+_policy_cache: Optional[PolicyCAGCache] = None
+
+
+def get_policy_cache() -> PolicyCAGCache:
+    """
+    Get or create global policy CAG cache instance
+    
+    Returns:
+        PolicyCAGCache instance
+    """
+    global _policy_cache
+    
+    if _policy_cache is None:
+        _policy_cache = PolicyCAGCache()
+    
+    return _policy_cache
+
+
+def refresh_policy_cache() -> bool:
+    """
+    Reload the policy CAG cache from ChromaDB (called at startup and after policy ingest)
+    
+    Returns:
+        True if the cache was reloaded, False otherwise
+    """
+    cache = get_policy_cache()
+    cache.invalidate()
+    return cache.load()
+
+
 @tool
 def search_policy_kb(
     query: str,
-    k: int = 5
+    k: int = 5,
+    diversify: bool = False
 ) -> str:
     """
     Search policy knowledge base using Pure CAG strategy (optimized for static policy documents).
@@ -42,7 +288,8 @@ def search_policy_kb(
     
     Args:
         query: User query about policies, regulations, or compliance
-        k: Number of documents to retrieve (default: 5 for policy documents)
+        k: Maximum number of documents to retrieve (default: 5 for policy documents; fewer are returned when relevance drops off)
+        diversify: Prefer distinct documents over near-duplicate chunks (default: False)
         
     Returns:
         Formatted context string with policy information and source citations
@@ -56,31 +303,95 @@ def search_policy_kb(
             collection_name=config.COLLECTION_POLICY
         )
         
-        # For Pure CAG, we can use vector similarity search on static documents
-        # The key difference is that policy documents are static and cached
-        # We retrieve relevant chunks and format them for the agent
+        # Pure CAG: rank the in-memory policy snapshot instead of searching the collection
+        # Diverse results need the stored embeddings, so they bypass the CAG snapshot
+        cache = get_policy_cache()
+        if config.POLICY_CAG_ENABLED and not diversify:
+            if not cache.is_current:
+                cache.load(policy_collection)
+            if cache.is_current:
+                empty_key, empty_generation, known_empty = check_known_empty(config.COLLECTION_POLICY, query)
+                if known_empty:
+                    return _policy_response([], query)
+                query_vector = client.embeddings.embed_query(query) if cache.has_vectors else None
+                results = _cached_policy_results(cache, query, k, query_vector)
+                record_if_empty(empty_key, empty_generation, results)
+                return _policy_response(results, query)
+        
+        # Fallback: hybrid lexical/vector search when the CAG cache is unavailable
+        results = search_collection_scored(
+            policy_collection,
+            config.COLLECTION_POLICY,
+            query,
+            k,
+            diversify=diversify,
+        )
+        
+        return _policy_response(results, query)
         
-        # Retrieve documents using similarity search
-        # Even though it's "Pure CAG", we use ChromaDB for retrieval
-        # The "CAG" aspect is that these are static policy documents (not dynamic)
-        docs: List[Document] = policy_collection.similarity_search(
-            query=query,
-            k=k
+    except Exception as e:
+        app_logger.error(f"Error searching policy knowledge base: {e}")
+        return (
+            f"Error retrieving policy information: {str(e)}. "
+            "Please try again or contact support if the issue persists."
         )
+
+
+async def asearch_policy_kb(
+    query: str,
+    k: int = 5,
+    diversify: bool = False
+) -> str:
+    """
+    Async counterpart of search_policy_kb, used by LangChain under ainvoke/astream.
+    
+    Cached policy chunks are ranked in memory after an async query embedding; loading
+    the snapshot and the vector fallback run on the bounded retrieval executor.
+    
+    Args:
+        query: User query about policies, regulations, or compliance
+        k: Maximum number of documents to retrieve (default: 5 for policy documents; fewer are returned when relevance drops off)
+        diversify: Prefer distinct documents over near-duplicate chunks (default: False)
         
-        if not docs:
-            app_logger.warning(f"No policy documents found for query: {query[:50]}")
-            return (
-                "No relevant policy documents found in the knowledge base. "
-                "Please check if policy documents have been uploaded to the policy knowledge base."
+    Returns:
+        Formatted context string with policy information and source citations
+    """
+    try:
+        cache = get_policy_cache()
+        use_cache = config.POLICY_CAG_ENABLED and not diversify
+        client = get_chroma_client()
+        policy_collection = None
+        if use_cache and not cache.is_current:
+            policy_collection = await run_in_retrieval_executor(
+                client.get_or_create_collection,
+                collection_name=config.COLLECTION_POLICY,
             )
+            await run_in_retrieval_executor(cache.load, policy_collection)
         
-        # Format retrieved documents with source citations (Pure CAG format)
-        formatted_context = format_policy_context(docs, query)
+        if use_cache and cache.is_current:
+            empty_key, empty_generation, known_empty = check_known_empty(config.COLLECTION_POLICY, query)
+            if known_empty:
+                return _policy_response([], query)
+            query_vector = await client.embeddings.aembed_query(query) if cache.has_vectors else None
+            results = _cached_policy_results(cache, query, k, query_vector)
+            record_if_empty(empty_key, empty_generation, results)
+            return _policy_response(results, query)
         
-        app_logger.info(f"Retrieved {len(docs)} policy documents for query: {query[:50]}")
+        if policy_collection is None:
+            policy_collection = await run_in_retrieval_executor(
+                client.get_or_create_collection,
+                collection_name=config.COLLECTION_POLICY,
+            )
+        
+        results = await asearch_collection_scored(
+            policy_collection,
+            config.COLLECTION_POLICY,
+            query,
+            k,
+            diversify=diversify,
+        )
         
-        return formatted_context
+        return _policy_response(results, query)
         
     except Exception as e:
         app_logger.error(f"Error searching policy knowledge base: {e}")
@@ -90,13 +401,103 @@ def search_policy_kb(
         )
 
 
-def format_policy_context(docs: List[Document], query: str) -> str:
+# Run the async implementation when the tool is used through ainvoke/astream
+search_policy_kb.coroutine = asearch_policy_kb
+
+
+def _cached_policy_results(
+    cache: PolicyCAGCache, query: str, k: int, query_vector: Optional[List[float]] = None
+) -> ScoredDocuments:
+    """Rank the loaded in-memory policy snapshot for a query"""
+    results = cache.search_with_scores(query, k=k, query_vector=query_vector) if cache.size else []
+    if results:
+        app_logger.info(f"Served {len(results)} cached policy documents for query: {query[:50]}")
+    return results
+
+
+def _policy_response(results: ScoredDocuments, query: str) -> str:
+    """Format retrieved policy documents with their scores, or explain that nothing was found"""
+    docs = [doc for doc, _ in results]
+    if not docs:
+        app_logger.warning(f"No policy documents found for query: {query[:50]}")
+        return (
+            "No relevant policy documents found in the knowledge base. "
+            "Please check if policy documents have been uploaded to the policy knowledge base."
+            + known_empty_note(config.COLLECTION_POLICY, query)
+        )
+    
+    # Format retrieved documents with source citations (Pure CAG format)
+    if config.CONTEXT_PACKING_ENABLED:
+        formatted_context = pack_context(results, query, "policy", legacy_formatter=format_policy_context)
+    else:
+        formatted_context = format_policy_context(docs, query, scores=[score for _, score in results])
+    
+    app_logger.info(f"Retrieved {len(docs)} policy documents for query: {query[:50]}")
+    
+    return formatted_context
+
+
+def render_policy_document(doc: Document) -> str:
+    """
+    Render a single policy document into a context block (without its position header).
+    
+    Args:
+        doc: Policy Document object
+        
+    Returns:
+        Rendered block with source citation and content
+    """
+    # Extract document content
+    content = doc.page_content.strip()
+    
+    # Extract metadata for citations
+    metadata = doc.metadata or {}
+    source_file = metadata.get("source_file", metadata.get("source", "Unknown"))
+    chunk_index = metadata.get("chunk_index", "")
+    upload_timestamp = metadata.get("upload_timestamp", "")
+    
+    block_parts = [f"Source: {source_file}"]
+    if upload_timestamp:
+        block_parts.append(f"Upload Date: {upload_timestamp}")
+    if chunk_index != "":
+        block_parts.append(f"Chunk Index: {chunk_index}")
+    block_parts.append("-" * 80)
+    block_parts.append(content)
+    
+    return "\n".join(block_parts)
+
+
+def format_policy_context(
+    docs: List[Document],
+    query: str,
+    scores: Optional[List[Optional[float]]] = None,
+) -> str:
     """
     Format retrieved policy documents into context string with source citations.
     
     Args:
         docs: List of retrieved Document objects
         query: Original query for context
+        scores: Optional relevance scores (same order as docs)
+        
+    Returns:
+        Formatted context string with document content and source citations
+    """
+    return format_policy_blocks([render_policy_document(doc) for doc in docs], query, scores=scores)
+
+
+def format_policy_blocks(
+    blocks: List[str],
+    query: str,
+    scores: Optional[List[Optional[float]]] = None,
+) -> str:
+    """
+    Assemble rendered policy blocks into context string with source citations.
+    
+    Args:
+        blocks: Rendered policy blocks (see render_policy_document)
+        query: Original query for context
+        scores: Optional relevance scores (same order as blocks)
         
     Returns:
         Formatted context string with document content and source citations
@@ -107,26 +508,12 @@ def format_policy_context(docs: List[Document], query: str) -> str:
     formatted_parts.append("=" * 80)
     formatted_parts.append("")
     
-    for i, doc in enumerate(docs, 1):
-        # Extract document content
-        content = doc.page_content.strip()
-        
-        # Extract metadata for citations
-        metadata = doc.metadata or {}
-        source_file = metadata.get("source_file", metadata.get("source", "Unknown"))
-        document_category = metadata.get("document_category", "policy")
-        chunk_index = metadata.get("chunk_index", "")
-        upload_timestamp = metadata.get("upload_timestamp", "")
-        
+    for i, block in enumerate(blocks, 1):
         # Format document entry
         formatted_parts.append(f"[Policy Document {i}]")
-        formatted_parts.append(f"Source: {source_file}")
-        if upload_timestamp:
-            formatted_parts.append(f"Upload Date: {upload_timestamp}")
-        if chunk_index != "":
-            formatted_parts.append(f"Chunk Index: {chunk_index}")
-        formatted_parts.append("-" * 80)
-        formatted_parts.append(content)
+        if scores and scores[i - 1] is not None:
+            formatted_parts.append(f"Relevance Score: {scores[i - 1]:.3f}")
+        formatted_parts.append(block)
         formatted_parts.append("")
     
     formatted_parts.append("=" * 80)
@@ -147,25 +534,12 @@ def get_all_policy_documents() -> List[Document]:
         List of all Document objects from policy_knowledge_base collection
     """
     try:
-        client = get_chroma_client()
-        policy_collection = client.get_or_create_collection(
-            collection_name=config.COLLECTION_POLICY
-        )
+        cache = get_policy_cache()
+        if not cache.is_current:
+            cache.load()
         
-        # Get all documents (for Pure CAG caching strategy)
-        # Note: This is a simple approach - in production, you might want pagination
-        # For now, we'll use a broad search to get documents
-        # In a true Pure CAG system, these would be fully cached
-        
-        # Use a broad query to get documents
-        docs = policy_collection.similarity_search(
-            query="policy regulation compliance FAA EASA DFARs",
-            k=100  # Get up to 100 documents (adjust based on collection size)
-        )
-        
-        return docs
+        return cache.documents()
         
     except Exception as e:
         app_logger.error(f"Error getting all policy documents: {e}")
         return []
-
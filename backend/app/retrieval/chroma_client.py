@@ -4,18 +4,63 @@ ChromaDB client initialization and collection management
 LangChain Version: v1.0+
 Documentation Reference: https://docs.langchain.com/oss/python/langchain/vector-stores/chroma
 Last Verified: November 2025
+
+With VECTOR_BACKEND=numpy, collections are NumpyVectorStore instances (exact search
+over a memory-mapped matrix, see numpy_store.py) with the same interface.
+With RETRIEVAL_SERVER_SOCKET set, get_chroma_client() returns a thin client to the
+shared retrieval server instead (see retrieval_server.py).
 """
 
 import os
 from typing import Optional, Dict, Any, List
 from chromadb import PersistentClient
 from chromadb.config import Settings
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from app.retrieval.embedding_cache import CachedQueryEmbeddings, get_query_embedding_cache
+from app.retrieval.embedding_scheduler import get_scheduled_embeddings
+from app.retrieval.persistent_embedding_cache import with_persistent_cache
+from app.retrieval.numpy_store import NumpyVectorStore, delete_numpy_collection, list_numpy_collections
+from app.retrieval.result_cache import bump_collection_generation
 from app.utils.config import config
 from app.utils.logger import app_logger
 
 
+class KnowledgeBaseChroma(Chroma):
+    """LangChain Chroma vector store with the write helpers used by versioned ingestion"""
+    
+    def upsert_embedded(
+        self,
+        ids: List[str],
+        documents: List[Document],
+        embeddings: List[List[float]],
+    ) -> None:
+        """
+        Store documents with precomputed embeddings, replacing records with the same ID
+        
+        Args:
+            ids: One unique ID per document
+            documents: Documents to store
+            embeddings: One vector per document
+        """
+        self._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=[doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+        )
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Replace the metadata of stored documents without re-embedding them
+
+        Args:
+            ids: IDs of stored documents
+            metadatas: New metadata, one per ID
+        """
+        self._collection.update(ids=ids, metadatas=metadatas)
+
+
 class ChromaDBClient:
     """ChromaDB client wrapper for managing vector database"""
     
@@ -28,6 +73,11 @@ class ChromaDBClient:
                               (default: from config)
         """
         self.persist_directory = persist_directory or config.CHROMA_DB_PATH
+        self.backend = config.VECTOR_BACKEND
+        self.numpy_store_path = (
+            config.get_numpy_store_path() if persist_directory is None
+            else os.path.join(self.persist_directory, "numpy_store")
+        )
         
         # Ensure directory exists
         os.makedirs(self.persist_directory, exist_ok=True)
@@ -41,10 +91,18 @@ class ChromaDBClient:
             ),
         )
         
-        # Initialize OpenAI embeddings
-        self.embeddings = OpenAIEmbeddings(
+        # Initialize OpenAI embeddings behind the process-wide embedding scheduler (concurrent
+        # requests share token-bounded API calls), the persistent on-disk embedding cache (text
+        # embedded before is never sent again) and the process-wide query embedding cache
+        # so every similarity_search reuses vectors for repeated query text
+        self.embeddings = CachedQueryEmbeddings(
+            with_persistent_cache(
+                get_scheduled_embeddings(),
+                model=config.OPENAI_EMBEDDING_MODEL,
+                dimensions=config.OPENAI_EMBEDDING_DIMENSIONS,
+            ),
+            cache=get_query_embedding_cache(),
             model=config.OPENAI_EMBEDDING_MODEL,
-            openai_api_key=config.OPENAI_API_KEY,
             dimensions=config.OPENAI_EMBEDDING_DIMENSIONS,
         )
         
@@ -52,7 +110,42 @@ class ChromaDBClient:
         self._collections: Dict[str, Chroma] = {}
         
         app_logger.info(
-            f"ChromaDB client initialized with persist_directory: {self.persist_directory}"
+            f"ChromaDB client initialized with persist_directory: {self.persist_directory} "
+            f"(vector backend: {self.backend})"
+        )
+    
+    def _numpy_collection(
+        self,
+        collection_name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> NumpyVectorStore:
+        """Open a collection of the NumPy vector backend"""
+        vectorstore = NumpyVectorStore(
+            collection_name=collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=self.numpy_store_path,
+            collection_metadata=metadata,
+        )
+        self._collections[collection_name] = vectorstore
+        return vectorstore
+    
+    def get_chroma_collection(self, collection_name: str) -> Chroma:
+        """
+        Get or create a collection in ChromaDB itself, whatever the configured backend
+        
+        Used to import Chroma collections into the NumPy backend and to benchmark them.
+        
+        Args:
+            collection_name: Name of the collection
+            
+        Returns:
+            Chroma vector store instance
+        """
+        return KnowledgeBaseChroma(
+            collection_name=collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory,
+            client=self.client,
         )
     
     def get_or_create_collection(
@@ -73,12 +166,22 @@ class ChromaDBClient:
         if collection_name in self._collections:
             return self._collections[collection_name]
         
+        if self.backend == "numpy":
+            vectorstore = self._numpy_collection(collection_name, metadata)
+            app_logger.info(f"Collection '{collection_name}' ready (numpy backend)")
+            return vectorstore
+        
         try:
             # Create or get collection using LangChain Chroma
             # ChromaDB requires non-empty metadata, so provide default if empty
-            collection_metadata = metadata if metadata else {"type": "knowledge_base"}
+            # Configured HNSW settings only take effect when the collection is created
+            # (see hnsw_tuning.py to rebuild an existing one)
+            collection_metadata = {
+                **config.get_hnsw_metadata(collection_name),
+                **(metadata if metadata else {"type": "knowledge_base"}),
+            }
             
-            vectorstore = Chroma(
+            vectorstore = KnowledgeBaseChroma(
                 collection_name=collection_name,
                 embedding_function=self.embeddings,
                 persist_directory=self.persist_directory,
@@ -109,9 +212,15 @@ class ChromaDBClient:
         if collection_name in self._collections:
             return self._collections[collection_name]
         
+        if self.backend == "numpy":
+            if collection_name not in list_numpy_collections(self.numpy_store_path):
+                app_logger.warning(f"Collection '{collection_name}' not found in the numpy backend")
+                return None
+            return self._numpy_collection(collection_name)
+        
         try:
             # Try to get existing collection
-            vectorstore = Chroma(
+            vectorstore = KnowledgeBaseChroma(
                 collection_name=collection_name,
                 embedding_function=self.embeddings,
                 persist_directory=self.persist_directory,
@@ -132,6 +241,9 @@ class ChromaDBClient:
         Returns:
             List of collection names
         """
+        if self.backend == "numpy":
+            return list_numpy_collections(self.numpy_store_path)
+        
         try:
             collections = self.client.list_collections()
             return [col.name for col in collections]
@@ -153,7 +265,11 @@ class ChromaDBClient:
             if collection_name in self._collections:
                 del self._collections[collection_name]
             
-            self.client.delete_collection(name=collection_name)
+            if self.backend == "numpy":
+                delete_numpy_collection(self.numpy_store_path, collection_name)
+            else:
+                self.client.delete_collection(name=collection_name)
+            bump_collection_generation(collection_name)
             app_logger.info(f"Collection '{collection_name}' deleted")
             return True
             
@@ -169,8 +285,14 @@ class ChromaDBClient:
             True if successful, False otherwise
         """
         try:
-            self.client.reset()
+            if self.backend == "numpy":
+                for collection_name in list_numpy_collections(self.numpy_store_path):
+                    delete_numpy_collection(self.numpy_store_path, collection_name)
+            else:
+                self.client.reset()
             self._collections.clear()
+            for collection_name in config.get_all_collections():
+                bump_collection_generation(collection_name)
             app_logger.info("ChromaDB client reset")
             return True
             
@@ -187,13 +309,20 @@ def get_chroma_client() -> ChromaDBClient:
     """
     Get or create global ChromaDB client instance
     
+    With RETRIEVAL_SERVER_SOCKET set, this is a RetrievalClient (same interface)
+    forwarding to the shared retrieval server (see retrieval_server.py).
+    
     Returns:
         ChromaDBClient instance
     """
     global _chroma_client
     
     if _chroma_client is None:
-        _chroma_client = ChromaDBClient()
+        if config.RETRIEVAL_SERVER_SOCKET:
+            from app.retrieval.retrieval_server import RetrievalClient
+            _chroma_client = RetrievalClient(config.RETRIEVAL_SERVER_SOCKET)
+        else:
+            _chroma_client = ChromaDBClient()
     
     return _chroma_client
 
@@ -0,0 +1,273 @@
+"""
+Token-budgeted context packing for knowledge base search results
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+Chunks are indexed with chunk_overlap=200, so adjacent hits from the same source
+repeat up to 20% of their text, and format_*_context adds rule lines and
+boilerplate to every document. pack_context merges adjacent chunk_index hits from
+the same source file, strips the overlapping text, gives each passage a one-line
+citation header and fills a token budget in score order. Every call logs the
+tokens saved against the legacy format; totals appear under /health/retrieval.
+"""
+
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.retrieval.relevance import ScoredDocuments
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+# Longest overlap searched for when joining adjacent chunks (chunk_overlap plus slack)
+MAX_OVERLAP_CHARS = 400
+
+# Shortest shared text treated as chunk overlap rather than a coincidence
+MIN_OVERLAP_CHARS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of text (about 4 characters per token for English)
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated number of tokens
+    """
+    return math.ceil(len(text) / 4)
+
+
+def strip_overlap(
+    previous: str,
+    following: str,
+    max_overlap: int = MAX_OVERLAP_CHARS,
+    min_overlap: int = MIN_OVERLAP_CHARS,
+) -> str:
+    """
+    Remove the prefix of following that repeats the end of previous
+
+    Only an overlap of at least min_overlap characters that starts and ends on word
+    boundaries counts, so neighbours that merely share a letter or two (e.g. across a
+    PDF page boundary) are left whole.
+
+    Args:
+        previous: Text of the earlier chunk
+        following: Text of the next chunk
+        max_overlap: Longest overlap to look for
+        min_overlap: Shortest overlap to strip
+
+    Returns:
+        following without the repeated prefix
+    """
+    limit = min(len(previous), len(following), max_overlap)
+    for size in range(limit, max(min_overlap, 1) - 1, -1):
+        if not previous.endswith(following[:size]):
+            continue
+        starts_on_boundary = size == len(previous) or not (
+            previous[-size - 1].isalnum() and previous[-size].isalnum()
+        )
+        ends_on_boundary = size == len(following) or not (
+            following[size - 1].isalnum() and following[size].isalnum()
+        )
+        if starts_on_boundary and ends_on_boundary:
+            return following[size:]
+    return following
+
+
+class _Passage:
+    """A run of adjacent chunks from one source file"""
+
+    def __init__(self, source_file: str, chunk_index: Any, text: str, score: Optional[float], rank: int):
+        self.source_file = source_file
+        self.first_chunk = chunk_index
+        self.last_chunk = chunk_index
+        self.text = text
+        self.score = score
+        self.rank = rank
+        self.chunks = 1
+
+    def append(self, chunk_index: int, text: str, score: Optional[float]) -> None:
+        """Extend the passage with the next chunk, dropping the text it repeats"""
+        remainder = strip_overlap(self.text, text)
+        # Chunks that share no text (e.g. across a page boundary) are kept apart
+        self.text += remainder if remainder != text else "\n" + text
+        self.last_chunk = chunk_index
+        self.chunks += 1
+        if score is not None and (self.score is None or score > self.score):
+            self.score = score
+
+    def header(self, position: int) -> str:
+        """One-line citation such as: [1] Source: manual.pdf #3-4 | relevance 0.82"""
+        chunks = (
+            f"#{self.first_chunk}" if self.first_chunk == self.last_chunk
+            else f"#{self.first_chunk}-{self.last_chunk}"
+        )
+        location = f"{self.source_file} {chunks}" if self.first_chunk != "" else self.source_file
+        score = f" | relevance {self.score:.2f}" if self.score is not None else ""
+        return f"[{position}] Source: {location}{score}"
+
+
+def merge_adjacent_chunks(results: ScoredDocuments) -> List["_Passage"]:
+    """
+    Merge hits with consecutive chunk_index values from the same source into passages
+
+    Duplicate chunks are dropped and overlapping text between neighbours is removed.
+
+    Args:
+        results: (Document, score) tuples, best first
+
+    Returns:
+        List of passages, best first (by score, then by original rank)
+    """
+    by_source: Dict[str, List[Tuple[Any, str, Optional[float], int]]] = {}
+    for rank, (doc, score) in enumerate(results):
+        metadata = doc.metadata or {}
+        source_file = str(metadata.get("source_file", metadata.get("source", "Unknown")))
+        by_source.setdefault(source_file, []).append(
+            (metadata.get("chunk_index", ""), doc.page_content.strip(), score, rank)
+        )
+
+    passages: List[_Passage] = []
+    for source_file, hits in by_source.items():
+        numbered = sorted((hit for hit in hits if isinstance(hit[0], int)), key=lambda hit: hit[0])
+        unnumbered = [hit for hit in hits if not isinstance(hit[0], int)]
+
+        current: Optional[_Passage] = None
+        for chunk_index, text, score, rank in numbered:
+            if current is not None and chunk_index == current.last_chunk:
+                continue
+            if current is not None and chunk_index == current.last_chunk + 1:
+                current.append(chunk_index, text, score)
+                current.rank = min(current.rank, rank)
+                continue
+            current = _Passage(source_file, chunk_index, text, score, rank)
+            passages.append(current)
+
+        seen = set()
+        for chunk_index, text, score, rank in unnumbered:
+            if text not in seen:
+                seen.add(text)
+                passages.append(_Passage(source_file, chunk_index, text, score, rank))
+
+    passages.sort(key=lambda passage: (-(passage.score if passage.score is not None else -1.0), passage.rank))
+    return passages
+
+
+def pack_context(
+    results: ScoredDocuments,
+    query: str,
+    title: str,
+    token_budget: Optional[int] = None,
+    legacy_formatter: Optional[Callable[[List[Document], str], str]] = None,
+) -> str:
+    """
+    Pack scored search results into a compact context string within a token budget
+
+    Passages are added in score order until the budget is used; the best passage is
+    always included (truncated if it alone exceeds the budget).
+
+    Args:
+        results: (Document, score) tuples, best first
+        query: User query
+        title: Knowledge base label for the header (e.g. "technical")
+        token_budget: Maximum estimated tokens (default: CONTEXT_TOKEN_BUDGET; None/0 for no limit)
+        legacy_formatter: format_*_context function used to measure tokens saved
+
+    Returns:
+        Packed context string with compact citation headers
+    """
+    if token_budget is None:
+        token_budget = config.CONTEXT_TOKEN_BUDGET
+
+    passages = merge_adjacent_chunks(results)
+    header = f"Relevant {title} information for query: '{query}'"
+    parts = [header]
+    used = estimate_tokens(header)
+    dropped = 0
+
+    for position, passage in enumerate(passages, 1):
+        block = f"\n{passage.header(position)}\n{passage.text}"
+        block_tokens = estimate_tokens(block)
+
+        if token_budget and used + block_tokens > token_budget:
+            if position > 1:
+                dropped += 1
+                continue
+            # Always keep the best passage, truncated to the remaining budget
+            block = block[:max(0, token_budget - used) * 4]
+            block_tokens = estimate_tokens(block)
+
+        parts.append(block)
+        used += block_tokens
+
+    if dropped:
+        parts.append(f"\n({dropped} lower-scoring passages omitted to fit the context budget)")
+
+    packed = "\n".join(parts)
+    packed_tokens = estimate_tokens(packed)
+
+    baseline_tokens = packed_tokens
+    if legacy_formatter is not None:
+        baseline_tokens = estimate_tokens(legacy_formatter([doc for doc, _ in results], query))
+
+    get_packing_stats().record(baseline_tokens, packed_tokens)
+    app_logger.info(
+        f"Packed {len(results)} {title} hits into {len(passages)} passages: "
+        f"{packed_tokens} tokens ({baseline_tokens - packed_tokens} saved vs {baseline_tokens}, "
+        f"{dropped} dropped for budget)"
+    )
+    return packed
+
+
+class PackingStats:
+    """Thread-safe totals of tokens packed vs the legacy context format"""
+
+    def __init__(self):
+        """Initialize empty totals"""
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.baseline_tokens = 0
+        self.packed_tokens = 0
+
+    def record(self, baseline_tokens: int, packed_tokens: int) -> None:
+        """Record one packing call"""
+        with self._lock:
+            self.calls += 1
+            self.baseline_tokens += baseline_tokens
+            self.packed_tokens += packed_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get packing statistics
+
+        Returns:
+            Dictionary with call count, token totals, tokens saved and saved ratio
+        """
+        with self._lock:
+            saved = self.baseline_tokens - self.packed_tokens
+            return {
+                "calls": self.calls,
+                "baseline_tokens": self.baseline_tokens,
+                "packed_tokens": self.packed_tokens,
+                "tokens_saved": saved,
+                "saved_ratio": round(saved / self.baseline_tokens, 4) if self.baseline_tokens else 0.0,
+            }
+
+
+# Global packing statistics instance
+_packing_stats = PackingStats()
+
+
+def get_packing_stats() -> PackingStats:
+    """
+    Get global context packing statistics
+
+    Returns:
+        PackingStats instance
+    """
+    return _packing_stats
@@ -0,0 +1,209 @@
+"""
+Process-wide query embedding cache shared by every ChromaDB similarity search
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/integrations/text_embedding
+Last Verified: November 2025
+
+The supervisor frequently fans the same request out to several workers, and
+get_cached_policy_info re-runs search_policy_kb with the same text. Each of those
+calls used to pay an OpenAI embedding round trip. CachedQueryEmbeddings wraps the
+OpenAIEmbeddings instance owned by ChromaDBClient and serves repeated query
+embeddings from a bounded LRU/TTL cache keyed by (model, dimensions, normalized text).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+CacheKey = Tuple[str, int, str]
+
+
+def normalize_query_text(text: str) -> str:
+    """
+    Normalize query text for cache keys (case-folded, whitespace collapsed)
+
+    Args:
+        text: Raw query text
+
+    Returns:
+        Normalized query text
+    """
+    return " ".join(text.split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """Thread-safe bounded LRU cache with per-entry TTL for query embeddings"""
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 3600):
+        """
+        Initialize query embedding cache
+
+        Args:
+            max_size: Maximum number of cached embeddings (LRU eviction beyond this)
+            ttl_seconds: Time-to-live for each entry in seconds (0 disables expiry)
+        """
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: CacheKey) -> Optional[List[float]]:
+        """
+        Get cached embedding for key
+
+        Args:
+            key: Cache key (model, dimensions, normalized text)
+
+        Returns:
+            Copy of the cached embedding vector, or None on miss/expiry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, vector = entry
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(vector)
+
+    def put(self, key: CacheKey, vector: List[float]) -> None:
+        """
+        Store embedding for key, evicting least recently used entries when full
+
+        Args:
+            key: Cache key (model, dimensions, normalized text)
+            vector: Embedding vector
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), list(vector))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached entries (counters are preserved)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hit/miss/eviction counters, size and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that serves embed_query from a QueryEmbeddingCache"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: QueryEmbeddingCache,
+        model: str,
+        dimensions: int,
+    ):
+        """
+        Wrap an embeddings instance with a query cache
+
+        Args:
+            embeddings: Underlying embeddings instance (e.g. OpenAIEmbeddings)
+            cache: Shared query embedding cache
+            model: Embedding model name (part of the cache key)
+            dimensions: Embedding dimensions (part of the cache key)
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        self.dimensions = dimensions
+
+    def _key(self, text: str) -> CacheKey:
+        return (self.model, self.dimensions, normalize_query_text(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents (not cached here; document text is embedded once at ingest)"""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text, reusing a cached vector when available"""
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+
+        vector = self.embeddings.embed_query(text)
+        self.cache.put(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed_documents"""
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query, sharing the same cache"""
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+
+        vector = await self.embeddings.aembed_query(text)
+        self.cache.put(key, vector)
+        return vector
+
+
+# Global query embedding cache instance
+_query_embedding_cache: Optional[QueryEmbeddingCache] = None
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """
+    Get or create global query embedding cache instance
+
+    Returns:
+        QueryEmbeddingCache instance shared by the whole process
+    """
+    global _query_embedding_cache
+
+    if _query_embedding_cache is None:
+        _query_embedding_cache = QueryEmbeddingCache(
+            max_size=config.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=config.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+        )
+        app_logger.info(
+            f"Query embedding cache initialized (max_size={config.QUERY_EMBEDDING_CACHE_SIZE}, "
+            f"ttl={config.QUERY_EMBEDDING_CACHE_TTL_SECONDS}s)"
+        )
+
+    return _query_embedding_cache
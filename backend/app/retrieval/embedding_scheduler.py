@@ -0,0 +1,385 @@
+"""
+Process-wide embedding scheduler that coalesces concurrent embedding requests
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/integrations/text_embedding
+Last Verified: November 2025
+
+Every upload, ingestion batch and search used to call the embeddings API on its
+own: ten concurrent small uploads meant ten small HTTP requests, and one huge
+upload could exceed the per-request token limit. EmbeddingScheduler queues the
+texts of every caller and returns a Future per request. A dispatcher thread
+coalesces queued texts into batches bounded by an estimated token count
+(EMBEDDING_BATCH_MAX_TOKENS) and a text count (EMBEDDING_BATCH_MAX_TEXTS),
+waiting EMBEDDING_BATCH_LINGER_MS for concurrent callers to join a batch, and
+keeps at most EMBEDDING_MAX_IN_FLIGHT batches in flight. Query texts are
+dispatched ahead of queued document texts.
+
+A rate-limit response (HTTP 429) pauses all dispatching and the batch is retried
+with exponential backoff and jitter, up to EMBEDDING_MAX_RETRIES times; any
+other error fails the requests of that batch right away. ScheduledEmbeddings
+exposes the scheduler as a LangChain Embeddings instance, used by
+ChromaDBClient (and so by ingestion) and generate_embeddings.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from app.retrieval.context_packer import estimate_tokens
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """
+    Check whether an embedding error is a rate-limit response
+
+    Args:
+        error: Exception raised by the embeddings client
+
+    Returns:
+        True for HTTP 429 / openai.RateLimitError
+    """
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+class _Request:
+    """One caller's texts and the future that receives their vectors"""
+
+    __slots__ = ("future", "vectors", "pending", "finished")
+
+    def __init__(self, count: int):
+        self.future: Future = Future()
+        self.vectors: List[Optional[List[float]]] = [None] * count
+        self.pending = count
+        self.finished = False
+
+
+# (request, position in the request, text, estimated tokens)
+_Item = Tuple[_Request, int, str, int]
+
+
+class EmbeddingScheduler:
+    """Coalesces concurrent embedding requests into token-bounded batches with capped concurrency"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_tokens: int = 100000,
+        max_batch_texts: int = 1000,
+        linger_seconds: float = 0.01,
+        max_in_flight: int = 4,
+        max_retries: int = 6,
+        backoff_base_seconds: float = 1.0,
+        backoff_max_seconds: float = 60.0,
+    ):
+        """
+        Initialize embedding scheduler
+
+        Args:
+            embeddings: Underlying embeddings instance (e.g. OpenAIEmbeddings)
+            max_batch_tokens: Maximum estimated tokens per API call (a longer single text is sent alone)
+            max_batch_texts: Maximum texts per API call
+            linger_seconds: How long a batch waits for concurrent requests to join it
+            max_in_flight: Maximum concurrent API calls
+            max_retries: Retries of a rate-limited batch before its requests fail
+            backoff_base_seconds: First backoff delay (doubled on each retry)
+            backoff_max_seconds: Maximum backoff delay
+        """
+        self.embeddings = embeddings
+        self.max_batch_tokens = max(1, max_batch_tokens)
+        self.max_batch_texts = max(1, max_batch_texts)
+        self.linger_seconds = linger_seconds
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._condition = threading.Condition()
+        self._queries: Deque[_Item] = deque()
+        self._documents: Deque[_Item] = deque()
+        self._queued_tokens = 0
+        self._in_flight = 0
+        self._resume_at = 0.0
+        self._closed = False
+        self._dispatcher: Optional[threading.Thread] = None
+        self._workers = ThreadPoolExecutor(self.max_in_flight, thread_name_prefix="embedding-batch")
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.batched_tokens = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def submit(self, texts: List[str], priority: bool = False) -> Future:
+        """
+        Queue texts for embedding
+
+        Args:
+            texts: Texts to embed
+            priority: Dispatch ahead of queued non-priority texts (used for queries)
+
+        Returns:
+            Future resolving to one vector per text, in order
+        """
+        request = _Request(len(texts))
+        if not texts:
+            request.future.set_result([])
+            return request.future
+
+        queue = self._queries if priority else self._documents
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Embedding scheduler is closed")
+            for position, text in enumerate(texts):
+                tokens = estimate_tokens(text)
+                queue.append((request, position, text, tokens))
+                self._queued_tokens += tokens
+            self.requests += 1
+            self.texts += len(texts)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="embedding-scheduler", daemon=True)
+                self._dispatcher.start()
+            self._condition.notify_all()
+        return request.future
+
+    def _queued(self) -> int:
+        return len(self._queries) + len(self._documents)
+
+    def _batch_full(self) -> bool:
+        return self._queued() >= self.max_batch_texts or self._queued_tokens >= self.max_batch_tokens
+
+    def _take_batch(self) -> List[_Item]:
+        """Pop queued items up to the batch limits, queries first (caller holds the lock)"""
+        batch: List[_Item] = []
+        tokens = 0
+        for queue in (self._queries, self._documents):
+            while queue and len(batch) < self.max_batch_texts:
+                item_tokens = queue[0][3]
+                if batch and tokens + item_tokens > self.max_batch_tokens:
+                    return batch
+                batch.append(queue.popleft())
+                tokens += item_tokens
+                self._queued_tokens -= item_tokens
+        return batch
+
+    def _dispatch(self) -> None:
+        """Dispatcher thread: form batches and hand them to the worker pool"""
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed and not self._queued():
+                        return
+                    paused_for = self._resume_at - time.monotonic()
+                    if self._queued() and self._in_flight < self.max_in_flight and paused_for <= 0:
+                        break
+                    self._condition.wait(paused_for if paused_for > 0 else None)
+
+                # Give concurrent callers a moment to join this batch
+                deadline = time.monotonic() + self.linger_seconds
+                while not self._closed and not self._batch_full():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                batch = self._take_batch()
+                self._in_flight += 1
+                self.batches += 1
+                self.batched_tokens += sum(item[3] for item in batch)
+
+            self._workers.submit(self._execute, batch)
+
+    def _execute(self, batch: List[_Item]) -> None:
+        """Worker: embed one batch, backing off on rate limits, and resolve its requests"""
+        texts = [item[2] for item in batch]
+        try:
+            attempt = 0
+            while True:
+                try:
+                    vectors = self.embeddings.embed_documents(texts)
+                    break
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                        self._fail(batch, e)
+                        return
+                    delay = min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt)
+                    delay *= random.uniform(0.5, 1.0)
+                    attempt += 1
+                    with self._condition:
+                        self.rate_limited += 1
+                        # Stop dispatching other batches until the rate limit has cooled down
+                        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                    app_logger.warning(
+                        f"Embedding batch of {len(texts)} texts rate limited; retry {attempt} in {delay:.1f}s"
+                    )
+                    time.sleep(delay)
+            if vectors is None or len(vectors) != len(batch):
+                # zip() would leave the requests of the missing vectors waiting forever
+                self._fail(batch, ValueError(
+                    f"Embedding API returned {0 if vectors is None else len(vectors)} vectors "
+                    f"for a batch of {len(batch)} texts"
+                ))
+                return
+            self._resolve(batch, vectors)
+        except Exception as e:
+            # Never leave a caller waiting on a future that no worker will resolve
+            self._fail(batch, e)
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _resolve(self, batch: List[_Item], vectors: List[List[float]]) -> None:
+        completed = []
+        with self._condition:
+            for (request, position, _, _), vector in zip(batch, vectors):
+                request.vectors[position] = vector
+                request.pending -= 1
+                if not request.pending and not request.finished:
+                    request.finished = True
+                    completed.append(request)
+        for request in completed:
+            request.future.set_result(request.vectors)
+
+    def _fail(self, batch: List[_Item], error: Exception) -> None:
+        failed = []
+        with self._condition:
+            self.failures += 1
+            for request, _, _, _ in batch:
+                if not request.finished:
+                    request.finished = True
+                    failed.append(request)
+        app_logger.error(f"Embedding batch of {len(batch)} texts failed: {error}")
+        for request in failed:
+            request.future.set_exception(error)
+
+    def close(self) -> None:
+        """Embed everything still queued, then stop the dispatcher and workers"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            dispatcher = self._dispatcher
+        if dispatcher is not None:
+            dispatcher.join()
+        self._workers.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get scheduler statistics
+
+        Returns:
+            Dictionary with request/text/batch counters, average batch size, queue depth,
+            in-flight batches, rate-limit retries and failed batches
+        """
+        with self._condition:
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "avg_batch_texts": ((self.texts - self._queued()) / self.batches) if self.batches else 0.0,
+                "avg_batch_tokens": (self.batched_tokens / self.batches) if self.batches else 0.0,
+                "queued_texts": self._queued(),
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "rate_limited": self.rate_limited,
+                "failed_batches": self.failures,
+            }
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embeddings wrapper that sends every request through an EmbeddingScheduler"""
+
+    def __init__(self, scheduler: EmbeddingScheduler):
+        """
+        Wrap an embedding scheduler
+
+        Args:
+            scheduler: Scheduler owning the underlying embeddings instance
+        """
+        self.scheduler = scheduler
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents in coalesced batches (blocks until this request's vectors are ready)"""
+        return self.scheduler.submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text ahead of queued document texts"""
+        return self.scheduler.submit([text], priority=True).result()[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed_documents (awaits the scheduler's future)"""
+        return await asyncio.wrap_future(self.scheduler.submit(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query"""
+        return (await asyncio.wrap_future(self.scheduler.submit([text], priority=True)))[0]
+
+
+def create_openai_embeddings(**kwargs: Any) -> OpenAIEmbeddings:
+    """
+    Create an OpenAIEmbeddings instance for the configured model
+
+    Args:
+        **kwargs: Extra OpenAIEmbeddings arguments
+
+    Returns:
+        OpenAIEmbeddings instance
+    """
+    return OpenAIEmbeddings(
+        model=config.OPENAI_EMBEDDING_MODEL,
+        openai_api_key=config.OPENAI_API_KEY,
+        dimensions=config.OPENAI_EMBEDDING_DIMENSIONS,
+        **kwargs,
+    )
+
+
+# Global embedding scheduler instance
+_embedding_scheduler: Optional[EmbeddingScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_embedding_scheduler() -> EmbeddingScheduler:
+    """
+    Get or create global embedding scheduler instance
+
+    Returns:
+        EmbeddingScheduler instance shared by the whole process
+    """
+    global _embedding_scheduler
+
+    with _scheduler_lock:
+        if _embedding_scheduler is None:
+            _embedding_scheduler = EmbeddingScheduler(
+                create_openai_embeddings(),
+                max_batch_tokens=config.EMBEDDING_BATCH_MAX_TOKENS,
+                max_batch_texts=config.EMBEDDING_BATCH_MAX_TEXTS,
+                linger_seconds=config.EMBEDDING_BATCH_LINGER_MS / 1000,
+                max_in_flight=config.EMBEDDING_MAX_IN_FLIGHT,
+                max_retries=config.EMBEDDING_MAX_RETRIES,
+                backoff_base_seconds=config.EMBEDDING_BACKOFF_BASE_SECONDS,
+                backoff_max_seconds=config.EMBEDDING_BACKOFF_MAX_SECONDS,
+            )
+            app_logger.info(
+                f"Embedding scheduler initialized (max_batch_tokens={config.EMBEDDING_BATCH_MAX_TOKENS}, "
+                f"max_batch_texts={config.EMBEDDING_BATCH_MAX_TEXTS}, max_in_flight={config.EMBEDDING_MAX_IN_FLIGHT})"
+            )
+
+    return _embedding_scheduler
+
+
+def get_scheduled_embeddings() -> Embeddings:
+    """
+    Get OpenAI embeddings for the configured model, behind the process-wide scheduler
+
+    Returns:
+        ScheduledEmbeddings, or a plain OpenAIEmbeddings instance when EMBEDDING_SCHEDULER_ENABLED=false
+    """
+    if not config.EMBEDDING_SCHEDULER_ENABLED:
+        return create_openai_embeddings()
+    return ScheduledEmbeddings(get_embedding_scheduler())
@@ -0,0 +1,68 @@
+"""
+Bounded thread pool for blocking retrieval work (ChromaDB queries, SQLite lookups)
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/tools
+Last Verified: November 2025
+
+The async retrieval tools (asearch_*) run on the uvicorn event loop. ChromaDB and
+SQLite calls are blocking disk I/O, so they are offloaded to this pool; its size
+caps how many retrieval calls hit the disk at once, independently of how many
+SSE streams are open.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+from app.utils.config import config
+
+
+T = TypeVar("T")
+
+# Global retrieval executor instance
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    """
+    Get or create the bounded thread pool used for blocking retrieval work
+
+    Returns:
+        ThreadPoolExecutor instance (size from RETRIEVAL_MAX_WORKERS)
+    """
+    global _retrieval_executor
+
+    with _executor_lock:
+        if _retrieval_executor is None:
+            _retrieval_executor = ThreadPoolExecutor(
+                max_workers=max(1, config.RETRIEVAL_MAX_WORKERS),
+                thread_name_prefix="retrieval",
+            )
+        return _retrieval_executor
+
+
+async def run_in_retrieval_executor(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking retrieval call on the retrieval executor without blocking the event loop
+
+    The caller's context variables (e.g. the retrieval request scope) are visible
+    inside func.
+
+    Args:
+        func: Blocking callable
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        Return value of func
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_retrieval_executor(),
+        functools.partial(context.run, func, *args, **kwargs),
+    )
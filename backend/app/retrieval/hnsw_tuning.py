@@ -0,0 +1,360 @@
+"""
+Per-collection HNSW index settings: inspection, rebuild and recall/latency sweep
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.trychroma.com/docs/collections/configure
+Last Verified: November 2025
+
+ChromaDB builds a collection's HNSW graph from the hnsw:* metadata given when the
+collection is created. ChromaDBClient merges the configured
+HNSW_{SPACE,M,CONSTRUCTION_EF,SEARCH_EF}_<COLLECTION> settings into that metadata,
+so the large billing collection can be tuned separately from the tiny policy one.
+
+Existing graphs keep their original parameters. rebuild_collection copies a
+collection, stored embeddings included (nothing is re-embedded), into a new
+collection built with the target settings, then swaps it in under the original
+name: the original is renamed aside and the copy renamed into place while the
+collection's swap lock keeps searches out (see versioning.py); if the rename fails
+the original gets its name back. If only search_ef differs, it is changed in place, but a running process
+keeps the loaded index until it restarts.
+
+sweep_hnsw builds a scratch collection for every (M, construction_ef, search_ef)
+combination from the stored embeddings. It reports recall@k against an exact
+NumPy baseline and p50/p99 query latency. Every combination is built separately
+because a loaded index ignores search_ef changes.
+
+    python -m app.retrieval.hnsw_tuning show
+    python -m app.retrieval.hnsw_tuning rebuild --collection billing_knowledge_base
+    python -m app.retrieval.hnsw_tuning sweep --collection billing_knowledge_base \\
+        --m 16 32 --construction-ef 100 200 --search-ef 50 100 200 --queries 200 --k 5
+
+HNSW settings only apply to VECTOR_BACKEND=chroma (the NumPy backend is exact).
+"""
+
+import argparse
+import itertools
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from app.retrieval.lexical_index import get_lexical_index
+from app.retrieval.result_cache import bump_collection_generation
+from app.retrieval.versioning import get_collection_swap_lock
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+HNSW_KEYS = ("hnsw:space", "hnsw:M", "hnsw:construction_ef", "hnsw:search_ef")
+
+# Chroma's defaults for collections created without hnsw:* metadata
+HNSW_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 100}
+
+# hnsw:* metadata keys and their names in chromadb's collection configuration
+_CONFIGURATION_KEYS = {
+    "hnsw:space": "space",
+    "hnsw:M": "max_neighbors",
+    "hnsw:construction_ef": "ef_construction",
+    "hnsw:search_ef": "ef_search",
+}
+
+
+def current_hnsw_settings(collection: Any) -> Dict[str, Any]:
+    """
+    HNSW parameters a ChromaDB collection was built with
+
+    Args:
+        collection: chromadb Collection
+
+    Returns:
+        Dictionary keyed by hnsw:space, hnsw:M, hnsw:construction_ef and hnsw:search_ef
+    """
+    settings = dict(HNSW_DEFAULTS)
+    metadata = collection.metadata or {}
+    settings.update({key: metadata[key] for key in HNSW_KEYS if key in metadata})
+
+    # chromadb >= 1.0 also reports the effective configuration (including in-place search_ef changes)
+    configuration = getattr(collection, "configuration", None)
+    hnsw = configuration.get("hnsw") if isinstance(configuration, dict) else None
+    if isinstance(hnsw, dict):
+        settings.update({key: hnsw[name] for key, name in _CONFIGURATION_KEYS.items() if hnsw.get(name) is not None})
+    return settings
+
+
+def _copy_records(source: Any, destination: Any, batch_size: int) -> int:
+    """Copy ids, stored embeddings, documents and metadata between ChromaDB collections"""
+    copied = 0
+    while True:
+        data = source.get(limit=batch_size, offset=copied, include=["embeddings", "documents", "metadatas"])
+        ids = data.get("ids") or []
+        if not ids:
+            return copied
+        destination.add(
+            ids=ids,
+            embeddings=data["embeddings"],
+            documents=data.get("documents"),
+            metadatas=data.get("metadatas"),
+        )
+        copied += len(ids)
+
+
+def rebuild_collection(
+    collection_name: str,
+    settings: Optional[Dict[str, Any]] = None,
+    client: Any = None,
+    batch_size: int = 1000,
+) -> Dict[str, Any]:
+    """
+    Apply HNSW settings to an existing collection, rebuilding its graph when required
+
+    Args:
+        collection_name: Name of the collection
+        settings: hnsw:* values to apply on top of the configured ones (default: configured only)
+        client: ChromaDBClient (default: global client)
+        batch_size: Records copied per request
+
+    Returns:
+        Dictionary with the collection name, action ("unchanged", "search_ef" or "rebuilt"),
+        record count, resulting settings and elapsed seconds
+
+    Raises:
+        ValueError: If the vector backend is not ChromaDB
+    """
+    if client is None:
+        from app.retrieval.chroma_client import get_chroma_client
+        client = get_chroma_client()
+    if client.backend != "chroma":
+        raise ValueError(f"HNSW settings apply to the chroma backend only (VECTOR_BACKEND={client.backend})")
+
+    started = time.perf_counter()
+    source = client.client.get_collection(collection_name)
+    current = current_hnsw_settings(source)
+    target = {**current, **config.get_hnsw_metadata(collection_name), **(settings or {})}
+    structural = [key for key in HNSW_KEYS if key != "hnsw:search_ef" and target[key] != current[key]]
+
+    if not structural:
+        action = "unchanged"
+        if target["hnsw:search_ef"] != current["hnsw:search_ef"]:
+            source.modify(configuration={"hnsw": {"ef_search": target["hnsw:search_ef"]}})
+            action = "search_ef"
+        return {
+            "collection": collection_name,
+            "action": action,
+            "records": source.count(),
+            "settings": current_hnsw_settings(source),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    metadata = {key: value for key, value in (source.metadata or {}).items() if not key.startswith("hnsw:")}
+    metadata.update(target)
+    staging_name = f"{collection_name}-rebuild-{uuid.uuid4().hex[:8]}"
+    staging = client.client.create_collection(staging_name, metadata=metadata, embedding_function=None)
+    try:
+        copied = _copy_records(source, staging, batch_size)
+    except Exception:
+        client.client.delete_collection(staging_name)
+        raise
+
+    # Swap: the rebuilt collection takes over the original name (and the chunk IDs are unchanged,
+    # so the lexical index stays valid). The original is only renamed aside until the swap is done.
+    retired_name = f"{collection_name}-retired-{uuid.uuid4().hex[:8]}"
+    with get_collection_swap_lock(collection_name).swapping():
+        source.modify(name=retired_name)
+        try:
+            staging.modify(name=collection_name)
+        except Exception:
+            source.modify(name=collection_name)
+            client.client.delete_collection(staging_name)
+            raise
+        finally:
+            client._collections.pop(collection_name, None)
+        get_lexical_index(collection_name).advance(bump_collection_generation(collection_name))
+
+    try:
+        client.client.delete_collection(retired_name)
+    except Exception as e:
+        app_logger.warning(f"Could not delete the replaced collection '{retired_name}': {e}")
+
+    elapsed = time.perf_counter() - started
+    app_logger.info(
+        f"Rebuilt '{collection_name}' ({copied} records) with {', '.join(structural)} changed in {elapsed:.2f}s"
+    )
+    return {
+        "collection": collection_name,
+        "action": "rebuilt",
+        "records": copied,
+        "settings": current_hnsw_settings(client.client.get_collection(collection_name)),
+        "seconds": round(elapsed, 3),
+    }
+
+
+def exact_neighbors(embeddings: np.ndarray, queries: np.ndarray, k: int, space: str = "l2") -> List[List[int]]:
+    """
+    Exact top-k row indices by brute force, ranked like the HNSW distance function
+
+    Args:
+        embeddings: Stored vectors (n, dims)
+        queries: Query vectors (q, dims)
+        k: Neighbours per query
+        space: "l2", "cosine" or "ip"
+
+    Returns:
+        Per-query lists of row indices, nearest first
+    """
+    if space == "cosine":
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    similarities = queries @ embeddings.T
+    if space == "l2":
+        # Squared l2 distance up to the per-query constant |q|^2
+        similarities = 2 * similarities - (embeddings * embeddings).sum(axis=1)
+    k = min(k, embeddings.shape[0])
+    top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(similarities, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1).tolist()
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    return round(float(np.percentile(values, percent)), 3) if values else 0.0
+
+
+def sweep_hnsw(
+    collection_name: str,
+    m_values: Sequence[int],
+    construction_ef_values: Sequence[int],
+    search_ef_values: Sequence[int],
+    queries: int = 100,
+    k: int = 5,
+    noise: float = 0.05,
+    space: Optional[str] = None,
+    client: Any = None,
+    batch_size: int = 1000,
+) -> List[Dict[str, Any]]:
+    """
+    Measure recall@k and query latency for every combination of HNSW settings
+
+    Queries are randomly chosen stored vectors plus Gaussian noise. Scratch
+    collections are deleted afterwards.
+
+    Args:
+        collection_name: Collection whose stored embeddings are indexed
+        m_values: hnsw:M values
+        construction_ef_values: hnsw:construction_ef values
+        search_ef_values: hnsw:search_ef values
+        queries: Number of synthetic queries
+        k: Results per query
+        noise: Standard deviation of the noise added to sampled vectors
+        space: Distance function (default: the collection's own)
+        client: ChromaDBClient (default: global client)
+        batch_size: Records added per request
+
+    Returns:
+        One dictionary per combination with M, construction_ef, search_ef,
+        recall_at_k, p50_ms, p99_ms and build_seconds
+    """
+    if client is None:
+        from app.retrieval.chroma_client import get_chroma_client
+        client = get_chroma_client()
+
+    source = client.client.get_collection(collection_name)
+    space = space or current_hnsw_settings(source)["hnsw:space"]
+    data = source.get(include=["embeddings"])
+    ids = data.get("ids") or []
+    if not ids:
+        return []
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(ids), size=min(queries, len(ids)), replace=False)
+    query_vectors = embeddings[picks] + rng.normal(0.0, noise, size=(len(picks), embeddings.shape[1])).astype(np.float32)
+    truth = [{ids[i] for i in row} for row in exact_neighbors(embeddings, query_vectors, k, space)]
+
+    results = []
+    for m, construction_ef, search_ef in itertools.product(m_values, construction_ef_values, search_ef_values):
+        scratch_name = f"{collection_name}-sweep-{uuid.uuid4().hex[:8]}"
+        scratch = client.client.create_collection(
+            scratch_name,
+            metadata={
+                "hnsw:space": space,
+                "hnsw:M": m,
+                "hnsw:construction_ef": construction_ef,
+                "hnsw:search_ef": search_ef,
+            },
+            embedding_function=None,
+        )
+        try:
+            started = time.perf_counter()
+            for start in range(0, len(ids), batch_size):
+                scratch.add(ids=ids[start:start + batch_size], embeddings=embeddings[start:start + batch_size])
+            build_seconds = time.perf_counter() - started
+
+            latencies: List[float] = []
+            recalls: List[float] = []
+            for vector, expected in zip(query_vectors, truth):
+                started = time.perf_counter()
+                found = scratch.query(query_embeddings=[vector.tolist()], n_results=k, include=[])["ids"][0]
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(len(expected & set(found)) / len(expected))
+        finally:
+            client.client.delete_collection(scratch_name)
+
+        results.append({
+            "M": m,
+            "construction_ef": construction_ef,
+            "search_ef": search_ef,
+            "recall_at_k": round(sum(recalls) / len(recalls), 4),
+            "p50_ms": _percentile(latencies, 50),
+            "p99_ms": _percentile(latencies, 99),
+            "build_seconds": round(build_seconds, 3),
+        })
+        app_logger.info(f"HNSW sweep '{collection_name}': {results[-1]}")
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Show, rebuild or sweep HNSW settings of the knowledge base collections"""
+    from app.retrieval.chroma_client import get_chroma_client
+
+    parser = argparse.ArgumentParser(description="Per-collection HNSW settings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("show", help="Show current and configured settings of every collection")
+
+    rebuild = commands.add_parser("rebuild", help="Apply configured settings to existing collections")
+    rebuild.add_argument("--collection", choices=config.get_all_collections(), help="Default: all collections")
+
+    sweep = commands.add_parser("sweep", help="Measure recall@k and latency for a grid of settings")
+    sweep.add_argument("--collection", required=True, choices=config.get_all_collections())
+    sweep.add_argument("--m", type=int, nargs="+", default=[16])
+    sweep.add_argument("--construction-ef", type=int, nargs="+", default=[100])
+    sweep.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    sweep.add_argument("--queries", type=int, default=100)
+    sweep.add_argument("--k", type=int, default=5)
+    sweep.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    client = get_chroma_client()
+    if args.command == "show":
+        existing = set(client.list_collections())
+        for name in config.get_all_collections():
+            current = current_hnsw_settings(client.client.get_collection(name)) if name in existing else None
+            print(json.dumps({"collection": name, "current": current, "configured": config.get_hnsw_metadata(name)}))
+    elif args.command == "rebuild":
+        for name in [args.collection] if args.collection else config.get_all_collections():
+            print(json.dumps(rebuild_collection(name, client=client)))
+    else:
+        for row in sweep_hnsw(
+            args.collection,
+            args.m,
+            args.construction_ef,
+            args.search_ef,
+            queries=args.queries,
+            k=args.k,
+            noise=args.noise,
+            client=client,
+        ):
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
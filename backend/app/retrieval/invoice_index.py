@@ -0,0 +1,451 @@
+"""
+Structured invoice index (SQLite sidecar) for comparative and aggregate billing queries
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/knowledge-base
+Last Verified: November 2025
+
+Questions like "Which company is our most valuable customer?" or "What is the total
+invoiced amount?" used to be answered by retrieving 20+ billing chunks and letting
+the LLM add them up. Invoice fields (number, customer, date, amounts) are now
+extracted at ingest time into a local SQLite table, and search_billing_kb answers
+aggregate questions with an exact query and a compact table. Rows are keyed on
+(source_file, invoice_number), and a period named in the question (Q3 2025,
+March 2025) restricts the aggregates to invoices dated within it.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+# Phrases that ask for a comparison or aggregate over invoices on their own
+AGGREGATE_KEYWORDS = [
+    "most valuable", "all companies", "all customers", "all invoices", "every invoice",
+    "which company", "which customer", "compare", "comparison", "aggregate",
+    "per customer", "by customer", "each customer",
+]
+
+# Ranking/summing words that only mean an aggregate when the query is about invoices or customers
+RANKING_KEYWORDS = [
+    "highest", "largest", "biggest", "top", "most expensive", "greatest",
+    "maximum", "sum", "total", "totals", "combined", "overall",
+]
+
+_AGGREGATE_PATTERN = re.compile(r"\b(?:" + "|".join(map(re.escape, AGGREGATE_KEYWORDS)) + r")\b")
+_RANKING_PATTERN = re.compile(r"\b(?:" + "|".join(map(re.escape, RANKING_KEYWORDS)) + r")\b")
+_BILLING_SCOPE_PATTERN = re.compile(
+    r"\b(?:invoices?|invoiced|customers?|compan(?:y|ies)|clients?|billed|spent|spend|revenue|amounts?)\b"
+)
+# A question about one invoice ("the total on invoice INV-004", "my invoice") is answered by retrieval
+_SINGLE_INVOICE_PATTERN = re.compile(
+    r"\b[a-z]{2,}-\d+\b|\binvoice\s*(?:no\.?|number|num|#)|#\s*\d+|"
+    r"\b(?:this|that|my)\s+(?:invoice|bill)\b"
+)
+
+_QUARTER_PATTERN = re.compile(r"\bq([1-4])\s*(?:of\s+)?(\d{4})\b")
+_MONTH_YEAR_PATTERN = re.compile(
+    r"\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+    r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\s+(\d{4})\b"
+)
+_ISO_DAY_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_YEAR_PATTERN = re.compile(r"\b((?:19|20)\d{2})\b")
+
+_INVOICE_NUMBER_PATTERN = re.compile(
+    r"invoice\s*(?:no\.?|number|num|#)\s*[:#]?\s*([A-Z0-9][A-Z0-9\-/]*)", re.IGNORECASE
+)
+_FIELD_PATTERNS = {
+    "customer": re.compile(r"(?:customer|client|bill\s*to)(?:\s*(?:id|name))?\s*:\s*(.+)", re.IGNORECASE),
+    "invoice_date": re.compile(r"(?<!due\s)(?:invoice\s*)?date\s*:\s*(.+)", re.IGNORECASE),
+    "subtotal": re.compile(r"sub\s*-?\s*total\s*:\s*\$?\s*([\d,]+(?:\.\d+)?)", re.IGNORECASE),
+    "tax": re.compile(r"(?:sales\s*)?tax[^:\n]*:\s*\$?\s*([\d,]+(?:\.\d+)?)", re.IGNORECASE),
+    "total": re.compile(
+        r"(?:total\s*due|amount\s*due|grand\s*total|invoice\s*total|balance\s*due|(?<!sub)(?<!sub-)(?<!sub )total)\s*:\s*\$?\s*([\d,]+(?:\.\d+)?)",
+        re.IGNORECASE,
+    ),
+}
+_DATE_FORMATS = ["%m/%d/%Y", "%Y-%m-%d", "%d-%m-%Y", "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%m/%d/%y"]
+
+
+def is_aggregate_billing_query(query: str) -> bool:
+    """
+    Detect comparative/aggregate billing questions (totals, rankings, comparisons)
+
+    Keywords are matched as whole words ("sum" does not match "summarize"), ranking
+    words such as "total" or "top" also need the query to be about invoices or
+    customers, and questions about a single invoice are left to normal retrieval.
+
+    Args:
+        query: User query
+
+    Returns:
+        True if the query asks for an aggregate over invoices
+    """
+    query_lower = query.lower()
+    if _SINGLE_INVOICE_PATTERN.search(query_lower):
+        return False
+    if _AGGREGATE_PATTERN.search(query_lower):
+        return True
+    return bool(_RANKING_PATTERN.search(query_lower) and _BILLING_SCOPE_PATTERN.search(query_lower))
+
+
+def _month_number(name: str) -> int:
+    return datetime.strptime(name[:3], "%b").month
+
+
+def _next_month(year: int, month: int) -> str:
+    return f"{year + month // 12:04d}-{month % 12 + 1:02d}-01"
+
+
+def invoice_date_range(query: str) -> Optional[Tuple[str, str]]:
+    """
+    Invoice date range named in a query: a quarter (Q3 2025), a month (March 2025),
+    a day (2025-03-14) or a year (2025)
+
+    Args:
+        query: User query
+
+    Returns:
+        [start, end) as ISO dates, or None if the query names no period
+    """
+    query_lower = query.lower()
+
+    match = _QUARTER_PATTERN.search(query_lower)
+    if match:
+        quarter, year = int(match.group(1)), int(match.group(2))
+        first_month = 3 * (quarter - 1) + 1
+        return f"{year:04d}-{first_month:02d}-01", _next_month(year, first_month + 2)
+
+    match = _MONTH_YEAR_PATTERN.search(query_lower)
+    if match:
+        month, year = _month_number(match.group(1)), int(match.group(2))
+        return f"{year:04d}-{month:02d}-01", _next_month(year, month)
+
+    match = _ISO_DAY_PATTERN.search(query_lower)
+    if match:
+        try:
+            day = datetime.strptime(match.group(1), "%Y-%m-%d").date()
+        except ValueError:
+            return None
+        return day.isoformat(), (day + timedelta(days=1)).isoformat()
+
+    match = _YEAR_PATTERN.search(query_lower)
+    if match:
+        year = int(match.group(1))
+        return f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+
+    return None
+
+
+def _parse_amount(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def parse_document_date(value: Optional[str]) -> Optional[str]:
+    """Parse a date written in a common document format into ISO format (None if unparseable)"""
+    if not value:
+        return None
+    value = value.strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def extract_invoice_records(text: str, source_file: str) -> List[Dict[str, Any]]:
+    """
+    Extract invoice fields from document text
+
+    The text is split at each "Invoice No:" marker so documents containing several
+    invoices yield one record each. Records without a total amount are dropped.
+
+    Args:
+        text: Full document text
+        source_file: Source file name (stored for citations)
+
+    Returns:
+        List of invoice record dictionaries
+    """
+    matches = list(_INVOICE_NUMBER_PATTERN.finditer(text))
+    records = []
+
+    for position, match in enumerate(matches):
+        # The header (customer, date) may precede the first invoice number, so the
+        # first section starts at the beginning of the text
+        section_start = match.start() if position > 0 else 0
+        section_end = matches[position + 1].start() if position + 1 < len(matches) else len(text)
+        section = text[section_start:section_end]
+
+        fields: Dict[str, Optional[str]] = {}
+        for field, pattern in _FIELD_PATTERNS.items():
+            field_match = pattern.search(section)
+            fields[field] = field_match.group(1).strip() if field_match else None
+
+        total = _parse_amount(fields["total"])
+        if total is None:
+            continue
+
+        raw_date = fields["invoice_date"].splitlines()[0].strip() if fields["invoice_date"] else None
+        records.append({
+            "invoice_number": match.group(1).upper(),
+            "customer": fields["customer"].splitlines()[0].strip() if fields["customer"] else "Unknown",
+            "invoice_date": parse_document_date(raw_date) or raw_date,
+            "subtotal": _parse_amount(fields["subtotal"]),
+            "tax": _parse_amount(fields["tax"]),
+            "total": total,
+            "source_file": source_file,
+        })
+
+    return records
+
+
+class InvoiceIndex:
+    """SQLite-backed table of invoice fields extracted at ingest time"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize invoice index
+
+        Args:
+            db_path: SQLite file path (default: structured index path from config)
+        """
+        self.db_path = db_path or config.get_structured_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            columns = {row["name"]: row["pk"] for row in conn.execute("PRAGMA table_info(invoices)")}
+            if columns and columns.get("source_file") != 1:
+                # Tables created keyed on invoice_number alone: the same number in two files
+                # overwrote one another. Rebuild keyed on (source_file, invoice_number).
+                conn.execute("ALTER TABLE invoices RENAME TO invoices_old")
+                conn.execute("DROP INDEX IF EXISTS idx_invoices_customer")
+                conn.execute("DROP INDEX IF EXISTS idx_invoices_source")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS invoices (
+                    invoice_number TEXT NOT NULL,
+                    customer TEXT NOT NULL,
+                    invoice_date TEXT,
+                    subtotal REAL,
+                    tax REAL,
+                    total REAL NOT NULL,
+                    source_file TEXT NOT NULL,
+                    PRIMARY KEY (source_file, invoice_number)
+                )
+                """
+            )
+            if columns and columns.get("source_file") != 1:
+                conn.execute("INSERT OR REPLACE INTO invoices SELECT * FROM invoices_old")
+                conn.execute("DROP TABLE invoices_old")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_customer ON invoices(customer)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def index_document(self, text: str, source_file: str) -> int:
+        """
+        Extract invoices from a document and replace any rows from the same source
+
+        Args:
+            text: Full document text
+            source_file: Source file name
+
+        Returns:
+            Number of invoice records stored
+        """
+        records = extract_invoice_records(text, source_file)
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM invoices WHERE source_file = ?", (source_file,))
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO invoices
+                    (invoice_number, customer, invoice_date, subtotal, tax, total, source_file)
+                VALUES
+                    (:invoice_number, :customer, :invoice_date, :subtotal, :tax, :total, :source_file)
+                """,
+                records,
+            )
+
+        if records:
+            app_logger.info(f"Indexed {len(records)} invoice records from {source_file}")
+        return len(records)
+
+    def count(self) -> int:
+        """Number of indexed invoices"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+
+    def customers(self) -> List[str]:
+        """Distinct customer names"""
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT customer FROM invoices")]
+
+    @staticmethod
+    def _where(customers: Optional[List[str]], date_range: Optional[Tuple[str, str]]) -> Tuple[str, List[Any]]:
+        """WHERE clause (with parameters) restricting rows to customers and an invoice date range"""
+        conditions = []
+        params: List[Any] = []
+        if customers:
+            conditions.append(f"customer IN ({','.join('?' for _ in customers)})")
+            params.extend(customers)
+        if date_range:
+            conditions.append("invoice_date >= ? AND invoice_date < ?")
+            params.extend(date_range)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def customer_totals(
+        self,
+        customers: Optional[List[str]] = None,
+        date_range: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Invoice count and invoiced amount per customer, highest total first
+
+        Args:
+            customers: Optional customer names to restrict to
+            date_range: Optional [start, end) ISO invoice dates to restrict to
+
+        Returns:
+            List of dictionaries with customer, invoice_count and total
+        """
+        where, params = self._where(customers, date_range)
+        sql = (
+            "SELECT customer, COUNT(*) AS invoice_count, SUM(total) AS total FROM invoices"
+            f"{where} GROUP BY customer ORDER BY total DESC"
+        )
+
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def invoices(
+        self,
+        customers: Optional[List[str]] = None,
+        limit: int = 50,
+        date_range: Optional[Tuple[str, str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Invoice rows, highest total first
+
+        Args:
+            customers: Optional customer names to restrict to
+            limit: Maximum number of rows
+            date_range: Optional [start, end) ISO invoice dates to restrict to
+
+        Returns:
+            List of invoice row dictionaries
+        """
+        where, params = self._where(customers, date_range)
+        sql = f"SELECT * FROM invoices{where} ORDER BY total DESC LIMIT ?"
+        params.append(limit)
+
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def undated_count(self) -> int:
+        """Number of invoices whose date could not be parsed (excluded from date ranges)"""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM invoices WHERE invoice_date IS NULL OR invoice_date NOT GLOB '[0-9][0-9][0-9][0-9]-*'"
+            ).fetchone()[0]
+
+
+def _money(amount: Optional[float]) -> str:
+    return f"${amount:,.2f}" if amount is not None else "-"
+
+
+def answer_aggregate_billing_query(query: str, index: "InvoiceIndex", max_rows: int = 50) -> Optional[str]:
+    """
+    Answer a comparative/aggregate billing question from the invoice table
+
+    A period named in the query (Q3 2025, March 2025, 2025) restricts the aggregates
+    to invoices dated within it.
+
+    Args:
+        query: User query
+        index: Invoice index
+        max_rows: Maximum number of individual invoices to list
+
+    Returns:
+        Compact table with exact totals, or None if no invoices are indexed
+    """
+    if index.count() == 0:
+        return None
+
+    query_lower = query.lower()
+    named_customers = [name for name in index.customers() if name.lower() in query_lower]
+    date_range = invoice_date_range(query)
+
+    totals = index.customer_totals(named_customers or None, date_range)
+    rows = index.invoices(named_customers or None, limit=max_rows, date_range=date_range)
+    invoice_count = sum(row["invoice_count"] for row in totals)
+    grand_total = sum(row["total"] for row in totals)
+
+    scope = ""
+    if date_range:
+        scope = f", invoices dated {date_range[0]} up to {date_range[1]} (exclusive)"
+    lines = [
+        f"Invoice aggregates for query: '{query}' (exact values from the structured invoice index{scope})",
+        "",
+    ]
+    if date_range:
+        undated = index.undated_count()
+        if undated:
+            lines += [f"Note: {undated} invoices have no parseable date and are not included.", ""]
+    lines += [
+        "Totals by customer (highest first):",
+        "| Customer | Invoices | Total Invoiced |",
+        "|---|---|---|",
+    ]
+    lines += [f"| {row['customer']} | {row['invoice_count']} | {_money(row['total'])} |" for row in totals]
+    lines.append(f"| ALL | {invoice_count} | {_money(grand_total)} |")
+    lines += [
+        "",
+        "Invoices (highest total first):",
+        "| Invoice | Customer | Date | Total | Source |",
+        "|---|---|---|---|---|",
+    ]
+    lines += [
+        f"| {row['invoice_number']} | {row['customer']} | {row['invoice_date'] or '-'} | "
+        f"{_money(row['total'])} | {row['source_file']} |"
+        for row in rows
+    ]
+    if invoice_count > len(rows):
+        lines.append(f"({invoice_count - len(rows)} more invoices omitted; totals above include them)")
+
+    return "\n".join(lines)
+
+
+# Global invoice index instance
+_invoice_index: Optional[InvoiceIndex] = None
+
+
+def get_invoice_index() -> InvoiceIndex:
+    """
+    Get or create global invoice index instance
+
+    Returns:
+        InvoiceIndex instance
+    """
+    global _invoice_index
+
+    if _invoice_index is None:
+        _invoice_index = InvoiceIndex()
+
+    return _invoice_index
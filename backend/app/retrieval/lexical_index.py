@@ -0,0 +1,443 @@
+"""
+In-process BM25 lexical index per knowledge base collection
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+Identifiers such as invoice numbers (INV-004), part numbers, FAR/DFARS clause
+numbers and bug IDs embed poorly, so vector search alone often misses them.
+Each collection gets an inverted index with BM25 scoring, built from ChromaDB on
+first use and maintained incrementally by ingest_document. Lexical rankings are
+fused with vector rankings by reciprocal-rank fusion (see search_pipeline).
+
+Each index remembers the collection generation it reflects; when another worker
+process writes the collection (the shared generation advances), the index is
+rebuilt from ChromaDB on next use.
+"""
+
+import math
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.retrieval.result_cache import get_collection_generations
+from app.utils.logger import app_logger
+
+
+# Keeps identifiers like "inv-004", "252.204-7012" or "14-cfr" as single tokens
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+_SEPARATOR_PATTERN = re.compile(r"[-./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenize text for lexical indexing
+
+    Args:
+        text: Raw text
+
+    Returns:
+        List of lower-cased tokens (identifiers are kept whole)
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def is_identifier_token(token: str) -> bool:
+    """
+    Check whether a token has the shape of an identifier
+
+    Identifiers are codes that start with letters and contain digits (INV-004,
+    A320, SR-1234) or groups of at least three numbers (252.204-7012, 4.2.1).
+    Numbers with a unit, ordinal or ratio (30-day, 1st, 10am, 24/7, 2.5) are
+    ordinary words.
+
+    Args:
+        token: Token produced by tokenize
+
+    Returns:
+        True if the token looks like an identifier
+    """
+    if len(token) < 3 or not any(ch.isdigit() for ch in token):
+        return False
+    if token[0].isalpha():
+        return True
+    parts = _SEPARATOR_PATTERN.split(token)
+    return len(parts) >= 3 and all(part.isdigit() for part in parts)
+
+
+def document_key(doc: Document) -> Tuple[str, Any, str]:
+    """
+    Stable identity for a chunk, used to fuse rankings from different retrievers
+
+    Args:
+        doc: Document object
+
+    Returns:
+        Tuple of (source file, chunk index, content)
+    """
+    metadata = doc.metadata or {}
+    return (
+        str(metadata.get("source_file", metadata.get("source", ""))),
+        metadata.get("chunk_index", ""),
+        doc.page_content,
+    )
+
+
+class BM25Index:
+    """Incremental inverted index with Okapi BM25 scoring"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty BM25 index
+
+        Args:
+            k1: Term frequency saturation parameter
+            b: Document length normalization parameter
+        """
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._documents: Dict[str, Document] = {}
+        self._total_length = 0
+        self._sources: Optional[Dict[str, str]] = None
+        self.loaded = False
+        # Collection generation the index reflects (None when unknown)
+        self.generation: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, doc_id: str, document: Document) -> None:
+        """
+        Add (or replace) a document in the index
+
+        Args:
+            doc_id: Document ID (ChromaDB chunk ID)
+            document: Document object
+        """
+        with self._lock:
+            if doc_id in self._documents:
+                self.remove(doc_id)
+
+            tokens = tokenize(document.page_content)
+            frequencies: Dict[str, int] = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+
+            for token, frequency in frequencies.items():
+                self._postings.setdefault(token, {})[doc_id] = frequency
+
+            self._doc_lengths[doc_id] = len(tokens)
+            self._documents[doc_id] = document
+            self._total_length += len(tokens)
+            self._sources = None
+
+    def add_documents(self, doc_ids: Iterable[str], documents: Iterable[Document]) -> None:
+        """
+        Add several documents to the index
+
+        Args:
+            doc_ids: Document IDs
+            documents: Document objects (same order as doc_ids)
+        """
+        with self._lock:
+            for doc_id, document in zip(doc_ids, documents):
+                self.add(doc_id, document)
+
+    def remove(self, doc_id: str) -> bool:
+        """
+        Remove a document from the index
+
+        Args:
+            doc_id: Document ID
+
+        Returns:
+            True if the document was indexed, False otherwise
+        """
+        with self._lock:
+            document = self._documents.pop(doc_id, None)
+            if document is None:
+                return False
+
+            for token in set(tokenize(document.page_content)):
+                postings = self._postings.get(token)
+                if postings is not None:
+                    postings.pop(doc_id, None)
+                    if not postings:
+                        del self._postings[token]
+
+            self._total_length -= self._doc_lengths.pop(doc_id, 0)
+            self._sources = None
+            return True
+
+    def clear(self) -> None:
+        """Remove every document from the index"""
+        with self._lock:
+            self._postings.clear()
+            self._doc_lengths.clear()
+            self._documents.clear()
+            self._total_length = 0
+            self._sources = None
+
+    def advance(self, generation: int) -> None:
+        """
+        Record a write this process already applied to the index
+
+        The index only moves to the new generation if it reflected the one just
+        before it, so writes made by other processes in between still force a rebuild.
+
+        Args:
+            generation: Collection generation returned by bump_collection_generation
+        """
+        with self._lock:
+            if self.generation == generation - 1:
+                self.generation = generation
+
+    def document_frequency(self, token: str) -> int:
+        """Number of indexed documents containing token"""
+        return len(self._postings.get(token, {}))
+
+    def ids_containing_all(self, tokens: Iterable[str]) -> List[str]:
+        """
+        IDs of documents that contain every given token
+
+        Args:
+            tokens: Tokens that must all be present
+
+        Returns:
+            List of matching document IDs
+        """
+        with self._lock:
+            matching: Optional[set] = None
+            for token in tokens:
+                postings = set(self._postings.get(token, {}))
+                matching = postings if matching is None else matching & postings
+                if not matching:
+                    return []
+            return list(matching or [])
+
+    def get_document(self, doc_id: str) -> Optional[Document]:
+        """Get an indexed document by ID"""
+        return self._documents.get(doc_id)
+
+    def source_files(self) -> Dict[str, str]:
+        """
+        Source files of the indexed chunks (recomputed only after the index changes)
+
+        Returns:
+            Dictionary mapping source_file to its latest upload_timestamp ("" if unknown)
+        """
+        with self._lock:
+            if self._sources is None:
+                sources: Dict[str, str] = {}
+                for document in self._documents.values():
+                    metadata = document.metadata or {}
+                    source_file = metadata.get("source_file")
+                    if source_file:
+                        uploaded = str(metadata.get("upload_timestamp", ""))
+                        sources[source_file] = max(sources.get(source_file, ""), uploaded)
+                self._sources = sources
+            return self._sources
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Score indexed documents against a query with BM25
+
+        Args:
+            query: Query text
+            k: Maximum number of results
+
+        Returns:
+            List of (doc_id, score) tuples, highest score first
+        """
+        with self._lock:
+            total_docs = len(self._documents)
+            if total_docs == 0:
+                return []
+
+            avg_length = self._total_length / total_docs if total_docs else 0.0
+            scores: Dict[str, float] = {}
+
+            for token in set(tokenize(query)):
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    length_norm = 1 - self.b + self.b * (self._doc_lengths[doc_id] / avg_length if avg_length else 0.0)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * (
+                        frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                    )
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+    def search_documents(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """
+        Same as search, returning Document objects instead of IDs
+
+        Args:
+            query: Query text
+            k: Maximum number of results
+
+        Returns:
+            List of (Document, score) tuples, highest score first
+        """
+        return [(self._documents[doc_id], score) for doc_id, score in self.search(query, k)]
+
+    def load_from_vectorstore(self, vectorstore: Any, generation: Optional[int] = None) -> bool:
+        """
+        Rebuild the index from every chunk stored in a ChromaDB collection
+
+        Args:
+            vectorstore: LangChain Chroma vector store
+            generation: Collection generation read before the chunks were fetched
+
+        Returns:
+            True if the index was (re)built, False if the collection payload was unusable
+        """
+        data = vectorstore.get(include=["documents", "metadatas"])
+        if not isinstance(data, dict):
+            return False
+
+        ids = data.get("ids") or []
+        contents = data.get("documents") or []
+        metadatas = data.get("metadatas") or [{}] * len(ids)
+
+        with self._lock:
+            self.clear()
+            for doc_id, content, metadata in zip(ids, contents, metadatas):
+                self.add(doc_id, Document(page_content=content or "", metadata=metadata or {}))
+            self.loaded = True
+            self.generation = generation
+
+        return True
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]],
+    rrf_k: int = 60,
+) -> List[Tuple[Document, float]]:
+    """
+    Fuse several rankings of the same corpus with reciprocal-rank fusion
+
+    Args:
+        rankings: Ranked document lists (best first) from different retrievers
+        rrf_k: RRF smoothing constant (default: 60)
+
+    Returns:
+        List of (Document, fused score) tuples, highest score first
+    """
+    fused: Dict[Tuple[str, Any, str], float] = {}
+    first_seen: Dict[Tuple[str, Any, str], Document] = {}
+
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = document_key(doc)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            first_seen.setdefault(key, doc)
+
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [(first_seen[key], score) for key, score in ordered]
+
+
+# Global lexical indexes, one per collection
+_lexical_indexes: Dict[str, BM25Index] = {}
+_registry_lock = threading.Lock()
+
+
+def get_lexical_index(collection_name: str) -> BM25Index:
+    """
+    Get or create the lexical index for a collection
+
+    Args:
+        collection_name: Name of the collection
+
+    Returns:
+        BM25Index instance (may not be loaded yet)
+    """
+    with _registry_lock:
+        index = _lexical_indexes.get(collection_name)
+        if index is None:
+            index = BM25Index()
+            _lexical_indexes[collection_name] = index
+        return index
+
+
+def is_lexical_index_current(collection_name: str) -> bool:
+    """
+    Check whether a collection's lexical index is loaded and reflects the latest write
+
+    Args:
+        collection_name: Name of the collection
+
+    Returns:
+        False if the index must be (re)built before use
+    """
+    index = get_lexical_index(collection_name)
+    if not index.loaded:
+        return False
+    return index.generation is None or index.generation == get_collection_generations().current(collection_name)
+
+
+def ensure_lexical_index(collection_name: str, vectorstore: Any) -> BM25Index:
+    """
+    Get the lexical index for a collection, building it from ChromaDB on first use
+    and rebuilding it after another process wrote the collection
+
+    Args:
+        collection_name: Name of the collection
+        vectorstore: LangChain Chroma vector store for the collection
+
+    Returns:
+        BM25Index instance
+    """
+    index = get_lexical_index(collection_name)
+    if not is_lexical_index_current(collection_name):
+        generation = get_collection_generations().current(collection_name)
+        try:
+            if index.load_from_vectorstore(vectorstore, generation):
+                app_logger.info(f"Lexical index for '{collection_name}' built with {len(index)} chunks")
+        except Exception as e:
+            app_logger.warning(f"Could not build lexical index for '{collection_name}': {e}")
+    return index
+
+
+def index_documents(collection_name: str, doc_ids: List[str], documents: List[Document]) -> None:
+    """
+    Incrementally add newly ingested chunks to a collection's lexical index
+
+    The index is only updated once it has been loaded; an unloaded index picks
+    the chunks up when it is first built from ChromaDB.
+
+    Args:
+        collection_name: Name of the collection
+        doc_ids: ChromaDB IDs of the new chunks
+        documents: New chunks (same order as doc_ids)
+    """
+    index = get_lexical_index(collection_name)
+    if index.loaded:
+        index.add_documents(doc_ids, documents)
+
+
+def lexical_index_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get lexical index statistics for every collection
+
+    Returns:
+        Dictionary mapping collection names to index size and load state
+    """
+    with _registry_lock:
+        return {
+            name: {
+                "loaded": index.loaded,
+                "generation": index.generation,
+                "chunks": len(index),
+                "terms": len(index._postings),
+            }
+            for name, index in _lexical_indexes.items()
+        }
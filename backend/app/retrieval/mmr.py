@@ -0,0 +1,140 @@
+"""
+Maximal marginal relevance (MMR) diversification over stored chunk embeddings
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+Billing and technical collections hold many near-identical chunks (invoice
+templates, repeated bug-report boilerplate), so a plain top-k fills up with
+copies. With diversify=True the search tools fetch MMR_FETCH_K candidates
+together with the embeddings ChromaDB already stores for them (nothing is
+re-embedded) and pick k by maximal marginal relevance:
+
+    argmax  lambda * sim(query, d) - (1 - lambda) * max sim(d, selected)
+
+lambda is configured per collection (MMR_LAMBDA_*; 1.0 is plain relevance order).
+Unlike Chroma.max_marginal_relevance_search_by_vector, results keep their
+relevance scores and are returned in MMR selection order.
+"""
+
+import math
+import operator
+from typing import Any, Dict, List, Optional, Sequence
+from langchain_core.documents import Document
+from app.retrieval.relevance import ScoredDocuments, collection_space, relevance_from_distance
+from app.utils.config import config
+
+
+def _unit(vector: Sequence[float]) -> List[float]:
+    """Scale a vector to unit length so dot products are cosine similarities"""
+    values = [float(value) for value in vector]
+    norm = math.sqrt(sum(value * value for value in values)) or 1.0
+    return [value / norm for value in values]
+
+
+def _dot(a: Sequence[float], b: Sequence[float]) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+def select_mmr(
+    query_embedding: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Select candidate indices by maximal marginal relevance
+
+    Args:
+        query_embedding: Query vector
+        embeddings: Candidate vectors
+        k: Number of candidates to select
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        Selected candidate indices in selection order
+    """
+    if len(embeddings) == 0 or k <= 0:
+        return []
+
+    query = _unit(query_embedding)
+    vectors = [_unit(vector) for vector in embeddings]
+    relevance = [_dot(query, vector) for vector in vectors]
+    selected = [max(range(len(vectors)), key=relevance.__getitem__)]
+    # Highest similarity of each candidate to anything already selected
+    redundancy = [_dot(vector, vectors[selected[0]]) for vector in vectors]
+
+    while len(selected) < min(k, len(vectors)):
+        best_index, best_score = -1, -math.inf
+        for i in range(len(vectors)):
+            if i in selected:
+                continue
+            score = lambda_mult * relevance[i] - (1.0 - lambda_mult) * redundancy[i]
+            if score > best_score:
+                best_index, best_score = i, score
+        selected.append(best_index)
+        redundancy = [
+            max(current, _dot(vector, vectors[best_index]))
+            for current, vector in zip(redundancy, vectors)
+        ]
+
+    return selected
+
+
+def mmr_vector_hits(
+    vectorstore: Any,
+    collection_name: str,
+    query_embedding: List[float],
+    k: int,
+    adaptive: bool = True,
+    chroma_filters: Optional[Dict[str, Any]] = None,
+) -> ScoredDocuments:
+    """
+    Diverse vector hits for a query, using the embeddings stored in ChromaDB
+
+    With adaptive k, candidates below the collection's minimum score are dropped
+    before selection (the best candidate is always kept).
+
+    Args:
+        vectorstore: LangChain Chroma vector store for the collection
+        collection_name: Name of the collection (selects lambda and minimum score)
+        query_embedding: Query vector
+        k: Number of results
+        adaptive: Drop candidates below the collection's minimum relevance score
+        chroma_filters: Optional "where" / "where_document" filters (see query_filters.py)
+
+    Returns:
+        List of (Document, relevance score) tuples in MMR selection order
+    """
+    filter_kwargs = {key: value for key, value in (chroma_filters or {}).items() if value}
+    result = vectorstore._collection.query(
+        query_embeddings=[query_embedding],
+        n_results=max(k, config.MMR_FETCH_K),
+        include=["documents", "metadatas", "distances", "embeddings"],
+        **filter_kwargs,
+    )
+    if not result or not result.get("documents") or not result["documents"][0]:
+        return []
+
+    space = collection_space(vectorstore)
+    candidates = [
+        (Document(page_content=text, metadata=metadata or {}), relevance_from_distance(distance, space), vector)
+        for text, metadata, distance, vector in zip(
+            result["documents"][0],
+            result["metadatas"][0],
+            result["distances"][0],
+            result["embeddings"][0],
+        )
+    ]
+    if adaptive:
+        min_score = config.get_retrieval_min_score(collection_name)
+        candidates = candidates[:1] + [candidate for candidate in candidates[1:] if candidate[1] >= min_score]
+
+    selected = select_mmr(
+        query_embedding,
+        [vector for _, _, vector in candidates],
+        k,
+        lambda_mult=config.get_mmr_lambda(collection_name),
+    )
+    return [(candidates[i][0], candidates[i][1]) for i in selected]
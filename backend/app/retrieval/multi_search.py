@@ -0,0 +1,218 @@
+"""
+Single-embedding fan-out search across every knowledge base collection
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+Multi-part questions are routed to several workers, and each used to embed the
+same text and query its own collection one after another. search_all_kbs embeds
+the query once, queries the billing, technical and policy collections
+concurrently with that vector, and returns per-collection and globally merged
+rankings with relevance scores.
+
+Results are memoized for the duration of one chat request (retrieval_request_scope),
+so orchestrator tools handling parts of the same request share a single fan-out,
+and search_collection reuses its hits instead of querying ChromaDB again.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.retrieval.chroma_client import get_chroma_client
+from app.retrieval.embedding_cache import normalize_query_text
+from app.retrieval.executor import get_retrieval_executor, run_in_retrieval_executor
+from app.retrieval.relevance import ScoredDocuments, collection_space, relevance_from_distance
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+# Fan-out results memoized for the current request (None outside a request scope)
+_request_results: ContextVar[Optional[Dict[Tuple[str, int, Tuple[str, ...]], Dict[str, Any]]]] = ContextVar(
+    "retrieval_request_results", default=None
+)
+
+
+@contextmanager
+def retrieval_request_scope() -> Iterator[None]:
+    """
+    Share fan-out search results across every tool call made while handling one request
+
+    Nested scopes reuse the outer scope's results.
+    """
+    if _request_results.get() is not None:
+        yield
+        return
+
+    token = _request_results.set({})
+    try:
+        yield
+    finally:
+        try:
+            _request_results.reset(token)
+        except ValueError:
+            # Streams closed from another context (client disconnect) cannot reset the token
+            _request_results.set(None)
+
+
+def _query_collection(collection_name: str, embedding: List[float], k: int) -> ScoredDocuments:
+    """Query one collection with a precomputed embedding, returning relevance scores (higher is better)"""
+    vectorstore = get_chroma_client().get_or_create_collection(collection_name=collection_name)
+    space = collection_space(vectorstore)
+    # Despite its name, this Chroma method returns raw distances
+    hits = vectorstore.similarity_search_by_vector_with_relevance_scores(embedding=embedding, k=k)
+    return [(doc, relevance_from_distance(distance, space)) for doc, distance in hits]
+
+
+def _fan_out_key(query: str, per_collection_k: int, collections: Optional[List[str]]) -> Tuple[str, int, Tuple[str, ...]]:
+    return (normalize_query_text(query), per_collection_k, tuple(collections or config.get_all_collections()))
+
+
+def _build_fan_out_result(
+    query: str,
+    key: Tuple[str, int, Tuple[str, ...]],
+    outcomes: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Assemble per-collection and merged rankings, and memoize them in the request scope"""
+    per_collection: Dict[str, ScoredDocuments] = {}
+    errors: Dict[str, str] = {}
+    for name, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            app_logger.error(f"Fan-out search failed for collection '{name}': {outcome}")
+            per_collection[name] = []
+            errors[name] = str(outcome)
+        else:
+            per_collection[name] = outcome
+
+    merged = sorted(
+        ((name, doc, score) for name, hits in per_collection.items() for doc, score in hits),
+        key=lambda item: item[2],
+        reverse=True,
+    )
+
+    result = {
+        "query": query,
+        "per_collection": per_collection,
+        "merged": merged,
+        "errors": errors,
+    }
+
+    shared = _request_results.get()
+    if shared is not None:
+        shared[key] = result
+
+    app_logger.info(
+        f"Fan-out search over {len(outcomes)} collections returned {len(merged)} results "
+        f"for query: {query[:50]}"
+    )
+    return result
+
+
+def _cached_fan_out(key: Tuple[str, int, Tuple[str, ...]], query: str) -> Optional[Dict[str, Any]]:
+    shared = _request_results.get()
+    if shared is not None and key in shared:
+        app_logger.info(f"Reusing fan-out search results for query: {query[:50]}")
+        return shared[key]
+    return None
+
+
+def search_all_kbs(
+    query: str,
+    per_collection_k: int = 5,
+    collections: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Embed a query once and search several knowledge base collections concurrently
+
+    Args:
+        query: User query
+        per_collection_k: Number of results to fetch from each collection
+        collections: Collection names to search (default: billing, technical and policy)
+
+    Returns:
+        Dictionary with:
+        - query: The query text
+        - per_collection: collection name -> list of (Document, score), best first
+        - merged: list of (collection name, Document, score) across collections, best first
+        - errors: collection name -> error message for collections that failed
+    """
+    key = _fan_out_key(query, per_collection_k, collections)
+    cached = _cached_fan_out(key, query)
+    if cached is not None:
+        return cached
+
+    embedding = get_chroma_client().embeddings.embed_query(query)
+
+    executor = get_retrieval_executor()
+    futures = {
+        name: executor.submit(_query_collection, name, embedding, per_collection_k)
+        for name in key[2]
+    }
+
+    outcomes: Dict[str, Any] = {}
+    for name, future in futures.items():
+        try:
+            outcomes[name] = future.result()
+        except Exception as e:
+            outcomes[name] = e
+
+    return _build_fan_out_result(query, key, outcomes)
+
+
+async def asearch_all_kbs(
+    query: str,
+    per_collection_k: int = 5,
+    collections: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Async counterpart of search_all_kbs (async embedding, ChromaDB queries on the retrieval executor)
+
+    Args:
+        query: User query
+        per_collection_k: Number of results to fetch from each collection
+        collections: Collection names to search (default: billing, technical and policy)
+
+    Returns:
+        Same dictionary as search_all_kbs
+    """
+    key = _fan_out_key(query, per_collection_k, collections)
+    cached = _cached_fan_out(key, query)
+    if cached is not None:
+        return cached
+
+    embedding = await get_chroma_client().embeddings.aembed_query(query)
+
+    results = await asyncio.gather(
+        *(run_in_retrieval_executor(_query_collection, name, embedding, per_collection_k) for name in key[2]),
+        return_exceptions=True,
+    )
+
+    return _build_fan_out_result(query, key, dict(zip(key[2], results)))
+
+
+def get_shared_collection_hits(collection_name: str, query: str, k: int) -> Optional[ScoredDocuments]:
+    """
+    Look up hits for one collection from a fan-out search already run in this request
+
+    Args:
+        collection_name: Name of the collection
+        query: User query
+        k: Number of results needed
+
+    Returns:
+        Top k (Document, score) tuples, or None if no fan-out result covers the query
+    """
+    shared = _request_results.get()
+    if not shared:
+        return None
+
+    normalized = normalize_query_text(query)
+    for (cached_query, per_collection_k, collection_names), result in shared.items():
+        if cached_query == normalized and per_collection_k >= k and collection_name in collection_names:
+            if collection_name in result["errors"]:
+                return None
+            return result["per_collection"][collection_name][:k]
+
+    return None
@@ -0,0 +1,211 @@
+"""
+Negative-result cache for searches that found nothing relevant
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+When a collection has nothing relevant, the search tools answer "No relevant …
+documents found" and the agent often retries the same question, paying for
+another embedding and search each time. NegativeResultCache remembers
+(collection, normalized query) pairs whose search came back empty for a short
+TTL. A search whose best vector hit scores below the collection's minimum relevance
+counts as empty too (see search_pipeline.discard_weak_results): the tools answer
+it as "nothing found" and it is recorded like a search with no hits. Entries are stamped
+with the collection generation (see result_cache.py), so any ingest into that
+collection forgets them. Searches that raised are never recorded: errors may be
+transient and must stay retryable.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app.retrieval.embedding_cache import normalize_query_text
+from app.retrieval.result_cache import get_collection_generations
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+NegativeCacheKey = Tuple[str, str]
+
+
+def negative_cache_key(collection_name: str, query: str) -> NegativeCacheKey:
+    """
+    Build a negative cache key
+
+    Args:
+        collection_name: Name of the collection
+        query: User query (normalized: case-folded, whitespace collapsed)
+
+    Returns:
+        Hashable cache key
+    """
+    return (collection_name, normalize_query_text(query))
+
+
+class NegativeResultCache:
+    """Thread-safe bounded LRU/TTL set of searches known to return nothing"""
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 300):
+        """
+        Initialize negative result cache
+
+        Args:
+            max_size: Maximum number of remembered searches (LRU eviction beyond this)
+            ttl_seconds: Time-to-live for each entry in seconds (0 disables expiry)
+        """
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        # key -> [generation, recorded_at, times served]
+        self._entries: "OrderedDict[NegativeCacheKey, List[Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def _live_entry(self, key: NegativeCacheKey, generation: int) -> Optional[List[Any]]:
+        """Get the entry for key, dropping it when stale or expired (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        entry_generation, recorded_at, _ = entry
+        if entry_generation != generation:
+            del self._entries[key]
+            self.stale += 1
+            return None
+        if self.ttl_seconds and time.monotonic() - recorded_at > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        return entry
+
+    def is_known_empty(self, key: NegativeCacheKey, generation: int) -> bool:
+        """
+        Check whether a search is known to return nothing at the collection's current generation
+
+        Args:
+            key: Cache key (see negative_cache_key)
+            generation: Current generation of the key's collection
+
+        Returns:
+            True when the search can be answered as empty without running it
+        """
+        with self._lock:
+            entry = self._live_entry(key, generation)
+            if entry is None:
+                self.misses += 1
+                return False
+
+            entry[2] += 1
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def times_served(self, key: NegativeCacheKey, generation: int) -> int:
+        """
+        Get how many searches were answered from an entry (0 when there is no live entry)
+
+        Args:
+            key: Cache key (see negative_cache_key)
+            generation: Current generation of the key's collection
+
+        Returns:
+            Number of searches short-circuited by the entry
+        """
+        with self._lock:
+            entry = self._live_entry(key, generation)
+            return entry[2] if entry is not None else 0
+
+    def record(self, key: NegativeCacheKey, generation: int) -> None:
+        """
+        Remember that a search returned nothing
+
+        Args:
+            key: Cache key (see negative_cache_key)
+            generation: Collection generation observed before the search ran
+        """
+        with self._lock:
+            self._entries[key] = [generation, time.monotonic(), 0]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries (counters are preserved)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hit/miss/stale/expiration/eviction counters, size and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Global instance
+_negative_result_cache: Optional[NegativeResultCache] = None
+
+
+def get_negative_result_cache() -> NegativeResultCache:
+    """
+    Get or create global negative result cache instance
+
+    Returns:
+        NegativeResultCache instance shared by the whole process
+    """
+    global _negative_result_cache
+
+    if _negative_result_cache is None:
+        _negative_result_cache = NegativeResultCache(
+            max_size=config.NEGATIVE_RESULT_CACHE_SIZE,
+            ttl_seconds=config.NEGATIVE_RESULT_CACHE_TTL_SECONDS,
+        )
+        app_logger.info(
+            f"Negative result cache initialized (max_size={config.NEGATIVE_RESULT_CACHE_SIZE}, "
+            f"ttl={config.NEGATIVE_RESULT_CACHE_TTL_SECONDS}s)"
+        )
+
+    return _negative_result_cache
+
+
+def known_empty_note(collection_name: str, query: str) -> str:
+    """
+    Sentence appended to a "No relevant … documents found" answer served from the negative cache
+
+    Args:
+        collection_name: Name of the collection that was searched
+        query: User query
+
+    Returns:
+        Note telling the agent not to repeat the search, or "" when the search actually ran
+    """
+    if not config.NEGATIVE_RESULT_CACHE_ENABLED:
+        return ""
+
+    generation = get_collection_generations().current(collection_name)
+    if not get_negative_result_cache().times_served(negative_cache_key(collection_name, query), generation):
+        return ""
+    return (
+        " This search already returned nothing since the knowledge base was last updated; "
+        "do not repeat it until new documents are uploaded."
+    )
@@ -0,0 +1,1295 @@
+"""
+In-process NumPy exact-search vector backend with a memory-mapped embedding matrix
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/integrations/vectorstores/chroma
+Last Verified: November 2025
+
+At our collection sizes (tens of thousands of chunks) one matrix-vector product
+over a contiguous float32 matrix followed by an argpartition top-k is faster and
+more predictable than ChromaDB's per-query overhead, and it is exact rather than
+approximate. With VECTOR_BACKEND=numpy, ChromaDBClient returns NumpyVectorStore
+collections instead of LangChain Chroma ones. They implement the part of the
+Chroma API that ingestion and the retrievers use (add_documents, get, delete,
+the similarity_search* methods, and _collection.query/metadata for MMR and
+relevance scoring), so no caller needs to change.
+
+Each collection is a directory under NUMPY_STORE_PATH:
+
+    embeddings.npy   float32 (capacity, dims) matrix of unit-normalized rows
+    records.json     sidecar with ids, documents and metadatas (rows beyond len(ids) are unused)
+
+Readers map embeddings.npy read-only, so several uvicorn workers share its pages
+through the OS page cache. A writer takes an exclusive lock file, appends rows in
+place (the file doubles when full), and then atomically replaces the sidecar.
+Readers pick up the new row count when the sidecar changes. Distances are cosine
+(1 - cos) and the collection reports hnsw:space=cosine, like a Chroma collection.
+
+At 1536 dimensions, float32 vectors cost 6 KB per chunk. NUMPY_STORE_QUANTIZATION
+keeps a float16 (3 KB) or int8 with a per-vector scale (~1.5 KB) copy next to the
+float32 matrix. Searches scan only the quantized copy, and the float32 rows of the
+top k * NUMPY_RESCORE_FACTOR candidates are rescored exactly. The OS therefore
+keeps only the small matrix hot in the page cache. int8 is the better default:
+NumPy has no vectorized float16 conversion, so float16 scans cost noticeably more CPU.
+
+NUMPY_COARSE_DIMENSIONS builds the first-pass copy from the first N dimensions of each
+vector, renormalized. For text-embedding-3 models this prefix is the embedding the API
+returns for dimensions=N, so a 256-d coarse index is derived from the stored 1536-d
+vectors without re-embedding anything. Queries are truncated the same way for the
+first pass, and candidates are rescored with the full vectors. It combines with
+quantization: int8 at 256 dimensions scans 260 bytes per chunk instead of 6 KB.
+A lower-dimension first pass ranks less precisely, so raise NUMPY_RESCORE_FACTOR
+until the report below shows no recall loss.
+
+To copy a Chroma collection and compare latency and recall@k against it:
+
+    python -m app.retrieval.numpy_store --collection technical_knowledge_base \\
+        --import-chroma --queries 200 --k 5
+
+To report memory use and the recall delta of float16/int8 storage for every collection:
+
+    python -m app.retrieval.numpy_store --quantization-report --k 10 --coarse-dimensions 256 512
+
+To rebuild every collection's first-pass copy after changing NUMPY_STORE_QUANTIZATION or
+NUMPY_COARSE_DIMENSIONS (opening a collection does this too):
+
+    python -m app.retrieval.numpy_store --reindex --quantization int8 --coarse-dimensions 256
+"""
+
+import argparse
+import itertools
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms fall back to in-process locking
+    fcntl = None
+
+
+EMBEDDINGS_FILE = "embeddings.npy"
+RECORDS_FILE = "records.json"
+_LOCK_FILE = ".lock"
+
+# Initial row capacity of a new embedding matrix (doubles when full)
+_MIN_CAPACITY = 1024
+
+
+def _unit_rows(vectors: Any) -> np.ndarray:
+    """float32 matrix of the vectors scaled to unit length (cosine similarity = dot product)"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+_WHERE_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+    "$gt": lambda value, operand: isinstance(value, (int, float)) and value > operand,
+    "$gte": lambda value, operand: isinstance(value, (int, float)) and value >= operand,
+    "$lt": lambda value, operand: isinstance(value, (int, float)) and value < operand,
+    "$lte": lambda value, operand: isinstance(value, (int, float)) and value <= operand,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """
+    Evaluate a ChromaDB metadata filter against one record
+
+    Args:
+        metadata: Record metadata
+        where: ChromaDB where filter ($and/$or plus $eq, $ne, $in, $nin, $gt, $gte, $lt, $lte)
+
+    Returns:
+        True if the record satisfies the filter
+
+    Raises:
+        ValueError: If the filter uses an unsupported operator
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            clauses = condition if isinstance(condition, dict) else {"$eq": condition}
+            for operator_name, operand in clauses.items():
+                compare = _WHERE_OPERATORS.get(operator_name)
+                if compare is None:
+                    raise ValueError(f"Unsupported where operator: {operator_name}")
+                if not compare(metadata.get(key), operand):
+                    return False
+    return True
+
+
+def matches_where_document(text: str, where_document: Dict[str, Any]) -> bool:
+    """
+    Evaluate a ChromaDB document filter against one record
+
+    Args:
+        text: Record text
+        where_document: ChromaDB where_document filter ($contains, $not_contains, $regex,
+            $not_regex, $and, $or)
+
+    Returns:
+        True if the text satisfies the filter
+
+    Raises:
+        ValueError: If the filter uses an unsupported operator
+    """
+    for operator_name, operand in where_document.items():
+        if operator_name == "$contains":
+            matched = operand in text
+        elif operator_name == "$not_contains":
+            matched = operand not in text
+        elif operator_name == "$regex":
+            matched = re.search(operand, text) is not None
+        elif operator_name == "$not_regex":
+            matched = re.search(operand, text) is None
+        elif operator_name == "$and":
+            matched = all(matches_where_document(text, clause) for clause in operand)
+        elif operator_name == "$or":
+            matched = any(matches_where_document(text, clause) for clause in operand)
+        else:
+            raise ValueError(f"Unsupported where_document operator: {operator_name}")
+        if not matched:
+            return False
+    return True
+
+
+
+def _prefix_rows(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """First dimensions of each row, renormalized (the shortened text-embedding-3 embedding)"""
+    if not dimensions or dimensions >= vectors.shape[1]:
+        return vectors
+    return _unit_rows(vectors[:, :dimensions])
+
+
+def _scan_bytes(count: int, dimensions: int, mode: str) -> int:
+    """Bytes of live vectors read by a full scan under a quantization mode"""
+    if mode == "float16":
+        return count * dimensions * 2
+    if mode == "int8":
+        return count * (dimensions + 4)
+    return count * dimensions * 4
+
+
+def _top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    top = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _ranked(rows: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """(row position, cosine distance) pairs of the k best-scoring rows"""
+    return [(int(rows[i]), float(1.0 - scores[i])) for i in _top_indices(scores, k)]
+
+
+def _approximate_scores(
+    quantized: np.ndarray,
+    scales: Optional[np.ndarray],
+    queries: np.ndarray,
+    rows: np.ndarray,
+) -> np.ndarray:
+    """Cosine similarities from a quantized matrix, scanned in float32 blocks (rows ascending)"""
+    scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+    if not len(rows):
+        return scores
+    # Unfiltered scans read contiguous slices instead of gathering rows
+    offset = int(rows[0]) if int(rows[-1]) - int(rows[0]) == len(rows) - 1 else None
+    buffer = np.empty((min(_SCAN_BLOCK_ROWS, len(rows)), quantized.shape[1]), dtype=np.float32)
+
+    for start in range(0, len(rows), _SCAN_BLOCK_ROWS):
+        end = min(start + _SCAN_BLOCK_ROWS, len(rows))
+        index = slice(offset + start, offset + end) if offset is not None else rows[start:end]
+        block = buffer[: end - start]
+        np.copyto(block, quantized[index], casting="unsafe")
+        block_scores = block @ queries.T
+        if scales is not None:
+            block_scores *= np.asarray(scales[index])[:, None]
+        scores[:, start:end] = block_scores.T
+    return scores
+
+
+def _search_rows(
+    snapshot: "_Snapshot",
+    queries: np.ndarray,
+    rows: np.ndarray,
+    k: int,
+    rescore_factor: int,
+    exact: bool = False,
+    rescore: bool = True,
+) -> List[List[Tuple[int, float]]]:
+    """Exact or two-stage (quantized and/or coarse first pass, exact rescoring) top-k over the given rows"""
+    if exact or snapshot.quantized is None:
+        matrix = snapshot.matrix[: snapshot.count] if len(rows) == snapshot.count else snapshot.matrix[rows]
+        return [_ranked(rows, scores, k) for scores in queries @ matrix.T]
+
+    coarse_queries = _prefix_rows(queries, snapshot.quantized.shape[1])
+    approximate = _approximate_scores(snapshot.quantized, snapshot.scales, coarse_queries, rows)
+    if not rescore:
+        return [_ranked(rows, scores, k) for scores in approximate]
+
+    candidates = min(len(rows), k * rescore_factor)
+    results = []
+    for query, scores in zip(queries, approximate):
+        shortlist = np.sort(rows[_top_indices(scores, candidates)])
+        # Only the shortlisted float32 rows are read (and paged in) from the full matrix
+        results.append(_ranked(shortlist, np.asarray(snapshot.matrix[shortlist]) @ query, k))
+    return results
+
+
+QUANTIZATION_MODES = ("none", "float16", "int8")
+# First-pass copies ("none" is only used for an unquantized coarse prefix)
+_QUANTIZED_FILES = {"none": "embeddings.coarse.npy", "float16": "embeddings.f16.npy", "int8": "embeddings.i8.npy"}
+SCALES_FILE = "scales.npy"
+
+# Rows converted to float32 at a time when scanning a quantized matrix (a cache-sized block)
+_SCAN_BLOCK_ROWS = 1024
+
+
+def quantize(vectors: np.ndarray, mode: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Quantize unit-normalized float32 rows
+
+    int8 uses a per-vector scale (max |component| / 127), so each row keeps its own range.
+
+    Args:
+        vectors: float32 matrix
+        mode: "none", "float16" or "int8"
+
+    Returns:
+        Tuple of (quantized matrix, per-row float32 scales or None)
+    """
+    if mode == "none":
+        return vectors, None
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def first_pass_copy(
+    vectors: np.ndarray, mode: str, coarse_dimensions: int = 0
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    First-pass search matrix: the renormalized coarse prefix of each row, then quantized
+
+    Args:
+        vectors: Unit-normalized float32 matrix
+        mode: "none", "float16" or "int8"
+        coarse_dimensions: Prefix length (0 keeps every dimension)
+
+    Returns:
+        Tuple of (first-pass matrix, per-row float32 scales or None)
+    """
+    return quantize(_prefix_rows(vectors, coarse_dimensions), mode)
+
+
+class _Snapshot:
+    """Immutable view of a collection: readers search it without holding the lock"""
+
+    __slots__ = ("matrix", "quantized", "scales", "ids", "documents", "metadatas", "positions")
+
+    def __init__(
+        self,
+        matrix: Optional[np.ndarray],
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        quantized: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None,
+    ):
+        self.matrix = matrix
+        self.quantized = quantized
+        self.scales = scales
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.positions = {doc_id: position for position, doc_id in enumerate(ids)}
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+
+class NumpyCollection:
+    """Exact-search collection: memory-mapped embedding matrix plus a JSON sidecar"""
+
+    def __init__(
+        self,
+        name: str,
+        directory: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        quantization: Optional[str] = None,
+        rescore_factor: Optional[int] = None,
+        coarse_dimensions: Optional[int] = None,
+    ):
+        """
+        Open (or create) a collection directory
+
+        Existing vectors get a first-pass copy built (or rebuilt) here when the
+        quantization mode or coarse dimensions differ from the stored one.
+
+        Args:
+            name: Collection name
+            directory: Directory holding embeddings.npy and records.json
+            metadata: Collection metadata stored on creation (hnsw:space is always cosine)
+            quantization: "none", "float16" or "int8" (default: NUMPY_STORE_QUANTIZATION)
+            rescore_factor: Candidates rescored exactly per result with quantization
+                (default: NUMPY_RESCORE_FACTOR)
+            coarse_dimensions: Leading dimensions scanned in the first pass, 0 for all
+                (default: NUMPY_COARSE_DIMENSIONS)
+
+        Raises:
+            ValueError: If the quantization mode is unknown or coarse_dimensions is negative
+        """
+        quantization = (quantization or config.NUMPY_STORE_QUANTIZATION).lower()
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization: {quantization}. Expected one of {QUANTIZATION_MODES}")
+        if coarse_dimensions is None:
+            coarse_dimensions = config.NUMPY_COARSE_DIMENSIONS
+        if coarse_dimensions < 0:
+            raise ValueError(f"coarse_dimensions must be 0 or positive, got {coarse_dimensions}")
+
+        self.name = name
+        self.directory = directory
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor or config.NUMPY_RESCORE_FACTOR)
+        self.coarse_dimensions = coarse_dimensions
+        self.metadata: Dict[str, Any] = {**(metadata or {}), "hnsw:space": "cosine"}
+        self._lock = threading.RLock()
+        self._version: Optional[Tuple[int, int, int]] = None
+        self._snapshot = _Snapshot(None, [], [], [])
+
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+        if self._snapshot.count and self._snapshot.quantized is None and self._first_pass:
+            self.requantize()
+
+    @property
+    def _first_pass(self) -> bool:
+        """Whether searches scan a separate (quantized and/or coarse) first-pass copy"""
+        return self.quantization != "none" or self.coarse_dimensions > 0
+
+    @property
+    def _records_path(self) -> str:
+        return os.path.join(self.directory, RECORDS_FILE)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _refresh(self) -> _Snapshot:
+        """Reload the sidecar and remap the matrices if any process has written since the last load"""
+        try:
+            stat = os.stat(self._records_path)
+        except FileNotFoundError:
+            return self._snapshot
+
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version == self._version:
+            return self._snapshot
+
+        with self._lock:
+            if version == self._version:
+                return self._snapshot
+            with open(self._records_path, encoding="utf-8") as handle:
+                records = json.load(handle)
+
+            matrix = quantized = scales = None
+            if records["ids"]:
+                matrix = np.load(self._path(EMBEDDINGS_FILE), mmap_mode="r")
+                # First-pass files written under other settings are ignored until requantize()
+                if (
+                    self._first_pass
+                    and records.get("quantization") == self.quantization
+                    and records.get("coarse_dimensions", 0) == self.coarse_dimensions
+                ):
+                    quantized = np.load(self._path(_QUANTIZED_FILES[self.quantization]), mmap_mode="r")
+                    if self.quantization == "int8":
+                        scales = np.load(self._path(SCALES_FILE), mmap_mode="r")
+
+            self.metadata = {**records.get("metadata", {}), "hnsw:space": "cosine"}
+            self._snapshot = _Snapshot(
+                matrix, records["ids"], records["documents"], records["metadatas"], quantized, scales
+            )
+            self._version = version
+            return self._snapshot
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[_Snapshot]:
+        """Exclusive write access across threads and worker processes, yielding the latest state"""
+        with self._lock:
+            with open(os.path.join(self.directory, _LOCK_FILE), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield self._refresh()
+
+    def _replace_array(self, filename: str, rows: int, existing: np.ndarray) -> np.ndarray:
+        """Build a new array file with room for rows (copying existing ones) and swap it in"""
+        capacity = _MIN_CAPACITY
+        while capacity < rows:
+            capacity *= 2
+
+        # Written beside the live file so mapped readers never see a partial array
+        temporary = self._path(f".{filename}.{uuid.uuid4().hex}")
+        array = np.lib.format.open_memmap(
+            temporary, mode="w+", dtype=existing.dtype, shape=(capacity,) + existing.shape[1:]
+        )
+        array[: len(existing)] = existing
+        array.flush()
+        os.replace(temporary, self._path(filename))
+        return array
+
+    def _write_rows(
+        self,
+        filename: str,
+        current: Optional[np.ndarray],
+        count: int,
+        rows: List[int],
+        values: np.ndarray,
+    ) -> None:
+        """Write values at row positions, appending in place or growing into a new file when full"""
+        needed = max(rows) + 1
+        if current is not None and current.shape[1:] == values.shape[1:] and current.shape[0] >= needed:
+            array = np.lib.format.open_memmap(self._path(filename), mode="r+")
+        else:
+            existing = (
+                current[:count] if current is not None and current.shape[1:] == values.shape[1:]
+                else values[:0]
+            )
+            array = self._replace_array(filename, needed, np.asarray(existing, dtype=values.dtype))
+        array[rows] = values
+        array.flush()
+
+    def _store_arrays(self, snapshot: _Snapshot, rows: List[int], vectors: np.ndarray) -> None:
+        """Write float32 rows and, when enabled, their first-pass copies"""
+        self._write_rows(EMBEDDINGS_FILE, snapshot.matrix, snapshot.count, rows, vectors)
+        if not self._first_pass:
+            return
+        quantized, scales = first_pass_copy(vectors, self.quantization, self.coarse_dimensions)
+        self._write_rows(_QUANTIZED_FILES[self.quantization], snapshot.quantized, snapshot.count, rows, quantized)
+        if scales is not None:
+            self._write_rows(SCALES_FILE, snapshot.scales, snapshot.count, rows, scales)
+
+    def _commit(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Atomically replace the sidecar, publishing the new row count to every reader"""
+        temporary = self._path(f".{RECORDS_FILE}.{uuid.uuid4().hex}")
+        with open(temporary, "w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "metadata": self.metadata,
+                    "quantization": self.quantization,
+                    "coarse_dimensions": self.coarse_dimensions,
+                    "ids": ids,
+                    "documents": documents,
+                    "metadatas": metadatas,
+                },
+                handle,
+                default=str,
+            )
+        os.replace(temporary, self._records_path)
+        self._refresh()
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """
+        Add records, replacing any existing record with the same ID
+
+        Args:
+            ids: Record IDs
+            embeddings: One vector per ID
+            documents: Record texts (default: empty)
+            metadatas: Record metadata (default: empty)
+
+        Raises:
+            ValueError: If the vector dimensions differ from the stored matrix
+        """
+        if not ids:
+            return
+        vectors = _unit_rows(embeddings)
+        documents = list(documents) if documents is not None else [""] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [{}] * len(ids)
+
+        with self._write_lock() as snapshot:
+            if snapshot.matrix is not None and snapshot.count and snapshot.matrix.shape[1] != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match collection "
+                    f"'{self.name}' dimension {snapshot.matrix.shape[1]}"
+                )
+            if snapshot.count and self._first_pass and snapshot.quantized is None:
+                snapshot = self._requantize(snapshot)
+
+            all_ids = list(snapshot.ids)
+            all_documents = list(snapshot.documents)
+            all_metadatas = list(snapshot.metadatas)
+            positions = dict(snapshot.positions)
+            rows = []
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                position = positions.get(doc_id)
+                if position is None:
+                    position = len(all_ids)
+                    positions[doc_id] = position
+                    all_ids.append(doc_id)
+                    all_documents.append(document or "")
+                    all_metadatas.append(metadata or {})
+                else:
+                    all_documents[position] = document or ""
+                    all_metadatas[position] = metadata or {}
+                rows.append(position)
+
+            self._store_arrays(snapshot, rows, vectors)
+            self._commit(all_ids, all_documents, all_metadatas)
+
+    add = upsert
+
+    def _requantize(self, snapshot: _Snapshot) -> _Snapshot:
+        """Rebuild the first-pass copies from the float32 matrix (caller holds the write lock)"""
+        vectors = np.asarray(snapshot.matrix[: snapshot.count])
+        quantized, scales = first_pass_copy(vectors, self.quantization, self.coarse_dimensions)
+        self._replace_array(_QUANTIZED_FILES[self.quantization], snapshot.count, quantized)
+        if scales is not None:
+            self._replace_array(SCALES_FILE, snapshot.count, scales)
+        self._commit(snapshot.ids, snapshot.documents, snapshot.metadatas)
+        app_logger.info(
+            f"Built first-pass copy of {snapshot.count} vectors of '{self.name}' "
+            f"(quantization={self.quantization}, coarse_dimensions={self.coarse_dimensions or 'all'})"
+        )
+        return self._snapshot
+
+    def requantize(self) -> None:
+        """Build first-pass copies for vectors stored without them (e.g. after changing the settings)"""
+        if not self._first_pass:
+            return
+        with self._write_lock() as snapshot:
+            if snapshot.count and snapshot.quantized is None:
+                self._requantize(snapshot)
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Delete records by ID and/or metadata filter, compacting the matrices into new files
+
+        Args:
+            ids: Record IDs to delete
+            where: ChromaDB metadata filter selecting records to delete
+
+        Returns:
+            Number of records deleted
+        """
+        with self._write_lock() as snapshot:
+            doomed = {snapshot.positions[doc_id] for doc_id in (ids or []) if doc_id in snapshot.positions}
+            if where:
+                doomed |= {i for i, metadata in enumerate(snapshot.metadatas) if matches_where(metadata, where)}
+            if not doomed:
+                return 0
+
+            keep = [i for i in range(snapshot.count) if i not in doomed]
+            if keep:
+                # Compact into fresh files: readers still mapping the old ones keep a consistent view
+                self._replace_array(EMBEDDINGS_FILE, len(keep), np.asarray(snapshot.matrix[keep]))
+                if snapshot.quantized is not None:
+                    self._replace_array(
+                        _QUANTIZED_FILES[self.quantization], len(keep), np.asarray(snapshot.quantized[keep])
+                    )
+                if snapshot.scales is not None:
+                    self._replace_array(SCALES_FILE, len(keep), np.asarray(snapshot.scales[keep]))
+
+            self._commit(
+                [snapshot.ids[i] for i in keep],
+                [snapshot.documents[i] for i in keep],
+                [snapshot.metadatas[i] for i in keep],
+            )
+            return len(doomed)
+
+    def update(self, ids: Sequence[str], metadatas: Sequence[Optional[Dict[str, Any]]]) -> None:
+        """
+        Replace the metadata of stored records, leaving their vectors and texts untouched
+
+        Args:
+            ids: Record IDs (unknown IDs are skipped)
+            metadatas: New metadata, one per ID
+        """
+        if not ids:
+            return
+        with self._write_lock() as snapshot:
+            all_metadatas = list(snapshot.metadatas)
+            for doc_id, metadata in zip(ids, metadatas):
+                position = snapshot.positions.get(doc_id)
+                if position is not None:
+                    all_metadatas[position] = metadata or {}
+            self._commit(list(snapshot.ids), list(snapshot.documents), all_metadatas)
+
+    def count(self) -> int:
+        """Number of records in the collection"""
+        return self._refresh().count
+
+    def _select(
+        self,
+        snapshot: _Snapshot,
+        ids: Optional[Sequence[str]],
+        where: Optional[Dict[str, Any]],
+        where_document: Optional[Dict[str, Any]],
+    ) -> Optional[List[int]]:
+        """Row positions passing the filters (None when nothing is filtered)"""
+        if ids is None and not where and not where_document:
+            return None
+        candidates = (
+            [snapshot.positions[doc_id] for doc_id in ids if doc_id in snapshot.positions]
+            if ids is not None
+            else range(snapshot.count)
+        )
+        return [
+            i for i in candidates
+            if (not where or matches_where(snapshot.metadatas[i], where))
+            and (not where_document or matches_where_document(snapshot.documents[i], where_document))
+        ]
+
+    def search(
+        self,
+        query_embeddings: Any,
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        exact: bool = False,
+        rescore: bool = True,
+    ) -> Tuple[_Snapshot, List[List[Tuple[int, float]]]]:
+        """
+        Top-k cosine search
+
+        Without a first-pass copy every row is scored exactly. With quantization and/or
+        coarse dimensions, a first pass over that copy picks n_results * rescore_factor
+        candidates and only those rows are rescored exactly from the float32 matrix.
+
+        Args:
+            query_embeddings: One or more query vectors
+            n_results: Number of results per query
+            where: Optional ChromaDB metadata filter
+            where_document: Optional ChromaDB document filter
+            exact: Score every row from the float32 matrix even when quantized
+            rescore: Rescore quantized candidates exactly (False returns first-pass results)
+
+        Returns:
+            Tuple of (snapshot searched, per-query lists of (row position, cosine distance), best first)
+        """
+        snapshot = self._refresh()
+        queries = _unit_rows(query_embeddings)
+        selected = self._select(snapshot, None, where, where_document)
+        if snapshot.matrix is None or snapshot.count == 0 or selected == [] or n_results <= 0:
+            return snapshot, [[] for _ in range(len(queries))]
+
+        rows = np.arange(snapshot.count) if selected is None else np.asarray(selected)
+        return snapshot, _search_rows(
+            snapshot, queries, rows, min(n_results, len(rows)), self.rescore_factor, exact, rescore
+        )
+
+    def query(
+        self,
+        query_embeddings: Any,
+        n_results: int = 10,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        include: Iterable[str] = ("documents", "metadatas", "distances"),
+    ) -> Dict[str, Any]:
+        """
+        ChromaDB-compatible query (per-query lists of ids, documents, metadatas, distances, embeddings)
+
+        Args:
+            query_embeddings: One or more query vectors
+            n_results: Number of results per query
+            where: Optional ChromaDB metadata filter
+            where_document: Optional ChromaDB document filter
+            include: Fields to return besides ids
+
+        Returns:
+            Dictionary shaped like chromadb's QueryResult
+        """
+        snapshot, hits = self.search(query_embeddings, n_results, where, where_document)
+        include = set(include)
+        result: Dict[str, Any] = {"ids": [[snapshot.ids[p] for p, _ in row] for row in hits]}
+        if "documents" in include:
+            result["documents"] = [[snapshot.documents[p] for p, _ in row] for row in hits]
+        if "metadatas" in include:
+            result["metadatas"] = [[snapshot.metadatas[p] for p, _ in row] for row in hits]
+        if "distances" in include:
+            result["distances"] = [[distance for _, distance in row] for row in hits]
+        if "embeddings" in include:
+            result["embeddings"] = [[np.array(snapshot.matrix[p]) for p, _ in row] for row in hits]
+        return result
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        include: Iterable[str] = ("documents", "metadatas"),
+    ) -> Dict[str, Any]:
+        """
+        ChromaDB-compatible get (flat lists of ids and the included fields)
+
+        Args:
+            ids: Record IDs to fetch (default: all)
+            where: Optional ChromaDB metadata filter
+            limit: Maximum number of records
+            offset: Number of matching records to skip
+            where_document: Optional ChromaDB document filter
+            include: Fields to return besides ids
+
+        Returns:
+            Dictionary shaped like chromadb's GetResult
+        """
+        snapshot = self._refresh()
+        rows = self._select(snapshot, ids, where, where_document)
+        positions = list(range(snapshot.count)) if rows is None else rows
+        start = offset or 0
+        positions = positions[start:start + limit] if limit is not None else positions[start:]
+
+        include = set(include)
+        result: Dict[str, Any] = {"ids": [snapshot.ids[p] for p in positions]}
+        if "documents" in include:
+            result["documents"] = [snapshot.documents[p] for p in positions]
+        if "metadatas" in include:
+            result["metadatas"] = [snapshot.metadatas[p] for p in positions]
+        if "embeddings" in include:
+            result["embeddings"] = [np.array(snapshot.matrix[p]) for p in positions]
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get collection storage statistics
+
+        Returns:
+            Dictionary with record count, capacity, dimensions, quantization mode, coarse
+            dimensions, bytes of live float32 vectors and bytes scanned per query (the
+            first-pass copy when enabled)
+        """
+        snapshot = self._refresh()
+        matrix = snapshot.matrix
+        dimensions = int(matrix.shape[1]) if matrix is not None else 0
+        float32_bytes = snapshot.count * dimensions * 4
+        first_pass = snapshot.quantized
+        return {
+            "count": snapshot.count,
+            "capacity": int(matrix.shape[0]) if matrix is not None else 0,
+            "dimensions": dimensions,
+            "quantization": self.quantization,
+            "coarse_dimensions": int(first_pass.shape[1]) if first_pass is not None else dimensions,
+            "float32_bytes": float32_bytes,
+            "scan_bytes": _scan_bytes(snapshot.count, int(first_pass.shape[1]), self.quantization)
+            if first_pass is not None else float32_bytes,
+        }
+
+
+class NumpyVectorStore:
+    """LangChain Chroma-compatible vector store backed by a NumpyCollection"""
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_function: Embeddings,
+        persist_directory: str,
+        collection_metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Initialize vector store
+
+        Args:
+            collection_name: Name of the collection
+            embedding_function: Embeddings used for documents and queries
+            persist_directory: NumPy store root (one subdirectory per collection)
+            collection_metadata: Metadata stored when the collection is created
+        """
+        self._embedding_function = embedding_function
+        self._collection = NumpyCollection(
+            collection_name, os.path.join(persist_directory, collection_name), collection_metadata
+        )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """
+        Embed and store texts
+
+        Args:
+            texts: Texts to store
+            metadatas: Optional metadata per text
+            ids: Optional IDs (default: random UUIDs)
+
+        Returns:
+            List of stored IDs
+        """
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        if texts:
+            self._collection.upsert(ids, self._embedding_function.embed_documents(texts), texts, metadatas)
+        return ids
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """
+        Embed and store documents
+
+        Args:
+            documents: Documents to store
+            ids: Optional IDs (default: random UUIDs)
+
+        Returns:
+            List of stored IDs
+        """
+        return self.add_texts(
+            [doc.page_content for doc in documents], [doc.metadata for doc in documents], ids=ids, **kwargs
+        )
+
+    def upsert_embedded(
+        self,
+        ids: List[str],
+        documents: List[Document],
+        embeddings: List[List[float]],
+    ) -> None:
+        """
+        Store documents with precomputed embeddings, replacing records with the same ID
+
+        Args:
+            ids: One unique ID per document
+            documents: Documents to store
+            embeddings: One vector per document
+        """
+        self._collection.upsert(
+            ids, embeddings, [doc.page_content for doc in documents], [doc.metadata for doc in documents]
+        )
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Replace the metadata of stored documents without re-embedding them
+
+        Args:
+            ids: IDs of stored documents
+            metadatas: New metadata, one per ID
+        """
+        self._collection.update(ids, metadatas)
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        include: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Get stored records (same arguments and result shape as Chroma.get)"""
+        return self._collection.get(
+            ids=ids,
+            where=where,
+            limit=limit,
+            offset=offset,
+            where_document=where_document,
+            include=include or ("documents", "metadatas"),
+        )
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        """Delete records by ID"""
+        self._collection.delete(ids=ids, where=kwargs.get("where"))
+
+    def persist(self) -> None:
+        """No-op: every write is durable once add or delete returns"""
+
+    def _hits(
+        self,
+        embedding: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        where_document: Optional[Dict[str, Any]],
+    ) -> List[Tuple[Document, float]]:
+        snapshot, hits = self._collection.search([embedding], k, filter, where_document)
+        return [
+            (
+                Document(
+                    id=snapshot.ids[position],
+                    page_content=snapshot.documents[position],
+                    metadata=snapshot.metadatas[position] or {},
+                ),
+                distance,
+            )
+            for position, distance in hits[0]
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Nearest documents to a vector
+
+        Returns:
+            List of (Document, cosine distance) tuples; like Chroma, these are distances, not relevance scores
+        """
+        return self._hits(embedding, k, filter, where_document)
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Nearest documents to a vector"""
+        return [doc for doc, _ in self._hits(embedding, k, filter, where_document)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Nearest documents to a query
+
+        Returns:
+            List of (Document, cosine distance) tuples, nearest first
+        """
+        return self._hits(self._embedding_function.embed_query(query), k, filter, where_document)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Nearest documents to a query"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, where_document)]
+
+
+def list_numpy_collections(root: str) -> List[str]:
+    """
+    Names of the collections stored under a NumPy store root
+
+    Args:
+        root: NumPy store root directory
+
+    Returns:
+        Sorted collection names
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, RECORDS_FILE))
+    )
+
+
+def delete_numpy_collection(root: str, collection_name: str) -> bool:
+    """
+    Remove a collection directory
+
+    Readers that still map the old matrix keep working until they next refresh.
+
+    Args:
+        root: NumPy store root directory
+        collection_name: Name of the collection
+
+    Returns:
+        True if the collection existed
+    """
+    directory = os.path.join(root, collection_name)
+    if not os.path.isdir(directory):
+        return False
+    shutil.rmtree(directory)
+    return True
+
+
+def import_from_chroma(chroma_vectorstore: Any, store: NumpyVectorStore, batch_size: int = 1000) -> int:
+    """
+    Copy every record (with its stored embedding) from a Chroma collection
+
+    Args:
+        chroma_vectorstore: LangChain Chroma vector store
+        store: Destination NumpyVectorStore
+        batch_size: Records read from Chroma per request
+
+    Returns:
+        Number of records copied
+    """
+    copied = 0
+    while True:
+        data = chroma_vectorstore.get(
+            limit=batch_size, offset=copied, include=["documents", "metadatas", "embeddings"]
+        )
+        ids = data.get("ids") or []
+        if not ids:
+            return copied
+        store._collection.upsert(ids, data["embeddings"], data.get("documents"), data.get("metadatas"))
+        copied += len(ids)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    return round(float(np.percentile(values, percent)), 3) if values else 0.0
+
+
+def benchmark_backends(
+    chroma_vectorstore: Any,
+    store: NumpyVectorStore,
+    query_embeddings: Sequence[Sequence[float]],
+    k: int = 5,
+) -> Dict[str, Any]:
+    """
+    Compare Chroma (HNSW) and NumPy (exact) query latency and Chroma's recall@k
+
+    Args:
+        chroma_vectorstore: LangChain Chroma vector store
+        store: NumpyVectorStore holding the same records
+        query_embeddings: Query vectors
+        k: Results per query
+
+    Returns:
+        Dictionary with p50/p95 latency per backend and Chroma recall@k against the exact results
+    """
+    chroma_ms: List[float] = []
+    numpy_ms: List[float] = []
+    recalls: List[float] = []
+
+    for embedding in query_embeddings:
+        embedding = [float(value) for value in embedding]
+
+        started = time.perf_counter()
+        approximate = chroma_vectorstore._collection.query(query_embeddings=[embedding], n_results=k, include=[])
+        chroma_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        exact = store._collection.query(query_embeddings=[embedding], n_results=k, include=[])
+        numpy_ms.append((time.perf_counter() - started) * 1000)
+
+        exact_ids = set(exact["ids"][0])
+        if exact_ids:
+            recalls.append(len(exact_ids & set(approximate["ids"][0])) / len(exact_ids))
+
+    return {
+        "queries": len(query_embeddings),
+        "k": k,
+        "records": store._collection.count(),
+        "chroma_p50_ms": _percentile(chroma_ms, 50),
+        "chroma_p95_ms": _percentile(chroma_ms, 95),
+        "numpy_p50_ms": _percentile(numpy_ms, 50),
+        "numpy_p95_ms": _percentile(numpy_ms, 95),
+        "chroma_recall_at_k": round(sum(recalls) / len(recalls), 4) if recalls else None,
+    }
+
+
+def sample_query_vectors(collection: NumpyCollection, count: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """
+    Synthetic queries: randomly chosen stored vectors plus Gaussian noise
+
+    Args:
+        collection: Collection to sample from
+        count: Number of queries (at most the number of records)
+        noise: Standard deviation of the noise added to each component
+        seed: Random seed
+
+    Returns:
+        float32 matrix of query vectors (empty when the collection is empty)
+    """
+    snapshot = collection._refresh()
+    if not snapshot.count:
+        return np.empty((0, 0), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    picks = np.sort(rng.choice(snapshot.count, size=min(count, snapshot.count), replace=False))
+    vectors = np.asarray(snapshot.matrix[picks])
+    return (vectors + rng.normal(0.0, noise, size=vectors.shape)).astype(np.float32)
+
+
+def _recall(results: List[List[Tuple[int, float]]], truth: List[List[Tuple[int, float]]]) -> float:
+    """Mean fraction of the true top-k rows found in each result list"""
+    fractions = [
+        len({p for p, _ in found} & {p for p, _ in expected}) / len(expected)
+        for found, expected in zip(results, truth) if expected
+    ]
+    return round(sum(fractions) / len(fractions), 4) if fractions else 1.0
+
+
+def quantization_report(
+    collection: NumpyCollection,
+    modes: Sequence[str] = ("float16", "int8"),
+    queries: int = 100,
+    k: int = 10,
+    noise: float = 0.05,
+    coarse_dimensions: Sequence[int] = (),
+) -> Dict[str, Any]:
+    """
+    Memory use and recall@k of quantization modes and coarse prefixes against exact float32 search
+
+    First-pass copies are built in memory from the stored vectors, so any setting can
+    be evaluated without rewriting the collection.
+
+    Args:
+        collection: Collection to evaluate
+        modes: Quantization modes to compare ("none" only applies with coarse dimensions)
+        queries: Number of synthetic queries (see sample_query_vectors)
+        k: Results per query
+        noise: Noise added to sampled query vectors
+        coarse_dimensions: Prefix lengths to evaluate each mode at (e.g. 256 reports "int8@256")
+
+    Returns:
+        Dictionary with the collection size and, per setting, bytes scanned per query, memory
+        ratio to float32, first-pass recall@k, rescored recall@k and the recall delta
+    """
+    snapshot = collection._refresh()
+    dimensions = int(snapshot.matrix.shape[1]) if snapshot.matrix is not None else 0
+    report: Dict[str, Any] = {
+        "collection": collection.name,
+        "count": snapshot.count,
+        "dimensions": dimensions,
+        "configured": collection.quantization,
+        "coarse_dimensions": collection.coarse_dimensions,
+        "rescore_factor": collection.rescore_factor,
+        "float32_bytes": _scan_bytes(snapshot.count, dimensions, "none"),
+        "modes": {},
+    }
+    if not snapshot.count:
+        return report
+
+    query_vectors = _unit_rows(sample_query_vectors(collection, queries, noise))
+    vectors = np.asarray(snapshot.matrix[: snapshot.count])
+    rows = np.arange(snapshot.count)
+    k = min(k, snapshot.count)
+    exact = _search_rows(snapshot, query_vectors, rows, k, collection.rescore_factor, exact=True)
+
+    for coarse, mode in itertools.product([0, *coarse_dimensions], modes):
+        if coarse >= dimensions or (mode == "none" and not coarse):
+            continue
+        quantized, scales = first_pass_copy(vectors, mode, coarse)
+        candidate = _Snapshot(vectors, snapshot.ids, snapshot.documents, snapshot.metadatas, quantized, scales)
+        first_pass = _search_rows(candidate, query_vectors, rows, k, collection.rescore_factor, rescore=False)
+        rescored = _search_rows(candidate, query_vectors, rows, k, collection.rescore_factor)
+        scan_bytes = _scan_bytes(snapshot.count, quantized.shape[1], mode)
+        report["modes"][f"{mode}@{coarse}" if coarse else mode] = {
+            "scan_bytes": scan_bytes,
+            "memory_ratio": round(scan_bytes / report["float32_bytes"], 3),
+            "first_pass_recall_at_k": _recall(first_pass, exact),
+            "rescored_recall_at_k": _recall(rescored, exact),
+            "recall_delta": round(_recall(rescored, exact) - 1.0, 4),
+        }
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Benchmark the NumPy store against ChromaDB, report first-pass memory and recall, or reindex"""
+    from app.retrieval.chroma_client import get_chroma_client
+
+    parser = argparse.ArgumentParser(description="Benchmark the NumPy exact-search backend against ChromaDB")
+    parser.add_argument("--collection", default=config.COLLECTION_TECHNICAL, choices=config.get_all_collections())
+    parser.add_argument("--import-chroma", action="store_true", help="Copy the Chroma collection first")
+    parser.add_argument("--query", action="append", default=[], help="Query text to embed (repeatable)")
+    parser.add_argument("--queries", type=int, default=100, help="Stored vectors to sample as queries")
+    parser.add_argument("--noise", type=float, default=0.05, help="Gaussian noise added to sampled vectors")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument(
+        "--quantization-report",
+        action="store_true",
+        help="Report memory and recall of float16/int8 storage for every NumPy collection",
+    )
+    parser.add_argument(
+        "--coarse-dimensions",
+        type=int,
+        nargs="+",
+        default=[],
+        help="Prefix lengths to report (with --quantization-report) or to reindex to (first value)",
+    )
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="Rebuild every collection's first-pass copy from its stored vectors (no re-embedding)",
+    )
+    parser.add_argument("--quantization", choices=QUANTIZATION_MODES, help="Quantization for --reindex")
+    args = parser.parse_args(argv)
+
+    root = config.get_numpy_store_path()
+    if args.reindex:
+        coarse = args.coarse_dimensions[0] if args.coarse_dimensions else None
+        for name in list_numpy_collections(root):
+            started = time.perf_counter()
+            collection = NumpyCollection(
+                name, os.path.join(root, name), quantization=args.quantization, coarse_dimensions=coarse
+            )
+            elapsed = round(time.perf_counter() - started, 3)
+            print(json.dumps({"collection": name, **collection.stats(), "seconds": elapsed}))
+        return
+
+    if args.quantization_report:
+        modes = ("none", "float16", "int8") if args.coarse_dimensions else ("float16", "int8")
+        for name in list_numpy_collections(root):
+            report = quantization_report(
+                NumpyCollection(name, os.path.join(root, name)),
+                modes=modes,
+                queries=args.queries,
+                k=args.k,
+                noise=args.noise,
+                coarse_dimensions=args.coarse_dimensions,
+            )
+            print(json.dumps(report, indent=2))
+        return
+
+    client = get_chroma_client()
+    chroma_vectorstore = client.get_chroma_collection(args.collection)
+    store = NumpyVectorStore(args.collection, client.embeddings, config.get_numpy_store_path())
+
+    if args.import_chroma:
+        started = time.perf_counter()
+        copied = import_from_chroma(chroma_vectorstore, store)
+        app_logger.info(f"Imported {copied} records in {time.perf_counter() - started:.2f}s")
+
+    if args.query:
+        query_embeddings = client.embeddings.embed_documents(args.query)
+    else:
+        query_embeddings = sample_query_vectors(store._collection, args.queries, args.noise)
+        if not len(query_embeddings):
+            parser.error(f"NumPy collection '{args.collection}' is empty; run with --import-chroma")
+
+    result = benchmark_backends(chroma_vectorstore, store, query_embeddings, k=args.k)
+    for key, value in result.items():
+        print(f"{key:>20}: {value}")
+
+
+if __name__ == "__main__":
+    main()
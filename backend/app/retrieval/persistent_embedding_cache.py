@@ -0,0 +1,463 @@
+"""
+Persistent on-disk embedding cache shared by ingestion and queries
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/integrations/text_embedding
+Last Verified: November 2025
+
+Re-ingesting a file, rebuilding a collection or trying another chunk size used to
+pay the OpenAI embedding API again for text it had already embedded.
+PersistentCachedEmbeddings sits directly in front of OpenAIEmbeddings (inside
+the in-memory CachedQueryEmbeddings) and serves both embed_documents and
+embed_query from a local SQLite table keyed by sha256(model, dimensions, text).
+Vectors are stored as float32 blobs (4 bytes per dimension). When the table
+grows beyond PERSISTENT_EMBEDDING_CACHE_MAX_MB, the least recently used
+vectors are evicted down to 90% of the limit.
+
+Lookups only read: last_used timestamps and hit/miss counters are kept in memory
+and written in one transaction with the next store, eviction or stats call (or
+once _FLUSH_INTERVAL_SECONDS / _FLUSH_MAX_PENDING is reached). The async
+embedding methods run SQLite work on the retrieval executor, never on the event
+loop. Entry count and size are running totals, re-measured when eviction runs
+and by the stats CLI, so /health/retrieval does not scan the table.
+
+Inspect or maintain the cache from the command line:
+
+    python -m app.retrieval.persistent_embedding_cache stats
+    python -m app.retrieval.persistent_embedding_cache evict --max-mb 256
+    python -m app.retrieval.persistent_embedding_cache clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.retrieval.executor import run_in_retrieval_executor
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+# SQLite's default limit on bound parameters per statement is 999
+_QUERY_BATCH = 500
+# Eviction frees space down to this fraction of the limit, so it does not run on every write
+_EVICTION_LOW_WATERMARK = 0.9
+# Deferred last_used / counter writes are flushed after this long or this many touched keys
+_FLUSH_INTERVAL_SECONDS = 30.0
+_FLUSH_MAX_PENDING = 1024
+
+
+def embedding_key(text: str, model: str, dimensions: int) -> bytes:
+    """
+    Build a persistent cache key
+
+    Args:
+        text: Exact text that was embedded
+        model: Embedding model name
+        dimensions: Embedding dimensions
+
+    Returns:
+        sha256 digest of model, dimensions and text
+    """
+    return hashlib.sha256(f"{model}\x00{dimensions}\x00{text}".encode("utf-8")).digest()
+
+
+class PersistentEmbeddingCache:
+    """Thread-safe SQLite table of float32 embedding vectors with size-based LRU eviction"""
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize persistent embedding cache
+
+        Args:
+            db_path: SQLite file path (default: persistent embedding cache path from config)
+            max_bytes: Maximum size of the stored vectors in bytes (default: from config)
+        """
+        self.db_path = db_path or config.get_persistent_embedding_cache_path()
+        self.max_bytes = max_bytes if max_bytes is not None else config.PERSISTENT_EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # One long-lived connection: lookups are on the query hot path. WAL lets the API
+        # processes, the retrieval server and ingestion jobs share the file.
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key BLOB PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    dimensions INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            # Lifetime counters, so the stats CLI sees what the services did
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+        # Deferred writes: last_used per touched key and counter increments since the last flush
+        self._touched: Dict[bytes, float] = {}
+        self._pending_counts: Dict[str, int] = {}
+        self._flushed_at = time.monotonic()
+        self._size_bytes, self._entries = self._measure()
+
+    def _measure(self) -> Tuple[int, int]:
+        """Stored bytes and entry count, by scanning the table"""
+        size_bytes, entries = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings"
+        ).fetchone()
+        return size_bytes, entries
+
+    def _count(self, **increments: int) -> None:
+        """Add to the pending counter increments (caller holds the lock)"""
+        for name, value in increments.items():
+            if value:
+                self._pending_counts[name] = self._pending_counts.get(name, 0) + value
+
+    def _flush(self) -> None:
+        """Write deferred last_used timestamps and counters (caller holds the lock and a transaction)"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched = {}
+        if self._pending_counts:
+            self._conn.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                list(self._pending_counts.items()),
+            )
+            self._pending_counts = {}
+        self._flushed_at = time.monotonic()
+
+    def flush(self) -> None:
+        """Write deferred last_used timestamps and counters now"""
+        with self._lock, self._conn:
+            self._flush()
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[List[float]]]:
+        """
+        Get cached vectors and mark them as recently used
+
+        Only reads from SQLite; the last_used updates and hit/miss counters are
+        written later in a batch (see flush).
+
+        Args:
+            keys: Cache keys (see embedding_key)
+
+        Returns:
+            One vector per key, None for keys that are not cached
+        """
+        found: Dict[bytes, List[float]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), _QUERY_BATCH):
+                batch = unique_keys[start:start + _QUERY_BATCH]
+                placeholders = ",".join("?" for _ in batch)
+                for key, vector in self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ):
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+
+            now = time.time()
+            self._touched.update((key, now) for key in found)
+            self._count(hits=len(found), misses=len(unique_keys) - len(found))
+            if (
+                len(self._touched) >= _FLUSH_MAX_PENDING
+                or time.monotonic() - self._flushed_at >= _FLUSH_INTERVAL_SECONDS
+            ):
+                with self._conn:
+                    self._flush()
+        return [found.get(key) for key in keys]
+
+    def put_many(self, entries: Sequence[Tuple[bytes, str, int, List[float]]]) -> None:
+        """
+        Store vectors, evicting least recently used ones when the size limit is exceeded
+
+        Args:
+            entries: (key, model, dimensions, vector) tuples
+        """
+        if not entries:
+            return
+
+        now = time.time()
+        rows = list({
+            key: (key, model, dimensions, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, model, dimensions, vector in entries
+        }.values())
+        with self._lock:
+            with self._conn:
+                # Replaced vectors must not be counted twice in the running totals
+                replaced: Dict[bytes, int] = {}
+                for start in range(0, len(rows), _QUERY_BATCH):
+                    batch = [row[0] for row in rows[start:start + _QUERY_BATCH]]
+                    placeholders = ",".join("?" for _ in batch)
+                    replaced.update(self._conn.execute(
+                        f"SELECT key, LENGTH(vector) FROM embeddings WHERE key IN ({placeholders})", batch
+                    ))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dimensions, vector, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._count(writes=len(rows))
+                self._flush()
+            self._size_bytes += sum(len(row[3]) for row in rows) - sum(replaced.values())
+            self._entries += len(rows) - len(replaced)
+            if self._size_bytes > self.max_bytes:
+                self._evict(self.max_bytes)
+
+    def _evict(self, max_bytes: int) -> int:
+        """Evict least recently used vectors down to the low watermark (caller holds the lock)"""
+        # Other processes write to the same file, so measure instead of trusting the running totals
+        with self._conn:
+            self._flush()
+        self._size_bytes, self._entries = self._measure()
+        excess = self._size_bytes - int(max_bytes * _EVICTION_LOW_WATERMARK)
+        if self._size_bytes <= max_bytes or excess <= 0:
+            return 0
+
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+
+        with self._conn:
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            self._count(evictions=len(victims))
+            self._flush()
+        self._size_bytes -= freed
+        self._entries -= len(victims)
+        app_logger.info(f"Persistent embedding cache evicted {len(victims)} vectors ({freed} bytes)")
+        return len(victims)
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Evict least recently used vectors if the cache is larger than max_bytes
+
+        Args:
+            max_bytes: Size limit in bytes (default: the cache's own limit)
+
+        Returns:
+            Number of evicted vectors
+        """
+        with self._lock:
+            return self._evict(self.max_bytes if max_bytes is None else max_bytes)
+
+    def clear(self) -> None:
+        """Remove all cached vectors (counters are preserved)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM embeddings")
+            self._touched = {}
+            self._size_bytes = 0
+            self._entries = 0
+
+    def stats(self, detailed: bool = False) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Args:
+            detailed: Re-measure the table and count entries per model (scans the table)
+
+        Returns:
+            Dictionary with entry count, stored bytes, limit, lifetime hit/miss/write/eviction
+            counters, hit ratio and (when detailed) entry counts per (model, dimensions)
+        """
+        with self._lock:
+            with self._conn:
+                self._flush()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters"))
+            models = None
+            if detailed:
+                models = [
+                    {"model": model, "dimensions": dimensions, "entries": entries}
+                    for model, dimensions, entries in self._conn.execute(
+                        "SELECT model, dimensions, COUNT(*) FROM embeddings GROUP BY model, dimensions"
+                    )
+                ]
+                self._size_bytes, self._entries = self._measure()
+            size_bytes = self._size_bytes
+            entries = self._entries
+
+        hits = counters.get("hits", 0)
+        lookups = hits + counters.get("misses", 0)
+        stats = {
+            "path": self.db_path,
+            "entries": entries,
+            "size_bytes": size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": counters.get("misses", 0),
+            "writes": counters.get("writes", 0),
+            "evictions": counters.get("evictions", 0),
+            "hit_ratio": (hits / lookups) if lookups else 0.0,
+        }
+        if models is not None:
+            stats["models"] = models
+        return stats
+
+    def close(self) -> None:
+        """Write deferred updates and close the SQLite connection"""
+        with self._lock:
+            try:
+                with self._conn:
+                    self._flush()
+            except sqlite3.Error as e:
+                app_logger.warning(f"Could not flush persistent embedding cache on close: {e}")
+            self._conn.close()
+
+
+class PersistentCachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves embed_documents and embed_query from a PersistentEmbeddingCache"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: PersistentEmbeddingCache,
+        model: str,
+        dimensions: int,
+    ):
+        """
+        Wrap an embeddings instance with the persistent cache
+
+        Args:
+            embeddings: Underlying embeddings instance (e.g. OpenAIEmbeddings)
+            cache: Persistent embedding cache
+            model: Embedding model name (part of the cache key)
+            dimensions: Embedding dimensions (part of the cache key)
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        self.dimensions = dimensions
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[Optional[List[float]]], Dict[bytes, str], List[bytes]]:
+        """Cached vectors per text, plus the distinct texts still to embed"""
+        keys = [embedding_key(text, self.model, self.dimensions) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = {key: text for key, text, vector in zip(keys, texts, vectors) if vector is None}
+        return vectors, missing, keys
+
+    def _fill(
+        self,
+        vectors: List[Optional[List[float]]],
+        missing: Dict[bytes, str],
+        keys: List[bytes],
+        embedded: List[List[float]],
+    ) -> List[List[float]]:
+        """Store freshly embedded vectors and place them at every position of their text"""
+        fresh = dict(zip(missing, embedded))
+        self.cache.put_many([(key, self.model, self.dimensions, vector) for key, vector in fresh.items()])
+        return [vector if vector is not None else fresh[key] for key, vector in zip(keys, vectors)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, calling the API only for text that is not cached"""
+        vectors, missing, keys = self._lookup(texts)
+        if not missing:
+            return vectors
+        return self._fill(vectors, missing, keys, self.embeddings.embed_documents(list(missing.values())))
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text, reusing a cached vector when available"""
+        vectors, missing, keys = self._lookup([text])
+        if not missing:
+            return vectors[0]
+        return self._fill(vectors, missing, keys, [self.embeddings.embed_query(text)])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async variant of embed_documents, sharing the same cache (SQLite work runs on the retrieval executor)"""
+        vectors, missing, keys = await run_in_retrieval_executor(self._lookup, texts)
+        if not missing:
+            return vectors
+        embedded = await self.embeddings.aembed_documents(list(missing.values()))
+        return await run_in_retrieval_executor(self._fill, vectors, missing, keys, embedded)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query, sharing the same cache (SQLite work runs on the retrieval executor)"""
+        vectors, missing, keys = await run_in_retrieval_executor(self._lookup, [text])
+        if not missing:
+            return vectors[0]
+        embedded = [await self.embeddings.aembed_query(text)]
+        return (await run_in_retrieval_executor(self._fill, vectors, missing, keys, embedded))[0]
+
+
+# Global persistent embedding cache instance
+_persistent_embedding_cache: Optional[PersistentEmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_persistent_embedding_cache() -> PersistentEmbeddingCache:
+    """
+    Get or create global persistent embedding cache instance
+
+    Returns:
+        PersistentEmbeddingCache instance shared by the whole process
+    """
+    global _persistent_embedding_cache
+
+    with _cache_lock:
+        if _persistent_embedding_cache is None:
+            _persistent_embedding_cache = PersistentEmbeddingCache()
+            app_logger.info(
+                f"Persistent embedding cache initialized (path={_persistent_embedding_cache.db_path}, "
+                f"max={config.PERSISTENT_EMBEDDING_CACHE_MAX_MB}MB)"
+            )
+
+    return _persistent_embedding_cache
+
+
+def with_persistent_cache(embeddings: Embeddings, model: str, dimensions: int) -> Embeddings:
+    """
+    Put the persistent embedding cache in front of an embeddings instance, if enabled
+
+    Args:
+        embeddings: Underlying embeddings instance (e.g. OpenAIEmbeddings)
+        model: Embedding model name
+        dimensions: Embedding dimensions
+
+    Returns:
+        PersistentCachedEmbeddings, or embeddings unchanged when PERSISTENT_EMBEDDING_CACHE_ENABLED=false
+    """
+    if not config.PERSISTENT_EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    return PersistentCachedEmbeddings(embeddings, get_persistent_embedding_cache(), model, dimensions)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Show statistics of the persistent embedding cache, evict from it or clear it"""
+    parser = argparse.ArgumentParser(description="Persistent embedding cache")
+    parser.add_argument("--path", help="SQLite file (default: from config)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Show size, hit ratio and entries per model")
+    evict = commands.add_parser("evict", help="Evict least recently used vectors beyond a size limit")
+    evict.add_argument("--max-mb", type=float, help="Default: PERSISTENT_EMBEDDING_CACHE_MAX_MB")
+    commands.add_parser("clear", help="Remove every cached vector")
+    args = parser.parse_args(argv)
+
+    cache = PersistentEmbeddingCache(db_path=args.path)
+    try:
+        if args.command == "evict":
+            max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+            print(json.dumps({"evicted": cache.evict(max_bytes)}))
+        elif args.command == "clear":
+            cache.clear()
+        print(json.dumps(cache.stats(detailed=True), indent=2))
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Semantic cache of policy lookups made by the billing agent
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+get_cached_policy_info used to keep one entry per session in graph state and hit
+only when the new query was a substring of the previous one. PolicySemanticCache
+keeps many entries per session (and optionally one process-wide scope) and
+matches on cosine similarity of query embeddings, so "what is the late payment
+penalty?" reuses the answer cached for "late payment fee policy". Entries expire
+by TTL, are evicted LRU per scope, and are dropped when the policy collection's
+generation changes (see result_cache.py). Each entry stores only the answer, the
+normalized vector and compact metadata (query, timestamp, hit count).
+"""
+
+import math
+import operator
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.retrieval.result_cache import get_collection_generations
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+GLOBAL_SCOPE = "__global__"
+
+
+def _normalize(vector: List[float]) -> Tuple[float, ...]:
+    """Scale a vector to unit length so a dot product is the cosine similarity"""
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return tuple(value / norm for value in vector)
+
+
+class _Entry:
+    """One cached policy answer"""
+
+    __slots__ = ("query", "vector", "content", "stored_at", "cached_at", "generation", "hits")
+
+    def __init__(self, query: str, vector: Tuple[float, ...], content: str, generation: int):
+        self.query = query[:200]
+        self.vector = vector
+        self.content = content
+        self.stored_at = time.monotonic()
+        self.cached_at = datetime.utcnow().isoformat()
+        self.generation = generation
+        self.hits = 0
+
+    def metadata(self) -> Dict[str, Any]:
+        return {"query": self.query, "cached_at": self.cached_at, "hits": self.hits}
+
+
+class PolicySemanticCache:
+    """Thread-safe per-session semantic cache with TTL and LRU eviction"""
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.92,
+        ttl_seconds: float = 1800,
+        max_entries_per_scope: int = 32,
+        max_scopes: int = 1024,
+        global_scope: bool = False,
+    ):
+        """
+        Initialize policy semantic cache
+
+        Args:
+            similarity_threshold: Minimum cosine similarity between queries for a hit
+            ttl_seconds: Time-to-live for each entry in seconds (0 disables expiry)
+            max_entries_per_scope: Maximum entries per session (LRU eviction beyond this)
+            max_scopes: Maximum number of sessions tracked (least recently used dropped)
+            global_scope: Also share entries across sessions
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_scope = max(1, max_entries_per_scope)
+        self.max_scopes = max(1, max_scopes)
+        self.global_scope = global_scope
+        self._scopes: "OrderedDict[str, OrderedDict[int, _Entry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _scopes_for(self, session_id: Optional[str]) -> List[str]:
+        # Policy documents are not user-specific, so calls without a session share the global scope
+        if not session_id:
+            return [GLOBAL_SCOPE]
+        return [session_id, GLOBAL_SCOPE] if self.global_scope else [session_id]
+
+    def _usable(self, entry: _Entry, generation: int, now: float) -> bool:
+        if entry.generation != generation:
+            return False
+        return not (self.ttl_seconds and now - entry.stored_at > self.ttl_seconds)
+
+    def lookup(self, session_id: Optional[str], embedding: List[float]) -> Optional[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Find the most similar cached query in the session (then global) scope
+
+        Args:
+            session_id: Conversation session (thread) identifier, or None
+            embedding: Embedding of the new query
+
+        Returns:
+            Tuple of (cached answer, similarity, entry metadata), or None on miss
+        """
+        vector = _normalize(embedding)
+        generation = get_collection_generations().current(config.COLLECTION_POLICY)
+        now = time.monotonic()
+
+        with self._lock:
+            for scope in self._scopes_for(session_id):
+                entries = self._scopes.get(scope)
+                if not entries:
+                    continue
+
+                best: Optional[Tuple[float, int, _Entry]] = None
+                for entry_id, entry in list(entries.items()):
+                    if not self._usable(entry, generation, now):
+                        del entries[entry_id]
+                        self.expirations += 1
+                        continue
+                    similarity = sum(map(operator.mul, vector, entry.vector))
+                    if similarity >= self.similarity_threshold and (best is None or similarity > best[0]):
+                        best = (similarity, entry_id, entry)
+
+                if best is not None:
+                    similarity, entry_id, entry = best
+                    entries.move_to_end(entry_id)
+                    self._scopes.move_to_end(scope)
+                    entry.hits += 1
+                    self.hits += 1
+                    return entry.content, similarity, entry.metadata()
+
+            self.misses += 1
+            return None
+
+    def store(self, session_id: Optional[str], query: str, embedding: List[float], content: str) -> None:
+        """
+        Cache a policy answer for the session (and the global scope when enabled)
+
+        Args:
+            session_id: Conversation session (thread) identifier, or None
+            query: Query the answer was retrieved for
+            embedding: Embedding of the query
+            content: Policy answer returned to the agent
+        """
+        vector = _normalize(embedding)
+        generation = get_collection_generations().current(config.COLLECTION_POLICY)
+
+        with self._lock:
+            for scope in self._scopes_for(session_id):
+                entries = self._scopes.setdefault(scope, OrderedDict())
+                self._scopes.move_to_end(scope)
+                self._next_id += 1
+                entries[self._next_id] = _Entry(query, vector, content, generation)
+                while len(entries) > self.max_entries_per_scope:
+                    entries.popitem(last=False)
+                    self.evictions += 1
+
+            while len(self._scopes) > self.max_scopes:
+                _, dropped = self._scopes.popitem(last=False)
+                self.evictions += len(dropped)
+
+    def clear(self) -> None:
+        """Remove all cached entries (counters are preserved)"""
+        with self._lock:
+            self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hit/miss/eviction counters, entry and session counts and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(len(entries) for entries in self._scopes.values()),
+                "sessions": sum(1 for scope in self._scopes if scope != GLOBAL_SCOPE),
+                "similarity_threshold": self.similarity_threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "global_scope": self.global_scope,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Global policy semantic cache instance
+_policy_semantic_cache: Optional[PolicySemanticCache] = None
+
+
+def get_policy_semantic_cache() -> PolicySemanticCache:
+    """
+    Get or create global policy semantic cache instance
+
+    Returns:
+        PolicySemanticCache instance shared by the whole process
+    """
+    global _policy_semantic_cache
+
+    if _policy_semantic_cache is None:
+        _policy_semantic_cache = PolicySemanticCache(
+            similarity_threshold=config.POLICY_SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=config.POLICY_SEMANTIC_CACHE_TTL_SECONDS,
+            max_entries_per_scope=config.POLICY_SEMANTIC_CACHE_MAX_ENTRIES,
+            max_scopes=config.POLICY_SEMANTIC_CACHE_MAX_SESSIONS,
+            global_scope=config.POLICY_SEMANTIC_CACHE_GLOBAL,
+        )
+        app_logger.info(
+            f"Policy semantic cache initialized (threshold={config.POLICY_SEMANTIC_CACHE_THRESHOLD}, "
+            f"ttl={config.POLICY_SEMANTIC_CACHE_TTL_SECONDS}s, "
+            f"global={config.POLICY_SEMANTIC_CACHE_GLOBAL})"
+        )
+
+    return _policy_semantic_cache
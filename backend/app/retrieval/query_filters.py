@@ -0,0 +1,306 @@
+"""
+Query-to-filter extraction for metadata pre-filtering
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/integrations/vectorstores/chroma
+Last Verified: November 2025
+
+Chunks carry source_file, document_category, upload_timestamp and chunk_index
+metadata, but searches never narrowed on them. extract_query_filters is a local
+rule-based parser (no LLM call) that recognizes:
+
+- file names ("Invoice-4-ABC-Company.pdf", or a known file's name without extension)
+- document types ("PDF", "markdown", "JSON", "text file")
+- upload date ranges ("uploaded last week", "added since March 2025", "ingested in 2024")
+- quoted phrases ("\"net 30\"")
+
+resolve_query_filters turns these into ChromaDB filters for one collection.
+upload_timestamp is an ISO string, which Chroma cannot range-compare, so file,
+type and date criteria are resolved against the collection's known source files
+(from its lexical index) into a source_file where filter; quoted phrases become
+a case-insensitive where_document $regex filter. When the criteria match no
+known file the search runs unfiltered rather than returning nothing, and a search
+whose phrase filter finds nothing is run again without it (see search_pipeline).
+"""
+
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.retrieval.lexical_index import ensure_lexical_index, get_lexical_index
+from app.retrieval.numpy_store import matches_where_document
+from app.utils.logger import app_logger
+
+
+_FILE_NAME_PATTERN = re.compile(r"\b[\w][\w\-.]*\.(?:pdf|json|md|markdown|txt)\b", re.IGNORECASE)
+
+_FILE_TYPE_PATTERNS = {
+    "pdf": re.compile(r"\bpdfs?\b", re.IGNORECASE),
+    "json": re.compile(r"\bjson\b", re.IGNORECASE),
+    "md": re.compile(r"\b(?:markdown|md files?)\b", re.IGNORECASE),
+    "txt": re.compile(r"\b(?:text files?|txt)\b", re.IGNORECASE),
+}
+_FILE_TYPE_SUFFIXES = {"pdf": {".pdf"}, "json": {".json"}, "md": {".md", ".markdown"}, "txt": {".txt"}}
+
+_QUOTED_PHRASE_PATTERN = re.compile(r"[\"“]([^\"“”]{3,})[\"”]")
+
+_MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",),
+         ("june", "jun"), ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"),
+         ("october", "oct"), ("november", "nov"), ("december", "dec")],
+        1,
+    )
+    for name in names
+}
+_MONTH_NAMES = "|".join(sorted(_MONTHS, key=len, reverse=True))
+_DATE = rf"(\d{{4}}-\d{{2}}-\d{{2}}|(?:{_MONTH_NAMES})(?:\s+\d{{4}})?|\d{{4}})"
+_UPLOADED = r"(?:uploaded|added|ingested)"
+
+_RELATIVE_PATTERN = re.compile(
+    rf"\b{_UPLOADED}\s+(today|yesterday|this week|last week|this month|last month|this year|last year)\b"
+)
+_LAST_N_PATTERN = re.compile(rf"\b{_UPLOADED}\s+in\s+the\s+(?:last|past)\s+(\d+)\s+(day|week|month)s?\b")
+_ABSOLUTE_PATTERN = re.compile(rf"\b{_UPLOADED}\s+(since|after|before|on|in|during)\s+{_DATE}\b")
+
+
+def _month_start(year: int, month: int) -> datetime:
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def _date_span(text: str, now: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """[start, end) of a date expression: a day (2025-03-14), a month (March 2025 / March) or a year (2025)"""
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", text):
+        try:
+            start = datetime.strptime(text, "%Y-%m-%d")
+        except ValueError:
+            return None
+        return start, start + timedelta(days=1)
+
+    if re.fullmatch(r"\d{4}", text):
+        year = int(text)
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+    parts = text.split()
+    month = _MONTHS.get(parts[0])
+    if month is None:
+        return None
+    year = int(parts[1]) if len(parts) > 1 else now.year
+    if len(parts) == 1 and _month_start(year, month) > now:
+        year -= 1
+    return _month_start(year, month), _month_start(year, month + 1)
+
+
+def _upload_range(query: str, now: datetime) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """(uploaded_after, uploaded_before) bounds named in the query, if any"""
+    today = datetime(now.year, now.month, now.day)
+
+    match = _RELATIVE_PATTERN.search(query)
+    if match:
+        week_start = today - timedelta(days=today.weekday())
+        month_start = _month_start(now.year, now.month)
+        return {
+            "today": (today, today + timedelta(days=1)),
+            "yesterday": (today - timedelta(days=1), today),
+            "this week": (week_start, week_start + timedelta(days=7)),
+            "last week": (week_start - timedelta(days=7), week_start),
+            "this month": (month_start, _month_start(now.year, now.month + 1)),
+            "last month": (_month_start(now.year, now.month - 1), month_start),
+            "this year": (datetime(now.year, 1, 1), datetime(now.year + 1, 1, 1)),
+            "last year": (datetime(now.year - 1, 1, 1), datetime(now.year, 1, 1)),
+        }[match.group(1)]
+
+    match = _LAST_N_PATTERN.search(query)
+    if match:
+        days = int(match.group(1)) * {"day": 1, "week": 7, "month": 30}[match.group(2)]
+        return now - timedelta(days=days), None
+
+    match = _ABSOLUTE_PATTERN.search(query)
+    if match:
+        span = _date_span(match.group(2), now)
+        if span is not None:
+            start, end = span
+            return {
+                "since": (start, None),
+                "after": (end, None),
+                "before": (None, start),
+            }.get(match.group(1), (start, end))
+
+    return None, None
+
+
+def extract_query_filters(query: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Extract file, document type, upload date and phrase constraints from a query
+
+    Args:
+        query: User query
+        now: Reference time for relative dates (default: current UTC time)
+
+    Returns:
+        Dictionary with any of "file_names", "file_types", "uploaded_after",
+        "uploaded_before" (datetimes) and "phrases"; empty when the query names none
+    """
+    now = now or datetime.utcnow()
+    lowered = query.lower()
+    filters: Dict[str, Any] = {}
+
+    file_names = sorted({name.lower() for name in _FILE_NAME_PATTERN.findall(query)})
+    if file_names:
+        filters["file_names"] = file_names
+
+    # Extensions inside explicit file names are not document-type requests
+    remainder = _FILE_NAME_PATTERN.sub(" ", lowered)
+    file_types = sorted(name for name, pattern in _FILE_TYPE_PATTERNS.items() if pattern.search(remainder))
+    if file_types:
+        filters["file_types"] = file_types
+
+    uploaded_after, uploaded_before = _upload_range(lowered, now)
+    if uploaded_after is not None:
+        filters["uploaded_after"] = uploaded_after
+    if uploaded_before is not None:
+        filters["uploaded_before"] = uploaded_before
+
+    phrases = [phrase.strip() for phrase in _QUOTED_PHRASE_PATTERN.findall(query) if phrase.strip()]
+    if phrases:
+        filters["phrases"] = phrases
+
+    return filters
+
+
+def _normalized_name(text: str) -> str:
+    return re.sub(r"[\s_\-]+", " ", text.lower()).strip()
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def match_source_files(query: str, filters: Dict[str, Any], sources: Dict[str, str]) -> Optional[List[str]]:
+    """
+    Resolve file, type and upload date criteria against known source files
+
+    Args:
+        query: User query (known file names are also matched without their extension)
+        filters: Output of extract_query_filters
+        sources: Mapping of source_file to upload_timestamp for the collection
+
+    Returns:
+        Sorted matching source files, or None when no criterion applies or nothing matches
+    """
+    candidates = set(sources)
+    applied = False
+
+    named = {name for name in sources if name.lower() in filters.get("file_names", [])}
+    normalized_query = f" {_normalized_name(query)} "
+    named |= {
+        name for name in sources
+        if len(Path(name).stem) >= 6 and f" {_normalized_name(Path(name).stem)} " in normalized_query
+    }
+    if named:
+        candidates &= named
+        applied = True
+
+    if filters.get("file_types"):
+        suffixes = set().union(*(_FILE_TYPE_SUFFIXES[file_type] for file_type in filters["file_types"]))
+        candidates = {name for name in candidates if Path(name).suffix.lower() in suffixes}
+        applied = True
+
+    after, before = filters.get("uploaded_after"), filters.get("uploaded_before")
+    if after is not None or before is not None:
+        def in_range(name: str) -> bool:
+            uploaded = _parse_timestamp(sources[name])
+            return uploaded is not None and (after is None or uploaded >= after) and (
+                before is None or uploaded < before
+            )
+
+        candidates = {name for name in candidates if in_range(name)}
+        applied = True
+
+    if not applied or not candidates:
+        return None
+    return sorted(candidates)
+
+
+def resolve_query_filters(collection_name: str, vectorstore: Any, query: str) -> Dict[str, Any]:
+    """
+    Build ChromaDB where / where_document filters for a query on one collection
+
+    Args:
+        collection_name: Name of the collection
+        vectorstore: LangChain Chroma vector store for the collection
+        query: User query
+
+    Returns:
+        Dictionary with "where" and/or "where_document" (empty when the query names no constraint)
+    """
+    filters = extract_query_filters(query)
+    index = get_lexical_index(collection_name)
+    # Bare file names are only recognized once the collection's files are known
+    if not filters and not index.loaded:
+        return {}
+
+    chroma_filters: Dict[str, Any] = {}
+    if index.loaded or set(filters) - {"phrases"}:
+        sources = ensure_lexical_index(collection_name, vectorstore).source_files()
+        files = match_source_files(query, filters, sources)
+        if files is None:
+            if set(filters) - {"phrases"}:
+                app_logger.info(f"Query filters {sorted(filters)} matched no files in '{collection_name}'; not applied")
+        elif len(files) < len(sources):
+            chroma_filters["where"] = (
+                {"source_file": files[0]} if len(files) == 1 else {"source_file": {"$in": files}}
+            )
+
+    phrases = filters.get("phrases", [])
+    if phrases:
+        # $contains is case-sensitive: "net 30" must also find "Net 30 days"
+        conditions = [{"$regex": "(?i)" + re.escape(phrase)} for phrase in phrases]
+        chroma_filters["where_document"] = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    if chroma_filters:
+        app_logger.info(f"Pre-filtering '{collection_name}' search with {chroma_filters}")
+    return chroma_filters
+
+
+def document_matches(doc: Document, chroma_filters: Dict[str, Any]) -> bool:
+    """
+    Check a document against filters built by resolve_query_filters (for lexical hits)
+
+    Args:
+        doc: Document object
+        chroma_filters: Dictionary with optional "where" and "where_document"
+
+    Returns:
+        True if the document satisfies every filter
+    """
+    where = chroma_filters.get("where")
+    if where:
+        condition = where["source_file"]
+        allowed = condition["$in"] if isinstance(condition, dict) else [condition]
+        if (doc.metadata or {}).get("source_file") not in allowed:
+            return False
+
+    where_document = chroma_filters.get("where_document")
+    if where_document and not matches_where_document(doc.page_content, where_document):
+        return False
+
+    return True
+
+
+def without_phrase_filter(chroma_filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drop the quoted-phrase (where_document) part of filters built by resolve_query_filters
+
+    Args:
+        chroma_filters: Dictionary with optional "where" and "where_document"
+
+    Returns:
+        The filters without "where_document"
+    """
+    return {key: value for key, value in chroma_filters.items() if key != "where_document"}
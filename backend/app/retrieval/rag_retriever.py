@@ -14,6 +14,11 @@ from langchain_core.tools import tool
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 from app.retrieval.chroma_client import get_chroma_client
+from app.retrieval.context_packer import pack_context
+from app.retrieval.executor import run_in_retrieval_executor
+from app.retrieval.negative_cache import known_empty_note
+from app.retrieval.relevance import ScoredDocuments
+from app.retrieval.search_pipeline import asearch_collection_scored, search_collection_scored
 from app.utils.config import config
 from app.utils.logger import app_logger
 
@@ -21,7 +26,8 @@ from app.utils.logger import app_logger
 @tool
 def search_technical_kb(
     query: str,
-    k: int = 3
+    k: int = 3,
+    diversify: bool = False
 ) -> str:
     """
     Search technical knowledge base using Pure RAG strategy (dynamic vector retrieval).
@@ -43,7 +49,8 @@ def search_technical_kb(
     
     Args:
         query: User query about technical topics, documentation, or specifications
-        k: Number of documents to retrieve (default: 3 for technical documents)
+        k: Maximum number of documents to retrieve (default: 3 for technical documents; fewer are returned when relevance drops off)
+        diversify: Prefer distinct documents over near-duplicate chunks such as repeated bug-report boilerplate (default: False)
         
     Returns:
         Formatted context string with technical information and source citations
@@ -57,26 +64,61 @@ def search_technical_kb(
             collection_name=config.COLLECTION_TECHNICAL
         )
         
-        # Pure RAG: Use dynamic vector similarity search
-        # This retrieves the most relevant documents based on the query
-        docs: List[Document] = technical_collection.similarity_search(
-            query=query,
-            k=k
+        # Pure RAG: Use dynamic vector similarity search fused with BM25 lexical ranking
+        # (bug IDs and part numbers are matched exactly by the lexical index)
+        results = search_collection_scored(
+            technical_collection,
+            config.COLLECTION_TECHNICAL,
+            query,
+            k,
+            diversify=diversify,
         )
         
-        if not docs:
-            app_logger.warning(f"No technical documents found for query: {query[:50]}")
-            return (
-                "No relevant technical documents found in the knowledge base. "
-                "Please check if technical documents have been uploaded to the technical knowledge base."
-            )
+        return _technical_response(results, query)
         
-        # Format retrieved documents with source citations (Pure RAG format)
-        formatted_context = format_technical_context(docs, query)
+    except Exception as e:
+        app_logger.error(f"Error searching technical knowledge base: {e}")
+        return (
+            f"Error retrieving technical information: {str(e)}. "
+            "Please try again or contact support if the issue persists."
+        )
+
+
+async def asearch_technical_kb(
+    query: str,
+    k: int = 3,
+    diversify: bool = False
+) -> str:
+    """
+    Async counterpart of search_technical_kb, used by LangChain under ainvoke/astream.
+    
+    Embeds the query asynchronously and runs ChromaDB work on the bounded retrieval
+    executor, so a slow retrieval does not stall other requests on the event loop.
+    
+    Args:
+        query: User query about technical topics, documentation, or specifications
+        k: Maximum number of documents to retrieve (default: 3 for technical documents; fewer are returned when relevance drops off)
+        diversify: Prefer distinct documents over near-duplicate chunks such as repeated bug-report boilerplate (default: False)
+        
+    Returns:
+        Formatted context string with technical information and source citations
+    """
+    try:
+        client = get_chroma_client()
+        technical_collection = await run_in_retrieval_executor(
+            client.get_or_create_collection,
+            collection_name=config.COLLECTION_TECHNICAL,
+        )
         
-        app_logger.info(f"Retrieved {len(docs)} technical documents for query: {query[:50]}")
+        results = await asearch_collection_scored(
+            technical_collection,
+            config.COLLECTION_TECHNICAL,
+            query,
+            k,
+            diversify=diversify,
+        )
         
-        return formatted_context
+        return _technical_response(results, query)
         
     except Exception as e:
         app_logger.error(f"Error searching technical knowledge base: {e}")
@@ -86,13 +128,44 @@ def search_technical_kb(
         )
 
 
-def format_technical_context(docs: List[Document], query: str) -> str:
+# Run the async implementation when the tool is used through ainvoke/astream
+search_technical_kb.coroutine = asearch_technical_kb
+
+
+def _technical_response(results: ScoredDocuments, query: str) -> str:
+    """Format retrieved technical documents with their scores, or explain that nothing was found"""
+    docs = [doc for doc, _ in results]
+    if not docs:
+        app_logger.warning(f"No technical documents found for query: {query[:50]}")
+        return (
+            "No relevant technical documents found in the knowledge base. "
+            "Please check if technical documents have been uploaded to the technical knowledge base."
+            + known_empty_note(config.COLLECTION_TECHNICAL, query)
+        )
+    
+    # Format retrieved documents with source citations (Pure RAG format)
+    if config.CONTEXT_PACKING_ENABLED:
+        formatted_context = pack_context(results, query, "technical", legacy_formatter=format_technical_context)
+    else:
+        formatted_context = format_technical_context(docs, query, scores=[score for _, score in results])
+    
+    app_logger.info(f"Retrieved {len(docs)} technical documents for query: {query[:50]}")
+    
+    return formatted_context
+
+
+def format_technical_context(
+    docs: List[Document],
+    query: str,
+    scores: Optional[List[Optional[float]]] = None,
+) -> str:
     """
     Format retrieved technical documents into context string with source citations.
     
     Args:
         docs: List of retrieved Document objects
         query: Original query for context
+        scores: Optional relevance scores (same order as docs)
         
     Returns:
         Formatted context string with document content and source citations
@@ -121,6 +194,8 @@ def format_technical_context(docs: List[Document], query: str) -> str:
             formatted_parts.append(f"Upload Date: {upload_timestamp}")
         if chunk_index != "":
             formatted_parts.append(f"Chunk Index: {chunk_index}")
+        if scores and scores[i - 1] is not None:
+            formatted_parts.append(f"Relevance Score: {scores[i - 1]:.3f}")
         formatted_parts.append("-" * 80)
         formatted_parts.append(content)
         formatted_parts.append("")
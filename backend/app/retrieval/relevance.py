@@ -0,0 +1,175 @@
+"""
+Relevance scores, adaptive k cutoffs and retrieval metrics
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+The search tools used to return a fixed k (3 technical, 5 policy, 5 or 20 billing)
+with no score information. Retrieval now scores every hit, and adaptive_cutoff
+returns between 1 and k_max results: it stops at the first hit below the
+collection's minimum score or after a score "cliff" (a large drop between
+consecutive hits). Easy queries send fewer chunks to the worker LLM; hard
+queries still get up to k_max.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+
+
+ScoredDocuments = List[Tuple[Document, Optional[float]]]
+
+
+def collection_space(vectorstore: Any) -> str:
+    """
+    Distance function of a Chroma collection (hnsw:space metadata, default l2)
+
+    Args:
+        vectorstore: LangChain Chroma vector store
+
+    Returns:
+        "l2", "cosine" or "ip"
+    """
+    try:
+        metadata = vectorstore._collection.metadata
+        space = metadata.get("hnsw:space", "l2") if isinstance(metadata, dict) else "l2"
+    except Exception:
+        space = "l2"
+    return space if space in ("l2", "cosine", "ip") else "l2"
+
+
+def relevance_from_distance(distance: float, space: str = "l2") -> float:
+    """
+    Convert a Chroma distance into a relevance score in [0, 1] (higher is better)
+
+    OpenAI embeddings are unit-normalized, so every distance function maps onto
+    cosine similarity: Chroma's l2 is the squared distance (2 - 2cos), while
+    cosine and ip distances are 1 - cos.
+
+    Args:
+        distance: Distance returned by Chroma
+        space: Collection distance function
+
+    Returns:
+        Relevance score clamped to [0, 1]
+    """
+    similarity = 1.0 - distance / 2.0 if space == "l2" else 1.0 - distance
+    return max(0.0, min(1.0, similarity))
+
+
+def adaptive_cutoff(
+    hits: List[Tuple[Document, float]],
+    k_max: int,
+    min_score: float = 0.0,
+    cliff_drop: float = 1.0,
+) -> Tuple[List[Tuple[Document, float]], str]:
+    """
+    Keep the leading hits until the score falls below min_score or drops off a cliff
+
+    The best hit is always kept, so a non-empty input yields between 1 and k_max results.
+
+    Args:
+        hits: (Document, score) tuples, best first
+        k_max: Maximum number of results
+        min_score: Minimum relevance score for hits after the first
+        cliff_drop: Score drop between consecutive hits that ends the result
+
+    Returns:
+        Tuple of (kept hits, reason) where reason is "empty", "k_max", "threshold" or "cliff"
+    """
+    hits = hits[:max(1, k_max)]
+    if not hits:
+        return [], "empty"
+
+    kept = [hits[0]]
+    for previous, current in zip(hits, hits[1:]):
+        if current[1] < min_score:
+            return kept, "threshold"
+        if previous[1] - current[1] >= cliff_drop:
+            return kept, "cliff"
+        kept.append(current)
+
+    return kept, "k_max"
+
+
+class RetrievalMetrics:
+    """Thread-safe per-collection counters for adaptive retrieval"""
+
+    def __init__(self):
+        """Initialize empty metrics"""
+        self._lock = threading.Lock()
+        self._collections: Dict[str, Dict[str, float]] = {}
+
+    def record(self, collection_name: str, k_max: int, scores: List[Optional[float]], reason: str) -> None:
+        """
+        Record one search
+
+        Args:
+            collection_name: Name of the collection
+            k_max: Maximum number of results requested
+            scores: Scores of the returned results
+            reason: Why the result ended (see adaptive_cutoff, or "decisive_lexical"/"fixed_k")
+        """
+        known = [score for score in scores if score is not None]
+        with self._lock:
+            entry = self._collections.setdefault(collection_name, {
+                "searches": 0,
+                "results": 0,
+                "k_max": 0,
+                "top_score_sum": 0.0,
+                "scored_searches": 0,
+            })
+            entry["searches"] += 1
+            entry["results"] += len(scores)
+            entry["k_max"] += k_max
+            entry[f"cut_{reason}"] = entry.get(f"cut_{reason}", 0) + 1
+            if known:
+                entry["top_score_sum"] += max(known)
+                entry["scored_searches"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-collection statistics
+
+        Returns:
+            Dictionary mapping collection names to search counts, average results
+            returned vs requested, average top score and cutoff reasons
+        """
+        with self._lock:
+            stats = {}
+            for name, entry in self._collections.items():
+                searches = entry["searches"] or 1
+                stats[name] = {
+                    "searches": entry["searches"],
+                    "avg_results": round(entry["results"] / searches, 2),
+                    "avg_k_max": round(entry["k_max"] / searches, 2),
+                    "avg_top_score": (
+                        round(entry["top_score_sum"] / entry["scored_searches"], 4)
+                        if entry["scored_searches"] else None
+                    ),
+                    "cutoffs": {
+                        key[len("cut_"):]: value for key, value in entry.items() if key.startswith("cut_")
+                    },
+                }
+            return stats
+
+    def clear(self) -> None:
+        """Reset all counters"""
+        with self._lock:
+            self._collections.clear()
+
+
+# Global retrieval metrics instance
+_retrieval_metrics = RetrievalMetrics()
+
+
+def get_retrieval_metrics() -> RetrievalMetrics:
+    """
+    Get global retrieval metrics instance
+
+    Returns:
+        RetrievalMetrics instance
+    """
+    return _retrieval_metrics
+
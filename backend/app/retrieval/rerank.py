@@ -0,0 +1,346 @@
+"""
+Pluggable reranking stage for knowledge base search results
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+To avoid missing results the tools used to over-fetch and hand every candidate to
+the worker LLM. With RERANK_ENABLED, search_collection_scored over-fetches
+RERANK_CANDIDATES hits cheaply, a Reranker rescores them and only the top k reach
+the LLM. The default LexicalFieldReranker runs on CPU in microseconds: it blends
+query-term overlap, identifier/field matches and the vector relevance score.
+Heavier rerankers (cross-encoders, hosted rerank APIs) plug in through
+register_reranker and the RERANKER setting.
+
+Benchmark rerank cost against the context tokens it saves on a live collection:
+
+    python -m app.retrieval.rerank --collection billing_knowledge_base \\
+        --query "late payment fee" --query "INV-004 total" --candidates 20 --k 5
+"""
+
+import argparse
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+from app.retrieval.context_packer import estimate_tokens
+from app.retrieval.lexical_index import is_identifier_token, tokenize
+from app.retrieval.relevance import ScoredDocuments
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+# Words that carry no signal for overlap scoring
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or our "
+    "the this to was we what when where which who why with you your".split()
+)
+
+
+class Reranker:
+    """Base class for rerankers: rescore candidates for a query and keep the best k"""
+
+    name = "base"
+
+    def score(self, query: str, candidates: ScoredDocuments) -> List[float]:
+        """
+        Score every candidate for the query
+
+        Args:
+            query: User query
+            candidates: (Document, relevance score or None) tuples in retrieval order
+
+        Returns:
+            One score per candidate in [0, 1] (higher is better)
+        """
+        raise NotImplementedError
+
+    def rerank(self, query: str, candidates: ScoredDocuments, k: int) -> ScoredDocuments:
+        """
+        Reorder candidates by score and keep the top k
+
+        Args:
+            query: User query
+            candidates: (Document, relevance score or None) tuples in retrieval order
+            k: Number of results to keep
+
+        Returns:
+            List of (Document, rerank score) tuples, best first
+        """
+        if not candidates:
+            return []
+        scores = self.score(query, candidates)
+        order = sorted(range(len(candidates)), key=lambda i: (-scores[i], i))
+        return [(candidates[i][0], scores[i]) for i in order[:k]]
+
+
+class LexicalFieldReranker(Reranker):
+    """CPU-only reranker blending term overlap, identifier/field matches and vector relevance"""
+
+    name = "lexical"
+
+    def __init__(self, vector_weight: float = 0.5, lexical_weight: float = 0.3, field_weight: float = 0.2):
+        """
+        Initialize reranker weights (normalized to sum to 1)
+
+        Args:
+            vector_weight: Weight of the retrieval relevance score
+            lexical_weight: Weight of the fraction of query terms found in the chunk
+            field_weight: Weight of identifier and source-file matches
+        """
+        total = (vector_weight + lexical_weight + field_weight) or 1.0
+        self.vector_weight = vector_weight / total
+        self.lexical_weight = lexical_weight / total
+        self.field_weight = field_weight / total
+
+    def score(self, query: str, candidates: ScoredDocuments) -> List[float]:
+        """Score candidates (missing relevance scores fall back to retrieval rank)"""
+        query_terms = {token for token in tokenize(query) if token not in _STOPWORDS}
+        identifiers = {token for token in query_terms if is_identifier_token(token)}
+        count = len(candidates)
+
+        scores = []
+        for rank, (doc, relevance) in enumerate(candidates):
+            if relevance is None:
+                relevance = 1.0 - rank / count
+            doc_terms = set(tokenize(doc.page_content))
+            overlap = len(query_terms & doc_terms) / len(query_terms) if query_terms else 0.0
+            scores.append(
+                self.vector_weight * relevance
+                + self.lexical_weight * overlap
+                + self.field_weight * self._field_score(doc, doc_terms, query_terms, identifiers)
+            )
+        return scores
+
+    @staticmethod
+    def _field_score(doc: Document, doc_terms: set, query_terms: set, identifiers: set) -> float:
+        """Fraction of query identifiers in the chunk, or 1.0 when the source file name matches"""
+        metadata = doc.metadata or {}
+        source_terms = set(tokenize(str(metadata.get("source_file", metadata.get("source", "")))))
+        if identifiers:
+            return len(identifiers & (doc_terms | source_terms)) / len(identifiers)
+        return 1.0 if any(len(term) >= 4 for term in query_terms & source_terms) else 0.0
+
+
+class RerankStats:
+    """Thread-safe totals of rerank cost and context tokens removed"""
+
+    def __init__(self):
+        """Initialize empty totals"""
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.candidates = 0
+        self.kept = 0
+        self.seconds = 0.0
+        self.candidate_tokens = 0
+        self.kept_tokens = 0
+
+    def record(self, candidates: ScoredDocuments, kept: ScoredDocuments, seconds: float) -> None:
+        """Record one rerank call"""
+        candidate_tokens = sum(estimate_tokens(doc.page_content) for doc, _ in candidates)
+        kept_tokens = sum(estimate_tokens(doc.page_content) for doc, _ in kept)
+        with self._lock:
+            self.calls += 1
+            self.candidates += len(candidates)
+            self.kept += len(kept)
+            self.seconds += seconds
+            self.candidate_tokens += candidate_tokens
+            self.kept_tokens += kept_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get rerank statistics
+
+        Returns:
+            Dictionary with call count, average candidates/kept, average rerank time
+            and context tokens saved versus passing every candidate to the LLM
+        """
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "reranker": config.RERANKER,
+                "calls": self.calls,
+                "avg_candidates": round(self.candidates / calls, 2),
+                "avg_kept": round(self.kept / calls, 2),
+                "avg_rerank_ms": round(self.seconds * 1000 / calls, 3),
+                "tokens_saved": self.candidate_tokens - self.kept_tokens,
+            }
+
+
+# Registered reranker factories, selected by the RERANKER setting
+_reranker_factories: Dict[str, Callable[[], Reranker]] = {"lexical": LexicalFieldReranker}
+_rerankers: Dict[str, Reranker] = {}
+_registry_lock = threading.Lock()
+_rerank_stats = RerankStats()
+
+
+def register_reranker(name: str, factory: Callable[[], Reranker]) -> None:
+    """
+    Register a reranker implementation
+
+    Args:
+        name: Name used in the RERANKER setting
+        factory: Callable returning a Reranker instance (called once, on first use)
+    """
+    with _registry_lock:
+        _reranker_factories[name] = factory
+        _rerankers.pop(name, None)
+
+
+def get_reranker(name: Optional[str] = None) -> Reranker:
+    """
+    Get the reranker registered under name (default: RERANKER setting)
+
+    Args:
+        name: Registered reranker name
+
+    Returns:
+        Reranker instance
+
+    Raises:
+        ValueError: If no reranker is registered under name
+    """
+    name = name or config.RERANKER
+    with _registry_lock:
+        reranker = _rerankers.get(name)
+        if reranker is None:
+            factory = _reranker_factories.get(name)
+            if factory is None:
+                raise ValueError(f"Unknown reranker: {name}. Registered: {sorted(_reranker_factories)}")
+            reranker = factory()
+            _rerankers[name] = reranker
+        return reranker
+
+
+def get_rerank_stats() -> RerankStats:
+    """
+    Get global rerank statistics
+
+    Returns:
+        RerankStats instance
+    """
+    return _rerank_stats
+
+
+def rerank_candidate_count(k: int) -> int:
+    """
+    Number of candidates to fetch for a search that returns k results
+
+    Args:
+        k: Number of results the caller needs
+
+    Returns:
+        RERANK_CANDIDATES (at least k) when reranking is enabled, otherwise k
+    """
+    return max(k, config.RERANK_CANDIDATES) if config.RERANK_ENABLED else k
+
+
+def rerank_results(collection_name: str, query: str, candidates: ScoredDocuments, k: int) -> ScoredDocuments:
+    """
+    Rerank over-fetched candidates and keep the top k (no-op when reranking is disabled)
+
+    Args:
+        collection_name: Name of the collection (for logging)
+        query: User query
+        candidates: (Document, score) tuples, best first
+        k: Number of results to keep
+
+    Returns:
+        List of (Document, rerank score) tuples, best first
+    """
+    if not config.RERANK_ENABLED or not candidates:
+        return candidates[:k]
+
+    reranker = get_reranker()
+    started = time.perf_counter()
+    kept = reranker.rerank(query, candidates, k)
+    elapsed = time.perf_counter() - started
+
+    _rerank_stats.record(candidates, kept, elapsed)
+    app_logger.info(
+        f"Reranked {len(candidates)} '{collection_name}' candidates to {len(kept)} "
+        f"with {reranker.name} in {elapsed * 1000:.2f}ms"
+    )
+    return kept
+
+
+def benchmark_reranker(
+    reranker: Reranker,
+    cases: Sequence[Tuple[str, ScoredDocuments]],
+    k: int,
+    repeat: int = 5,
+) -> Dict[str, Any]:
+    """
+    Measure rerank cost against the context tokens it removes
+
+    Args:
+        reranker: Reranker to measure
+        cases: (query, over-fetched candidates) pairs
+        k: Number of results kept per query
+        repeat: Timing repetitions per query (best run is used)
+
+    Returns:
+        Dictionary with per-query timing, tokens of all candidates vs the kept top k,
+        tokens saved and rerank milliseconds per 1,000 tokens saved
+    """
+    total_ms = 0.0
+    candidate_tokens = 0
+    kept_tokens = 0
+
+    for query, candidates in cases:
+        best = float("inf")
+        kept: ScoredDocuments = []
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            kept = reranker.rerank(query, candidates, k)
+            best = min(best, time.perf_counter() - started)
+        total_ms += best * 1000
+        candidate_tokens += sum(estimate_tokens(doc.page_content) for doc, _ in candidates)
+        kept_tokens += sum(estimate_tokens(doc.page_content) for doc, _ in kept)
+
+    queries = len(cases) or 1
+    saved = candidate_tokens - kept_tokens
+    return {
+        "reranker": reranker.name,
+        "queries": len(cases),
+        "k": k,
+        "avg_rerank_ms": round(total_ms / queries, 3),
+        "candidate_tokens": candidate_tokens,
+        "kept_tokens": kept_tokens,
+        "tokens_saved": saved,
+        "avg_tokens_saved": round(saved / queries, 1),
+        "ms_per_1k_tokens_saved": round(total_ms / saved * 1000, 3) if saved else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Benchmark a reranker on live collection results"""
+    from app.retrieval.chroma_client import get_chroma_client
+    from app.retrieval.relevance import collection_space, relevance_from_distance
+
+    parser = argparse.ArgumentParser(description="Benchmark rerank cost against context tokens saved")
+    parser.add_argument("--collection", default=config.COLLECTION_BILLING, choices=config.get_all_collections())
+    parser.add_argument("--query", action="append", required=True, help="Query to benchmark (repeatable)")
+    parser.add_argument("--candidates", type=int, default=config.RERANK_CANDIDATES)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--reranker", default=config.RERANKER)
+    args = parser.parse_args(argv)
+
+    vectorstore = get_chroma_client().get_or_create_collection(args.collection)
+    space = collection_space(vectorstore)
+    cases = [
+        (query, [
+            (doc, relevance_from_distance(distance, space))
+            for doc, distance in vectorstore.similarity_search_with_score(query=query, k=args.candidates)
+        ])
+        for query in args.query
+    ]
+
+    result = benchmark_reranker(get_reranker(args.reranker), cases, args.k)
+    for key, value in result.items():
+        print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
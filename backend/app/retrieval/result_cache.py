@@ -0,0 +1,367 @@
+"""
+Retrieval result cache invalidated by per-collection generation counters
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+The same FAQ-style questions reach the knowledge base search tools many times a
+day. RetrievalResultCache keeps the final (Document, score) results of
+search_collection_scored in a bounded LRU keyed by (collection, normalized query,
+k, filters). Each entry is stamped with the collection's generation number, which
+ingest_document (and collection deletes) increment after every successful write;
+an entry from an older generation is discarded on lookup, so results written
+before an ingest are never served after it.
+
+Generations live in a small SQLite file next to the ChromaDB data, so every
+worker process (uvicorn --workers N) sees a write made by any of them within
+RETRIEVAL_GENERATION_CHECK_SECONDS. Entries also expire after
+RETRIEVAL_RESULT_CACHE_TTL_SECONDS, which bounds staleness for writes made
+outside the app (e.g. directly through chromadb).
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.retrieval.embedding_cache import normalize_query_text
+from app.retrieval.relevance import ScoredDocuments
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+ResultCacheKey = Tuple[str, str, int, str]
+
+
+class CollectionGenerations:
+    """
+    Thread-safe per-collection write generation counters
+
+    With a db_path the counters are stored in SQLite and shared by every process
+    using the same file; without one they are local to this process.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, check_seconds: float = 0.0):
+        """
+        Initialize generation counters
+
+        Args:
+            db_path: SQLite file shared by all worker processes (None for process-local counters)
+            check_seconds: How long a generation read from SQLite is reused before reading it again
+        """
+        self.db_path = db_path
+        self.check_seconds = max(0.0, check_seconds)
+        self._lock = threading.Lock()
+        self._generations: Dict[str, int] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            try:
+                directory = os.path.dirname(db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS generations ("
+                    "collection TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+                )
+            except sqlite3.Error as e:
+                app_logger.warning(f"Shared collection generations unavailable ({e}); using process-local counters")
+                self._conn = None
+
+    @property
+    def shared(self) -> bool:
+        """Whether generations are shared with other processes through SQLite"""
+        return self._conn is not None
+
+    def current(self, collection_name: str) -> int:
+        """Get the current generation of a collection"""
+        with self._lock:
+            if self._conn is None:
+                return self._generations.get(collection_name, 0)
+
+            now = time.monotonic()
+            checked_at = self._checked_at.get(collection_name)
+            if checked_at is not None and now - checked_at < self.check_seconds:
+                return self._generations.get(collection_name, 0)
+
+            try:
+                row = self._conn.execute(
+                    "SELECT generation FROM generations WHERE collection = ?", (collection_name,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                app_logger.warning(f"Could not read generation of '{collection_name}': {e}")
+                return self._generations.get(collection_name, 0)
+
+            self._generations[collection_name] = row[0] if row else 0
+            self._checked_at[collection_name] = now
+            return self._generations[collection_name]
+
+    def bump(self, collection_name: str) -> int:
+        """
+        Advance a collection's generation after a write
+
+        Args:
+            collection_name: Name of the collection that changed
+
+        Returns:
+            New generation number
+        """
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "INSERT INTO generations (collection, generation) VALUES (?, 1) "
+                        "ON CONFLICT(collection) DO UPDATE SET generation = generation + 1 "
+                        "RETURNING generation",
+                        (collection_name,),
+                    ).fetchone()
+                    self._generations[collection_name] = row[0]
+                    self._checked_at[collection_name] = time.monotonic()
+                    return row[0]
+                except sqlite3.Error as e:
+                    app_logger.warning(f"Could not store generation of '{collection_name}': {e}")
+
+            generation = self._generations.get(collection_name, 0) + 1
+            self._generations[collection_name] = generation
+            return generation
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get a copy of every collection's generation"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    return dict(self._conn.execute("SELECT collection, generation FROM generations").fetchall())
+                except sqlite3.Error as e:
+                    app_logger.warning(f"Could not read collection generations: {e}")
+            return dict(self._generations)
+
+    def close(self) -> None:
+        """Close the SQLite connection (counters fall back to this process)"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def result_cache_key(
+    collection_name: str,
+    query: str,
+    k: int,
+    filters: Optional[Dict[str, Any]] = None,
+) -> ResultCacheKey:
+    """
+    Build a result cache key
+
+    Args:
+        collection_name: Name of the collection
+        query: User query (normalized: case-folded, whitespace collapsed)
+        k: Maximum number of results
+        filters: Anything else that changes the result (metadata filters, search options)
+
+    Returns:
+        Hashable cache key
+    """
+    filter_key = json.dumps(filters or {}, sort_keys=True, default=str)
+    return (collection_name, normalize_query_text(query), k, filter_key)
+
+
+def estimate_result_bytes(results: ScoredDocuments) -> int:
+    """
+    Approximate memory held by a cached result (document text, metadata and scores)
+
+    Args:
+        results: (Document, score) tuples
+
+    Returns:
+        Approximate size in bytes
+    """
+    size = sys.getsizeof(results)
+    for doc, _ in results:
+        size += sys.getsizeof(doc.page_content) + 64
+        for key, value in (doc.metadata or {}).items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+class RetrievalResultCache:
+    """Thread-safe LRU cache of retrieval results bounded by entry count and bytes"""
+
+    def __init__(self, max_size: int = 1024, max_bytes: int = 32 * 1024 * 1024, ttl_seconds: float = 0.0):
+        """
+        Initialize retrieval result cache
+
+        Args:
+            max_size: Maximum number of cached results (LRU eviction beyond this)
+            max_bytes: Maximum approximate memory footprint in bytes
+            ttl_seconds: Maximum age of a cached result (0 for no expiry)
+        """
+        self.max_size = max(1, max_size)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[ResultCacheKey, Tuple[int, ScoredDocuments, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key: ResultCacheKey, generation: int) -> Optional[ScoredDocuments]:
+        """
+        Get cached results for key if they belong to the collection's current generation and have not expired
+
+        Args:
+            key: Cache key (see result_cache_key)
+            generation: Current generation of the key's collection
+
+        Returns:
+            Copy of the cached result list, or None on miss or stale entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry_generation, results, size, stored_at = entry
+            expired = self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds
+            if entry_generation != generation or expired:
+                del self._entries[key]
+                self._bytes -= size
+                self.stale += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(results)
+
+    def put(self, key: ResultCacheKey, generation: int, results: ScoredDocuments) -> None:
+        """
+        Store results stamped with the generation they were read at
+
+        Args:
+            key: Cache key (see result_cache_key)
+            generation: Collection generation observed before the search ran
+            results: (Document, score) tuples
+        """
+        size = estimate_result_bytes(results)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (generation, list(results), size, time.monotonic())
+            self._bytes += size
+            while len(self._entries) > self.max_size or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached entries (counters are preserved)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with hit/miss/stale/eviction counters, size, memory footprint and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "approx_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "generations": get_collection_generations().snapshot(),
+            }
+
+
+# Global instances
+_collection_generations: Optional[CollectionGenerations] = None
+_generations_lock = threading.Lock()
+_retrieval_result_cache: Optional[RetrievalResultCache] = None
+
+
+def get_collection_generations() -> CollectionGenerations:
+    """
+    Get or create global collection generation counters
+
+    Returns:
+        CollectionGenerations instance (shared across processes unless disabled)
+    """
+    global _collection_generations
+
+    if _collection_generations is None:
+        with _generations_lock:
+            if _collection_generations is None:
+                db_path = config.get_generations_path() if config.SHARED_GENERATIONS_ENABLED else None
+                _collection_generations = CollectionGenerations(
+                    db_path=db_path,
+                    check_seconds=config.RETRIEVAL_GENERATION_CHECK_SECONDS,
+                )
+                app_logger.info(
+                    f"Collection generations initialized "
+                    f"({'shared via ' + db_path if _collection_generations.shared else 'process-local'})"
+                )
+
+    return _collection_generations
+
+
+def bump_collection_generation(collection_name: str) -> int:
+    """
+    Mark a collection as changed so cached results for it are no longer served
+
+    Args:
+        collection_name: Name of the collection that was written
+
+    Returns:
+        New generation number
+    """
+    generation = get_collection_generations().bump(collection_name)
+    app_logger.debug(f"Collection '{collection_name}' advanced to generation {generation}")
+    return generation
+
+
+def get_retrieval_result_cache() -> RetrievalResultCache:
+    """
+    Get or create global retrieval result cache instance
+
+    Returns:
+        RetrievalResultCache instance shared by the whole process
+    """
+    global _retrieval_result_cache
+
+    if _retrieval_result_cache is None:
+        _retrieval_result_cache = RetrievalResultCache(
+            max_size=config.RETRIEVAL_RESULT_CACHE_SIZE,
+            max_bytes=config.RETRIEVAL_RESULT_CACHE_MAX_BYTES,
+            ttl_seconds=config.RETRIEVAL_RESULT_CACHE_TTL_SECONDS,
+        )
+        app_logger.info(
+            f"Retrieval result cache initialized (max_size={config.RETRIEVAL_RESULT_CACHE_SIZE}, "
+            f"max_bytes={config.RETRIEVAL_RESULT_CACHE_MAX_BYTES}, "
+            f"ttl={config.RETRIEVAL_RESULT_CACHE_TTL_SECONDS}s)"
+        )
+
+    return _retrieval_result_cache
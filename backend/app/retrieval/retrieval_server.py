@@ -0,0 +1,757 @@
+"""
+Local retrieval server shared by every API worker, reached over a Unix socket
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/integrations/vectorstores/chroma
+Last Verified: November 2025
+
+With `uvicorn --workers N`, each worker opening its own PersistentClient on
+CHROMA_DB_PATH keeps N copies of the HNSW indexes, lexical indexes and caches in
+RAM, and all N contend on one SQLite file. This module runs a single retrieval
+process that owns the ChromaDB client (or NumPy store), the query embedding
+cache, the lexical indexes and the retrieval result cache:
+
+    RETRIEVAL_SERVER_SOCKET=/tmp/retrieval.sock python -m app.retrieval.retrieval_server
+
+When RETRIEVAL_SERVER_SOCKET is set, get_chroma_client() in the API workers
+returns a RetrievalClient instead. It has the same interface as ChromaDBClient,
+and its RemoteVectorStore collections implement the vector store methods the
+retrievers and ingestion use. search_collection_scored hands the whole hybrid
+search to the server, so a repeated question is answered from the shared result
+cache whichever worker receives it. Writes go through the server, which keeps
+its lexical indexes in step and invalidates cached results for the collection.
+
+Protocol: every message is a frame of a 1-byte kind and a 4-byte big-endian
+length, followed by the payload. A request payload is [method, args, kwargs].
+The response holds the result, or [error type, message] when the call failed.
+Values use a small tagged binary encoding: None, bool, int, float, str, bytes,
+list, tuple, dict and Document. Vectors and matrices are sent as raw little-endian
+float32 arrays. Unlike pickle, decoding cannot run code. The socket is created
+with mode 0600.
+"""
+
+import os
+import signal
+import socket
+import socketserver
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.retrieval.chroma_client import ChromaDBClient
+from app.retrieval.embedding_cache import get_query_embedding_cache
+from app.retrieval.lexical_index import get_lexical_index, index_documents, lexical_index_stats
+from app.retrieval.relevance import ScoredDocuments
+from app.retrieval.result_cache import bump_collection_generation, get_retrieval_result_cache
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+# Frame kinds
+REQUEST = 1
+RESPONSE = 2
+ERROR = 3
+
+_HEADER = struct.Struct(">BI")
+_LENGTH = struct.Struct(">I")
+_INT = struct.Struct(">q")
+_FLOAT = struct.Struct(">d")
+_MAX_FRAME_BYTES = 1 << 30
+
+# Vector store and collection methods a client may call
+_STORE_METHODS = {
+    "add_texts",
+    "add_documents",
+    "get",
+    "delete",
+    "similarity_search",
+    "similarity_search_with_score",
+    "similarity_search_by_vector",
+    "similarity_search_by_vector_with_relevance_scores",
+}
+_STORE_WRITES = {"add_texts", "add_documents", "delete"}
+_COLLECTION_METHODS = {"query", "get", "count"}
+
+
+def _encode(value: Any, out: bytearray) -> None:
+    """Append the tagged encoding of value to out"""
+    if value is None:
+        out += b"N"
+    elif isinstance(value, (bool, np.bool_)):
+        out += b"T" if value else b"F"
+    elif isinstance(value, (int, np.integer)):
+        out += b"i" + _INT.pack(int(value))
+    elif isinstance(value, (float, np.floating)):
+        out += b"d" + _FLOAT.pack(float(value))
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        out += b"s" + _LENGTH.pack(len(data)) + data
+    elif isinstance(value, (bytes, bytearray)):
+        out += b"b" + _LENGTH.pack(len(value)) + value
+    elif isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value, dtype="<f4")
+        if array.ndim == 1:
+            out += b"v" + _LENGTH.pack(array.shape[0])
+        elif array.ndim == 2:
+            out += b"V" + _LENGTH.pack(array.shape[0]) + _LENGTH.pack(array.shape[1])
+        else:
+            raise TypeError(f"Cannot encode a {array.ndim}-dimensional array")
+        out += array.tobytes()
+    elif isinstance(value, Document):
+        out += b"D"
+        _encode(value.page_content, out)
+        _encode(value.metadata, out)
+        _encode(value.id, out)
+    elif isinstance(value, (list, tuple)):
+        out += (b"u" if isinstance(value, tuple) else b"l") + _LENGTH.pack(len(value))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, dict):
+        out += b"m" + _LENGTH.pack(len(value))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    else:
+        raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def encode(value: Any) -> bytes:
+    """
+    Encode a value in the retrieval protocol's binary format
+
+    Args:
+        value: None, bool, int, float, str, bytes, list, tuple, dict, Document or float32 array
+
+    Returns:
+        Encoded bytes
+
+    Raises:
+        TypeError: If the value (or a nested value) has an unsupported type
+    """
+    out = bytearray()
+    _encode(value, out)
+    return bytes(out)
+
+
+def _decode(buffer: memoryview, offset: int) -> Tuple[Any, int]:
+    """Decode one value starting at offset, returning it and the offset after it"""
+    tag = chr(buffer[offset])
+    offset += 1
+    if tag == "N":
+        return None, offset
+    if tag in "TF":
+        return tag == "T", offset
+    if tag == "i":
+        return _INT.unpack_from(buffer, offset)[0], offset + _INT.size
+    if tag == "d":
+        return _FLOAT.unpack_from(buffer, offset)[0], offset + _FLOAT.size
+    if tag in "sb":
+        (length,) = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        data = bytes(buffer[offset:offset + length])
+        return (data.decode("utf-8") if tag == "s" else data), offset + length
+    if tag in "vV":
+        (rows,) = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        shape: Tuple[int, ...] = (rows,)
+        if tag == "V":
+            shape = (rows, _LENGTH.unpack_from(buffer, offset)[0])
+            offset += _LENGTH.size
+        size = int(np.prod(shape)) * 4
+        array = np.frombuffer(buffer[offset:offset + size], dtype="<f4").astype(np.float32).reshape(shape)
+        return array, offset + size
+    if tag == "D":
+        page_content, offset = _decode(buffer, offset)
+        metadata, offset = _decode(buffer, offset)
+        doc_id, offset = _decode(buffer, offset)
+        return Document(page_content=page_content, metadata=metadata, id=doc_id), offset
+    if tag in "lu":
+        (count,) = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        items = []
+        for _ in range(count):
+            item, offset = _decode(buffer, offset)
+            items.append(item)
+        return (tuple(items) if tag == "u" else items), offset
+    if tag == "m":
+        (count,) = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+        mapping = {}
+        for _ in range(count):
+            key, offset = _decode(buffer, offset)
+            mapping[key], offset = _decode(buffer, offset)
+        return mapping, offset
+    raise ValueError(f"Unknown value tag {tag!r}")
+
+
+def decode(data: bytes) -> Any:
+    """
+    Decode a value encoded by encode()
+
+    Args:
+        data: Encoded bytes
+
+    Returns:
+        Decoded value (float32 vectors and matrices as NumPy arrays)
+
+    Raises:
+        ValueError: If the data is malformed
+    """
+    buffer = memoryview(data)
+    try:
+        value, offset = _decode(buffer, 0)
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"Truncated retrieval protocol value: {e}") from e
+    if offset != len(buffer):
+        raise ValueError(f"{len(buffer) - offset} trailing bytes after retrieval protocol value")
+    return value
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    """Read exactly size bytes, raising ConnectionError if the peer closes first"""
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("Retrieval server connection closed")
+        received += count
+    return bytes(data)
+
+
+def write_frame(sock: socket.socket, kind: int, payload: bytes) -> None:
+    """Send one frame"""
+    sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def read_frame(sock: socket.socket) -> Tuple[int, bytes]:
+    """
+    Receive one frame
+
+    Returns:
+        Tuple of (kind, payload)
+
+    Raises:
+        ConnectionError: If the connection closes
+        ValueError: If the frame exceeds the maximum size
+    """
+    kind, length = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    if length > _MAX_FRAME_BYTES:
+        raise ValueError(f"Retrieval frame of {length} bytes exceeds the limit")
+    return kind, _recv_exactly(sock, length)
+
+
+class RetrievalServerError(RuntimeError):
+    """Error raised by the retrieval server while handling a call"""
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+
+
+def _float32(vectors: Any) -> np.ndarray:
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class RetrievalConnection:
+    """Per-thread Unix socket connections to the retrieval server"""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        """
+        Initialize connection settings (sockets are opened on first use in each thread)
+
+        Args:
+            socket_path: Path of the server's Unix socket
+            timeout: Seconds to wait for a reply (default: RETRIEVAL_SERVER_TIMEOUT)
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout if timeout is not None else config.RETRIEVAL_SERVER_TIMEOUT
+        self._local = threading.local()
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def close(self) -> None:
+        """Close this thread's connection"""
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call a server method, reconnecting once if the server was restarted
+
+        Args:
+            method: Server method name
+            *args: Positional arguments
+            **kwargs: Keyword arguments
+
+        Returns:
+            Decoded result
+
+        Raises:
+            ValueError: If the server rejected the call with a ValueError
+            RetrievalServerError: If the call failed on the server
+            OSError: If the server cannot be reached
+        """
+        payload = encode([method, list(args), kwargs])
+        for attempt in range(2):
+            try:
+                sock = self._socket()
+                write_frame(sock, REQUEST, payload)
+                kind, reply = read_frame(sock)
+                break
+            except ConnectionError:
+                self.close()
+                if attempt:
+                    raise
+            except OSError:
+                self.close()
+                raise
+
+        result = decode(reply)
+        if kind == ERROR:
+            error_type, message = result
+            if error_type == "ValueError":
+                raise ValueError(message)
+            raise RetrievalServerError(error_type, message)
+        return result
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings served by the retrieval server (sharing its query embedding cache)"""
+
+    def __init__(self, connection: RetrievalConnection):
+        self.connection = connection
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents on the server"""
+        if not texts:
+            return []
+        return [row.tolist() for row in self.connection.call("embed_documents", list(texts))]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text on the server, reusing its cached vector when available"""
+        return self.connection.call("embed_query", text).tolist()
+
+
+class RemoteCollection:
+    """Proxy for the chromadb Collection behind a remote vector store (_collection)"""
+
+    def __init__(self, connection: RetrievalConnection, name: str, metadata: Optional[Dict[str, Any]] = None):
+        self._connection = connection
+        self.name = name
+        self.metadata = metadata or {}
+
+    def _call(self, method: str, **kwargs: Any) -> Any:
+        return self._connection.call("collection", self.name, method, kwargs)
+
+    def query(self, query_embeddings: Any, **kwargs: Any) -> Dict[str, Any]:
+        """ChromaDB query with precomputed embeddings"""
+        return self._call("query", query_embeddings=_float32(query_embeddings), **kwargs)
+
+    def get(self, **kwargs: Any) -> Dict[str, Any]:
+        """ChromaDB get"""
+        return self._call("get", **kwargs)
+
+    def count(self) -> int:
+        """Number of records in the collection"""
+        return self._call("count")
+
+
+class RemoteVectorStore:
+    """LangChain Chroma-compatible vector store whose collection lives in the retrieval server"""
+
+    def __init__(
+        self,
+        connection: RetrievalConnection,
+        collection_name: str,
+        embeddings: Embeddings,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Initialize vector store proxy
+
+        Args:
+            connection: Connection to the retrieval server
+            collection_name: Name of the collection
+            embeddings: Embeddings (RemoteEmbeddings) exposed to callers
+            metadata: Collection metadata reported by the server
+        """
+        self._connection = connection
+        self.collection_name = collection_name
+        self._embedding_function = embeddings
+        self._collection = RemoteCollection(connection, collection_name, metadata)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def _call(self, method: str, **kwargs: Any) -> Any:
+        return self._connection.call("store", self.collection_name, method, kwargs)
+
+    def add_texts(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed and store texts on the server"""
+        return self._call("add_texts", texts=list(texts), metadatas=metadatas, ids=ids)
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        """Embed and store documents on the server"""
+        return self._call("add_documents", documents=list(documents), **kwargs)
+
+    def get(self, **kwargs: Any) -> Dict[str, Any]:
+        """ChromaDB-compatible get"""
+        return self._call("get", **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        """Delete records by ID (or filter)"""
+        self._call("delete", ids=ids, **kwargs)
+
+    def replace_chunks(
+        self,
+        ids: List[str],
+        documents: List[Document],
+        removed_ids: List[str],
+        updated_ids: Optional[List[str]] = None,
+        updated_documents: Optional[List[Document]] = None,
+    ) -> None:
+        """Embed new chunks and swap them in (removed ones deleted, metadata updated) atomically on the server"""
+        self._connection.call(
+            "replace_chunks", self.collection_name, ids, documents, removed_ids,
+            updated_ids or [], updated_documents or [],
+        )
+
+    def persist(self) -> None:
+        """No-op: the server persists every write"""
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self._call("similarity_search", query=query, k=k, **kwargs)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._call("similarity_search_with_score", query=query, k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return self._call("similarity_search_by_vector", embedding=_float32(embedding), k=k, **kwargs)
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self._call(
+            "similarity_search_by_vector_with_relevance_scores", embedding=_float32(embedding), k=k, **kwargs
+        )
+
+    def search_scored(self, query: str, k: int, adaptive: bool = True, diversify: bool = False) -> ScoredDocuments:
+        """
+        Run search_collection_scored on the server (its lexical index and result cache)
+
+        Args:
+            query: User query
+            k: Maximum number of documents to return
+            adaptive: Apply the adaptive cutoff
+            diversify: Select vector hits by maximal marginal relevance
+
+        Returns:
+            List of (Document, score) tuples, best first
+        """
+        return self._connection.call("search_scored", self.collection_name, query, k, adaptive, diversify)
+
+
+class RetrievalClient:
+    """Thin ChromaDBClient replacement that forwards everything to the retrieval server"""
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Initialize client (no connection is opened until the first call)
+
+        Args:
+            socket_path: Server socket (default: RETRIEVAL_SERVER_SOCKET)
+            timeout: Seconds to wait for a reply (default: RETRIEVAL_SERVER_TIMEOUT)
+        """
+        self.socket_path = socket_path or config.RETRIEVAL_SERVER_SOCKET
+        self.backend = "remote"
+        self._connection = RetrievalConnection(self.socket_path, timeout)
+        self.embeddings = RemoteEmbeddings(self._connection)
+        self._collections: Dict[str, RemoteVectorStore] = {}
+        app_logger.info(f"Retrieval client using server at {self.socket_path}")
+
+    def _vectorstore(self, collection_name: str, metadata: Dict[str, Any]) -> RemoteVectorStore:
+        vectorstore = RemoteVectorStore(self._connection, collection_name, self.embeddings, metadata)
+        self._collections[collection_name] = vectorstore
+        return vectorstore
+
+    def get_or_create_collection(
+        self,
+        collection_name: str,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> RemoteVectorStore:
+        """
+        Get or create a collection on the server
+
+        Args:
+            collection_name: Name of the collection
+            metadata: Optional metadata for the collection
+
+        Returns:
+            RemoteVectorStore instance
+        """
+        if collection_name in self._collections:
+            return self._collections[collection_name]
+        return self._vectorstore(
+            collection_name, self._connection.call("open_collection", collection_name, metadata, True)
+        )
+
+    def get_collection(self, collection_name: str) -> Optional[RemoteVectorStore]:
+        """
+        Get an existing collection
+
+        Args:
+            collection_name: Name of the collection
+
+        Returns:
+            RemoteVectorStore instance or None if not found
+        """
+        if collection_name in self._collections:
+            return self._collections[collection_name]
+        metadata = self._connection.call("open_collection", collection_name, None, False)
+        return None if metadata is None else self._vectorstore(collection_name, metadata)
+
+    def list_collections(self) -> List[str]:
+        """List all available collections"""
+        return self._connection.call("list_collections")
+
+    def delete_collection(self, collection_name: str) -> bool:
+        """Delete a collection"""
+        self._collections.pop(collection_name, None)
+        return self._connection.call("delete_collection", collection_name)
+
+    def reset(self) -> bool:
+        """Delete all collections"""
+        self._collections.clear()
+        return self._connection.call("reset")
+
+    def ping(self) -> Dict[str, Any]:
+        """Server process ID and vector backend"""
+        return self._connection.call("ping")
+
+    def stats(self) -> Dict[str, Any]:
+        """Server cache and lexical index statistics"""
+        return self._connection.call("stats")
+
+
+class _RetrievalRequestHandler(socketserver.BaseRequestHandler):
+    """Serve calls from one client connection until it closes"""
+
+    def handle(self) -> None:
+        while True:
+            try:
+                _, payload = read_frame(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            try:
+                method, args, kwargs = decode(payload)
+                kind, reply = RESPONSE, encode(self.server.dispatch(method, args, kwargs))
+            except Exception as e:
+                app_logger.warning(f"Retrieval server call failed: {type(e).__name__}: {e}")
+                kind, reply = ERROR, encode([type(e).__name__, str(e)])
+            try:
+                write_frame(self.request, kind, reply)
+            except OSError:
+                return
+
+
+class RetrievalServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Retrieval server owning the vector store client, caches and lexical indexes"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, client: Optional[ChromaDBClient] = None):
+        """
+        Bind the Unix socket (replacing a stale socket file from a previous run)
+
+        Args:
+            socket_path: Path of the Unix socket
+            client: Local ChromaDBClient (default: a new one)
+
+        Raises:
+            RuntimeError: If another server is already listening on socket_path
+        """
+        if os.path.exists(socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                os.unlink(socket_path)
+            else:
+                raise RuntimeError(f"A retrieval server is already listening on {socket_path}")
+            finally:
+                probe.close()
+
+        self.client = client or ChromaDBClient()
+        super().__init__(socket_path, _RetrievalRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+    def dispatch(self, method: str, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+        """
+        Run one client call
+
+        Raises:
+            ValueError: If the method is unknown
+        """
+        handler = getattr(self, f"_rpc_{method}", None)
+        if handler is None:
+            raise ValueError(f"Unknown retrieval server method: {method}")
+        return handler(*args, **kwargs)
+
+    def _store(self, collection_name: str) -> Any:
+        return self.client.get_or_create_collection(collection_name)
+
+    def _rpc_ping(self) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "backend": self.client.backend}
+
+    def _rpc_stats(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "result_cache": get_retrieval_result_cache().stats(),
+            "query_embedding_cache": get_query_embedding_cache().stats(),
+            "lexical_indexes": lexical_index_stats(),
+        }
+
+    def _rpc_list_collections(self) -> List[str]:
+        return self.client.list_collections()
+
+    def _rpc_delete_collection(self, collection_name: str) -> bool:
+        get_lexical_index(collection_name).clear()
+        get_lexical_index(collection_name).loaded = False
+        return self.client.delete_collection(collection_name)
+
+    def _rpc_reset(self) -> bool:
+        for collection_name in config.get_all_collections():
+            get_lexical_index(collection_name).clear()
+            get_lexical_index(collection_name).loaded = False
+        return self.client.reset()
+
+    def _rpc_open_collection(
+        self, collection_name: str, metadata: Optional[Dict[str, Any]], create: bool
+    ) -> Optional[Dict[str, Any]]:
+        vectorstore = (
+            self.client.get_or_create_collection(collection_name, metadata) if create
+            else self.client.get_collection(collection_name)
+        )
+        return None if vectorstore is None else dict(vectorstore._collection.metadata or {})
+
+    def _rpc_store(self, collection_name: str, method: str, kwargs: Dict[str, Any]) -> Any:
+        if method not in _STORE_METHODS:
+            raise ValueError(f"Vector store method not allowed: {method}")
+        if isinstance(kwargs.get("embedding"), np.ndarray):
+            kwargs["embedding"] = kwargs["embedding"].tolist()
+        result = getattr(self._store(collection_name), method)(**kwargs)
+        if method in _STORE_WRITES:
+            self._after_write(collection_name, method, kwargs, result)
+        return result
+
+    def _after_write(self, collection_name: str, method: str, kwargs: Dict[str, Any], result: Any) -> None:
+        """Keep the lexical index in step with a write and invalidate cached results"""
+        if method == "add_documents":
+            index_documents(collection_name, result, kwargs["documents"])
+        elif method == "add_texts":
+            metadatas = kwargs.get("metadatas") or [{}] * len(result)
+            documents = [
+                Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(kwargs["texts"], metadatas)
+            ]
+            index_documents(collection_name, result, documents)
+        else:
+            index = get_lexical_index(collection_name)
+            if kwargs.get("ids") and len(kwargs) == 1:
+                for doc_id in kwargs["ids"]:
+                    index.remove(doc_id)
+            else:
+                # Filtered deletes: rebuild from the collection on next use
+                index.clear()
+                index.loaded = False
+        get_lexical_index(collection_name).advance(bump_collection_generation(collection_name))
+
+    def _rpc_collection(self, collection_name: str, method: str, kwargs: Dict[str, Any]) -> Any:
+        if method not in _COLLECTION_METHODS:
+            raise ValueError(f"Collection method not allowed: {method}")
+        return getattr(self._store(collection_name)._collection, method)(**kwargs)
+
+    def _rpc_embed_query(self, text: str) -> np.ndarray:
+        return _float32(self.client.embeddings.embed_query(text))
+
+    def _rpc_embed_documents(self, texts: List[str]) -> np.ndarray:
+        return _float32(self.client.embeddings.embed_documents(texts))
+
+    def _rpc_search_scored(
+        self, collection_name: str, query: str, k: int, adaptive: bool, diversify: bool
+    ) -> ScoredDocuments:
+        from app.retrieval.search_pipeline import search_collection_scored
+        return search_collection_scored(
+            self._store(collection_name), collection_name, query, k, adaptive=adaptive, diversify=diversify
+        )
+
+    def _rpc_replace_chunks(
+        self,
+        collection_name: str,
+        ids: List[str],
+        documents: List[Document],
+        removed_ids: List[str],
+        updated_ids: Optional[List[str]] = None,
+        updated_documents: Optional[List[Document]] = None,
+    ) -> None:
+        from app.retrieval.versioning import replace_source_chunks
+        replace_source_chunks(
+            self._store(collection_name), collection_name, ids, documents, removed_ids,
+            updated_ids=updated_ids, updated_documents=updated_documents,
+        )
+
+
+def main() -> None:
+    """Run the retrieval server on RETRIEVAL_SERVER_SOCKET until SIGTERM/SIGINT"""
+    from app.retrieval import chroma_client
+
+    if not config.RETRIEVAL_SERVER_SOCKET:
+        raise SystemExit("Set RETRIEVAL_SERVER_SOCKET to the Unix socket path to serve on")
+
+    server = RetrievalServer(config.RETRIEVAL_SERVER_SOCKET)
+    # Code running inside the server (the search pipeline) must use the local client
+    chroma_client._chroma_client = server.client
+    chroma_client.initialize_knowledge_bases()
+
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    app_logger.info(f"Retrieval server (pid {os.getpid()}) listening on {config.RETRIEVAL_SERVER_SOCKET}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        app_logger.info("Retrieval server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,625 @@
+"""
+Shared retrieval pipeline used by the knowledge base search tools
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/retrieval
+Last Verified: November 2025
+
+search_collection combines the per-collection BM25 lexical index with ChromaDB
+vector search by reciprocal-rank fusion. When the query names an identifier
+(invoice number, clause number, bug ID) that only a handful of chunks contain,
+the lexical hit is decisive and the vector call is skipped entirely. Vector hits
+from a search_all_kbs fan-out earlier in the same request are reused.
+
+asearch_collection is the async counterpart used by the asearch_* tools under
+ainvoke/astream: it embeds asynchronously and runs ChromaDB work on the bounded
+retrieval executor, so a slow retrieval never stalls the event loop.
+
+The *_scored variants return relevance scores and apply the adaptive k cutoff
+(see relevance.py); the tools report those scores in their output. Their results
+are cached per collection generation (see result_cache.py), so repeated questions
+skip both searches until the next ingest into that collection. With RERANK_ENABLED
+they over-fetch candidates and keep the reranker's top k (see rerank.py), and
+with diversify=True vector hits are chosen by maximal marginal relevance (mmr.py).
+Queries that name a file, document type, upload date range or quoted phrase are
+pre-filtered with ChromaDB where / where_document filters (see query_filters.py).
+Collections served by the retrieval server (see retrieval_server.py) run the whole
+search there, against its lexical indexes and result cache. Searches that came back
+empty are remembered for a short TTL (see negative_cache.py) and answered as empty
+without embedding or searching again. Each uncached search holds the collection's
+swap lock (see versioning.py), so it never sees a half-replaced document.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from app.retrieval.lexical_index import (
+    BM25Index,
+    document_key,
+    ensure_lexical_index,
+    get_lexical_index,
+    is_lexical_index_current,
+    is_identifier_token,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+from app.retrieval.executor import run_in_retrieval_executor
+from app.retrieval.mmr import mmr_vector_hits
+from app.retrieval.negative_cache import NegativeCacheKey, get_negative_result_cache, negative_cache_key
+from app.retrieval.multi_search import get_shared_collection_hits
+from app.retrieval.query_filters import (
+    document_matches,
+    extract_query_filters,
+    resolve_query_filters,
+    without_phrase_filter,
+)
+from app.retrieval.relevance import (
+    ScoredDocuments,
+    adaptive_cutoff,
+    collection_space,
+    get_retrieval_metrics,
+    relevance_from_distance,
+)
+from app.retrieval.rerank import rerank_candidate_count, rerank_results
+from app.retrieval.retrieval_server import RemoteVectorStore
+from app.retrieval.result_cache import (
+    ResultCacheKey,
+    get_collection_generations,
+    get_retrieval_result_cache,
+    result_cache_key,
+)
+from app.retrieval.versioning import get_collection_swap_lock
+from app.utils.config import config
+from app.utils.logger import app_logger
+
+
+def decisive_lexical_hits(
+    query: str,
+    index: BM25Index,
+    lexical_hits: List[Tuple[Document, float]],
+    k: int,
+) -> List[Document]:
+    """
+    Return lexical hits when they settle the query on their own
+
+    A lexical result is decisive when the query contains identifier tokens and
+    at least one but no more than k chunks contain all of them. Those chunks lead
+    the result; remaining slots are filled with the next best BM25 hits.
+
+    Args:
+        query: User query
+        index: Lexical index for the collection
+        lexical_hits: BM25 hits for the query (best first)
+        k: Number of results requested
+
+    Returns:
+        List of Document objects, or empty list if the lexical hit is not decisive
+    """
+    identifiers = [token for token in set(tokenize(query)) if is_identifier_token(token)]
+    if not identifiers:
+        return []
+
+    matching_ids = index.ids_containing_all(identifiers)
+    if not matching_ids or len(matching_ids) > k:
+        return []
+
+    exact = [index.get_document(doc_id) for doc_id in matching_ids]
+    exact_keys = {id(doc) for doc in exact}
+    ranked_exact = [doc for doc, _ in lexical_hits if id(doc) in exact_keys]
+    ranked_exact += [doc for doc in exact if doc not in ranked_exact]
+    fill = [doc for doc, _ in lexical_hits if id(doc) not in exact_keys]
+
+    return (ranked_exact + fill)[:k]
+
+
+def _vector_filter_kwargs(chroma_filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyword arguments passing query filters to the LangChain Chroma search methods"""
+    kwargs = {}
+    if chroma_filters.get("where"):
+        kwargs["filter"] = chroma_filters["where"]
+    if chroma_filters.get("where_document"):
+        kwargs["where_document"] = chroma_filters["where_document"]
+    return kwargs
+
+
+def _filtered_lexical_hits(
+    index: BM25Index,
+    query: str,
+    k: int,
+    chroma_filters: Dict[str, Any],
+) -> List[Tuple[Document, float]]:
+    """BM25 hits restricted to documents that satisfy the query filters"""
+    if not chroma_filters:
+        return index.search_documents(query, k=k)
+    hits = index.search_documents(query, k=k * 4)
+    return [(doc, score) for doc, score in hits if document_matches(doc, chroma_filters)][:k]
+
+
+def _filtered_decisive_hits(
+    query: str,
+    index: BM25Index,
+    lexical_hits: List[Tuple[Document, float]],
+    k: int,
+    chroma_filters: Dict[str, Any],
+) -> List[Document]:
+    """Decisive lexical hits restricted to documents that satisfy the query filters"""
+    decisive = decisive_lexical_hits(query, index, lexical_hits, k)
+    return [doc for doc in decisive if document_matches(doc, chroma_filters)]
+
+
+def _normalized_lexical_scores(lexical_hits: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+    """Scale BM25 scores by the best score so they fall in [0, 1]"""
+    if not lexical_hits:
+        return []
+    top = lexical_hits[0][1] or 1.0
+    return [(doc, score / top) for doc, score in lexical_hits]
+
+
+def _decisive_result(
+    collection_name: str,
+    query: str,
+    decisive: List[Document],
+    lexical_hits: List[Tuple[Document, float]],
+    k: int,
+) -> ScoredDocuments:
+    """Score decisive lexical hits (exact identifier matches missing from the BM25 list score 1.0)"""
+    lexical_scores = {id(doc): score for doc, score in _normalized_lexical_scores(lexical_hits)}
+    scored = [(doc, lexical_scores.get(id(doc), 1.0)) for doc in decisive]
+
+    app_logger.info(
+        f"Decisive lexical hit in '{collection_name}' for query: {query[:50]} "
+        f"(vector search skipped)"
+    )
+    get_retrieval_metrics().record(collection_name, k, [score for _, score in scored], "decisive_lexical")
+    return scored
+
+
+def _diverse_results(
+    collection_name: str, query: str, k: int, hits: ScoredDocuments, adaptive: bool
+) -> ScoredDocuments:
+    """Record MMR-selected hits (not fused with lexical hits, which would re-add near-duplicates)"""
+    hits = discard_weak_results(collection_name, query, hits, adaptive)
+    get_retrieval_metrics().record(collection_name, k, [score for _, score in hits], "mmr")
+    app_logger.info(f"Selected {len(hits)}/{k} diverse results from '{collection_name}' for query: {query[:50]}")
+    return hits
+
+
+def rank_results(
+    collection_name: str,
+    query: str,
+    k: int,
+    vector_hits: ScoredDocuments,
+    lexical_hits: List[Tuple[Document, float]],
+    adaptive: bool,
+) -> ScoredDocuments:
+    """
+    Apply the adaptive cutoff to vector and lexical hits and fuse them by reciprocal rank
+
+    Args:
+        collection_name: Name of the collection (selects the minimum score)
+        query: User query
+        k: Maximum number of results (k_max)
+        vector_hits: (Document, relevance) tuples from vector search, best first
+        lexical_hits: (Document, BM25 score) tuples, best first
+        adaptive: Whether to cut results at the score threshold / cliff
+
+    Returns:
+        List of (Document, score) tuples, best first; empty when even the best vector
+        hit is below the collection's minimum score (see discard_weak_results)
+    """
+    if vector_hits and not discard_weak_results(collection_name, query, vector_hits, adaptive):
+        get_retrieval_metrics().record(collection_name, k, [], "below_min_score")
+        return []
+
+    lexical_scored = _normalized_lexical_scores(lexical_hits)
+    reason = "fixed_k"
+
+    if adaptive:
+        vector_hits, reason = adaptive_cutoff(
+            vector_hits,
+            k,
+            min_score=config.get_retrieval_min_score(collection_name),
+            cliff_drop=config.RETRIEVAL_SCORE_CLIFF,
+        )
+        lexical_scored, _ = adaptive_cutoff(lexical_scored, k, cliff_drop=config.RETRIEVAL_SCORE_CLIFF)
+
+    if lexical_scored:
+        scores = {document_key(doc): score for doc, score in lexical_scored}
+        scores.update({document_key(doc): score for doc, score in vector_hits})
+        fused = reciprocal_rank_fusion(
+            [[doc for doc, _ in vector_hits], [doc for doc, _ in lexical_scored]],
+            rrf_k=config.RRF_K,
+        )
+        results = [(doc, scores[document_key(doc)]) for doc, _ in fused[:k]]
+    else:
+        results = vector_hits[:k]
+
+    score_list = [score for _, score in results]
+    get_retrieval_metrics().record(collection_name, k, score_list, reason)
+    app_logger.info(
+        f"Retrieved {len(results)}/{k} results from '{collection_name}' ({reason}); scores: "
+        + ", ".join(f"{score:.3f}" if score is not None else "-" for score in score_list)
+    )
+    return results
+
+
+def discard_weak_results(
+    collection_name: str,
+    query: str,
+    results: ScoredDocuments,
+    adaptive: bool,
+) -> ScoredDocuments:
+    """
+    Treat a search whose best vector hit scores below the collection's minimum as having found nothing
+
+    The adaptive cutoff always keeps the best hit; when even that hit is below the
+    minimum relevance, nothing relevant was found and the search is answered (and
+    remembered by the negative cache) as empty. Only vector relevance is judged:
+    BM25 scores are normalized by the best lexical hit, so any keyword match (even
+    on "what is the") would score 1.0.
+
+    Args:
+        collection_name: Name of the collection (selects the minimum score)
+        query: User query
+        results: (Document, vector relevance) tuples, best first
+        adaptive: Whether the adaptive cutoff applies (scores are relevance scores)
+
+    Returns:
+        results unchanged, or [] when every score is below the minimum
+    """
+    scores = [score for _, score in results]
+    if not adaptive or not scores or None in scores:
+        return results
+
+    min_score = config.get_retrieval_min_score(collection_name)
+    if max(scores) >= min_score:
+        return results
+
+    app_logger.info(
+        f"Best '{collection_name}' hit scores {max(scores):.3f} < {min_score:.3f}; "
+        f"no relevant results for query: {query[:50]}"
+    )
+    return []
+
+
+def _log_phrase_fallback(collection_name: str, query: str) -> None:
+    """Log a quoted-phrase filter that matched nothing (the search is repeated without it)"""
+    app_logger.info(
+        f"Quoted phrase matched nothing in '{collection_name}'; searching without it: {query[:50]}"
+    )
+
+
+def _cached_results(
+    collection_name: str,
+    query: str,
+    k: int,
+    adaptive: bool,
+    diversify: bool,
+    chroma_filters: Dict[str, Any],
+) -> Tuple[Optional[ResultCacheKey], int, Optional[ScoredDocuments]]:
+    """Look up cached results; returns (key, generation, results) with key None when caching is off"""
+    if not config.RETRIEVAL_RESULT_CACHE_ENABLED:
+        return None, 0, None
+
+    reranker = config.RERANKER if config.RERANK_ENABLED else None
+    key = result_cache_key(
+        collection_name,
+        query,
+        k,
+        {"adaptive": adaptive, "diversify": diversify, "reranker": reranker, "filters": chroma_filters},
+    )
+    # Read the generation before searching so a concurrent ingest leaves this entry stale
+    generation = get_collection_generations().current(collection_name)
+    results = get_retrieval_result_cache().get(key, generation)
+    if results is not None:
+        app_logger.info(f"Retrieval result cache hit for '{collection_name}': {query[:50]}")
+    return key, generation, results
+
+
+def check_known_empty(collection_name: str, query: str) -> Tuple[Optional[NegativeCacheKey], int, bool]:
+    """
+    Check the negative cache before searching a collection (or the policy CAG snapshot)
+
+    Args:
+        collection_name: Name of the collection
+        query: User query
+
+    Returns:
+        (key, generation, known_empty); key is None when the negative cache is off
+    """
+    if not config.NEGATIVE_RESULT_CACHE_ENABLED:
+        return None, 0, False
+
+    key = negative_cache_key(collection_name, query)
+    # Read the generation before searching so a concurrent ingest leaves a new entry stale
+    generation = get_collection_generations().current(collection_name)
+    if get_negative_result_cache().is_known_empty(key, generation):
+        app_logger.info(f"Negative result cache hit for '{collection_name}': {query[:50]}")
+        return key, generation, True
+    return key, generation, False
+
+
+def record_if_empty(key: Optional[NegativeCacheKey], generation: int, results: ScoredDocuments) -> None:
+    """
+    Remember a search that returned nothing (no hits, or none above the minimum score)
+
+    Args:
+        key: Key from check_known_empty (None when the negative cache is off)
+        generation: Collection generation read by check_known_empty
+        results: Results of the search
+    """
+    if key is not None and not results:
+        get_negative_result_cache().record(key, generation)
+
+
+def search_collection_scored(
+    vectorstore: Any,
+    collection_name: str,
+    query: str,
+    k: int,
+    adaptive: bool = True,
+    diversify: bool = False,
+) -> ScoredDocuments:
+    """
+    Hybrid lexical + vector search over a knowledge base collection, with relevance scores
+
+    With adaptive k enabled, up to k results are returned: the result ends at the
+    first hit below the collection's minimum score or after a score cliff, and is
+    empty when even the best hit scores below the minimum.
+
+    Args:
+        vectorstore: LangChain Chroma vector store for the collection
+        collection_name: Name of the collection (selects the lexical index)
+        query: User query
+        k: Maximum number of documents to return (k_max)
+        adaptive: Apply the adaptive cutoff (disable for queries that need every match)
+        diversify: Select vector hits by maximal marginal relevance (see mmr.py)
+
+    Returns:
+        List of (Document, score) tuples, best first. Scores are cosine relevance in
+        [0, 1] (normalized BM25 for keyword-only matches); None when adaptive k is
+        disabled and vector search ran without scores. Reranker scores replace them
+        when RERANK_ENABLED is set.
+    """
+    if isinstance(vectorstore, RemoteVectorStore):
+        return vectorstore.search_scored(query, k, adaptive=adaptive, diversify=diversify)
+
+    adaptive = adaptive and config.ADAPTIVE_K_ENABLED
+    empty_key, empty_generation, known_empty = check_known_empty(collection_name, query)
+    if known_empty:
+        return []
+
+    chroma_filters = resolve_query_filters(collection_name, vectorstore, query) if config.QUERY_FILTERS_ENABLED else {}
+    key, generation, cached = _cached_results(collection_name, query, k, adaptive, diversify, chroma_filters)
+    if cached is not None:
+        return cached
+
+    with get_collection_swap_lock(collection_name).reading():
+        candidates = _search_collection_scored(
+            vectorstore, collection_name, query, rerank_candidate_count(k), adaptive, diversify, chroma_filters
+        )
+        if not candidates and chroma_filters.get("where_document"):
+            _log_phrase_fallback(collection_name, query)
+            candidates = _search_collection_scored(
+                vectorstore, collection_name, query, rerank_candidate_count(k), adaptive, diversify,
+                without_phrase_filter(chroma_filters),
+            )
+    results = rerank_results(collection_name, query, candidates, k)
+    if key is not None:
+        get_retrieval_result_cache().put(key, generation, results)
+    record_if_empty(empty_key, empty_generation, results)
+    return results
+
+
+def _search_collection_scored(
+    vectorstore: Any,
+    collection_name: str,
+    query: str,
+    k: int,
+    adaptive: bool,
+    diversify: bool,
+    chroma_filters: Dict[str, Any],
+) -> ScoredDocuments:
+    """Uncached body of search_collection_scored"""
+    lexical_hits: List[Tuple[Document, float]] = []
+    index = None
+
+    if config.LEXICAL_SEARCH_ENABLED:
+        index = ensure_lexical_index(collection_name, vectorstore)
+        lexical_hits = _filtered_lexical_hits(index, query, k, chroma_filters)
+
+    if lexical_hits:
+        decisive = _filtered_decisive_hits(query, index, lexical_hits, k, chroma_filters)
+        if decisive:
+            return _decisive_result(collection_name, query, decisive, lexical_hits, k)
+
+    if diversify:
+        embedding = vectorstore.embeddings.embed_query(query)
+        return _diverse_results(
+            collection_name,
+            query,
+            k,
+            mmr_vector_hits(vectorstore, collection_name, embedding, k, adaptive, chroma_filters),
+            adaptive,
+        )
+
+    vector_hits = None if chroma_filters else get_shared_collection_hits(collection_name, query, k)
+    if vector_hits is None:
+        filter_kwargs = _vector_filter_kwargs(chroma_filters)
+        if adaptive:
+            space = collection_space(vectorstore)
+            vector_hits = [
+                (doc, relevance_from_distance(distance, space))
+                for doc, distance in vectorstore.similarity_search_with_score(query=query, k=k, **filter_kwargs)
+            ]
+        else:
+            vector_hits = [
+                (doc, None) for doc in vectorstore.similarity_search(query=query, k=k, **filter_kwargs)
+            ]
+
+    return rank_results(collection_name, query, k, vector_hits, lexical_hits, adaptive)
+
+
+def search_collection(
+    vectorstore: Any,
+    collection_name: str,
+    query: str,
+    k: int,
+) -> List[Document]:
+    """
+    Hybrid lexical + vector search over a knowledge base collection
+
+    Args:
+        vectorstore: LangChain Chroma vector store for the collection
+        collection_name: Name of the collection (selects the lexical index)
+        query: User query
+        k: Maximum number of documents to return
+
+    Returns:
+        List of Document objects, best first
+    """
+    return [doc for doc, _ in search_collection_scored(vectorstore, collection_name, query, k)]
+
+
+async def asearch_collection_scored(
+    vectorstore: Any,
+    collection_name: str,
+    query: str,
+    k: int,
+    adaptive: bool = True,
+    diversify: bool = False,
+) -> ScoredDocuments:
+    """
+    Async counterpart of search_collection_scored that never blocks the event loop
+
+    The query is embedded with the async embeddings client; building the lexical
+    index and the ChromaDB query run on the bounded retrieval executor.
+
+    Args:
+        vectorstore: LangChain Chroma vector store for the collection
+        collection_name: Name of the collection (selects the lexical index)
+        query: User query
+        k: Maximum number of documents to return (k_max)
+        adaptive: Apply the adaptive cutoff (disable for queries that need every match)
+        diversify: Select vector hits by maximal marginal relevance (see mmr.py)
+
+    Returns:
+        List of (Document, score) tuples, best first
+    """
+    if isinstance(vectorstore, RemoteVectorStore):
+        return await run_in_retrieval_executor(
+            vectorstore.search_scored, query, k, adaptive=adaptive, diversify=diversify
+        )
+
+    adaptive = adaptive and config.ADAPTIVE_K_ENABLED
+    empty_key, empty_generation, known_empty = check_known_empty(collection_name, query)
+    if known_empty:
+        return []
+
+    chroma_filters: Dict[str, Any] = {}
+    if config.QUERY_FILTERS_ENABLED:
+        if is_lexical_index_current(collection_name):
+            chroma_filters = resolve_query_filters(collection_name, vectorstore, query)
+        elif extract_query_filters(query):
+            chroma_filters = await run_in_retrieval_executor(
+                resolve_query_filters, collection_name, vectorstore, query
+            )
+    key, generation, cached = _cached_results(collection_name, query, k, adaptive, diversify, chroma_filters)
+    if cached is not None:
+        return cached
+
+    # Wait for a running version swap on the executor rather than on the event loop
+    swap_lock = get_collection_swap_lock(collection_name)
+    if not swap_lock.try_acquire_read():
+        await run_in_retrieval_executor(swap_lock.acquire_read)
+    try:
+        candidates = await _asearch_collection_scored(
+            vectorstore, collection_name, query, rerank_candidate_count(k), adaptive, diversify, chroma_filters
+        )
+        if not candidates and chroma_filters.get("where_document"):
+            _log_phrase_fallback(collection_name, query)
+            candidates = await _asearch_collection_scored(
+                vectorstore, collection_name, query, rerank_candidate_count(k), adaptive, diversify,
+                without_phrase_filter(chroma_filters),
+            )
+    finally:
+        swap_lock.release_read()
+    results = rerank_results(collection_name, query, candidates, k)
+    if key is not None:
+        get_retrieval_result_cache().put(key, generation, results)
+    record_if_empty(empty_key, empty_generation, results)
+    return results
+
+
+async def _asearch_collection_scored(
+    vectorstore: Any,
+    collection_name: str,
+    query: str,
+    k: int,
+    adaptive: bool,
+    diversify: bool,
+    chroma_filters: Dict[str, Any],
+) -> ScoredDocuments:
+    """Uncached body of asearch_collection_scored"""
+    lexical_hits: List[Tuple[Document, float]] = []
+    index = None
+
+    if config.LEXICAL_SEARCH_ENABLED:
+        index = get_lexical_index(collection_name)
+        if not is_lexical_index_current(collection_name):
+            index = await run_in_retrieval_executor(ensure_lexical_index, collection_name, vectorstore)
+        lexical_hits = _filtered_lexical_hits(index, query, k, chroma_filters)
+
+    if lexical_hits:
+        decisive = _filtered_decisive_hits(query, index, lexical_hits, k, chroma_filters)
+        if decisive:
+            return _decisive_result(collection_name, query, decisive, lexical_hits, k)
+
+    if diversify:
+        embedding = await vectorstore.embeddings.aembed_query(query)
+        hits = await run_in_retrieval_executor(
+            mmr_vector_hits, vectorstore, collection_name, embedding, k, adaptive, chroma_filters
+        )
+        return _diverse_results(collection_name, query, k, hits, adaptive)
+
+    vector_hits = None if chroma_filters else get_shared_collection_hits(collection_name, query, k)
+    if vector_hits is None:
+        embedding = await vectorstore.embeddings.aembed_query(query)
+        filter_kwargs = _vector_filter_kwargs(chroma_filters)
+        if adaptive:
+            space = collection_space(vectorstore)
+            # Despite its name, this Chroma method returns raw distances
+            hits = await run_in_retrieval_executor(
+                vectorstore.similarity_search_by_vector_with_relevance_scores,
+                embedding=embedding,
+                k=k,
+                **filter_kwargs,
+            )
+            vector_hits = [(doc, relevance_from_distance(distance, space)) for doc, distance in hits]
+        else:
+            docs = await run_in_retrieval_executor(
+                vectorstore.similarity_search_by_vector, embedding=embedding, k=k, **filter_kwargs
+            )
+            vector_hits = [(doc, None) for doc in docs]
+
+    return rank_results(collection_name, query, k, vector_hits, lexical_hits, adaptive)
+
+
+async def asearch_collection(
+    vectorstore: Any,
+    collection_name: str,
+    query: str,
+    k: int,
+) -> List[Document]:
+    """
+    Async counterpart of search_collection
+
+    Args:
+        vectorstore: LangChain Chroma vector store for the collection
+        collection_name: Name of the collection (selects the lexical index)
+        query: User query
+        k: Maximum number of documents to return
+
+    Returns:
+        List of Document objects, best first
+    """
+    return [doc for doc, _ in await asearch_collection_scored(vectorstore, collection_name, query, k)]
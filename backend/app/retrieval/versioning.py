@@ -0,0 +1,302 @@
+"""
+Replace-by-source document versioning with an atomic swap
+
+LangChain Version: v1.0+
+Documentation Reference: https://docs.langchain.com/oss/python/langchain/knowledge-base
+Last Verified: November 2025
+
+Ingestion treats source_file as a document key: a new upload of a file is
+diffed against the content-addressed chunk IDs stored for it (see
+ingest_data.plan_chunk_writes), and replace_source_chunks upserts only the new
+chunks and deletes only the removed ones. Chunks already stored keep their vectors;
+those whose chunk_index or total_chunks moved get their metadata updated in the
+same swap so neighbouring chunks still line up for context packing.
+
+ChromaDB has no transactions, so the swap is made atomic for searches with a
+per-collection readers-writer lock. search_collection_scored holds the shared
+side for a whole search (lexical and vector); replace_source_chunks embeds the
+new chunks first, then takes the exclusive side just for the upsert, the delete,
+the metadata update, the lexical index update and the generation bump. A search therefore sees either
+the old version of a document or the new one, never a mix of both.
+
+If an upsert batch fails, or the delete of the removed chunks still fails after
+retries, the chunks upserted so far are rolled back so the old version stays whole. A failed metadata update leaves
+the new version with stale chunk metadata until the document is ingested again.
+Whatever happens, the lexical index
+is brought in step with the store and the generation is bumped.
+
+The lock only excludes searches in the same process. With several API worker
+processes, set RETRIEVAL_SERVER_SOCKET so every search and every swap runs in
+the retrieval server (see retrieval_server.py); otherwise a search in another
+worker can observe a half-applied swap.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.documents import Document
+from app.retrieval.lexical_index import get_lexical_index, index_documents
+from app.retrieval.result_cache import bump_collection_generation
+from app.retrieval.retrieval_server import RemoteVectorStore
+from app.utils.logger import app_logger
+
+
+# Attempts (with exponential backoff) for the delete and the rollback of a swap
+_WRITE_ATTEMPTS = 3
+_RETRY_DELAY_SECONDS = 0.2
+
+
+class CollectionSwapLock:
+    """Readers-writer lock: searches share a collection, a version swap waits for them and excludes them"""
+
+    def __init__(self):
+        """Initialize an unlocked swap lock"""
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._swapping = False
+        self._swaps_waiting = 0
+
+    def try_acquire_read(self) -> bool:
+        """Take the shared side if no swap is running or waiting (never blocks)"""
+        with self._condition:
+            if self._swapping or self._swaps_waiting:
+                return False
+            self._readers += 1
+            return True
+
+    def acquire_read(self) -> None:
+        """Take the shared side, waiting for a running or waiting swap to finish first"""
+        with self._condition:
+            while self._swapping or self._swaps_waiting:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        """Release the shared side (from any thread)"""
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        """Hold the shared side for the duration of a search"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def swapping(self) -> Iterator[None]:
+        """Hold the exclusive side; new searches wait until the swap is done"""
+        with self._condition:
+            self._swaps_waiting += 1
+            while self._swapping or self._readers:
+                self._condition.wait()
+            self._swaps_waiting -= 1
+            self._swapping = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._swapping = False
+                self._condition.notify_all()
+
+
+# Global swap lock registry (one lock per collection)
+_swap_locks: Dict[str, CollectionSwapLock] = {}
+_registry_lock = threading.Lock()
+
+
+def get_collection_swap_lock(collection_name: str) -> CollectionSwapLock:
+    """
+    Get or create the swap lock of a collection
+
+    Args:
+        collection_name: Name of the collection
+
+    Returns:
+        CollectionSwapLock instance
+    """
+    with _registry_lock:
+        swap_lock = _swap_locks.get(collection_name)
+        if swap_lock is None:
+            swap_lock = CollectionSwapLock()
+            _swap_locks[collection_name] = swap_lock
+        return swap_lock
+
+
+def store_embedded_documents(
+    vectorstore: Any,
+    ids: List[str],
+    documents: List[Document],
+    embeddings: List[List[float]],
+    batch_size: int = 1000,
+    written: Optional[List[str]] = None,
+) -> None:
+    """
+    Upsert documents with precomputed embeddings, in batches of at most batch_size records
+
+    Args:
+        vectorstore: KnowledgeBaseChroma or NumpyVectorStore (anything with upsert_embedded)
+        ids: One unique ID per document
+        documents: Documents to store
+        embeddings: One vector per document
+        batch_size: Maximum records per upsert call
+        written: Optional list extended with the IDs of each batch as it is attempted
+            (a failed batch may still be partly stored), for rolling them back
+    """
+    batch_size = max(1, batch_size)
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        if written is not None:
+            written.extend(ids[start:end])
+        vectorstore.upsert_embedded(ids[start:end], documents[start:end], embeddings[start:end])
+
+
+def _delete_with_retries(vectorstore: Any, ids: List[str]) -> None:
+    """Delete records by ID, retrying transient failures with exponential backoff"""
+    for attempt in range(_WRITE_ATTEMPTS):
+        try:
+            vectorstore.delete(ids=list(ids))
+            return
+        except Exception as e:
+            if attempt == _WRITE_ATTEMPTS - 1:
+                raise
+            app_logger.warning(f"Deleting {len(ids)} chunks failed ({e}); retry {attempt + 1}")
+            time.sleep(_RETRY_DELAY_SECONDS * 2 ** attempt)
+
+
+def update_document_metadata(
+    vectorstore: Any,
+    ids: List[str],
+    documents: List[Document],
+    batch_size: int = 1000,
+) -> None:
+    """
+    Replace the metadata of stored documents with that of documents, without re-embedding
+
+    Args:
+        vectorstore: KnowledgeBaseChroma or NumpyVectorStore (anything with update_metadata)
+        ids: IDs of stored documents
+        documents: Documents carrying the new metadata (same order as ids)
+        batch_size: Maximum records per update call
+    """
+    batch_size = max(1, batch_size)
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        vectorstore.update_metadata(ids[start:end], [doc.metadata for doc in documents[start:end]])
+
+
+def _roll_back(vectorstore: Any, collection_name: str, ids: List[str]) -> None:
+    """Remove the chunks a failed swap upserted, so the previous version stays whole"""
+    if not ids:
+        return
+    try:
+        _delete_with_retries(vectorstore, ids)
+        app_logger.warning(f"Rolled back {len(ids)} new chunks in '{collection_name}' after a failed swap")
+    except Exception as e:
+        app_logger.error(
+            f"Rolling back {len(ids)} new chunks in '{collection_name}' failed ({e}); "
+            "old and new chunks are both stored until the document is ingested again"
+        )
+
+
+def replace_source_chunks(
+    vectorstore: Any,
+    collection_name: str,
+    ids: List[str],
+    documents: List[Document],
+    removed_ids: List[str],
+    embeddings: Optional[List[List[float]]] = None,
+    batch_size: int = 1000,
+    updated_ids: Optional[List[str]] = None,
+    updated_documents: Optional[List[Document]] = None,
+) -> None:
+    """
+    Atomically swap in new chunks and delete removed ones (of one or more source documents)
+
+    Atomic for searches in this process only; see the module docstring for several workers.
+
+    Args:
+        vectorstore: Vector store of the collection
+        collection_name: Name of the collection
+        ids: Content-addressed IDs of the new chunks
+        documents: New chunks (same order as ids)
+        removed_ids: IDs of stored chunks the new versions no longer contain
+        embeddings: Precomputed vectors of the new chunks (default: embedded here, before the swap)
+        batch_size: Maximum records per upsert call
+        updated_ids: IDs of stored chunks whose metadata changed (not re-embedded)
+        updated_documents: Those chunks with their new metadata (same order as updated_ids)
+    """
+    updated_ids = list(updated_ids or [])
+    updated_documents = list(updated_documents or [])
+    if not ids and not removed_ids and not updated_ids:
+        return
+
+    # A repeated ID (same source file and content twice in one batch) keeps its last chunk
+    last_position = {doc_id: position for position, doc_id in enumerate(ids)}
+    if len(last_position) != len(ids):
+        keep = sorted(last_position.values())
+        ids = [ids[position] for position in keep]
+        documents = [documents[position] for position in keep]
+        if embeddings is not None:
+            embeddings = [embeddings[position] for position in keep]
+    last_update = {doc_id: position for position, doc_id in enumerate(updated_ids)}
+    if len(last_update) != len(updated_ids):
+        keep = sorted(last_update.values())
+        updated_ids = [updated_ids[position] for position in keep]
+        updated_documents = [updated_documents[position] for position in keep]
+
+    if isinstance(vectorstore, RemoteVectorStore):
+        # The retrieval server owns the searches, so it performs the swap under its own lock
+        vectorstore.replace_chunks(
+            ids=list(ids),
+            documents=list(documents),
+            removed_ids=list(removed_ids),
+            updated_ids=updated_ids,
+            updated_documents=updated_documents,
+        )
+        return
+
+    if embeddings is None and documents:
+        embeddings = vectorstore.embeddings.embed_documents([doc.page_content for doc in documents])
+
+    with get_collection_swap_lock(collection_name).swapping():
+        index = get_lexical_index(collection_name)
+        swapped = False
+        try:
+            written: List[str] = []
+            try:
+                if ids:
+                    store_embedded_documents(vectorstore, ids, documents, embeddings, batch_size, written)
+                if removed_ids:
+                    _delete_with_retries(vectorstore, removed_ids)
+            except Exception:
+                _roll_back(vectorstore, collection_name, written)
+                raise
+            if updated_ids:
+                update_document_metadata(vectorstore, updated_ids, updated_documents, batch_size)
+            swapped = True
+        finally:
+            if swapped:
+                # Keep the collection's BM25 lexical index in step with ChromaDB
+                index_documents(collection_name, ids + updated_ids, documents + updated_documents)
+                for doc_id in removed_ids:
+                    index.remove(doc_id)
+            else:
+                # The store may hold part of the swap: rebuild the index from it on next use
+                index.clear()
+                index.loaded = False
+
+            # Cached retrieval results for this collection are now stale
+            generation = bump_collection_generation(collection_name)
+            if swapped:
+                index.advance(generation)
+
+    app_logger.info(
+        f"Swapped {len(ids)} new and {len(removed_ids)} removed chunks into '{collection_name}' "
+        f"({len(updated_ids)} with updated metadata)"
+    )
@@ -15,6 +15,7 @@ import asyncio
 import uuid
 from app.schemas.chat import ChatMessage, ChatResponse, ChatStreamChunk
 from app.agents.orchestrator import get_supervisor_agent_singleton
+from app.retrieval.multi_search import retrieval_request_scope
 from app.utils.logger import app_logger
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -370,6 +371,23 @@ async def generate_agent_stream(supervisor_agent, message: str, session_id: str)
         yield "data: [DONE]\n\n"
 
 
+async def scoped_agent_stream(stream):
+    """
+    Run an agent stream inside a retrieval request scope
+    
+    Fan-out search results are shared by every tool call made while the stream runs.
+    
+    Args:
+        stream: Async generator from generate_agent_stream
+        
+    Yields:
+        Chunks from the wrapped stream
+    """
+    with retrieval_request_scope():
+        async for chunk in stream:
+            yield chunk
+
+
 def get_agent_response_non_streaming(supervisor_agent, message: str, session_id: str) -> ChatResponse:
     """
     Get non-streaming response from supervisor agent
@@ -464,7 +482,7 @@ async def chat(message: ChatMessage):
         if message.stream:
             # Return streaming SSE response
             return StreamingResponse(
-                generate_agent_stream(supervisor_agent, message.message, session_id),
+                scoped_agent_stream(generate_agent_stream(supervisor_agent, message.message, session_id)),
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
@@ -474,11 +492,12 @@ async def chat(message: ChatMessage):
             )
         else:
             # Return non-streaming JSON response
-            response = get_agent_response_non_streaming(
-                supervisor_agent,
-                message.message,
-                session_id
-            )
+            with retrieval_request_scope():
+                response = get_agent_response_non_streaming(
+                    supervisor_agent,
+                    message.message,
+                    session_id
+                )
             return response.model_dump()
             
     except HTTPException:
@@ -5,6 +5,19 @@ Health endpoint router
 from fastapi import APIRouter, HTTPException
 from datetime import datetime
 from app.retrieval.chroma_client import get_chroma_client
+from app.retrieval.embedding_cache import get_query_embedding_cache
+from app.retrieval.persistent_embedding_cache import get_persistent_embedding_cache
+from app.retrieval.embedding_scheduler import get_embedding_scheduler
+from app.retrieval.cag_retriever import get_policy_cache
+from app.retrieval.context_packer import get_packing_stats
+from app.retrieval.executor import run_in_retrieval_executor
+from app.retrieval.lexical_index import lexical_index_stats
+from app.retrieval.policy_semantic_cache import get_policy_semantic_cache
+from app.retrieval.relevance import get_retrieval_metrics
+from app.retrieval.rerank import get_rerank_stats
+from app.retrieval.result_cache import get_retrieval_result_cache
+from app.retrieval.negative_cache import get_negative_result_cache
+from app.utils.config import config
 from app.utils.logger import app_logger
 
 router = APIRouter(prefix="/health", tags=["health"])
@@ -46,3 +59,34 @@ async def health_check():
             }
         )
 
+
+
+@router.get("/retrieval")
+async def retrieval_stats():
+    """
+    Retrieval cache and adaptive k statistics endpoint
+    
+    Returns:
+        Hit/miss/eviction counters for the retrieval caches and per-collection
+        adaptive retrieval metrics (results returned vs k_max, scores, cutoffs)
+        and context packing totals (tokens packed vs the legacy format)
+    """
+    # The persistent cache flushes deferred writes to SQLite, so keep it off the event loop
+    persistent_stats = None
+    if config.PERSISTENT_EMBEDDING_CACHE_ENABLED:
+        persistent_stats = await run_in_retrieval_executor(get_persistent_embedding_cache().stats)
+    
+    return {
+        "query_embedding_cache": get_query_embedding_cache().stats(),
+        "persistent_embedding_cache": persistent_stats,
+        "embedding_scheduler": get_embedding_scheduler().stats() if config.EMBEDDING_SCHEDULER_ENABLED else None,
+        "retrieval_result_cache": get_retrieval_result_cache().stats(),
+        "negative_result_cache": get_negative_result_cache().stats(),
+        "policy_cag_cache": get_policy_cache().stats(),
+        "policy_semantic_cache": get_policy_semantic_cache().stats(),
+        "lexical_indexes": lexical_index_stats(),
+        "adaptive_retrieval": get_retrieval_metrics().stats(),
+        "context_packing": get_packing_stats().stats(),
+        "rerank": get_rerank_stats().stats(),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
@@ -95,6 +95,8 @@ async def process_upload_task(
             upload_status[upload_id]["files"][file_name]["progress"] = 100.0
             upload_status[upload_id]["files"][file_name]["target_collection"] = result["target_collection"]
             upload_status[upload_id]["files"][file_name]["chunks_count"] = result["chunks_count"]
+            for count in ("new_chunks", "unchanged_chunks", "removed_chunks"):
+                upload_status[upload_id]["files"][file_name][count] = result.get(count)
             upload_status[upload_id]["updated_at"] = datetime.utcnow()
             
             # Update overall progress
@@ -25,6 +25,15 @@ class UploadFileStatus(BaseModel):
     chunks_count: Optional[int] = Field(
         None, description="Number of chunks created"
     )
+    new_chunks: Optional[int] = Field(
+        None, description="Number of chunks embedded and stored (not already stored)"
+    )
+    unchanged_chunks: Optional[int] = Field(
+        None, description="Number of chunks already stored from a previous upload"
+    )
+    removed_chunks: Optional[int] = Field(
+        None, description="Number of stored chunks of this file deleted because the new version no longer contains them"
+    )
 
 
 class UploadRequest(BaseModel):
@@ -47,6 +47,128 @@ class Config:
     # ChromaDB Configuration
     CHROMA_DB_PATH: str = os.getenv("CHROMA_DB_PATH", "./chroma_db")
     
+    # Vector Backend Configuration ("chroma", or "numpy" for exact search over a memory-mapped matrix;
+    # NumPy store default: inside CHROMA_DB_PATH)
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    NUMPY_STORE_PATH: str = os.getenv("NUMPY_STORE_PATH", "")
+    # Retrieval Server Configuration (Unix socket of `python -m app.retrieval.retrieval_server`; when set,
+    # API workers use it instead of opening ChromaDB themselves)
+    RETRIEVAL_SERVER_SOCKET: str = os.getenv("RETRIEVAL_SERVER_SOCKET", "")
+    RETRIEVAL_SERVER_TIMEOUT: float = float(os.getenv("RETRIEVAL_SERVER_TIMEOUT", "30"))
+    # HNSW Index Configuration per collection, applied when a Chroma collection is created
+    # (empty/0 = Chroma default: l2, M 16, construction_ef 100, search_ef 100)
+    HNSW_SPACE_BILLING: str = os.getenv("HNSW_SPACE_BILLING", "")
+    HNSW_SPACE_TECHNICAL: str = os.getenv("HNSW_SPACE_TECHNICAL", "")
+    HNSW_SPACE_POLICY: str = os.getenv("HNSW_SPACE_POLICY", "")
+    HNSW_M_BILLING: int = int(os.getenv("HNSW_M_BILLING", "0"))
+    HNSW_M_TECHNICAL: int = int(os.getenv("HNSW_M_TECHNICAL", "0"))
+    HNSW_M_POLICY: int = int(os.getenv("HNSW_M_POLICY", "0"))
+    HNSW_CONSTRUCTION_EF_BILLING: int = int(os.getenv("HNSW_CONSTRUCTION_EF_BILLING", "0"))
+    HNSW_CONSTRUCTION_EF_TECHNICAL: int = int(os.getenv("HNSW_CONSTRUCTION_EF_TECHNICAL", "0"))
+    HNSW_CONSTRUCTION_EF_POLICY: int = int(os.getenv("HNSW_CONSTRUCTION_EF_POLICY", "0"))
+    HNSW_SEARCH_EF_BILLING: int = int(os.getenv("HNSW_SEARCH_EF_BILLING", "0"))
+    HNSW_SEARCH_EF_TECHNICAL: int = int(os.getenv("HNSW_SEARCH_EF_TECHNICAL", "0"))
+    HNSW_SEARCH_EF_POLICY: int = int(os.getenv("HNSW_SEARCH_EF_POLICY", "0"))
+    
+    # Quantized first pass for the NumPy backend ("none", "float16" or "int8"); the top
+    # k * NUMPY_RESCORE_FACTOR candidates are rescored exactly from the float32 matrix
+    NUMPY_STORE_QUANTIZATION: str = os.getenv("NUMPY_STORE_QUANTIZATION", "none").lower()
+    NUMPY_RESCORE_FACTOR: int = int(os.getenv("NUMPY_RESCORE_FACTOR", "4"))
+    # Coarse first pass over the first N dimensions of each stored vector (0 = full vectors);
+    # text-embedding-3 prefixes are valid lower-dimension embeddings
+    NUMPY_COARSE_DIMENSIONS: int = int(os.getenv("NUMPY_COARSE_DIMENSIONS", "0"))
+    
+    # Query Embedding Cache Configuration
+    QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+    
+    # Persistent Embedding Cache Configuration (SQLite, shared by ingestion and queries; default: inside CHROMA_DB_PATH)
+    PERSISTENT_EMBEDDING_CACHE_ENABLED: bool = os.getenv("PERSISTENT_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    PERSISTENT_EMBEDDING_CACHE_PATH: str = os.getenv("PERSISTENT_EMBEDDING_CACHE_PATH", "")
+    PERSISTENT_EMBEDDING_CACHE_MAX_MB: int = int(os.getenv("PERSISTENT_EMBEDDING_CACHE_MAX_MB", "1024"))
+    
+    # Embedding Scheduler Configuration (process-wide coalescing of embedding API calls)
+    EMBEDDING_SCHEDULER_ENABLED: bool = os.getenv("EMBEDDING_SCHEDULER_ENABLED", "true").lower() == "true"
+    # Estimated tokens and texts per API call (OpenAI accepts at most 300k tokens / 2048 inputs per request;
+    # 1000 texts matches OpenAIEmbeddings' own chunk_size, so one batch is one HTTP request)
+    EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+    EMBEDDING_BATCH_MAX_TEXTS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TEXTS", "1000"))
+    EMBEDDING_BATCH_LINGER_MS: int = int(os.getenv("EMBEDDING_BATCH_LINGER_MS", "10"))
+    EMBEDDING_MAX_IN_FLIGHT: int = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+    EMBEDDING_MAX_RETRIES: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+    EMBEDDING_BACKOFF_BASE_SECONDS: float = float(os.getenv("EMBEDDING_BACKOFF_BASE_SECONDS", "1.0"))
+    EMBEDDING_BACKOFF_MAX_SECONDS: float = float(os.getenv("EMBEDDING_BACKOFF_MAX_SECONDS", "60.0"))
+    
+    # Retrieval Result Cache Configuration (invalidated by per-collection ingest generations)
+    RETRIEVAL_RESULT_CACHE_ENABLED: bool = os.getenv("RETRIEVAL_RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RETRIEVAL_RESULT_CACHE_SIZE: int = int(os.getenv("RETRIEVAL_RESULT_CACHE_SIZE", "1024"))
+    RETRIEVAL_RESULT_CACHE_MAX_BYTES: int = int(os.getenv("RETRIEVAL_RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    RETRIEVAL_RESULT_CACHE_TTL_SECONDS: int = int(os.getenv("RETRIEVAL_RESULT_CACHE_TTL_SECONDS", "300"))
+    
+    # Collection generations shared by all worker processes (SQLite file; default: CHROMA_DB_PATH/generations.sqlite3)
+    SHARED_GENERATIONS_ENABLED: bool = os.getenv("SHARED_GENERATIONS_ENABLED", "true").lower() == "true"
+    GENERATIONS_PATH: str = os.getenv("GENERATIONS_PATH", "")
+    RETRIEVAL_GENERATION_CHECK_SECONDS: float = float(os.getenv("RETRIEVAL_GENERATION_CHECK_SECONDS", "1.0"))
+    
+    # Negative Result Cache Configuration (searches that found nothing; short TTL, invalidated by ingest)
+    NEGATIVE_RESULT_CACHE_ENABLED: bool = os.getenv("NEGATIVE_RESULT_CACHE_ENABLED", "true").lower() == "true"
+    NEGATIVE_RESULT_CACHE_SIZE: int = int(os.getenv("NEGATIVE_RESULT_CACHE_SIZE", "2048"))
+    NEGATIVE_RESULT_CACHE_TTL_SECONDS: int = int(os.getenv("NEGATIVE_RESULT_CACHE_TTL_SECONDS", "300"))
+    
+    # Policy CAG Configuration (serve policy context from the preloaded in-memory snapshot)
+    POLICY_CAG_ENABLED: bool = os.getenv("POLICY_CAG_ENABLED", "true").lower() == "true"
+    
+    # Policy Semantic Cache Configuration (get_cached_policy_info; per session, optionally shared globally)
+    POLICY_SEMANTIC_CACHE_ENABLED: bool = os.getenv("POLICY_SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    POLICY_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("POLICY_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    POLICY_SEMANTIC_CACHE_TTL_SECONDS: int = int(os.getenv("POLICY_SEMANTIC_CACHE_TTL_SECONDS", "1800"))
+    POLICY_SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("POLICY_SEMANTIC_CACHE_MAX_ENTRIES", "32"))
+    POLICY_SEMANTIC_CACHE_MAX_SESSIONS: int = int(os.getenv("POLICY_SEMANTIC_CACHE_MAX_SESSIONS", "1024"))
+    POLICY_SEMANTIC_CACHE_GLOBAL: bool = os.getenv("POLICY_SEMANTIC_CACHE_GLOBAL", "false").lower() == "true"
+    
+    # Hybrid Lexical Search Configuration (BM25 index fused with vector results)
+    LEXICAL_SEARCH_ENABLED: bool = os.getenv("LEXICAL_SEARCH_ENABLED", "true").lower() == "true"
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    
+    # Concurrent Retrieval Configuration (bounded thread pool for ChromaDB queries)
+    RETRIEVAL_MAX_WORKERS: int = int(os.getenv("RETRIEVAL_MAX_WORKERS", "8"))
+    
+    # Multi-file Ingestion Pipeline Configuration (parse/chunk processes -> embedding threads -> one writer)
+    INGEST_PIPELINE_ENABLED: bool = os.getenv("INGEST_PIPELINE_ENABLED", "true").lower() == "true"
+    INGEST_PARSE_WORKERS: int = int(os.getenv("INGEST_PARSE_WORKERS", "0"))  # 0 = one per CPU core
+    INGEST_EMBED_CONCURRENCY: int = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+    INGEST_EMBED_BATCH_SIZE: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+    INGEST_WRITE_BATCH_SIZE: int = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "1000"))
+    INGEST_MAX_IN_FLIGHT: int = int(os.getenv("INGEST_MAX_IN_FLIGHT", "32"))
+    
+    # Adaptive k Configuration (relevance scores are cosine similarities in [0, 1])
+    ADAPTIVE_K_ENABLED: bool = os.getenv("ADAPTIVE_K_ENABLED", "true").lower() == "true"
+    RETRIEVAL_MIN_SCORE_BILLING: float = float(os.getenv("RETRIEVAL_MIN_SCORE_BILLING", "0.2"))
+    RETRIEVAL_MIN_SCORE_TECHNICAL: float = float(os.getenv("RETRIEVAL_MIN_SCORE_TECHNICAL", "0.2"))
+    RETRIEVAL_MIN_SCORE_POLICY: float = float(os.getenv("RETRIEVAL_MIN_SCORE_POLICY", "0.2"))
+    RETRIEVAL_SCORE_CLIFF: float = float(os.getenv("RETRIEVAL_SCORE_CLIFF", "0.15"))
+    
+    # Query Filter Configuration (file name / document type / upload date / quoted phrase pre-filters)
+    QUERY_FILTERS_ENABLED: bool = os.getenv("QUERY_FILTERS_ENABLED", "true").lower() == "true"
+    
+    # MMR Configuration (diversify=True in the search tools; lambda 1.0 = relevance only, 0.0 = diversity only)
+    MMR_FETCH_K: int = int(os.getenv("MMR_FETCH_K", "20"))
+    MMR_LAMBDA_BILLING: float = float(os.getenv("MMR_LAMBDA_BILLING", "0.5"))
+    MMR_LAMBDA_TECHNICAL: float = float(os.getenv("MMR_LAMBDA_TECHNICAL", "0.5"))
+    MMR_LAMBDA_POLICY: float = float(os.getenv("MMR_LAMBDA_POLICY", "0.7"))
+    
+    # Rerank Configuration (over-fetch RERANK_CANDIDATES, rescore on CPU, keep the top k)
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANKER: str = os.getenv("RERANKER", "lexical")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "20"))
+    
+    # Context Packing Configuration (merged, de-duplicated passages within an estimated token budget)
+    CONTEXT_PACKING_ENABLED: bool = os.getenv("CONTEXT_PACKING_ENABLED", "true").lower() == "true"
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+    
+    # Structured Index Configuration (SQLite sidecar for invoice and bug report fields; default: inside CHROMA_DB_PATH)
+    STRUCTURED_INDEX_PATH: str = os.getenv("STRUCTURED_INDEX_PATH", "")
+    
     # Application Configuration
     ESCALATION_EMAIL: str = os.getenv("ESCALATION_EMAIL", "john.doe@aerospace-co.com")
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
@@ -75,6 +197,62 @@ class Config:
         
         return errors
     
+    @classmethod
+    def get_structured_index_path(cls) -> str:
+        """Get SQLite file path for the structured invoice/bug report index"""
+        return cls.STRUCTURED_INDEX_PATH or os.path.join(cls.CHROMA_DB_PATH, "structured_index.sqlite3")
+    
+    @classmethod
+    def get_persistent_embedding_cache_path(cls) -> str:
+        """Get SQLite file path for the persistent embedding cache"""
+        return cls.PERSISTENT_EMBEDDING_CACHE_PATH or os.path.join(cls.CHROMA_DB_PATH, "embedding_cache.sqlite3")
+    
+    @classmethod
+    def get_generations_path(cls) -> str:
+        """Get SQLite file path of the collection generations shared by worker processes"""
+        return cls.GENERATIONS_PATH or os.path.join(cls.CHROMA_DB_PATH, "generations.sqlite3")
+    
+    @classmethod
+    def get_numpy_store_path(cls) -> str:
+        """Get root directory of the NumPy vector backend"""
+        return cls.NUMPY_STORE_PATH or os.path.join(cls.CHROMA_DB_PATH, "numpy_store")
+    
+    @classmethod
+    def get_hnsw_metadata(cls, collection_name: str) -> dict:
+        """Get configured hnsw:* collection metadata for a knowledge base collection (unset values omitted)"""
+        suffix = {
+            cls.COLLECTION_BILLING: "BILLING",
+            cls.COLLECTION_TECHNICAL: "TECHNICAL",
+            cls.COLLECTION_POLICY: "POLICY",
+        }.get(collection_name)
+        if suffix is None:
+            return {}
+        values = {
+            "hnsw:space": getattr(cls, f"HNSW_SPACE_{suffix}").lower(),
+            "hnsw:M": getattr(cls, f"HNSW_M_{suffix}"),
+            "hnsw:construction_ef": getattr(cls, f"HNSW_CONSTRUCTION_EF_{suffix}"),
+            "hnsw:search_ef": getattr(cls, f"HNSW_SEARCH_EF_{suffix}"),
+        }
+        return {key: value for key, value in values.items() if value}
+    
+    @classmethod
+    def get_retrieval_min_score(cls, collection_name: str) -> float:
+        """Get minimum relevance score for a knowledge base collection"""
+        return {
+            cls.COLLECTION_BILLING: cls.RETRIEVAL_MIN_SCORE_BILLING,
+            cls.COLLECTION_TECHNICAL: cls.RETRIEVAL_MIN_SCORE_TECHNICAL,
+            cls.COLLECTION_POLICY: cls.RETRIEVAL_MIN_SCORE_POLICY,
+        }.get(collection_name, 0.0)
+    
+    @classmethod
+    def get_mmr_lambda(cls, collection_name: str) -> float:
+        """Get MMR relevance/diversity trade-off for a knowledge base collection"""
+        return {
+            cls.COLLECTION_BILLING: cls.MMR_LAMBDA_BILLING,
+            cls.COLLECTION_TECHNICAL: cls.MMR_LAMBDA_TECHNICAL,
+            cls.COLLECTION_POLICY: cls.MMR_LAMBDA_POLICY,
+        }.get(collection_name, 0.5)
+    
     @classmethod
     def get_all_collections(cls) -> list[str]:
         """Get list of all knowledge base collection names"""
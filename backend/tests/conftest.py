@@ -35,3 +35,69 @@ def sample_pdf_content():
     # In real tests, you'd use actual PDF bytes
     return b"%PDF-1.4\n1 0 obj\n<<\n/Type /Catalog\n>>\nendobj\nxref\n0 1\ntrailer\n<<\n/Root 1 0 R\n>>\nstartxref\n9\n%%EOF"
 
+
+
+@pytest.fixture(autouse=True)
+def isolated_structured_index(tmp_path, monkeypatch):
+    """Keep the SQLite structured index sidecar out of the real ChromaDB directory"""
+    import app.retrieval.invoice_index as invoice_module
+    import app.retrieval.bug_report_index as bug_report_module
+    from app.utils.config import Config
+    monkeypatch.setattr(Config, "STRUCTURED_INDEX_PATH", str(tmp_path / "structured_index.sqlite3"))
+    monkeypatch.setattr(invoice_module, "_invoice_index", None)
+    monkeypatch.setattr(bug_report_module, "_bug_report_index", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_persistent_embedding_cache(tmp_path, monkeypatch):
+    """Keep the persistent embedding cache out of the real ChromaDB directory so mocked embeddings are not reused"""
+    import app.retrieval.persistent_embedding_cache as persistent_cache_module
+    from app.utils.config import Config
+    monkeypatch.setattr(Config, "PERSISTENT_EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache.sqlite3"))
+    monkeypatch.setattr(persistent_cache_module, "_persistent_embedding_cache", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_embedding_scheduler(monkeypatch):
+    """Give every test its own embedding scheduler (created on first use)"""
+    import app.retrieval.embedding_scheduler as scheduler_module
+    monkeypatch.setattr(scheduler_module, "_embedding_scheduler", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_collection_generations(tmp_path, monkeypatch):
+    """Keep the shared collection generations file out of the real ChromaDB directory"""
+    import app.retrieval.result_cache as result_cache_module
+    from app.utils.config import Config
+    monkeypatch.setattr(Config, "GENERATIONS_PATH", str(tmp_path / "generations.sqlite3"))
+    monkeypatch.setattr(result_cache_module, "_collection_generations", None)
+    yield
+    if result_cache_module._collection_generations is not None:
+        result_cache_module._collection_generations.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_result_cache(monkeypatch):
+    """Give every test an empty retrieval result cache so mocked searches are not served from it"""
+    import app.retrieval.result_cache as result_cache_module
+    monkeypatch.setattr(result_cache_module, "_retrieval_result_cache", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_negative_result_cache(monkeypatch):
+    """Give every test an empty negative result cache so empty mocked searches are not remembered"""
+    import app.retrieval.negative_cache as negative_cache_module
+    monkeypatch.setattr(negative_cache_module, "_negative_result_cache", None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_policy_semantic_cache(monkeypatch):
+    """Give every test an empty policy semantic cache"""
+    import app.retrieval.policy_semantic_cache as semantic_cache_module
+    monkeypatch.setattr(semantic_cache_module, "_policy_semantic_cache", None)
+    yield
@@ -13,6 +13,7 @@ from app.agents.orchestrator import (
     billing_tool,
     technical_tool,
     policy_tool,
+    search_knowledge_bases,
     EMERGENCY_KEYWORDS
 )
 from app.utils.config import config
@@ -93,6 +94,24 @@ def test_policy_tool():
     assert "inquiry" in result.lower()
 
 
+@pytest.mark.asyncio
+async def test_async_worker_tools_share_invocation_and_errors():
+    """Test the async tools await their own worker and report failures with the worker's contact"""
+    from unittest.mock import AsyncMock
+    from langchain_core.messages import AIMessage
+    agent = Mock()
+    agent.ainvoke = AsyncMock(return_value={"messages": [AIMessage(content="Invoice INV-1 is paid")]})
+
+    with patch('app.agents.orchestrator.get_billing_agent_singleton', return_value=agent):
+        assert await billing_tool.ainvoke({"request": "Is INV-1 paid?"}) == "Invoice INV-1 is paid"
+    agent.ainvoke.assert_awaited_once_with({"messages": [{"role": "user", "content": "Is INV-1 paid?"}]})
+
+    agent.ainvoke.side_effect = RuntimeError("worker down")
+    with patch('app.agents.orchestrator.get_policy_agent_singleton', return_value=agent):
+        result = await policy_tool.ainvoke({"request": "What is the SLA?"})
+    assert "policy inquiry: worker down" in result and "compliance@aerospace-co.com" in result
+
+
 def test_tool_descriptions_exist():
     """Test that all tools have descriptions"""
     assert hasattr(detect_emergency, 'description') or hasattr(detect_emergency, '__doc__')
@@ -101,6 +120,47 @@ def test_tool_descriptions_exist():
     assert hasattr(policy_tool, 'description') or hasattr(policy_tool, '__doc__')
 
 
+def fan_out_result(query):
+    """Helper for a search_all_kbs result with one relevant and one weak hit"""
+    from langchain_core.documents import Document
+    return {
+        "query": query,
+        "per_collection": {
+            config.COLLECTION_BILLING: [(Document(page_content="Net 30 payment terms", metadata={"source_file": "terms.md"}), 0.8)],
+            config.COLLECTION_TECHNICAL: [(Document(page_content="Unrelated manual", metadata={"source_file": "manual.md"}), 0.05)],
+            config.COLLECTION_POLICY: [],
+        },
+        "merged": [],
+        "errors": {},
+    }
+
+
+def test_search_knowledge_bases_groups_relevant_hits():
+    """Test the fan-out tool reports relevant hits per knowledge base and names empty ones"""
+    with patch('app.agents.orchestrator.search_all_kbs', side_effect=fan_out_result) as mock_search:
+        result = search_knowledge_bases.invoke({"query": "payment terms"})
+
+    mock_search.assert_called_once_with("payment terms")
+    assert "Relevant billing information" in result and "Net 30 payment terms" in result
+    assert "Unrelated manual" not in result
+    assert "No relevant documents found in: technical, policy" in result
+
+
+@pytest.mark.asyncio
+async def test_search_knowledge_bases_async_fan_out():
+    """Test the async tool uses asearch_all_kbs and the supervisor is given the tool"""
+    from unittest.mock import AsyncMock
+    with patch('app.agents.orchestrator.asearch_all_kbs', new=AsyncMock(side_effect=fan_out_result)) as mock_search:
+        result = await search_knowledge_bases.ainvoke({"query": "payment terms"})
+
+    mock_search.assert_awaited_once_with("payment terms")
+    assert "Net 30 payment terms" in result
+
+    with patch('app.agents.orchestrator.create_agent') as mock_create_agent:
+        get_supervisor_agent()
+    assert search_knowledge_bases in mock_create_agent.call_args[1]["tools"]
+
+
 @patch('app.agents.orchestrator.create_agent')
 def test_get_supervisor_agent_creates_agent(mock_create_agent):
     """Test that get_supervisor_agent creates agent with correct parameters"""
@@ -0,0 +1,112 @@
+"""
+Tests for the async retrieval path (asearch_* tools) used under ainvoke/astream
+"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from langchain_core.documents import Document
+from app.retrieval.search_pipeline import asearch_collection
+from app.retrieval.rag_retriever import search_technical_kb
+from app.retrieval.hybrid_retriever import search_billing_kb
+from app.utils.config import config
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+def make_vectorstore(docs, delay=0.0):
+    """Helper for a vector store with async embeddings and a (optionally slow) vector query"""
+    vectorstore = Mock()
+    vectorstore.get.return_value = None
+    vectorstore.embeddings.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+
+    def similarity_search_by_vector_with_relevance_scores(embedding, k):
+        time.sleep(delay)
+        return [(doc, 0.4) for doc in docs[:k]]
+
+    def similarity_search_by_vector(embedding, k):
+        return docs[:k]
+
+    vectorstore.similarity_search_by_vector_with_relevance_scores.side_effect = (
+        similarity_search_by_vector_with_relevance_scores
+    )
+    vectorstore.similarity_search_by_vector.side_effect = similarity_search_by_vector
+    return vectorstore
+
+
+@pytest.mark.asyncio
+async def test_asearch_collection_uses_async_embedding():
+    """Test the async path embeds asynchronously and queries by vector"""
+    docs = [Document(page_content="Hydraulic pump manual", metadata={"source_file": "manual.pdf"})]
+    vectorstore = make_vectorstore(docs)
+
+    result = await asearch_collection(vectorstore, config.COLLECTION_TECHNICAL, "hydraulic pump", 3)
+
+    assert result == docs
+    vectorstore.embeddings.aembed_query.assert_awaited_once_with("hydraulic pump")
+    vectorstore.similarity_search.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_slow_retrieval_does_not_block_event_loop():
+    """Test other coroutines keep running while a slow ChromaDB query is in flight"""
+    vectorstore = make_vectorstore([Document(page_content="slow", metadata={})], delay=0.3)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    await asyncio.gather(
+        asearch_collection(vectorstore, config.COLLECTION_TECHNICAL, "slow query", 1),
+        ticker(),
+    )
+
+    assert ticks == 10
+
+
+@pytest.mark.asyncio
+async def test_technical_tool_ainvoke_uses_async_implementation():
+    """Test search_technical_kb.ainvoke runs the async implementation"""
+    docs = [Document(page_content="Hydraulic pump manual", metadata={"source_file": "manual.pdf"})]
+    vectorstore = make_vectorstore(docs)
+    client = Mock()
+    client.get_or_create_collection.return_value = vectorstore
+
+    with patch("app.retrieval.rag_retriever.get_chroma_client", return_value=client):
+        result = await search_technical_kb.ainvoke({"query": "hydraulic pump", "k": 3})
+
+    assert "manual.pdf" in result
+    vectorstore.embeddings.aembed_query.assert_awaited_once()
+    vectorstore.similarity_search.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_billing_tool_ainvoke_comparative_fallback_keeps_k_20():
+    """Test the async billing path keeps the k >= 20 fallback for comparative queries"""
+    docs = [
+        Document(page_content=f"Invoice INV-00{i}", metadata={"source_file": f"Invoice-{i}.pdf"})
+        for i in range(1, 5)
+    ]
+    vectorstore = make_vectorstore(docs)
+    client = Mock()
+    client.get_or_create_collection.return_value = vectorstore
+
+    with patch("app.retrieval.hybrid_retriever.get_chroma_client", return_value=client):
+        result = await search_billing_kb.ainvoke({
+            "query": "Which company is our most valuable customer based on invoiced amount?",
+        })
+
+    assert vectorstore.similarity_search_by_vector.call_args.kwargs["k"] >= 20
+    for i in range(1, 5):
+        assert f"Invoice-{i}.pdf" in result
@@ -0,0 +1,162 @@
+"""
+Tests for the structured bug report index and the query_bug_reports tool
+"""
+
+import sqlite3
+import pytest
+from contextlib import closing
+from unittest.mock import patch
+from app.retrieval.bug_report_index import (
+    BugReportIndex,
+    extract_bug_reports,
+    get_bug_report_index,
+    query_bug_reports,
+)
+
+
+def bug_report_text(bug_id, status, severity, component, reported, resolved=None):
+    """Helper to render a bug report in a labeled-field layout"""
+    text = (
+        f"Bug ID: {bug_id}\n"
+        f"Title: {component} fault\n"
+        f"Status: {status}\n"
+        f"Severity: {severity}\n"
+        f"Component: {component}\n"
+        f"Reported: {reported}\n"
+    )
+    if resolved:
+        text += f"Resolved: {resolved}\n"
+    return text
+
+
+@pytest.fixture
+def populated_index(tmp_path):
+    """Fixture with five bug reports across two documents"""
+    index = BugReportIndex(str(tmp_path / "bugs.sqlite3"))
+    index.index_document(
+        bug_report_text("BUG-101", "Resolved", "High", "Hydraulics", "01/05/2025", "02/10/2025")
+        + bug_report_text("BUG-102", "Closed", "Low", "Avionics", "03/01/2025", "03/20/2025")
+        + bug_report_text("BUG-103", "Open", "High", "Avionics", "04/02/2025"),
+        "bug-reports-2025.md",
+    )
+    index.index_document(
+        bug_report_text("BUG-201", "Fixed", "Critical", "Hydraulics", "2024-11-01", "2024-12-15")
+        + bug_report_text("BUG-202", "In Progress", "Medium", "Landing Gear", "2025-05-01"),
+        "bug-reports-2024.md",
+    )
+    return index
+
+
+def test_extract_bug_reports():
+    """Test one record is extracted per bug ID with normalized fields"""
+    records = extract_bug_reports(
+        bug_report_text("bug-101", "Resolved", "High", "Hydraulics", "01/05/2025", "02/10/2025")
+        + bug_report_text("BUG-102", "Open", "Low", "Avionics", "03/01/2025"),
+        "bugs.md",
+    )
+
+    assert [record["bug_id"] for record in records] == ["BUG-101", "BUG-102"]
+    assert records[0]["status"] == "resolved"
+    assert records[0]["severity"] == "high"
+    assert records[0]["reported_date"] == "2025-01-05"
+    assert records[0]["resolved_date"] == "2025-02-10"
+    assert records[1]["resolved_date"] is None
+    assert records[1]["source_file"] == "bugs.md"
+
+
+def test_extract_bug_reports_bare_ids():
+    """Test bare bug IDs are used when no labeled ID field exists"""
+    records = extract_bug_reports("BUG-7: pump fault\nStatus: Open\n\nBUG-8: sensor drift\nStatus: Closed", "log.txt")
+
+    assert [(record["bug_id"], record["status"]) for record in records] == [("BUG-7", "open"), ("BUG-8", "closed")]
+
+
+def test_extract_bug_reports_normalizes_status_and_anchors_component():
+    """Test free-text statuses reduce to their synonym and "Operating System:" is not a component"""
+    records = extract_bug_reports(
+        "Bug ID: BUG-301\nStatus: Resolved - fixed in v2\nOperating System: Linux\n"
+        "Bug ID: BUG-302\nStatus: In progress (waiting on vendor)\nOperating System: Linux\n- Subsystem: Hydraulics\n"
+        "Bug ID: BUG-303\nStatus: Won't fix\n",
+        "bugs.md",
+    )
+
+    assert [record["status"] for record in records] == ["resolved", "in progress", "won't fix"]
+    assert [record["component"] for record in records] == [None, "Hydraulics", None]
+
+
+def test_query_matches_free_text_status(tmp_path):
+    """Test a status written with trailing detail is counted by the status filter"""
+    index = BugReportIndex(str(tmp_path / "bugs.sqlite3"))
+    index.index_document(bug_report_text("BUG-1", "Resolved - fixed in v2", "High", "Avionics", "2025-01-05"), "a.md")
+
+    assert index.query(status="resolved")["total"] == 1
+
+
+def test_existing_raw_statuses_are_normalized_on_open(tmp_path):
+    """Test rows stored with raw status text are normalized when the index is opened"""
+    db_path = str(tmp_path / "bugs.sqlite3")
+    index = BugReportIndex(db_path)
+    index.index_document(bug_report_text("BUG-1", "Open", "High", "Avionics", "2025-01-05"), "a.md")
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.execute("UPDATE bug_reports SET status = 'closed - duplicate of bug-2'")
+
+    assert BugReportIndex(db_path).query(status="resolved")["total"] == 1
+
+
+def test_query_status_synonyms(populated_index):
+    """Test resolved status also matches closed and fixed reports"""
+    result = populated_index.query(status="resolved")
+
+    assert result["total"] == 3
+    assert {row["bug_id"] for row in result["rows"]} == {"BUG-101", "BUG-102", "BUG-201"}
+
+
+def test_query_date_range_and_severity(populated_index):
+    """Test resolved-date range combined with severity filter"""
+    result = populated_index.query(status="resolved", severity="high", date_from="2025-01-01", date_to="2025-12-31")
+
+    assert result["total"] == 1
+    assert result["rows"][0]["bug_id"] == "BUG-101"
+
+
+def test_query_group_by(populated_index):
+    """Test group-by counts"""
+    result = populated_index.query(group_by="component")
+
+    groups = {group["group"]: group["count"] for group in result["groups"]}
+    assert groups == {"Hydraulics": 2, "Avionics": 2, "Landing Gear": 1}
+
+
+def test_query_invalid_group_by(populated_index):
+    """Test unknown group-by values are rejected"""
+    with pytest.raises(ValueError):
+        populated_index.query(group_by="owner; DROP TABLE bug_reports")
+
+
+def test_reindex_replaces_source_rows(populated_index):
+    """Test re-ingesting a document replaces its rows"""
+    populated_index.index_document(
+        bug_report_text("BUG-201", "Fixed", "Critical", "Hydraulics", "2024-11-01", "2024-12-15"),
+        "bug-reports-2024.md",
+    )
+
+    assert populated_index.count() == 4
+
+
+def test_query_bug_reports_tool(populated_index):
+    """Test the tool returns exact counts with source citations"""
+    with patch("app.retrieval.bug_report_index.get_bug_report_index", return_value=populated_index):
+        result = query_bug_reports.invoke({"status": "open", "group_by": "status"})
+
+    assert "Matching bug reports: 2" in result
+    assert "BUG-103" in result and "BUG-202" in result
+    assert "bug-reports-2025.md" in result
+
+
+def test_query_bug_reports_tool_empty_index():
+    """Test the tool points to search_technical_kb when nothing is indexed"""
+    assert get_bug_report_index().count() == 0
+
+    result = query_bug_reports.invoke({"status": "resolved"})
+
+    assert "No bug reports have been indexed" in result
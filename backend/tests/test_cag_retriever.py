@@ -25,7 +25,7 @@ def test_search_policy_kb_no_documents():
     with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -50,7 +50,7 @@ def test_search_policy_kb_with_documents():
         
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = [mock_doc1, mock_doc2]
+        mock_collection.similarity_search_with_score.return_value = [(mock_doc1, 0.3), (mock_doc2, 0.4)]
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -66,7 +66,7 @@ def test_search_policy_kb_uses_policy_collection():
     with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -149,15 +149,15 @@ def test_search_policy_kb_default_k():
     with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
         search_policy_kb.invoke({"query": "test"})
         
-        # Verify similarity_search was called with k=5
-        mock_collection.similarity_search.assert_called_once()
-        call_kwargs = mock_collection.similarity_search.call_args[1]
+        # Verify similarity_search_with_score was called with k=5
+        mock_collection.similarity_search_with_score.assert_called_once()
+        call_kwargs = mock_collection.similarity_search_with_score.call_args[1]
         assert call_kwargs.get('k', 5) == 5
 
 
@@ -166,13 +166,159 @@ def test_search_policy_kb_custom_k():
     with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
         search_policy_kb.invoke({"query": "test", "k": 10})
         
-        # Verify similarity_search was called with custom k
-        call_kwargs = mock_collection.similarity_search.call_args[1]
+        # Verify similarity_search_with_score was called with custom k
+        call_kwargs = mock_collection.similarity_search_with_score.call_args[1]
         assert call_kwargs.get('k') == 10
 
+
+
+@pytest.fixture
+def fresh_policy_cache():
+    """Fixture that isolates the global policy CAG cache"""
+    import app.retrieval.cag_retriever as cag_module
+    cag_module._policy_cache = None
+    yield cag_module.get_policy_cache()
+    cag_module._policy_cache = None
+
+
+def make_policy_collection():
+    """Helper to build a mock policy collection with a full snapshot"""
+    mock_collection = Mock()
+    mock_collection.get.return_value = {
+        "ids": ["1", "2"],
+        "documents": [
+            "Refunds are issued within 30 days of an approved request.",
+            "DFARS 252.204-7012 requires safeguarding covered defense information.",
+        ],
+        "metadatas": [
+            {"source_file": "refund_policy.md", "chunk_index": 0},
+            {"source_file": "dfars_policy.pdf", "chunk_index": 0},
+        ],
+    }
+    return mock_collection
+
+
+def test_search_policy_kb_serves_from_cag_cache(fresh_policy_cache):
+    """Test that a loaded CAG cache serves policy context without vector search"""
+    with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
+        mock_collection = make_policy_collection()
+        mock_client = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_get_client.return_value = mock_client
+        
+        result = search_policy_kb.invoke({"query": "What does DFARS 252.204-7012 require?", "k": 1})
+        
+        mock_collection.similarity_search_with_score.assert_not_called()
+        assert "dfars_policy.pdf" in result
+        assert "refund_policy.md" not in result
+        assert fresh_policy_cache.stats()["chunks"] == 2
+
+
+def test_search_policy_kb_cag_cache_loaded_once(fresh_policy_cache):
+    """Test that the policy snapshot is loaded once and reused across queries"""
+    with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
+        mock_collection = make_policy_collection()
+        mock_client = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_get_client.return_value = mock_client
+        
+        search_policy_kb.invoke({"query": "refund"})
+        search_policy_kb.invoke({"query": "refund window"})
+        
+        mock_collection.get.assert_called_once()
+
+
+def test_refresh_policy_cache_reloads_snapshot(fresh_policy_cache):
+    """Test that refresh_policy_cache picks up newly ingested policy chunks"""
+    from app.retrieval.cag_retriever import refresh_policy_cache
+    
+    with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
+        mock_collection = make_policy_collection()
+        mock_client = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_get_client.return_value = mock_client
+        
+        assert refresh_policy_cache() is True
+        assert fresh_policy_cache.size == 2
+        
+        mock_collection.get.return_value["documents"].append("New export control policy.")
+        mock_collection.get.return_value["metadatas"].append({"source_file": "export.md"})
+        
+        assert refresh_policy_cache() is True
+        assert fresh_policy_cache.size == 3
+
+
+def test_cag_cache_reloads_after_ingest_in_another_process(fresh_policy_cache):
+    """Test a policy write recorded by another worker process makes the snapshot reload"""
+    from app.retrieval.result_cache import CollectionGenerations, get_collection_generations
+    get_collection_generations().check_seconds = 0
+    
+    with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
+        mock_collection = make_policy_collection()
+        mock_client = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_get_client.return_value = mock_client
+        
+        search_policy_kb.invoke({"query": "refund"})
+        mock_collection.get.return_value["documents"].append("Export control policy for ITAR items.")
+        mock_collection.get.return_value["metadatas"].append({"source_file": "export.md"})
+        CollectionGenerations(db_path=config.get_generations_path()).bump(config.COLLECTION_POLICY)
+        
+        result = search_policy_kb.invoke({"query": "export control ITAR"})
+        
+        assert mock_collection.get.call_count == 2
+        assert "export.md" in result
+
+
+def test_cag_cache_ranks_paraphrases_with_stored_embeddings(fresh_policy_cache):
+    """Test a question sharing no words with the policy text is ranked by embedding similarity"""
+    with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
+        mock_collection = make_policy_collection()
+        mock_collection.get.return_value["embeddings"] = [[1.0, 0.0], [0.0, 1.0]]
+        mock_client = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_client.embeddings.embed_query.return_value = [0.9, 0.1]
+        mock_get_client.return_value = mock_client
+        
+        result = search_policy_kb.invoke({"query": "Can I send it back?"})
+        
+        mock_client.embeddings.embed_query.assert_called_once_with("Can I send it back?")
+        mock_collection.similarity_search_with_score.assert_not_called()
+        assert "refund_policy.md" in result
+        assert "dfars_policy.pdf" not in result
+
+
+def test_cag_cache_without_matches_returns_nothing(fresh_policy_cache):
+    """Test chunks matching neither lexically nor semantically are not served as filler"""
+    with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
+        mock_client = Mock()
+        mock_client.get_or_create_collection.return_value = make_policy_collection()
+        mock_get_client.return_value = mock_client
+        
+        result = search_policy_kb.invoke({"query": "Can I send it back?"})
+        
+        assert result.startswith("No relevant policy documents")
+
+
+def test_cag_cache_known_empty_skips_the_query_embedding(fresh_policy_cache):
+    """Test a repeated policy search that found nothing is answered from the negative cache, with its note"""
+    with patch('app.retrieval.cag_retriever.get_chroma_client') as mock_get_client:
+        mock_collection = make_policy_collection()
+        mock_collection.get.return_value["embeddings"] = [[1.0, 0.0], [0.0, 1.0]]
+        mock_client = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_client.embeddings.embed_query.return_value = [-1.0, -1.0]
+        mock_get_client.return_value = mock_client
+        
+        first = search_policy_kb.invoke({"query": "warp drive maintenance"})
+        second = search_policy_kb.invoke({"query": "warp drive maintenance"})
+        
+        assert first.startswith("No relevant policy documents") and "do not repeat it" not in first
+        assert "do not repeat it" in second
+        mock_client.embeddings.embed_query.assert_called_once()
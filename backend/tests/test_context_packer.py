@@ -0,0 +1,155 @@
+"""
+Tests for token-budgeted context packing
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from app.retrieval.context_packer import (
+    PackingStats,
+    estimate_tokens,
+    merge_adjacent_chunks,
+    pack_context,
+    strip_overlap,
+)
+from app.retrieval.rag_retriever import format_technical_context, search_technical_kb
+from app.utils.config import config
+
+
+@pytest.fixture(autouse=True)
+def fresh_packing_stats():
+    """Fixture that isolates the global packing statistics"""
+    import app.retrieval.context_packer as packer_module
+    original = packer_module._packing_stats
+    packer_module._packing_stats = PackingStats()
+    yield packer_module._packing_stats
+    packer_module._packing_stats = original
+
+
+def chunk(source_file, chunk_index, text):
+    """Helper to build an ingested chunk"""
+    return Document(page_content=text, metadata={"source_file": source_file, "chunk_index": chunk_index})
+
+
+def test_strip_overlap():
+    """Test the repeated prefix of the next chunk is removed"""
+    assert strip_overlap("The pump must be primed before start", "be primed before start. Then open valve A") == (
+        ". Then open valve A"
+    )
+    assert strip_overlap("no shared text", "entirely different") == "entirely different"
+
+
+def test_coincidental_overlap_is_not_stripped():
+    """Test a short or mid-word match is not treated as overlap and unrelated neighbours are joined by a newline"""
+    assert strip_overlap("The pump must rotate", "every hour the seal is checked.") == "every hour the seal is checked."
+    assert strip_overlap("check the seal", "seal housing") == "seal housing"
+
+    passages = merge_adjacent_chunks([
+        (chunk("manual.pdf", 7, "The pump must rotate"), 0.9),
+        (chunk("manual.pdf", 8, "every hour the seal is checked."), 0.8),
+    ])
+
+    assert len(passages) == 1
+    assert passages[0].text == "The pump must rotate\nevery hour the seal is checked."
+
+
+def test_merge_adjacent_chunks_from_same_source():
+    """Test consecutive chunk_index hits from one source become a single passage"""
+    results = [
+        (chunk("manual.pdf", 4, "Step two: bleed the line. Step three"), 0.7),
+        (chunk("manual.pdf", 3, "Step one: close valve. Step two: bleed the line."), 0.9),
+        (chunk("manual.pdf", 9, "Unrelated appendix"), 0.5),
+        (chunk("faq.md", 4, "FAQ answer"), 0.6),
+    ]
+
+    passages = merge_adjacent_chunks(results)
+
+    assert [(p.source_file, p.first_chunk, p.last_chunk) for p in passages] == [
+        ("manual.pdf", 3, 4),
+        ("faq.md", 4, 4),
+        ("manual.pdf", 9, 9),
+    ]
+    assert passages[0].text == "Step one: close valve. Step two: bleed the line. Step three"
+    assert passages[0].score == 0.9
+
+
+def test_merge_drops_duplicate_chunks():
+    """Test the same chunk returned twice (e.g. vector and lexical hits) is kept once"""
+    results = [(chunk("manual.pdf", 2, "Torque to 40 Nm"), 0.8), (chunk("manual.pdf", 2, "Torque to 40 Nm"), 0.6)]
+
+    passages = merge_adjacent_chunks(results)
+
+    assert len(passages) == 1
+    assert passages[0].text == "Torque to 40 Nm"
+
+
+def test_pack_context_compact_header_and_savings(fresh_packing_stats):
+    """Test packed output cites sources compactly and is smaller than the legacy format"""
+    results = [
+        (chunk("manual.pdf", 0, "Close valve A. " * 20), 0.9),
+        (chunk("manual.pdf", 1, "Close valve A. " * 5 + "Open valve B."), 0.85),
+    ]
+
+    packed = pack_context(results, "valves", "technical", legacy_formatter=format_technical_context)
+
+    assert "[1] Source: manual.pdf #0-1 | relevance 0.90" in packed
+    assert "Open valve B." in packed
+    stats = fresh_packing_stats.stats()
+    assert stats["calls"] == 1
+    assert stats["tokens_saved"] > 0
+    assert stats["packed_tokens"] == estimate_tokens(packed)
+
+
+def test_pack_context_fills_budget_in_score_order():
+    """Test lower-scoring passages are dropped once the token budget is used"""
+    results = [
+        (chunk("low.pdf", 0, "low " * 200), 0.3),
+        (chunk("high.pdf", 0, "high " * 200), 0.9),
+        (chunk("mid.pdf", 0, "mid " * 200), 0.6),
+    ]
+
+    packed = pack_context(results, "query", "billing", token_budget=600)
+
+    assert "high.pdf" in packed and "mid.pdf" in packed
+    assert "low.pdf" not in packed
+    assert "1 lower-scoring passages omitted" in packed
+    assert estimate_tokens(packed) <= 620
+
+
+def test_pack_context_always_keeps_best_passage():
+    """Test the best passage is truncated rather than dropped when it exceeds the budget"""
+    packed = pack_context([(chunk("big.pdf", 0, "word " * 2000), 0.9)], "query", "policy", token_budget=100)
+
+    assert "big.pdf" in packed
+    assert estimate_tokens(packed) <= 110
+
+
+def test_pack_context_unlimited_budget_keeps_everything():
+    """Test a zero budget only merges and de-duplicates (comparative billing path)"""
+    results = [(chunk(f"Invoice-{i}.pdf", 0, "line item " * 300), None) for i in range(1, 5)]
+
+    packed = pack_context(results, "most valuable customer", "billing", token_budget=0)
+
+    for i in range(1, 5):
+        assert f"Invoice-{i}.pdf" in packed
+
+
+def test_technical_tool_uses_packed_context():
+    """Test the technical search tool returns packed context when packing is enabled"""
+    collection = Mock()
+    collection.get.return_value = None
+    collection._collection.metadata = {"hnsw:space": "cosine"}
+    collection.similarity_search_with_score.return_value = [
+        (chunk("manual.pdf", 0, "Prime the pump and open valve A. Then start"), 0.1),
+        (chunk("manual.pdf", 1, "open valve A. Then start the motor."), 0.15),
+    ]
+    client = Mock()
+    client.get_or_create_collection.return_value = collection
+
+    with patch("app.retrieval.rag_retriever.get_chroma_client", return_value=client), \
+            patch.object(config, "CONTEXT_PACKING_ENABLED", True):
+        result = search_technical_kb.invoke({"query": "start pump"})
+
+    assert "[1] Source: manual.pdf #0-1" in result
+    assert "Prime the pump and open valve A. Then start the motor." in result
+    assert "Chunk Index" not in result
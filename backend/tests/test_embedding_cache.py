@@ -0,0 +1,99 @@
+"""
+Tests for the process-wide query embedding cache
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from app.retrieval.embedding_cache import (
+    QueryEmbeddingCache,
+    CachedQueryEmbeddings,
+    normalize_query_text,
+)
+
+
+def make_cached_embeddings(cache=None):
+    """Helper to wrap a mock embeddings instance"""
+    inner = Mock()
+    inner.embed_query.side_effect = lambda text: [float(len(text)), 1.0]
+    inner.embed_documents.side_effect = lambda texts: [[0.0, 0.0] for _ in texts]
+    cache = cache or QueryEmbeddingCache(max_size=10, ttl_seconds=60)
+    return inner, CachedQueryEmbeddings(inner, cache, model="text-embedding-3-small", dimensions=2)
+
+
+def test_normalize_query_text():
+    """Test normalization collapses whitespace and case"""
+    assert normalize_query_text("  What is   the  FAA Policy? ") == "what is the faa policy?"
+
+
+def test_embed_query_cache_hit():
+    """Test repeated queries only call the underlying embeddings once"""
+    inner, embeddings = make_cached_embeddings()
+
+    first = embeddings.embed_query("refund policy")
+    second = embeddings.embed_query("  Refund   POLICY ")
+
+    assert first == second
+    inner.embed_query.assert_called_once()
+    stats = embeddings.cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_embed_documents_not_cached():
+    """Test embed_documents passes through to the underlying embeddings"""
+    inner, embeddings = make_cached_embeddings()
+
+    embeddings.embed_documents(["a", "b"])
+    embeddings.embed_documents(["a", "b"])
+
+    assert inner.embed_documents.call_count == 2
+    assert embeddings.cache.stats()["size"] == 0
+
+
+def test_cache_key_includes_model_and_dimensions():
+    """Test that different models do not share cached vectors"""
+    cache = QueryEmbeddingCache(max_size=10, ttl_seconds=60)
+    inner_a, embeddings_a = make_cached_embeddings(cache)
+    inner_b = Mock()
+    inner_b.embed_query.return_value = [9.0, 9.0]
+    embeddings_b = CachedQueryEmbeddings(inner_b, cache, model="text-embedding-3-large", dimensions=2)
+
+    embeddings_a.embed_query("invoice total")
+    assert embeddings_b.embed_query("invoice total") == [9.0, 9.0]
+    inner_b.embed_query.assert_called_once()
+
+
+def test_lru_eviction():
+    """Test least recently used entries are evicted beyond max_size"""
+    cache = QueryEmbeddingCache(max_size=2, ttl_seconds=60)
+    cache.put(("m", 2, "a"), [1.0])
+    cache.put(("m", 2, "b"), [2.0])
+    cache.get(("m", 2, "a"))
+    cache.put(("m", 2, "c"), [3.0])
+
+    assert cache.get(("m", 2, "b")) is None
+    assert cache.get(("m", 2, "a")) == [1.0]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    """Test entries expire after ttl_seconds"""
+    cache = QueryEmbeddingCache(max_size=10, ttl_seconds=5)
+    with patch("app.retrieval.embedding_cache.time.monotonic", return_value=100.0):
+        cache.put(("m", 2, "a"), [1.0])
+    with patch("app.retrieval.embedding_cache.time.monotonic", return_value=106.0):
+        assert cache.get(("m", 2, "a")) is None
+
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_aembed_query_shares_cache():
+    """Test async embed_query reuses vectors cached by the sync path"""
+    inner, embeddings = make_cached_embeddings()
+
+    vector = embeddings.embed_query("warranty terms")
+    assert await embeddings.aembed_query("warranty terms") == vector
+    inner.aembed_query.assert_not_called()
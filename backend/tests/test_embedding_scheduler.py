@@ -0,0 +1,180 @@
+"""
+Tests for the coalescing embedding batch scheduler
+"""
+
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from langchain_core.embeddings import Embeddings
+from app.retrieval.embedding_scheduler import (
+    EmbeddingScheduler,
+    ScheduledEmbeddings,
+    get_scheduled_embeddings,
+)
+from app.utils.config import config
+
+
+class RateLimitError(Exception):
+    """Stand-in for openai.RateLimitError"""
+
+    status_code = 429
+
+
+class RecordingEmbeddings(Embeddings):
+    """Embeddings that record each API call and can hold or fail calls"""
+
+    def __init__(self, failures=(), delay=0.0):
+        self.calls = []
+        self.failures = list(failures)
+        self.delay = delay
+        self.gate = threading.Event()
+        self.gate.set()
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            self.gate.wait(5)
+            time.sleep(self.delay)
+            if self.failures:
+                raise self.failures.pop(0)
+            self.calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def make_scheduler():
+    """Fixture creating schedulers that are closed after the test"""
+    schedulers = []
+
+    def make(embeddings, **kwargs):
+        scheduler = EmbeddingScheduler(embeddings, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+def test_concurrent_requests_share_a_batch(make_scheduler):
+    """Test requests queued while a batch is in flight are sent together and resolved in order"""
+    embeddings = RecordingEmbeddings()
+    embeddings.gate.clear()
+    scheduler = make_scheduler(embeddings, max_in_flight=1)
+    first = scheduler.submit(["warm up"])
+    time.sleep(0.05)
+
+    futures = [scheduler.submit([f"upload {i}", "x" * i]) for i in range(10)]
+    embeddings.gate.set()
+
+    assert first.result(5) == [[7.0]]
+    assert [future.result(5) for future in futures] == [[[8.0], [float(i)]] for i in range(10)]
+    assert len(embeddings.calls) == 2 and len(embeddings.calls[1]) == 20
+    assert scheduler.stats()["batches"] == 2
+
+
+def test_batches_are_bounded_by_estimated_tokens(make_scheduler):
+    """Test batches stay within the token budget and an oversized text is sent alone"""
+    embeddings = RecordingEmbeddings()
+    scheduler = make_scheduler(embeddings, max_batch_tokens=10, linger_seconds=0.05)
+
+    vectors = scheduler.submit(["a" * 20, "b" * 20, "c" * 100, "d" * 20]).result(5)
+
+    assert vectors == [[20.0], [20.0], [100.0], [20.0]]
+    assert [len(call) for call in embeddings.calls] == [2, 1, 1]
+
+
+def test_in_flight_batches_are_capped(make_scheduler):
+    """Test no more than max_in_flight API calls run at once"""
+    embeddings = RecordingEmbeddings(delay=0.02)
+    scheduler = make_scheduler(embeddings, max_batch_texts=1, max_in_flight=2, linger_seconds=0)
+
+    futures = [scheduler.submit([str(i)]) for i in range(8)]
+
+    assert [future.result(5) for future in futures] == [[[1.0]]] * 8
+    assert embeddings.peak == 2
+
+
+def test_rate_limits_back_off_and_other_errors_fail(make_scheduler):
+    """Test 429s are retried with backoff, while other errors and exhausted retries fail the future"""
+    embeddings = RecordingEmbeddings(failures=[RateLimitError(), RateLimitError()])
+    scheduler = make_scheduler(embeddings, max_retries=2, backoff_base_seconds=0.01, linger_seconds=0)
+
+    assert scheduler.submit(["refund"]).result(5) == [[6.0]]
+    assert scheduler.stats()["rate_limited"] == 2
+
+    embeddings.failures = [ValueError("bad input")]
+    with pytest.raises(ValueError):
+        scheduler.submit(["bad"]).result(5)
+
+    embeddings.failures = [RateLimitError()] * 3
+    with pytest.raises(RateLimitError):
+        scheduler.submit(["busy"]).result(5)
+    assert scheduler.stats()["failed_batches"] == 2
+    assert scheduler.submit(["ok"]).result(5) == [[2.0]]
+
+
+def test_vector_count_mismatch_fails_the_batch(make_scheduler):
+    """Test a response with fewer vectors than texts fails every request instead of leaving futures pending"""
+    embeddings = RecordingEmbeddings()
+    scheduler = make_scheduler(embeddings, linger_seconds=0.05)
+
+    with patch.object(embeddings, "embed_documents", side_effect=lambda texts: [[1.0]] * (len(texts) - 1)):
+        futures = [scheduler.submit(["engine", "turbine"]), scheduler.submit(["blade"])]
+        for future in futures:
+            with pytest.raises(ValueError, match="returned 2 vectors for a batch of 3 texts"):
+                future.result(5)
+
+    assert scheduler.stats()["failed_batches"] == 1
+    assert scheduler.submit(["ok"]).result(5) == [[2.0]]
+
+
+def test_queries_go_ahead_of_documents(make_scheduler):
+    """Test a query submitted behind queued documents is dispatched first"""
+    embeddings = RecordingEmbeddings()
+    embeddings.gate.clear()
+    scheduler = make_scheduler(embeddings, max_batch_texts=1, max_in_flight=1, linger_seconds=0)
+    held = scheduler.submit(["held"])
+    time.sleep(0.05)
+    documents = scheduler.submit(["doc 1", "doc 2"])
+    query = ScheduledEmbeddings(scheduler)
+
+    thread = threading.Thread(target=query.embed_query, args=("query",))
+    thread.start()
+    time.sleep(0.05)
+    embeddings.gate.set()
+    thread.join(5)
+    documents.result(5)
+    held.result(5)
+
+    assert embeddings.calls == [["held"], ["query"], ["doc 1"], ["doc 2"]]
+
+
+@pytest.mark.asyncio
+async def test_async_callers_await_the_future(make_scheduler):
+    """Test aembed_documents and aembed_query resolve through the scheduler"""
+    embeddings = ScheduledEmbeddings(make_scheduler(RecordingEmbeddings()))
+
+    assert await embeddings.aembed_documents(["engine", "turbine"]) == [[6.0], [7.0]]
+    assert await embeddings.aembed_query("blade") == [5.0]
+    assert await embeddings.aembed_documents([]) == []
+
+
+def test_scheduler_can_be_disabled():
+    """Test EMBEDDING_SCHEDULER_ENABLED=false returns plain OpenAI embeddings"""
+    with patch.object(config, "OPENAI_API_KEY", "sk-test"):
+        assert isinstance(get_scheduled_embeddings(), ScheduledEmbeddings)
+        with patch.object(config, "EMBEDDING_SCHEDULER_ENABLED", False):
+            assert not isinstance(get_scheduled_embeddings(), ScheduledEmbeddings)
@@ -0,0 +1,136 @@
+"""
+Tests for per-collection HNSW settings, rebuilds and the recall/latency sweep
+"""
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+from app.retrieval.chroma_client import ChromaDBClient
+from app.retrieval.hnsw_tuning import (
+    current_hnsw_settings,
+    exact_neighbors,
+    rebuild_collection,
+    sweep_hnsw,
+)
+from app.retrieval.versioning import get_collection_swap_lock
+from app.utils.config import Config, config
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Fixture for a ChromaDB client on a temporary directory"""
+    with patch.object(config, "VECTOR_BACKEND", "chroma"):
+        return ChromaDBClient(persist_directory=str(tmp_path))
+
+
+def add_vectors(client, name, count=60, dims=8):
+    """Helper adding random vectors to a collection"""
+    collection = client.client.get_collection(name)
+    vectors = np.random.default_rng(1).normal(size=(count, dims)).tolist()
+    collection.add(
+        ids=[f"id-{i}" for i in range(count)],
+        embeddings=vectors,
+        documents=[f"doc {i}" for i in range(count)],
+        metadatas=[{"source_file": f"f{i}.md"} for i in range(count)],
+    )
+    return vectors
+
+
+def test_configured_settings_apply_at_creation(client):
+    """Test HNSW_*_<COLLECTION> settings become the collection's hnsw:* metadata"""
+    with patch.object(Config, "HNSW_SPACE_BILLING", "cosine"), patch.object(Config, "HNSW_M_BILLING", 32):
+        assert Config.get_hnsw_metadata(config.COLLECTION_BILLING) == {"hnsw:space": "cosine", "hnsw:M": 32}
+        client.get_or_create_collection(config.COLLECTION_BILLING)
+
+    settings = current_hnsw_settings(client.client.get_collection(config.COLLECTION_BILLING))
+
+    assert settings["hnsw:space"] == "cosine"
+    assert settings["hnsw:M"] == 32
+    assert client.client.get_collection(config.COLLECTION_BILLING).metadata["type"] == "knowledge_base"
+    assert Config.get_hnsw_metadata("unknown") == {}
+
+
+def test_rebuild_changes_structure_and_keeps_records(client):
+    """Test a rebuild swaps in a collection with new settings and the same records"""
+    client.get_or_create_collection(config.COLLECTION_TECHNICAL)
+    vectors = add_vectors(client, config.COLLECTION_TECHNICAL)
+
+    result = rebuild_collection(
+        config.COLLECTION_TECHNICAL, {"hnsw:space": "cosine", "hnsw:construction_ef": 64}, client=client
+    )
+
+    rebuilt = client.client.get_collection(config.COLLECTION_TECHNICAL)
+    assert result["action"] == "rebuilt" and result["records"] == 60
+    assert current_hnsw_settings(rebuilt)["hnsw:space"] == "cosine"
+    assert rebuilt.metadata["type"] == "knowledge_base"
+    assert client.list_collections() == [config.COLLECTION_TECHNICAL]
+    found = rebuilt.query(query_embeddings=[vectors[5]], n_results=1, include=["documents", "metadatas"])
+    assert found["ids"] == [["id-5"]]
+    assert found["metadatas"][0][0]["source_file"] == "f5.md"
+
+
+def test_rebuild_swaps_under_the_lock_and_restores_on_failure(client):
+    """Test the rename runs with searches locked out, and a failed rename leaves the original in place"""
+    from chromadb.api.models.Collection import Collection
+    client.get_or_create_collection(config.COLLECTION_TECHNICAL)
+    add_vectors(client, config.COLLECTION_TECHNICAL)
+    modify = Collection.modify
+    observed = []
+
+    def failing_modify(self, name=None, **kwargs):
+        if name == config.COLLECTION_TECHNICAL and "-rebuild-" in self.name:
+            observed.append(get_collection_swap_lock(config.COLLECTION_TECHNICAL).try_acquire_read())
+            raise RuntimeError("rename failed")
+        return modify(self, name=name, **kwargs)
+
+    with patch.object(Collection, "modify", failing_modify), pytest.raises(RuntimeError):
+        rebuild_collection(config.COLLECTION_TECHNICAL, {"hnsw:space": "cosine"}, client=client)
+
+    assert observed == [False]
+    assert client.list_collections() == [config.COLLECTION_TECHNICAL]
+    assert client.client.get_collection(config.COLLECTION_TECHNICAL).count() == 60
+
+
+def test_rebuild_search_ef_only_and_unchanged(client):
+    """Test search_ef alone is changed in place and matching settings are left alone"""
+    client.get_or_create_collection(config.COLLECTION_POLICY)
+
+    assert rebuild_collection(config.COLLECTION_POLICY, client=client)["action"] == "unchanged"
+    result = rebuild_collection(config.COLLECTION_POLICY, {"hnsw:search_ef": 250}, client=client)
+
+    assert result["action"] == "search_ef"
+    assert result["settings"]["hnsw:search_ef"] == 250
+
+
+def test_rebuild_rejects_numpy_backend(tmp_path):
+    """Test HNSW rebuilds are refused for the exact NumPy backend"""
+    with patch.object(config, "VECTOR_BACKEND", "numpy"):
+        numpy_client = ChromaDBClient(persist_directory=str(tmp_path))
+
+    with pytest.raises(ValueError):
+        rebuild_collection(config.COLLECTION_POLICY, client=numpy_client)
+
+
+def test_exact_neighbors_per_space():
+    """Test brute-force ranking follows each distance function"""
+    embeddings = np.array([[1.0, 0.0], [10.0, 1.0], [0.0, 1.0]], dtype=np.float32)
+    query = np.array([[1.0, -0.1]], dtype=np.float32)
+
+    assert exact_neighbors(embeddings, query, 1, "l2") == [[0]]
+    assert exact_neighbors(embeddings, query, 1, "ip") == [[1]]
+    assert exact_neighbors(embeddings, query, 3, "cosine")[0][:2] == [0, 1]
+
+
+def test_sweep_reports_each_combination(client):
+    """Test the sweep measures every combination and cleans up scratch collections"""
+    client.get_or_create_collection(config.COLLECTION_BILLING)
+    add_vectors(client, config.COLLECTION_BILLING, count=120)
+
+    rows = sweep_hnsw(config.COLLECTION_BILLING, [8, 16], [50], [10, 100], queries=20, k=5, client=client)
+
+    assert [(row["M"], row["search_ef"]) for row in rows] == [(8, 10), (8, 100), (16, 10), (16, 100)]
+    for row in rows:
+        assert 0.0 <= row["recall_at_k"] <= 1.0
+        assert row["p99_ms"] >= row["p50_ms"] >= 0.0
+    assert rows[-1]["recall_at_k"] == pytest.approx(1.0)
+    assert client.list_collections() == [config.COLLECTION_BILLING]
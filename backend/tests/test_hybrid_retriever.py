@@ -27,7 +27,7 @@ def test_search_billing_kb_no_documents():
     with patch('app.retrieval.hybrid_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -51,7 +51,7 @@ def test_search_billing_kb_with_documents():
         
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = [mock_doc1, mock_doc2]
+        mock_collection.similarity_search_with_score.return_value = [(mock_doc1, 0.3), (mock_doc2, 0.4)]
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -67,7 +67,7 @@ def test_search_billing_kb_uses_billing_collection():
     with patch('app.retrieval.hybrid_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -149,14 +149,14 @@ def test_search_billing_kb_default_k():
     with patch('app.retrieval.hybrid_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
         search_billing_kb.invoke({"query": "test"})
         
-        mock_collection.similarity_search.assert_called_once()
-        call_kwargs = mock_collection.similarity_search.call_args[1]
+        mock_collection.similarity_search_with_score.assert_called_once()
+        call_kwargs = mock_collection.similarity_search_with_score.call_args[1]
         assert call_kwargs.get('k', 5) == 5
 
 
@@ -165,13 +165,13 @@ def test_search_billing_kb_custom_k():
     with patch('app.retrieval.hybrid_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
         search_billing_kb.invoke({"query": "test", "k": 5})
         
-        call_kwargs = mock_collection.similarity_search.call_args[1]
+        call_kwargs = mock_collection.similarity_search_with_score.call_args[1]
         assert call_kwargs.get('k') == 5
 
 
@@ -0,0 +1,244 @@
+"""
+Tests for the pipelined multi-file ingestion engine
+"""
+
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.ingestion.ingest_data import chunk_ids, ingest_document, ingest_multiple_documents
+from app.ingestion.pipeline import IngestionPipeline, expand_paths
+from app.retrieval.chroma_client import ChromaDBClient
+from app.retrieval.context_packer import pack_context
+from app.retrieval.lexical_index import get_lexical_index
+from app.retrieval.result_cache import get_collection_generations
+from app.utils.config import config
+
+
+VOCABULARY = ["invoice", "payment", "engine", "turbine", "refund", "policy"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings that record every embedding request"""
+
+    def __init__(self, fail_on=None):
+        self.requests = []
+        self.fail_on = fail_on
+
+    def embed_documents(self, texts):
+        if self.fail_on and any(self.fail_on in text for text in texts):
+            raise RuntimeError("rate limited")
+        self.requests.append(list(texts))
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(term)) + 0.01 for term in VOCABULARY]
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Fixture for a ChromaDB client with keyword embeddings, used by the pipeline"""
+    with patch.object(config, "VECTOR_BACKEND", "chroma"):
+        chroma = ChromaDBClient(persist_directory=str(tmp_path / "db"))
+    chroma.embeddings = KeywordEmbeddings()
+    with patch("app.ingestion.pipeline.get_chroma_client", return_value=chroma), \
+            patch("app.ingestion.ingest_data.get_chroma_client", return_value=chroma):
+        yield chroma
+
+
+def write_files(directory, contents):
+    """Helper writing one text file per (name, text) pair"""
+    paths = []
+    for name, text in contents:
+        path = directory / name
+        path.write_text(text)
+        paths.append(path)
+    return paths
+
+
+def stored_texts(client, collection_name):
+    """Helper listing the chunk texts stored in a collection"""
+    return sorted(client.client.get_collection(collection_name).get()["documents"])
+
+
+def test_results_in_input_order_with_failures(client, tmp_path):
+    """Test every file gets a result in input order and a bad file does not stop the others"""
+    paths = write_files(tmp_path, [
+        ("a.txt", "engine turbine inspection"),
+        ("b.txt", ""),
+        ("c.txt", "turbine blade repair"),
+    ])
+    paths.insert(2, tmp_path / "missing.txt")
+    generation = get_collection_generations().current(config.COLLECTION_TECHNICAL)
+    get_lexical_index(config.COLLECTION_TECHNICAL).loaded = True
+
+    results = IngestionPipeline(use_processes=False).run(paths, config.COLLECTION_TECHNICAL)
+
+    assert [result["success"] for result in results] == [True, False, False, True]
+    assert [result["file_path"] for result in results] == [str(path) for path in paths]
+    assert "empty" in results[1]["error"]
+    assert results[3]["target_collection"] == config.COLLECTION_TECHNICAL and results[3]["chunks_count"] == 1
+    assert stored_texts(client, config.COLLECTION_TECHNICAL) == ["engine turbine inspection", "turbine blade repair"]
+    assert len(get_lexical_index(config.COLLECTION_TECHNICAL)) == 2
+    assert get_collection_generations().current(config.COLLECTION_TECHNICAL) > generation
+
+
+def test_chunks_are_embedded_in_bounded_batches(client, tmp_path):
+    """Test embedding requests hold at most embed_batch_size texts and vectors stay with their chunks"""
+    text = "\n\n".join(f"turbine section {i} " + "engine " * 40 for i in range(6))
+    paths = write_files(tmp_path, [("manual.txt", text), ("invoice.txt", "invoice payment terms")])
+
+    results = IngestionPipeline(chunk_size=300, chunk_overlap=0, embed_batch_size=2, use_processes=False).run(
+        paths, auto_map=True
+    )
+
+    assert results[0]["chunks_count"] > 2
+    assert all(len(request) <= 2 for request in client.embeddings.requests)
+    collection = client.client.get_collection(results[1]["target_collection"])
+    record = collection.get(where={"source_file": "invoice.txt"}, include=["documents", "embeddings"])
+    assert list(record["embeddings"][0]) == pytest.approx(client.embeddings.embed_query("invoice payment terms"))
+
+
+def test_embedding_failure_fails_only_that_file(client, tmp_path):
+    """Test an embedding error is reported for its file while the others are stored"""
+    client.embeddings = KeywordEmbeddings(fail_on="refund")
+    paths = write_files(tmp_path, [("policy-a.txt", "refund policy"), ("policy-b.txt", "policy review")])
+
+    results = IngestionPipeline(use_processes=False).run(paths, config.COLLECTION_POLICY)
+
+    assert results[0]["success"] is False and "rate limited" in results[0]["error"]
+    assert results[1]["success"] is True
+    assert stored_texts(client, config.COLLECTION_POLICY) == ["policy review"]
+
+
+def test_parse_runs_in_worker_processes(client, tmp_path):
+    """Test parsing and chunking in a process pool returns picklable prepared documents"""
+    paths = write_files(tmp_path, [("one.txt", "refund policy"), ("two.txt", "invoice payment")])
+
+    results = IngestionPipeline(parse_workers=2).run(paths, config.COLLECTION_BILLING)
+
+    assert [result["success"] for result in results] == [True, True]
+    assert stored_texts(client, config.COLLECTION_BILLING) == ["invoice payment", "refund policy"]
+
+
+def test_ingest_multiple_documents_uses_pipeline(client, tmp_path):
+    """Test ingest_multiple_documents delegates several files to the pipeline"""
+    paths = write_files(tmp_path, [("one.txt", "engine"), ("two.txt", "turbine")])
+
+    with patch.object(IngestionPipeline, "run", return_value=["done"]) as run:
+        assert ingest_multiple_documents(paths, config.COLLECTION_TECHNICAL) == ["done"]
+        with patch.object(config, "INGEST_PIPELINE_ENABLED", False), \
+                patch("app.ingestion.ingest_data.ingest_document", return_value={"success": True}):
+            assert ingest_multiple_documents(paths, config.COLLECTION_TECHNICAL) == [{"success": True}] * 2
+
+    run.assert_called_once_with(paths, target_collection=config.COLLECTION_TECHNICAL, auto_map=False)
+
+
+def test_chunk_ids_are_content_addressed():
+    """Test IDs depend on source and content only, and repeated chunks within a file stay distinct"""
+    chunks = [Document(page_content="net 30"), Document(page_content="late fee"), Document(page_content="net 30")]
+
+    ids = chunk_ids(chunks, "terms.md")
+
+    assert ids == chunk_ids([Document(page_content=c.page_content, metadata={"x": 1}) for c in chunks], "terms.md")
+    assert len(set(ids)) == 3
+    assert ids[0] not in chunk_ids(chunks, "other.md")
+
+
+def test_reingest_skips_unchanged_chunks(client, tmp_path):
+    """Test re-uploading a file embeds only changed chunks and reports new/unchanged/removed counts"""
+    path = tmp_path / "manual.txt"
+    path.write_text("turbine inspection steps\n\nengine start procedure\n\nrefund of parts")
+
+    first = ingest_document(path, config.COLLECTION_TECHNICAL, chunk_size=30, chunk_overlap=0)
+    requests = len(client.embeddings.requests)
+    second = ingest_document(path, config.COLLECTION_TECHNICAL, chunk_size=30, chunk_overlap=0)
+
+    assert (first["new_chunks"], first["unchanged_chunks"], first["removed_chunks"]) == (3, 0, 0)
+    assert (second["new_chunks"], second["unchanged_chunks"], second["removed_chunks"]) == (0, 3, 0)
+    assert len(client.embeddings.requests) == requests
+    assert client.client.get_collection(config.COLLECTION_TECHNICAL).count() == 3
+
+    path.write_text("turbine inspection steps\n\nengine stop procedure\n\nrefund of parts")
+    third = ingest_document(path, config.COLLECTION_TECHNICAL, chunk_size=30, chunk_overlap=0)
+
+    assert (third["new_chunks"], third["unchanged_chunks"], third["removed_chunks"]) == (1, 2, 1)
+    assert client.embeddings.requests[-1] == ["engine stop procedure"]
+    assert "engine start procedure" not in stored_texts(client, config.COLLECTION_TECHNICAL)
+    assert client.client.get_collection(config.COLLECTION_TECHNICAL).count() == 3
+
+
+def test_edit_in_the_middle_refreshes_metadata_of_unchanged_chunks(client, tmp_path):
+    """Test chunks after an inserted one get their new chunk_index without re-embedding, so packing still merges them"""
+    path = tmp_path / "manual.txt"
+    path.write_text("turbine inspection steps\n\nengine start procedure\n\nrefund of parts")
+    get_lexical_index(config.COLLECTION_TECHNICAL).loaded = True
+    first = ingest_document(path, config.COLLECTION_TECHNICAL, chunk_size=30, chunk_overlap=0)
+
+    path.write_text("turbine inspection steps\n\nengine stop procedure\n\ninvoice payment check\n\nrefund of parts")
+    second = ingest_document(path, config.COLLECTION_TECHNICAL, chunk_size=30, chunk_overlap=0)
+
+    assert (second["new_chunks"], second["unchanged_chunks"], second["removed_chunks"]) == (2, 2, 1)
+    assert client.embeddings.requests[-1] == ["engine stop procedure", "invoice payment check"]
+    stored = client.client.get_collection(config.COLLECTION_TECHNICAL).get()
+    metadata = {text: meta for text, meta in zip(stored["documents"], stored["metadatas"])}
+    assert metadata["refund of parts"]["chunk_index"] == 3
+    assert {meta["total_chunks"] for meta in metadata.values()} == {4}
+    assert {meta["upload_timestamp"] for meta in metadata.values()} == {second["upload_timestamp"]}
+    assert first["upload_timestamp"] != second["upload_timestamp"]
+
+    results = [(Document(page_content=text, metadata=meta), 0.9) for text, meta in metadata.items()]
+    packed = pack_context(results, "engine", "Technical")
+
+    assert "manual.txt #0-3" in packed
+    assert packed.index("engine stop procedure") < packed.index("invoice payment check") < packed.index("refund of parts")
+    assert "engine start procedure" not in packed
+    hits = get_lexical_index(config.COLLECTION_TECHNICAL).search_documents("refund", 1)
+    assert hits and hits[0][0].metadata["chunk_index"] == 3
+
+
+def test_reingesting_an_identical_file_writes_nothing(client, tmp_path):
+    """Test a byte-identical re-upload skips the swap, keeping the generation and caches intact"""
+    path = tmp_path / "manual.txt"
+    path.write_text("turbine inspection steps\n\nengine start procedure\n\nrefund of parts")
+    ingest_document(path, config.COLLECTION_TECHNICAL, chunk_size=30, chunk_overlap=0)
+    generation = get_collection_generations().current(config.COLLECTION_TECHNICAL)
+
+    with patch("app.ingestion.ingest_data.replace_source_chunks") as replace:
+        result = ingest_document(path, config.COLLECTION_TECHNICAL, chunk_size=30, chunk_overlap=0)
+
+    replace.assert_not_called()
+    assert (result["new_chunks"], result["unchanged_chunks"], result["removed_chunks"]) == (0, 3, 0)
+    assert get_collection_generations().current(config.COLLECTION_TECHNICAL) == generation
+
+
+def test_pipeline_rerun_embeds_nothing(client, tmp_path):
+    """Test a repeated bulk load finds every chunk stored and skips the embedding calls"""
+    paths = write_files(tmp_path, [("a.txt", "engine turbine"), ("b.txt", "turbine blade")])
+    pipeline = IngestionPipeline(use_processes=False)
+    pipeline.run(paths, config.COLLECTION_TECHNICAL)
+    requests = len(client.embeddings.requests)
+
+    results = pipeline.run(paths, config.COLLECTION_TECHNICAL)
+
+    assert [(result["new_chunks"], result["unchanged_chunks"]) for result in results] == [(0, 1), (0, 1)]
+    assert len(client.embeddings.requests) == requests
+    assert client.client.get_collection(config.COLLECTION_TECHNICAL).count() == 2
+
+
+def test_expand_paths(tmp_path):
+    """Test directories expand recursively to supported files"""
+    (tmp_path / "sub").mkdir()
+    paths = write_files(tmp_path, [("b.md", "x"), ("sub/a.pdf", "x"), ("notes.docx", "x")])
+
+    assert expand_paths([str(tmp_path)]) == [paths[0], paths[1]]
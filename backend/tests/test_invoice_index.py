@@ -0,0 +1,182 @@
+"""
+Tests for the structured invoice index used by comparative billing queries
+"""
+
+import sqlite3
+import pytest
+from contextlib import closing
+from unittest.mock import Mock, patch
+from app.retrieval.invoice_index import (
+    InvoiceIndex,
+    extract_invoice_records,
+    answer_aggregate_billing_query,
+    is_aggregate_billing_query,
+    get_invoice_index,
+    invoice_date_range,
+)
+from app.retrieval.hybrid_retriever import search_billing_kb
+
+
+def invoice_text(number, customer, date, total):
+    """Helper to render an invoice in the sample invoice layout"""
+    return (
+        "AEROSPACE COMPANY BILLING INVOICE\n"
+        f"Invoice No: {number}\n"
+        f"Date: {date}\n"
+        f"Customer ID: {customer}\n"
+        "Subtotal: $1,000.00\n"
+        "Sales Tax (10%): $100.00\n"
+        f"TOTAL DUE: ${total}"
+    )
+
+
+@pytest.fixture
+def populated_index(tmp_path):
+    """Fixture with the four sample invoices indexed"""
+    index = InvoiceIndex(str(tmp_path / "invoices.sqlite3"))
+    index.index_document(invoice_text("INV-001", "ABC Company", "01/01/2026", "55,000.00"), "Invoice-1-ABC-Company.pdf")
+    index.index_document(invoice_text("INV-004", "ABC Company", "01/15/2026", "357,500.00"), "Invoice-4-ABC-Company.pdf")
+    index.index_document(invoice_text("INV-002", "XYZ Company", "01/05/2026", "110,000.00"), "Invoice-1-XYZ-Company.pdf")
+    index.index_document(invoice_text("INV-003", "PQR Company", "01/10/2026", "82,500.00"), "Invoice-1-PQR-Company.pdf")
+    return index
+
+
+def test_extract_invoice_records():
+    """Test invoice fields are extracted from the sample layout"""
+    records = extract_invoice_records(
+        invoice_text("INV-004", "ABC Company", "01/15/2026", "357,500.00"),
+        "Invoice-4-ABC-Company.pdf",
+    )
+    
+    assert len(records) == 1
+    record = records[0]
+    assert record["invoice_number"] == "INV-004"
+    assert record["customer"] == "ABC Company"
+    assert record["invoice_date"] == "2026-01-15"
+    assert record["subtotal"] == 1000.0
+    assert record["total"] == 357500.0
+
+
+def test_extract_invoice_records_without_total():
+    """Test documents without a total amount yield no records"""
+    assert extract_invoice_records("Invoice No: INV-9\nCustomer: ACME", "notes.md") == []
+
+
+def test_customer_totals(populated_index):
+    """Test per-customer totals are exact and ordered highest first"""
+    totals = populated_index.customer_totals()
+    
+    assert totals[0]["customer"] == "ABC Company"
+    assert totals[0]["invoice_count"] == 2
+    assert totals[0]["total"] == 412500.0
+    assert [row["customer"] for row in totals] == ["ABC Company", "XYZ Company", "PQR Company"]
+
+
+def test_reindex_replaces_rows_from_same_source(populated_index):
+    """Test re-ingesting a file replaces its invoice rows"""
+    populated_index.index_document(
+        invoice_text("INV-003", "PQR Company", "01/10/2026", "90,000.00"),
+        "Invoice-1-PQR-Company.pdf",
+    )
+    
+    assert populated_index.count() == 4
+    pqr = populated_index.customer_totals(["PQR Company"])[0]
+    assert pqr["total"] == 90000.0
+
+
+def test_answer_aggregate_billing_query(populated_index):
+    """Test the aggregate table lists exact totals"""
+    table = answer_aggregate_billing_query("Which company is our most valuable customer?", populated_index)
+    
+    assert "| ABC Company | 2 | $412,500.00 |" in table
+    assert "| ALL | 4 | $605,000.00 |" in table
+    assert "Invoice-4-ABC-Company.pdf" in table
+
+
+def test_answer_aggregate_billing_query_named_customer(populated_index):
+    """Test that naming a customer restricts the aggregates"""
+    table = answer_aggregate_billing_query("Total invoiced for XYZ Company", populated_index)
+    
+    assert "XYZ Company" in table
+    assert "ABC Company" not in table
+
+
+def test_answer_aggregate_billing_query_empty_index(tmp_path):
+    """Test that an empty index defers to vector retrieval"""
+    index = InvoiceIndex(str(tmp_path / "empty.sqlite3"))
+    assert answer_aggregate_billing_query("total invoiced", index) is None
+
+
+def test_is_aggregate_billing_query():
+    """Test aggregate query detection"""
+    assert is_aggregate_billing_query("What is the highest invoice amount?")
+    assert is_aggregate_billing_query("What did we invoice in Q3 2025 in total?")
+    assert not is_aggregate_billing_query("What are the payment terms?")
+
+
+@pytest.mark.parametrize("query", [
+    "Can you summarize the payment terms?",
+    "How do I stop automatic billing?",
+    "Is the laptop warranty included?",
+    "What is the total on invoice INV-004?",
+    "What is the total due on my invoice?",
+])
+def test_ordinary_billing_questions_are_not_aggregates(query):
+    """Test keywords match whole words only and single-invoice questions go to retrieval"""
+    assert not is_aggregate_billing_query(query)
+
+
+def test_date_range_restricts_aggregates(tmp_path):
+    """Test a quarter named in the query restricts totals to invoices dated within it"""
+    index = InvoiceIndex(str(tmp_path / "invoices.sqlite3"))
+    index.index_document(invoice_text("INV-010", "ABC Company", "06/30/2025", "1,000.00"), "q2.pdf")
+    index.index_document(invoice_text("INV-011", "ABC Company", "07/01/2025", "2,000.00"), "q3-a.pdf")
+    index.index_document(invoice_text("INV-012", "XYZ Company", "09/30/2025", "3,000.00"), "q3-b.pdf")
+
+    table = answer_aggregate_billing_query("What did we invoice in Q3 2025 in total?", index)
+
+    assert "invoices dated 2025-07-01 up to 2025-10-01" in table
+    assert "| ALL | 2 | $5,000.00 |" in table
+    assert "INV-010" not in table
+    assert invoice_date_range("Totals for March 2025") == ("2025-03-01", "2025-04-01")
+    assert invoice_date_range("Total invoiced for all customers") is None
+
+
+def test_same_invoice_number_in_two_files_is_kept(tmp_path):
+    """Test rows are keyed on (source_file, invoice_number), so another file's invoice is not overwritten"""
+    index = InvoiceIndex(str(tmp_path / "invoices.sqlite3"))
+    index.index_document(invoice_text("INV-001", "ABC Company", "01/01/2026", "55,000.00"), "abc.pdf")
+    index.index_document(invoice_text("INV-001", "XYZ Company", "01/02/2026", "10,000.00"), "xyz.pdf")
+
+    assert index.count() == 2
+    assert {row["customer"] for row in index.customer_totals()} == {"ABC Company", "XYZ Company"}
+
+
+def test_tables_keyed_on_invoice_number_are_migrated(tmp_path):
+    """Test an index created with the old invoice_number key is rebuilt and keeps its rows"""
+    path = str(tmp_path / "invoices.sqlite3")
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute(
+            "CREATE TABLE invoices (invoice_number TEXT PRIMARY KEY, customer TEXT NOT NULL, invoice_date TEXT, "
+            "subtotal REAL, tax REAL, total REAL NOT NULL, source_file TEXT NOT NULL)"
+        )
+        conn.execute("INSERT INTO invoices VALUES ('INV-001', 'ABC Company', '2026-01-01', NULL, NULL, 5.0, 'abc.pdf')")
+
+    index = InvoiceIndex(path)
+    index.index_document(invoice_text("INV-001", "XYZ Company", "01/02/2026", "10.00"), "xyz.pdf")
+
+    assert index.count() == 2
+
+
+def test_search_billing_kb_uses_invoice_index_for_comparative_query():
+    """Test comparative billing queries skip vector search when invoices are indexed"""
+    get_invoice_index().index_document(
+        invoice_text("INV-004", "ABC Company", "01/15/2026", "357,500.00"),
+        "Invoice-4-ABC-Company.pdf",
+    )
+    
+    with patch('app.retrieval.hybrid_retriever.get_chroma_client') as mock_get_client:
+        result = search_billing_kb.invoke({"query": "Which company is our most valuable customer?"})
+        
+        mock_get_client.assert_not_called()
+        assert "$357,500.00" in result
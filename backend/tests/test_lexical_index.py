@@ -0,0 +1,122 @@
+"""
+Tests for the BM25 lexical index and reciprocal-rank fusion
+"""
+
+import pytest
+from langchain_core.documents import Document
+from app.retrieval.lexical_index import (
+    BM25Index,
+    ensure_lexical_index,
+    get_lexical_index,
+    is_lexical_index_current,
+    tokenize,
+    is_identifier_token,
+    reciprocal_rank_fusion,
+)
+
+
+def make_doc(content, source="doc.pdf", chunk_index=0):
+    """Helper to create a chunk with citation metadata"""
+    return Document(page_content=content, metadata={"source_file": source, "chunk_index": chunk_index})
+
+
+def test_tokenize_keeps_identifiers_whole():
+    """Test that identifiers survive tokenization"""
+    tokens = tokenize("Invoice INV-004 cites DFARS 252.204-7012 and BUG_17.")
+    assert "inv-004" in tokens
+    assert "252.204-7012" in tokens
+
+
+def test_is_identifier_token():
+    """Test identifier detection"""
+    assert is_identifier_token("inv-004")
+    assert is_identifier_token("a320")
+    assert is_identifier_token("252.204-7012")
+    assert not is_identifier_token("2025")
+    assert not is_identifier_token("invoice")
+    for ordinary in ("30-day", "24/7", "1st", "10am", "2.5"):
+        assert not is_identifier_token(ordinary)
+
+
+def test_bm25_ranks_exact_identifier_first():
+    """Test BM25 ranking prefers the chunk containing the identifier"""
+    index = BM25Index()
+    index.add("1", make_doc("Invoice No: INV-001 total due $55,000"))
+    index.add("2", make_doc("Invoice No: INV-004 total due $357,500"))
+    index.add("3", make_doc("Payment terms net 30 for every invoice"))
+
+    hits = index.search("What is the total of INV-004?", k=3)
+
+    assert hits[0][0] == "2"
+    assert index.ids_containing_all(["inv-004"]) == ["2"]
+
+
+def test_bm25_remove_and_replace():
+    """Test documents can be removed and replaced incrementally"""
+    index = BM25Index()
+    index.add("1", make_doc("hydraulic pump failure"))
+    index.add("2", make_doc("landing gear actuator"))
+
+    assert index.remove("1") is True
+    assert index.search("hydraulic", k=5) == []
+
+    index.add("2", make_doc("hydraulic actuator replaced"))
+    assert len(index) == 1
+    assert index.search("hydraulic", k=5)[0][0] == "2"
+    assert index.search("landing", k=5) == []
+
+
+def test_load_from_vectorstore():
+    """Test the index can be rebuilt from a ChromaDB collection payload"""
+    from unittest.mock import Mock
+    vectorstore = Mock()
+    vectorstore.get.return_value = {
+        "ids": ["a", "b"],
+        "documents": ["first chunk", "second chunk"],
+        "metadatas": [{"source_file": "a.md"}, None],
+    }
+
+    index = BM25Index()
+    assert index.load_from_vectorstore(vectorstore) is True
+    assert index.loaded is True
+    assert len(index) == 2
+    assert index.get_document("b").metadata == {}
+
+
+def test_index_rebuilt_after_write_in_another_process():
+    """Test a write recorded in the shared generations file makes the next search rebuild the index"""
+    from unittest.mock import Mock
+    from app.retrieval import lexical_index
+    from app.retrieval.result_cache import CollectionGenerations, get_collection_generations
+    from app.utils.config import config
+    lexical_index._lexical_indexes.clear()
+    get_collection_generations().check_seconds = 0
+    vectorstore = Mock()
+    vectorstore.get.return_value = {"ids": ["a"], "documents": ["INV-001 paid"], "metadatas": [{}]}
+    assert len(ensure_lexical_index("billing", vectorstore)) == 1
+
+    # This process's own writes keep the incrementally updated index
+    lexical_index.index_documents("billing", ["b"], [make_doc("INV-002 due")])
+    get_lexical_index("billing").advance(get_collection_generations().bump("billing"))
+    assert is_lexical_index_current("billing")
+
+    vectorstore.get.return_value = {"ids": ["a", "c"], "documents": ["INV-001 paid", "INV-003 new"], "metadatas": [{}, {}]}
+    CollectionGenerations(db_path=config.get_generations_path()).bump("billing")
+
+    assert not is_lexical_index_current("billing")
+    index = ensure_lexical_index("billing", vectorstore)
+    assert index.search("inv-003", k=1)[0][0] == "c" and vectorstore.get.call_count == 2
+    lexical_index._lexical_indexes.clear()
+
+
+def test_reciprocal_rank_fusion_merges_rankings():
+    """Test RRF rewards documents ranked well by both retrievers"""
+    a = make_doc("alpha", "a.pdf")
+    b = make_doc("beta", "b.pdf")
+    c = make_doc("gamma", "c.pdf")
+    b_copy = make_doc("beta", "b.pdf")
+
+    fused = reciprocal_rank_fusion([[a, b, c], [b_copy, c]])
+
+    assert [doc.page_content for doc, _ in fused] == ["beta", "gamma", "alpha"]
+    assert fused[0][1] > fused[1][1]
@@ -0,0 +1,113 @@
+"""
+Tests for maximal marginal relevance diversification
+"""
+
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from app.retrieval.mmr import mmr_vector_hits, select_mmr
+from app.retrieval.search_pipeline import asearch_collection_scored, search_collection_scored
+from app.retrieval.rag_retriever import search_technical_kb
+from app.retrieval.cag_retriever import search_policy_kb
+from app.utils.config import Config, config
+
+
+QUERY = [1.0, 0.0, 0.0]
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+def make_vectorstore():
+    """Helper for a collection with two copies of an invoice template and one distinct invoice"""
+    vectorstore = Mock()
+    vectorstore.get.return_value = None
+    vectorstore._collection.metadata = {"hnsw:space": "cosine"}
+    vectorstore.embeddings.embed_query.return_value = QUERY
+    vectorstore.embeddings.aembed_query = AsyncMock(return_value=QUERY)
+    vectorstore._collection.query.return_value = {
+        "documents": [["Invoice template A", "Invoice template A (copy)", "Invoice INV-9 for XYZ"]],
+        "metadatas": [[{"source_file": "a.pdf"}, {"source_file": "a-copy.pdf"}, {"source_file": "xyz.pdf"}]],
+        "distances": [[0.05, 0.06, 0.2]],
+        "embeddings": [[[0.95, 0.31, 0.0], [0.95, 0.31, 0.0], [0.8, 0.0, 0.6]]],
+    }
+    return vectorstore
+
+
+def test_select_mmr_skips_near_duplicates():
+    """Test the second pick is the distinct candidate rather than the duplicate"""
+    embeddings = [[0.95, 0.31, 0.0], [0.95, 0.31, 0.0], [0.8, 0.0, 0.6]]
+
+    assert select_mmr(QUERY, embeddings, k=2, lambda_mult=0.5) == [0, 2]
+    assert select_mmr(QUERY, embeddings, k=2, lambda_mult=1.0) == [0, 1]
+    assert select_mmr(QUERY, [], k=2) == []
+
+
+def test_mmr_vector_hits_reuse_stored_embeddings():
+    """Test candidates are fetched with their stored embeddings and keep relevance scores"""
+    vectorstore = make_vectorstore()
+
+    with patch.object(Config, "MMR_LAMBDA_BILLING", 0.5), patch.object(config, "MMR_FETCH_K", 10):
+        hits = mmr_vector_hits(vectorstore, config.COLLECTION_BILLING, QUERY, k=2)
+
+    kwargs = vectorstore._collection.query.call_args.kwargs
+    assert "embeddings" in kwargs["include"]
+    assert kwargs["n_results"] == 10
+    assert [doc.metadata["source_file"] for doc, _ in hits] == ["a.pdf", "xyz.pdf"]
+    assert [round(score, 2) for _, score in hits] == [0.95, 0.8]
+    vectorstore.embeddings.embed_documents.assert_not_called()
+
+
+def test_lambda_is_per_collection():
+    """Test a collection configured for relevance only keeps the duplicate"""
+    vectorstore = make_vectorstore()
+
+    with patch.object(Config, "MMR_LAMBDA_TECHNICAL", 1.0):
+        hits = mmr_vector_hits(vectorstore, config.COLLECTION_TECHNICAL, QUERY, k=2)
+
+    assert [doc.metadata["source_file"] for doc, _ in hits] == ["a.pdf", "a-copy.pdf"]
+
+
+def test_search_collection_diversify():
+    """Test diversify=True selects by MMR and is cached separately from plain search"""
+    vectorstore = make_vectorstore()
+    vectorstore.similarity_search_with_score.return_value = []
+
+    diverse = search_collection_scored(vectorstore, config.COLLECTION_BILLING, "invoice", 2, diversify=True)
+    search_collection_scored(vectorstore, config.COLLECTION_BILLING, "invoice", 2)
+
+    assert [doc.metadata["source_file"] for doc, _ in diverse] == ["a.pdf", "xyz.pdf"]
+    vectorstore.similarity_search_with_score.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_async_search_diversify():
+    """Test the async path embeds asynchronously and selects by MMR"""
+    vectorstore = make_vectorstore()
+
+    diverse = await asearch_collection_scored(vectorstore, config.COLLECTION_BILLING, "invoice", 2, diversify=True)
+
+    vectorstore.embeddings.aembed_query.assert_awaited_once_with("invoice")
+    assert len(diverse) == 2
+
+
+def test_tools_accept_diversify():
+    """Test the technical tool passes diversify through and policy bypasses the CAG snapshot"""
+    client = Mock()
+    client.get_or_create_collection.return_value = make_vectorstore()
+
+    with patch("app.retrieval.rag_retriever.get_chroma_client", return_value=client):
+        technical = search_technical_kb.invoke({"query": "invoice", "k": 2, "diversify": True})
+    with patch("app.retrieval.cag_retriever.get_chroma_client", return_value=client), \
+            patch("app.retrieval.cag_retriever.get_policy_cache") as get_cache, \
+            patch.object(Config, "MMR_LAMBDA_POLICY", 0.5):
+        policy = search_policy_kb.invoke({"query": "invoice", "k": 2, "diversify": True})
+
+    assert "xyz.pdf" in technical and "a-copy.pdf" not in technical
+    assert "xyz.pdf" in policy
+    get_cache.return_value.load.assert_not_called()
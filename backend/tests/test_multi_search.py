@@ -0,0 +1,132 @@
+"""
+Tests for single-embedding fan-out search across knowledge base collections
+"""
+
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+from langchain_core.documents import Document
+from app.retrieval.multi_search import (
+    asearch_all_kbs,
+    get_shared_collection_hits,
+    retrieval_request_scope,
+    search_all_kbs,
+)
+from app.utils.config import config
+
+
+@pytest.fixture
+def mock_client():
+    """Fixture for a ChromaDB client whose collections return fixed distances"""
+    distances = {
+        config.COLLECTION_BILLING: [("invoice", 0.2)],
+        config.COLLECTION_TECHNICAL: [("manual", 0.1), ("bug", 0.3)],
+        config.COLLECTION_POLICY: [("policy", 0.4)],
+    }
+
+    def make_collection(collection_name, **kwargs):
+        collection = Mock()
+        collection.similarity_search_by_vector_with_relevance_scores.return_value = [
+            (Document(page_content=content, metadata={"source_file": f"{content}.md"}), distance)
+            for content, distance in distances[collection_name]
+        ]
+        return collection
+
+    client = Mock()
+    client.embeddings.embed_query.return_value = [0.1, 0.2, 0.3]
+    client.embeddings.aembed_query = AsyncMock(return_value=[0.1, 0.2, 0.3])
+    client.get_or_create_collection.side_effect = make_collection
+
+    with patch("app.retrieval.multi_search.get_chroma_client", return_value=client):
+        yield client
+
+
+def test_search_all_kbs_embeds_once(mock_client):
+    """Test the query is embedded once and every collection is searched with that vector"""
+    result = search_all_kbs("hydraulic pump warranty", per_collection_k=3)
+
+    mock_client.embeddings.embed_query.assert_called_once_with("hydraulic pump warranty")
+    assert set(result["per_collection"]) == set(config.get_all_collections())
+    assert result["errors"] == {}
+
+
+def test_search_all_kbs_merged_ranking(mock_client):
+    """Test merged ranking orders hits from every collection by relevance score"""
+    result = search_all_kbs("hydraulic pump warranty", per_collection_k=3)
+
+    merged = [(name, doc.page_content) for name, doc, _ in result["merged"]]
+    assert merged == [
+        (config.COLLECTION_TECHNICAL, "manual"),
+        (config.COLLECTION_BILLING, "invoice"),
+        (config.COLLECTION_TECHNICAL, "bug"),
+        (config.COLLECTION_POLICY, "policy"),
+    ]
+    # Squared L2 distances of unit vectors map to cosine similarity (1 - d/2)
+    assert result["merged"][0][2] == pytest.approx(0.95)
+
+
+@pytest.mark.asyncio
+async def test_asearch_all_kbs_matches_sync(mock_client):
+    """Test the async fan-out embeds asynchronously and returns the same rankings"""
+    result = await asearch_all_kbs("hydraulic pump warranty", per_collection_k=3)
+
+    mock_client.embeddings.aembed_query.assert_awaited_once_with("hydraulic pump warranty")
+    mock_client.embeddings.embed_query.assert_not_called()
+    assert [doc.page_content for _, doc, _ in result["merged"]] == ["manual", "invoice", "bug", "policy"]
+
+
+def test_search_all_kbs_collection_failure(mock_client):
+    """Test a failing collection is reported without losing the others"""
+    healthy = mock_client.get_or_create_collection.side_effect
+
+    def failing(collection_name, **kwargs):
+        if collection_name == config.COLLECTION_POLICY:
+            raise RuntimeError("collection unavailable")
+        return healthy(collection_name, **kwargs)
+
+    mock_client.get_or_create_collection.side_effect = failing
+
+    result = search_all_kbs("hydraulic pump warranty")
+
+    assert "collection unavailable" in result["errors"][config.COLLECTION_POLICY]
+    assert result["per_collection"][config.COLLECTION_POLICY] == []
+    assert len(result["merged"]) == 3
+
+
+def test_request_scope_shares_results(mock_client):
+    """Test results are shared within a request scope and not outside it"""
+    with retrieval_request_scope():
+        first = search_all_kbs("Hydraulic  pump warranty")
+        second = search_all_kbs("hydraulic pump warranty")
+        shared = get_shared_collection_hits(config.COLLECTION_TECHNICAL, "hydraulic pump warranty", 1)
+
+    assert first is second
+    assert mock_client.embeddings.embed_query.call_count == 1
+    assert [doc.page_content for doc, _ in shared] == ["manual"]
+
+    search_all_kbs("hydraulic pump warranty")
+    assert mock_client.embeddings.embed_query.call_count == 2
+    assert get_shared_collection_hits(config.COLLECTION_TECHNICAL, "hydraulic pump warranty", 1) is None
+
+
+def test_shared_hits_require_enough_results(mock_client):
+    """Test fan-out hits are not reused when the caller needs more results than were fetched"""
+    with retrieval_request_scope():
+        search_all_kbs("hydraulic pump warranty", per_collection_k=2)
+
+        assert get_shared_collection_hits(config.COLLECTION_TECHNICAL, "hydraulic pump warranty", 5) is None
+        assert get_shared_collection_hits(config.COLLECTION_TECHNICAL, "other question", 2) is None
+
+
+def test_search_collection_reuses_fan_out_hits(mock_client):
+    """Test search_collection skips the vector query when the request already fanned out"""
+    from app.retrieval.search_pipeline import search_collection
+
+    vectorstore = Mock()
+    vectorstore.get.return_value = None
+
+    with retrieval_request_scope():
+        search_all_kbs("hydraulic pump warranty", per_collection_k=5)
+        docs = search_collection(vectorstore, config.COLLECTION_TECHNICAL, "hydraulic pump warranty", 2)
+
+    vectorstore.similarity_search.assert_not_called()
+    assert [doc.page_content for doc in docs] == ["manual", "bug"]
@@ -0,0 +1,172 @@
+"""
+Tests for the negative-result cache of searches that found nothing
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from app.retrieval.lexical_index import BM25Index
+from app.retrieval.negative_cache import (
+    NegativeResultCache,
+    get_negative_result_cache,
+    negative_cache_key,
+)
+from app.retrieval.rag_retriever import search_technical_kb
+from app.retrieval.result_cache import bump_collection_generation
+from app.retrieval.search_pipeline import asearch_collection_scored, search_collection_scored
+from app.utils.config import config
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+def make_vectorstore(hits=()):
+    """Helper for a vector store whose similarity search returns the given (Document, distance) hits"""
+    vectorstore = Mock()
+    vectorstore.get.return_value = None
+    vectorstore._collection.metadata = {"hnsw:space": "cosine"}
+    vectorstore.similarity_search_with_score.return_value = list(hits)
+    return vectorstore
+
+
+def test_entries_expire_and_go_stale():
+    """Test an entry stops answering after its TTL or after the collection generation moves"""
+    cache = NegativeResultCache(max_size=4, ttl_seconds=60)
+    key = negative_cache_key("billing", "Refund  for order 7")
+
+    assert key == negative_cache_key("billing", "refund for order 7")
+    assert not cache.is_known_empty(key, 0)
+    cache.record(key, 0)
+    assert cache.is_known_empty(key, 0)
+    assert cache.times_served(key, 0) == 1
+    assert not cache.is_known_empty(key, 1)
+
+    cache.record(key, 1)
+    with patch("app.retrieval.negative_cache.time.monotonic", return_value=10 ** 9):
+        assert not cache.is_known_empty(key, 1)
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["stale"] == 1 and stats["expirations"] == 1
+    assert stats["size"] == 0
+
+
+def test_cache_is_bounded():
+    """Test LRU eviction keeps the cache within its entry limit"""
+    cache = NegativeResultCache(max_size=2)
+    for query in ("a", "b", "c"):
+        cache.record(negative_cache_key("policy", query), 0)
+
+    assert not cache.is_known_empty(negative_cache_key("policy", "a"), 0)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_empty_search_is_not_repeated_until_ingest():
+    """Test an empty search is answered from the cache until the collection changes"""
+    vectorstore = make_vectorstore()
+
+    with patch.object(config, "RETRIEVAL_RESULT_CACHE_ENABLED", False):
+        assert search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "Warp drive manual", 3) == []
+        assert search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "warp  drive manual", 3) == []
+        assert vectorstore.similarity_search_with_score.call_count == 1
+
+        bump_collection_generation(config.COLLECTION_TECHNICAL)
+        search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "warp drive manual", 3)
+
+    assert vectorstore.similarity_search_with_score.call_count == 2
+    assert get_negative_result_cache().stats()["hits"] == 1
+
+
+def test_low_scoring_hits_are_recorded_as_empty():
+    """Test a search whose best hit is below the minimum score answers empty and is not repeated"""
+    far = [(Document(page_content="Invoice 12", metadata={"source_file": "inv.md"}), 1.9)]
+    near = [(Document(page_content="Invoice 12", metadata={"source_file": "inv.md"}), 0.4)]
+    vectorstore = make_vectorstore(far)
+
+    with patch.object(config, "RETRIEVAL_RESULT_CACHE_ENABLED", False):
+        assert search_collection_scored(vectorstore, config.COLLECTION_BILLING, "compare invoices", 3) == []
+        assert search_collection_scored(vectorstore, config.COLLECTION_BILLING, "compare invoices", 3) == []
+        assert vectorstore.similarity_search_with_score.call_count == 1
+
+        vectorstore.similarity_search_with_score.return_value = near
+        results = search_collection_scored(vectorstore, config.COLLECTION_BILLING, "invoice twelve", 3)
+
+    assert [doc.page_content for doc, _ in results] == ["Invoice 12"]
+    assert get_negative_result_cache().stats()["size"] == 1
+
+
+def test_keyword_hit_does_not_rescue_a_weak_vector_search():
+    """Test a BM25 match on common words (normalized to 1.0) does not keep a below-minimum search alive"""
+    late_fee = Document(page_content="What is the late fee", metadata={"source_file": "fees.md"})
+    index = BM25Index()
+    index.add("fee", late_fee)
+    far = [(late_fee, 1.9)]
+
+    with patch("app.retrieval.search_pipeline.ensure_lexical_index", return_value=index), \
+            patch.object(config, "RETRIEVAL_RESULT_CACHE_ENABLED", False):
+        results = search_collection_scored(make_vectorstore(far), config.COLLECTION_BILLING, "What is the weather on Mars?", 3)
+
+    assert index.search("What is the weather on Mars?", 1)
+    assert results == []
+    assert get_negative_result_cache().stats()["size"] == 1
+
+
+def test_tool_reports_known_empty_for_low_scoring_hits():
+    """Test the tool answers a below-minimum search as empty and then as known empty"""
+    client = Mock()
+    far = [(Document(page_content="Turbine manual", metadata={"source_file": "turbine.md"}), 1.9)]
+    client.get_or_create_collection.return_value = make_vectorstore(far)
+
+    with patch("app.retrieval.rag_retriever.get_chroma_client", return_value=client):
+        first = search_technical_kb.invoke({"query": "warp core"})
+        second = search_technical_kb.invoke({"query": "warp core"})
+
+    assert first.startswith("No relevant technical documents") and "Turbine manual" not in first
+    assert "do not repeat it" in second
+
+
+@pytest.mark.asyncio
+async def test_async_search_reads_entries_from_sync_path():
+    """Test the async search path honours entries recorded by the sync path"""
+    vectorstore = make_vectorstore()
+    search_collection_scored(vectorstore, config.COLLECTION_POLICY, "pet policy", 3)
+
+    results = await asearch_collection_scored(vectorstore, config.COLLECTION_POLICY, "pet policy", 3)
+
+    assert results == []
+    vectorstore.similarity_search_by_vector_with_relevance_scores.assert_not_called()
+
+
+def test_failed_searches_and_disabled_cache_are_not_recorded():
+    """Test errors stay retryable and NEGATIVE_RESULT_CACHE_ENABLED=false always searches"""
+    vectorstore = make_vectorstore()
+    vectorstore.similarity_search_with_score.side_effect = RuntimeError("timeout")
+
+    with pytest.raises(RuntimeError):
+        search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "router reset", 3)
+    assert get_negative_result_cache().stats()["size"] == 0
+
+    vectorstore.similarity_search_with_score.side_effect = None
+    with patch.object(config, "NEGATIVE_RESULT_CACHE_ENABLED", False), \
+            patch.object(config, "RETRIEVAL_RESULT_CACHE_ENABLED", False):
+        search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "router reset", 3)
+        search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "router reset", 3)
+    assert vectorstore.similarity_search_with_score.call_count == 3
+
+
+def test_tool_reports_known_empty():
+    """Test a repeated empty search tells the agent not to retry it"""
+    client = Mock()
+    client.get_or_create_collection.return_value = make_vectorstore()
+
+    with patch("app.retrieval.rag_retriever.get_chroma_client", return_value=client):
+        first = search_technical_kb.invoke({"query": "flux capacitor"})
+        second = search_technical_kb.invoke({"query": "Flux capacitor"})
+
+    assert first.startswith("No relevant technical documents") and "do not repeat it" not in first
+    assert second.startswith("No relevant technical documents") and "do not repeat it" in second
@@ -0,0 +1,276 @@
+"""
+Tests for the NumPy exact-search vector backend
+"""
+
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.retrieval import numpy_store
+from app.retrieval.chroma_client import ChromaDBClient
+from app.retrieval.numpy_store import (
+    NumpyCollection,
+    NumpyVectorStore,
+    benchmark_backends,
+    import_from_chroma,
+    list_numpy_collections,
+    matches_where,
+)
+from app.retrieval.search_pipeline import search_collection_scored
+from app.utils.config import config
+
+
+VOCABULARY = ["invoice", "payment", "engine", "turbine", "refund", "policy"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings over a tiny vocabulary"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(term)) + 0.01 for term in VOCABULARY]
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture for a NumPy vector store with three documents"""
+    vectorstore = NumpyVectorStore("technical", KeywordEmbeddings(), str(tmp_path))
+    vectorstore.add_documents(
+        [
+            Document(page_content="engine turbine inspection", metadata={"source_file": "engine.pdf", "page": 1}),
+            Document(page_content="invoice payment terms", metadata={"source_file": "billing.md", "page": 2}),
+            Document(page_content="refund policy", metadata={"source_file": "policy.txt", "page": 3}),
+        ],
+        ids=["engine", "invoice", "refund"],
+    )
+    return vectorstore
+
+
+def test_exact_search_ranks_by_cosine(store):
+    """Test results are ordered by cosine distance and carry their metadata"""
+    hits = store.similarity_search_with_score("turbine engine", k=2)
+
+    assert [doc.metadata["source_file"] for doc, _ in hits] == ["engine.pdf", "billing.md"]
+    assert hits[0][1] == pytest.approx(0.0, abs=0.01)
+    assert hits[0][0].id == "engine"
+    assert store._collection.metadata["hnsw:space"] == "cosine"
+
+
+def test_filters(store):
+    """Test where and where_document filters restrict the candidates"""
+    by_file = store.similarity_search("turbine", k=3, filter={"source_file": {"$in": ["billing.md", "policy.txt"]}})
+    by_text = store.similarity_search("turbine", k=3, where_document={"$contains": "refund"})
+    by_page = store.get(where={"$and": [{"page": {"$gte": 2}}, {"source_file": {"$ne": "policy.txt"}}]})
+
+    assert {doc.metadata["source_file"] for doc in by_file} == {"billing.md", "policy.txt"}
+    assert [doc.page_content for doc in by_text] == ["refund policy"]
+    assert by_page["ids"] == ["invoice"]
+    with pytest.raises(ValueError):
+        matches_where({}, {"page": {"$regex": "x"}})
+
+
+def test_persistence_and_second_reader(store, tmp_path):
+    """Test another instance (e.g. another uvicorn worker) sees data and later writes"""
+    reader = NumpyCollection("technical", str(tmp_path / "technical"))
+    assert reader.count() == 3
+
+    store.add_texts(["payment refund"], metadatas=[{"source_file": "late.md"}], ids=["late"])
+
+    assert reader.count() == 4
+    result = reader.query(query_embeddings=[KeywordEmbeddings().embed_query("payment refund")], n_results=1)
+    assert result["ids"] == [["late"]]
+    assert isinstance(reader._snapshot.matrix, np.memmap)
+    assert list_numpy_collections(str(tmp_path)) == ["technical"]
+
+
+def test_upsert_growth_and_delete(tmp_path):
+    """Test the matrix grows past its capacity, upserts replace rows and deletes compact"""
+    collection = NumpyCollection("grow", str(tmp_path / "grow"))
+    vectors = np.eye(6, dtype=np.float32)
+
+    with patch.object(numpy_store, "_MIN_CAPACITY", 2):
+        collection.upsert([f"id-{i}" for i in range(5)], vectors[:5], [f"doc {i}" for i in range(5)])
+        collection.upsert(["id-0"], vectors[5:6], ["doc 0 replaced"])
+
+    assert collection.stats()["capacity"] == 8
+    assert collection.count() == 5
+    assert collection.query(query_embeddings=[vectors[5]], n_results=1)["documents"] == [["doc 0 replaced"]]
+
+    assert collection.delete(ids=["id-1", "id-3", "missing"]) == 2
+    assert collection.get()["ids"] == ["id-0", "id-2", "id-4"]
+    assert collection.query(query_embeddings=[vectors[4]], n_results=1)["ids"] == [["id-4"]]
+
+    with pytest.raises(ValueError):
+        collection.upsert(["bad"], [[1.0, 0.0]])
+
+
+def test_query_returns_stored_embeddings(store):
+    """Test the Chroma-shaped query result used by MMR includes unit-normalized embeddings"""
+    result = store._collection.query(
+        query_embeddings=[KeywordEmbeddings().embed_query("invoice")],
+        n_results=2,
+        include=["documents", "metadatas", "distances", "embeddings"],
+    )
+
+    assert result["ids"][0][0] == "invoice"
+    assert np.linalg.norm(result["embeddings"][0][0]) == pytest.approx(1.0, abs=1e-5)
+    assert result["distances"][0][0] <= result["distances"][0][1]
+
+
+def test_search_pipeline_runs_on_numpy_backend(store):
+    """Test search_collection_scored works unchanged on a NumpyVectorStore"""
+    with patch.object(config, "LEXICAL_SEARCH_ENABLED", False):
+        results = search_collection_scored(store, "technical", "turbine engine", 2)
+
+    assert results[0][0].metadata["source_file"] == "engine.pdf"
+    assert results[0][1] == pytest.approx(1.0, abs=0.01)
+
+
+def test_client_selects_numpy_backend(tmp_path):
+    """Test VECTOR_BACKEND=numpy makes ChromaDBClient return NumPy collections"""
+    with patch.object(config, "VECTOR_BACKEND", "numpy"):
+        client = ChromaDBClient(persist_directory=str(tmp_path))
+    client.embeddings = KeywordEmbeddings()
+
+    vectorstore = client.get_or_create_collection("billing_knowledge_base", metadata={"type": "knowledge_base"})
+    vectorstore.add_texts(["invoice payment"])
+
+    assert isinstance(vectorstore, NumpyVectorStore)
+    assert client.list_collections() == ["billing_knowledge_base"]
+    assert client.delete_collection("billing_knowledge_base")
+    assert client.list_collections() == []
+    assert client.get_collection("billing_knowledge_base") is None
+
+
+def test_import_and_benchmark(tmp_path):
+    """Test importing a Chroma collection and measuring Chroma's recall against exact search"""
+    vectors = np.eye(4, dtype=np.float32).tolist()
+    chroma = Mock()
+    chroma.get.side_effect = [
+        {"ids": ["a", "b", "c"], "documents": ["a", "b", "c"], "metadatas": [{}, {}, {}], "embeddings": vectors[:3]},
+        {"ids": ["d"], "documents": ["d"], "metadatas": [{}], "embeddings": vectors[3:]},
+        {"ids": []},
+    ]
+    # Approximate search misses the exact nearest neighbour for every query
+    chroma._collection.query.return_value = {"ids": [["z"]]}
+    store = NumpyVectorStore("imported", KeywordEmbeddings(), str(tmp_path))
+
+    assert import_from_chroma(chroma, store, batch_size=3) == 4
+    result = benchmark_backends(chroma, store, [vectors[0], vectors[2]], k=1)
+
+    assert result["records"] == 4
+    assert result["chroma_recall_at_k"] == 0.0
+    assert result["numpy_p95_ms"] >= result["numpy_p50_ms"] >= 0.0
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_quantized_two_stage_search(tmp_path, mode):
+    """Test quantized collections scan the small copy and rescore candidates exactly"""
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(300, 32)).astype(np.float32)
+    exact = NumpyCollection("exact", str(tmp_path / "exact"), quantization="none")
+    quantized = NumpyCollection("quantized", str(tmp_path / "quantized"), quantization=mode, rescore_factor=4)
+    ids = [f"id-{i}" for i in range(len(vectors))]
+    exact.upsert(ids, vectors)
+    quantized.upsert(ids, vectors)
+
+    queries = vectors[:10] + rng.normal(0.0, 0.1, size=(10, 32)).astype(np.float32)
+    expected = exact.query(query_embeddings=queries, n_results=5)
+    found = quantized.query(query_embeddings=queries, n_results=5)
+
+    assert found["ids"] == expected["ids"]
+    assert np.allclose(found["distances"], expected["distances"], atol=1e-5)
+    stats = quantized.stats()
+    assert stats["quantization"] == mode
+    assert stats["scan_bytes"] < stats["float32_bytes"]
+
+
+def test_existing_collection_is_requantized(tmp_path):
+    """Test opening float32-only data in a quantized mode builds the quantized copy"""
+    vectors = np.eye(4, dtype=np.float32)
+    NumpyCollection("kb", str(tmp_path), quantization="none").upsert(["a", "b", "c", "d"], vectors)
+
+    collection = NumpyCollection("kb", str(tmp_path), quantization="int8")
+    collection.delete(ids=["b"])
+
+    assert collection._snapshot.quantized.dtype == np.int8
+    assert collection.query(query_embeddings=[vectors[3]], n_results=1)["ids"] == [["d"]]
+    with pytest.raises(ValueError):
+        NumpyCollection("kb", str(tmp_path), quantization="int4")
+
+
+def test_quantization_report(tmp_path):
+    """Test the per-collection memory and recall report"""
+    rng = np.random.default_rng(3)
+    collection = NumpyCollection("kb", str(tmp_path), quantization="none")
+    collection.upsert([f"id-{i}" for i in range(200)], rng.normal(size=(200, 64)))
+
+    report = numpy_store.quantization_report(collection, queries=20, k=5)
+
+    assert report["count"] == 200 and report["float32_bytes"] == 200 * 64 * 4
+    assert report["modes"]["float16"]["memory_ratio"] == 0.5
+    assert report["modes"]["int8"]["memory_ratio"] < 0.3
+    for mode in ("float16", "int8"):
+        assert report["modes"][mode]["rescored_recall_at_k"] >= report["modes"][mode]["first_pass_recall_at_k"]
+        assert report["modes"][mode]["rescored_recall_at_k"] >= 0.95
+
+
+def matryoshka_vectors(rng, count, dimensions):
+    """Helper for vectors whose leading dimensions carry most of the signal, like text-embedding-3"""
+    return (rng.normal(size=(count, dimensions)) / (1.0 + np.arange(dimensions) / 4.0)).astype(np.float32)
+
+
+@pytest.mark.parametrize("mode", ["none", "int8"])
+def test_coarse_prefix_search_rescores_with_full_vectors(tmp_path, mode):
+    """Test a coarse prefix first pass returns the exact results after rescoring"""
+    rng = np.random.default_rng(11)
+    vectors = matryoshka_vectors(rng, 400, 64)
+    ids = [f"id-{i}" for i in range(len(vectors))]
+    exact = NumpyCollection("exact", str(tmp_path / "exact"), quantization="none", coarse_dimensions=0)
+    coarse = NumpyCollection(
+        "coarse", str(tmp_path / "coarse"), quantization=mode, rescore_factor=8, coarse_dimensions=16
+    )
+    exact.upsert(ids, vectors)
+    coarse.upsert(ids, vectors)
+
+    queries = vectors[:10] + rng.normal(0.0, 0.05, size=(10, 64)).astype(np.float32)
+    expected = exact.query(query_embeddings=queries, n_results=5)
+    found = coarse.query(query_embeddings=queries, n_results=5)
+
+    assert found["ids"] == expected["ids"]
+    assert np.allclose(found["distances"], expected["distances"], atol=1e-5)
+    stats = coarse.stats()
+    assert stats["coarse_dimensions"] == 16 and stats["dimensions"] == 64
+    assert stats["scan_bytes"] <= stats["float32_bytes"] // 4
+
+
+def test_reindex_to_coarse_prefix_without_reembedding(tmp_path):
+    """Test reopening with new coarse dimensions rebuilds the first pass from stored vectors"""
+    rng = np.random.default_rng(5)
+    vectors = matryoshka_vectors(rng, 50, 32)
+    NumpyCollection("kb", str(tmp_path), quantization="int8", coarse_dimensions=0).upsert(
+        [f"id-{i}" for i in range(50)], vectors
+    )
+
+    collection = NumpyCollection("kb", str(tmp_path), quantization="int8", coarse_dimensions=8)
+
+    assert collection._snapshot.quantized.shape[1] == 8
+    assert collection.query(query_embeddings=[vectors[7]], n_results=1)["ids"] == [["id-7"]]
+    report = numpy_store.quantization_report(collection, modes=("none", "int8"), queries=10, k=3, coarse_dimensions=[8])
+    assert set(report["modes"]) == {"int8", "none@8", "int8@8"}
+    assert report["modes"]["none@8"]["memory_ratio"] == 0.25
+    with pytest.raises(ValueError):
+        NumpyCollection("kb", str(tmp_path), coarse_dimensions=-1)
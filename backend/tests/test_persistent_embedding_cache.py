@@ -0,0 +1,169 @@
+"""
+Tests for the persistent on-disk embedding cache
+"""
+
+import json
+import pytest
+from unittest.mock import patch
+from langchain_core.embeddings import Embeddings
+from app.retrieval.persistent_embedding_cache import (
+    PersistentCachedEmbeddings,
+    PersistentEmbeddingCache,
+    embedding_key,
+    get_persistent_embedding_cache,
+    main,
+    with_persistent_cache,
+)
+from app.utils.config import config
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embeddings that record every text sent to the "API" """
+
+    def __init__(self):
+        self.sent = []
+
+    def embed_documents(self, texts):
+        self.sent.extend(texts)
+        return [[float(len(text)), 0.5, -1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+
+def cached(cache, model="text-embedding-3-small", dimensions=3):
+    """Helper wrapping fresh counting embeddings with the cache"""
+    return PersistentCachedEmbeddings(CountingEmbeddings(), cache, model, dimensions)
+
+
+def test_rebuild_sends_only_new_text(tmp_path):
+    """Test a second process embedding the same chunks makes no API calls and keeps vector order"""
+    path = str(tmp_path / "cache.sqlite3")
+    first = cached(PersistentEmbeddingCache(path))
+    vectors = first.embed_documents(["engine", "turbine", "engine"])
+
+    rebuilt = cached(PersistentEmbeddingCache(path))
+
+    assert first.embeddings.sent == ["engine", "turbine"]
+    assert rebuilt.embed_documents(["turbine", "engine", "blade"]) == [vectors[1], vectors[0], [5.0, 0.5, -1.0]]
+    assert rebuilt.embeddings.sent == ["blade"]
+    assert rebuilt.embed_query("engine") == vectors[0] and rebuilt.embeddings.sent == ["blade"]
+
+
+def test_key_includes_model_and_dimensions(tmp_path):
+    """Test vectors of another model or dimension count are never served"""
+    cache = PersistentEmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cached(cache).embed_query("refund policy")
+
+    other = cached(cache, model="text-embedding-3-large")
+    other.embed_query("refund policy")
+    smaller = cached(cache, dimensions=256)
+    smaller.embed_query("refund policy")
+
+    assert other.embeddings.sent == ["refund policy"] and smaller.embeddings.sent == ["refund policy"]
+    assert embedding_key("a", "m", 3) != embedding_key("a", "m", 4)
+    assert cache.stats()["entries"] == 3
+
+
+def test_size_limit_evicts_least_recently_used(tmp_path):
+    """Test writes beyond max_bytes evict the least recently used vectors first"""
+    cache = PersistentEmbeddingCache(str(tmp_path / "cache.sqlite3"), max_bytes=3 * 12)
+    embeddings = cached(cache)
+    embeddings.embed_documents(["a", "b", "c"])
+    embeddings.embed_query("a")
+
+    embeddings.embed_query("d")
+
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["size_bytes"] <= 3 * 12 and stats["evictions"] == 2
+    embeddings.embeddings.sent.clear()
+    embeddings.embed_documents(["a", "d"])
+    assert embeddings.embeddings.sent == []
+
+
+@pytest.mark.asyncio
+async def test_async_path_shares_the_cache(tmp_path):
+    """Test aembed_documents reads and writes the same entries as the sync path"""
+    embeddings = cached(PersistentEmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    embeddings.embed_documents(["invoice"])
+
+    vectors = await embeddings.aembed_documents(["invoice", "payment"])
+
+    assert vectors == [[7.0, 0.5, -1.0], [7.0, 0.5, -1.0]]
+    assert embeddings.embeddings.sent == ["invoice", "payment"]
+
+
+def test_lookups_defer_writes(tmp_path):
+    """Test lookups only read, and last_used and counters are written in one later batch"""
+    path = str(tmp_path / "cache.sqlite3")
+    cache = PersistentEmbeddingCache(path)
+    embeddings = cached(cache)
+    embeddings.embed_documents(["engine", "turbine"])
+    other = PersistentEmbeddingCache(path)
+    stored_last_used = dict(other._conn.execute("SELECT key, last_used FROM embeddings"))
+
+    embeddings.embed_query("engine")
+    embeddings.embed_query("engine")
+
+    assert dict(other._conn.execute("SELECT key, last_used FROM embeddings")) == stored_last_used
+    assert dict(other._conn.execute("SELECT name, value FROM counters")).get("hits") is None
+
+    cache.flush()
+
+    key = embedding_key("engine", "text-embedding-3-small", 3)
+    assert dict(other._conn.execute("SELECT key, last_used FROM embeddings"))[key] > stored_last_used[key]
+    assert dict(other._conn.execute("SELECT name, value FROM counters"))["hits"] == 2
+
+
+def test_running_totals_match_the_table(tmp_path):
+    """Test stats() reports running entry and byte totals that agree with a full scan, including replaced keys"""
+    cache = PersistentEmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    key = embedding_key("engine", "m", 3)
+    cache.put_many([(key, "m", 3, [1.0, 2.0, 3.0]), (key, "m", 3, [1.0, 2.0, 3.0])])
+    cache.put_many([(key, "m", 3, [4.0, 5.0, 6.0]), (embedding_key("blade", "m", 3), "m", 3, [1.0, 0.0, 0.0])])
+
+    quick = cache.stats()
+
+    assert (quick["entries"], quick["size_bytes"]) == (2, 2 * 12) and "models" not in quick
+    detailed = cache.stats(detailed=True)
+    assert (detailed["entries"], detailed["size_bytes"]) == (2, 2 * 12)
+
+
+@pytest.mark.asyncio
+async def test_async_lookups_run_on_the_retrieval_executor(tmp_path):
+    """Test the async methods hand SQLite work to the retrieval executor instead of the event loop"""
+    from app.retrieval import persistent_embedding_cache as module
+    embeddings = cached(PersistentEmbeddingCache(str(tmp_path / "cache.sqlite3")))
+    calls = []
+    original = module.run_in_retrieval_executor
+
+    async def recording(func, *args, **kwargs):
+        calls.append(func.__name__)
+        return await original(func, *args, **kwargs)
+
+    with patch.object(module, "run_in_retrieval_executor", recording):
+        await embeddings.aembed_query("invoice")
+        await embeddings.aembed_query("invoice")
+
+    assert calls == ["_lookup", "_fill", "_lookup"]
+
+
+def test_enabled_flag_and_stats_cli(tmp_path, capsys):
+    """Test PERSISTENT_EMBEDDING_CACHE_ENABLED=false bypasses the cache and the CLI reports lifetime counters"""
+    underlying = CountingEmbeddings()
+    with patch.object(config, "PERSISTENT_EMBEDDING_CACHE_ENABLED", False):
+        assert with_persistent_cache(underlying, "m", 3) is underlying
+
+    wrapped = with_persistent_cache(underlying, "m", 3)
+    wrapped.embed_query("net 30")
+    wrapped.embed_query("net 30")
+    get_persistent_embedding_cache().close()
+
+    main(["--path", config.get_persistent_embedding_cache_path(), "stats"])
+
+    stats = json.loads(capsys.readouterr().out)
+    assert (stats["entries"], stats["hits"], stats["misses"], stats["writes"]) == (1, 1, 1, 1)
+    assert stats["models"] == [{"model": "m", "dimensions": 3, "entries": 1}]
@@ -0,0 +1,106 @@
+"""
+Tests for the semantic policy cache behind get_cached_policy_info
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from app.retrieval.hybrid_retriever import get_cached_policy_info
+from app.retrieval.policy_semantic_cache import PolicySemanticCache
+from app.retrieval.result_cache import bump_collection_generation
+from app.utils.config import config
+
+
+# Unit-length query embeddings: LATE_FEE and LATE_PENALTY have cosine similarity 0.96
+LATE_FEE = [1.0, 0.0, 0.0]
+LATE_PENALTY = [0.96, 0.28, 0.0]
+EXPORT_RULES = [0.0, 0.0, 1.0]
+
+
+def make_runtime(session_id):
+    """Helper for a ToolRuntime carrying the session thread_id"""
+    runtime = Mock()
+    runtime.config = {"configurable": {"thread_id": session_id}}
+    return runtime
+
+
+def test_similar_query_hits():
+    """Test a paraphrased query above the threshold reuses the cached answer"""
+    cache = PolicySemanticCache(similarity_threshold=0.9)
+    cache.store("s1", "late payment fee policy", LATE_FEE, "Late fee: 1.5% per month")
+
+    content, similarity, metadata = cache.lookup("s1", LATE_PENALTY)
+
+    assert content == "Late fee: 1.5% per month"
+    assert similarity == pytest.approx(0.96)
+    assert metadata["query"] == "late payment fee policy"
+    assert metadata["hits"] == 1
+    assert cache.lookup("s1", EXPORT_RULES) is None
+
+
+def test_entries_are_session_scoped_unless_global():
+    """Test other sessions only see entries when the global scope is enabled"""
+    cache = PolicySemanticCache(similarity_threshold=0.9)
+    cache.store("s1", "late fee", LATE_FEE, "answer")
+    assert cache.lookup("s2", LATE_FEE) is None
+
+    shared = PolicySemanticCache(similarity_threshold=0.9, global_scope=True)
+    shared.store("s1", "late fee", LATE_FEE, "answer")
+    assert shared.lookup("s2", LATE_FEE)[0] == "answer"
+
+
+def test_ttl_and_size_eviction():
+    """Test entries expire after the TTL and the oldest are evicted beyond the size limit"""
+    cache = PolicySemanticCache(similarity_threshold=0.9, ttl_seconds=60, max_entries_per_scope=2)
+    with patch("app.retrieval.policy_semantic_cache.time.monotonic", return_value=1000.0):
+        cache.store("s1", "late fee", LATE_FEE, "late")
+        cache.store("s1", "export", EXPORT_RULES, "export")
+        cache.store("s1", "third", [0.0, 1.0, 0.0], "third")
+
+    assert cache.stats()["evictions"] == 1
+    with patch("app.retrieval.policy_semantic_cache.time.monotonic", return_value=1030.0):
+        assert cache.lookup("s1", LATE_FEE) is None
+        assert cache.lookup("s1", EXPORT_RULES)[0] == "export"
+    with patch("app.retrieval.policy_semantic_cache.time.monotonic", return_value=2000.0):
+        assert cache.lookup("s1", EXPORT_RULES) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_policy_ingest_invalidates_entries():
+    """Test entries cached before a policy ingest are not served after it"""
+    cache = PolicySemanticCache(similarity_threshold=0.9)
+    cache.store("s1", "late fee", LATE_FEE, "old answer")
+
+    bump_collection_generation(config.COLLECTION_POLICY)
+
+    assert cache.lookup("s1", LATE_FEE) is None
+
+
+def test_tool_hits_after_first_turn():
+    """Test get_cached_policy_info retrieves once and then serves similar queries from the cache"""
+    client = Mock()
+    client.embeddings.embed_query.side_effect = lambda text: LATE_FEE if "fee" in text else LATE_PENALTY
+    search = Mock()
+    search.invoke.return_value = "Relevant policy information: late fee 1.5%"
+
+    with patch("app.retrieval.hybrid_retriever.get_chroma_client", return_value=client), \
+            patch("app.retrieval.hybrid_retriever.search_policy_kb", search):
+        first = get_cached_policy_info.func(query="late payment fee", runtime=make_runtime("s1"))
+        second = get_cached_policy_info.func(query="late payment penalty", runtime=make_runtime("s1"))
+
+    assert first == second == "Relevant policy information: late fee 1.5%"
+    search.invoke.assert_called_once_with({"query": "late payment fee", "k": 3})
+
+
+def test_tool_does_not_cache_missing_results():
+    """Test 'not found' answers are retrieved again on the next call"""
+    client = Mock()
+    client.embeddings.embed_query.return_value = LATE_FEE
+    search = Mock()
+    search.invoke.return_value = "No relevant policy documents found in the knowledge base."
+
+    with patch("app.retrieval.hybrid_retriever.get_chroma_client", return_value=client), \
+            patch("app.retrieval.hybrid_retriever.search_policy_kb", search):
+        get_cached_policy_info.func(query="late fee", runtime=make_runtime("s1"))
+        get_cached_policy_info.func(query="late fee", runtime=make_runtime("s1"))
+
+    assert search.invoke.call_count == 2
@@ -0,0 +1,202 @@
+"""
+Tests for query-to-filter extraction and metadata pre-filtering
+"""
+
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, Mock, patch
+from langchain_core.documents import Document
+from app.retrieval.query_filters import (
+    document_matches,
+    extract_query_filters,
+    match_source_files,
+    resolve_query_filters,
+)
+from app.retrieval.search_pipeline import asearch_collection_scored, search_collection_scored
+from app.utils.config import config
+
+
+NOW = datetime(2025, 11, 12, 15, 0)  # a Wednesday
+
+SOURCES = {
+    "Invoice-4-ABC-Company.pdf": "2025-11-10T09:00:00",
+    "billing_faq.md": "2025-03-02T12:00:00",
+    "refund-policy.txt": "2024-06-20T08:30:00",
+    "plans.json": "2025-10-01T10:00:00",
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+def make_vectorstore():
+    """Helper for a collection whose chunks come from SOURCES"""
+    names = list(SOURCES)
+    vectorstore = Mock()
+    vectorstore._collection.metadata = {"hnsw:space": "cosine"}
+    vectorstore.get.return_value = {
+        "ids": [f"id-{i}" for i in range(len(names))],
+        "documents": [f"Payment terms are net 30 (chunk {i})" for i in range(len(names))],
+        "metadatas": [
+            {"source_file": name, "upload_timestamp": SOURCES[name], "chunk_index": 0} for name in names
+        ],
+    }
+    vectorstore.similarity_search_with_score.return_value = [
+        (Document(page_content="Payment terms are net 30", metadata={"source_file": names[0]}), 0.1)
+    ]
+    vectorstore.embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    vectorstore.similarity_search_by_vector_with_relevance_scores.return_value = []
+    return vectorstore
+
+
+def test_extract_file_names_and_types():
+    """Test explicit file names are not also read as document-type requests"""
+    filters = extract_query_filters("What is the total on Invoice-4-ABC-Company.pdf?", now=NOW)
+    assert filters == {"file_names": ["invoice-4-abc-company.pdf"]}
+
+    filters = extract_query_filters("Search the markdown and JSON docs for plan limits", now=NOW)
+    assert filters == {"file_types": ["json", "md"]}
+
+
+def test_extract_upload_dates():
+    """Test relative and absolute upload date ranges"""
+    assert extract_query_filters("invoices uploaded last week", now=NOW) == {
+        "uploaded_after": datetime(2025, 11, 3),
+        "uploaded_before": datetime(2025, 11, 10),
+    }
+    assert extract_query_filters("docs added since March 2025", now=NOW) == {
+        "uploaded_after": datetime(2025, 3, 1),
+    }
+    assert extract_query_filters("policies ingested in 2024", now=NOW) == {
+        "uploaded_after": datetime(2024, 1, 1),
+        "uploaded_before": datetime(2025, 1, 1),
+    }
+    assert extract_query_filters("files uploaded in the last 3 days", now=NOW) == {
+        "uploaded_after": datetime(2025, 11, 9, 15, 0),
+    }
+
+
+def test_extract_phrases_and_plain_queries():
+    """Test quoted phrases are extracted and ordinary questions yield no filters"""
+    assert extract_query_filters('Which invoices mention "net 30"?', now=NOW) == {"phrases": ["net 30"]}
+    assert extract_query_filters("How do I reset my password?", now=NOW) == {}
+
+
+def test_match_source_files():
+    """Test criteria are resolved against known files and unmatched criteria are not applied"""
+    assert match_source_files("invoice-4-abc-company.pdf", {"file_names": ["invoice-4-abc-company.pdf"]}, SOURCES) == [
+        "Invoice-4-ABC-Company.pdf"
+    ]
+    # Known files are also recognized by name without the extension
+    assert match_source_files("what does the billing faq say", {}, SOURCES) == ["billing_faq.md"]
+    assert match_source_files("what do the plans say", {}, SOURCES) is None
+    assert match_source_files("", {"file_types": ["txt", "json"]}, SOURCES) == ["plans.json", "refund-policy.txt"]
+    assert match_source_files("", {"uploaded_after": datetime(2025, 10, 1)}, SOURCES) == [
+        "Invoice-4-ABC-Company.pdf",
+        "plans.json",
+    ]
+    assert match_source_files("", {"file_names": ["missing.pdf"]}, SOURCES) is None
+
+
+def test_resolve_query_filters_builds_chroma_filters():
+    """Test where and where_document filters for one and several files"""
+    vectorstore = make_vectorstore()
+
+    single = resolve_query_filters(config.COLLECTION_BILLING, vectorstore, 'Invoice-4-ABC-Company.pdf "net 30"')
+    several = resolve_query_filters(config.COLLECTION_BILLING, vectorstore, "text files or json")
+    unmatched = resolve_query_filters(config.COLLECTION_BILLING, vectorstore, "notes.pdf")
+
+    assert single == {
+        "where": {"source_file": "Invoice-4-ABC-Company.pdf"},
+        "where_document": {"$regex": "(?i)net\\ 30"},
+    }
+    assert several == {"where": {"source_file": {"$in": ["plans.json", "refund-policy.txt"]}}}
+    assert unmatched == {}
+    assert resolve_query_filters(config.COLLECTION_BILLING, vectorstore, "payment terms") == {}
+    # Once the collection's files are known, a bare file name narrows the search
+    assert resolve_query_filters(config.COLLECTION_BILLING, vectorstore, "what does the billing FAQ say") == {
+        "where": {"source_file": "billing_faq.md"}
+    }
+
+
+def test_document_matches():
+    """Test lexical hits are checked against the same filters"""
+    doc = Document(page_content="Payment terms are net 30", metadata={"source_file": "plans.json"})
+
+    assert document_matches(doc, {})
+    assert document_matches(doc, {"where": {"source_file": {"$in": ["plans.json", "a.pdf"]}}})
+    assert not document_matches(doc, {"where": {"source_file": "a.pdf"}})
+    assert not document_matches(doc, {"where_document": {"$and": [{"$contains": "net 30"}, {"$contains": "late"}]}})
+
+
+def test_phrases_match_case_insensitively():
+    """Test a quoted phrase matches text that differs only in case"""
+    vectorstore = make_vectorstore()
+    filters = resolve_query_filters(config.COLLECTION_BILLING, vectorstore, 'What does "net 30" mean?')
+
+    assert document_matches(Document(page_content="Net 30 days from the invoice date"), filters)
+    assert not document_matches(Document(page_content="Net 45 days"), filters)
+
+
+def test_phrase_that_matches_nothing_falls_back_to_unfiltered_search():
+    """Test a search whose phrase filter finds nothing is repeated without it and not recorded as empty"""
+    vectorstore = make_vectorstore()
+    hits = vectorstore.similarity_search_with_score.return_value
+    vectorstore.similarity_search_with_score.side_effect = (
+        lambda query, k, **kwargs: [] if "where_document" in kwargs else hits
+    )
+
+    results = search_collection_scored(vectorstore, config.COLLECTION_BILLING, 'What is a "grace period"?', 3)
+
+    assert [doc.page_content for doc, _ in results] == ["Payment terms are net 30"]
+    assert vectorstore.similarity_search_with_score.call_count == 2
+    assert "where_document" not in vectorstore.similarity_search_with_score.call_args.kwargs
+
+
+def test_search_passes_filters_to_chroma():
+    """Test a filtered query pre-filters vector search and lexical hits"""
+    vectorstore = make_vectorstore()
+
+    results = search_collection_scored(vectorstore, config.COLLECTION_BILLING, "net 30 in Invoice-4-ABC-Company.pdf", 3)
+
+    kwargs = vectorstore.similarity_search_with_score.call_args.kwargs
+    assert kwargs["filter"] == {"source_file": "Invoice-4-ABC-Company.pdf"}
+    assert "where_document" not in kwargs
+    assert {doc.metadata["source_file"] for doc, _ in results} == {"Invoice-4-ABC-Company.pdf"}
+
+
+def test_search_without_filters_is_unchanged():
+    """Test plain queries call ChromaDB without filter arguments"""
+    vectorstore = make_vectorstore()
+
+    search_collection_scored(vectorstore, config.COLLECTION_BILLING, "payment terms", 3)
+
+    vectorstore.similarity_search_with_score.assert_called_once_with(query="payment terms", k=3)
+
+
+def test_filters_can_be_disabled():
+    """Test QUERY_FILTERS_ENABLED=false skips extraction"""
+    vectorstore = make_vectorstore()
+
+    with patch.object(config, "QUERY_FILTERS_ENABLED", False):
+        search_collection_scored(vectorstore, config.COLLECTION_BILLING, "net 30 in plans.json", 3)
+
+    assert "filter" not in vectorstore.similarity_search_with_score.call_args.kwargs
+
+
+@pytest.mark.asyncio
+async def test_async_search_passes_filters():
+    """Test the async vector search receives the same filters"""
+    vectorstore = make_vectorstore()
+
+    await asearch_collection_scored(vectorstore, config.COLLECTION_BILLING, 'plans "net 30" in json files', 3)
+
+    kwargs = vectorstore.similarity_search_by_vector_with_relevance_scores.call_args.kwargs
+    assert kwargs["filter"] == {"source_file": "plans.json"}
+    assert kwargs["where_document"] == {"$regex": "(?i)net\\ 30"}
@@ -25,7 +25,7 @@ def test_search_technical_kb_no_documents():
     with patch('app.retrieval.rag_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -50,7 +50,7 @@ def test_search_technical_kb_with_documents():
         
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = [mock_doc1, mock_doc2]
+        mock_collection.similarity_search_with_score.return_value = [(mock_doc1, 0.3), (mock_doc2, 0.4)]
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -66,7 +66,7 @@ def test_search_technical_kb_uses_technical_collection():
     with patch('app.retrieval.rag_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
@@ -149,15 +149,15 @@ def test_search_technical_kb_default_k():
     with patch('app.retrieval.rag_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
         search_technical_kb.invoke({"query": "test"})
         
-        # Verify similarity_search was called with k=3
-        mock_collection.similarity_search.assert_called_once()
-        call_kwargs = mock_collection.similarity_search.call_args[1]
+        # Verify similarity_search_with_score was called with k=3
+        mock_collection.similarity_search_with_score.assert_called_once()
+        call_kwargs = mock_collection.similarity_search_with_score.call_args[1]
         assert call_kwargs.get('k', 3) == 3
 
 
@@ -166,14 +166,14 @@ def test_search_technical_kb_custom_k():
     with patch('app.retrieval.rag_retriever.get_chroma_client') as mock_get_client:
         mock_client = Mock()
         mock_collection = Mock()
-        mock_collection.similarity_search.return_value = []
+        mock_collection.similarity_search_with_score.return_value = []
         mock_client.get_or_create_collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
         search_technical_kb.invoke({"query": "test", "k": 5})
         
-        # Verify similarity_search was called with custom k
-        call_kwargs = mock_collection.similarity_search.call_args[1]
+        # Verify similarity_search_with_score was called with custom k
+        call_kwargs = mock_collection.similarity_search_with_score.call_args[1]
         assert call_kwargs.get('k') == 5
 
 
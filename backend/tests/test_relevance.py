@@ -0,0 +1,133 @@
+"""
+Tests for relevance scores, adaptive k cutoffs and retrieval metrics
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from app.retrieval.relevance import (
+    RetrievalMetrics,
+    adaptive_cutoff,
+    collection_space,
+    relevance_from_distance,
+)
+from app.retrieval.search_pipeline import search_collection_scored
+from app.retrieval.rag_retriever import search_technical_kb
+from app.utils.config import config
+
+
+@pytest.fixture(autouse=True)
+def fresh_lexical_indexes():
+    """Fixture that isolates the global lexical index registry"""
+    import app.retrieval.lexical_index as lexical_module
+    lexical_module._lexical_indexes.clear()
+    yield
+    lexical_module._lexical_indexes.clear()
+
+
+def scored(*scores):
+    """Helper to build (Document, score) hits, best first"""
+    return [(Document(page_content=f"doc {i}", metadata={"chunk_index": i}), score) for i, score in enumerate(scores)]
+
+
+def test_relevance_from_distance():
+    """Test distances of unit vectors map to cosine similarity for every space"""
+    assert relevance_from_distance(0.0, "l2") == 1.0
+    assert relevance_from_distance(0.5, "l2") == pytest.approx(0.75)
+    assert relevance_from_distance(0.25, "cosine") == pytest.approx(0.75)
+    assert relevance_from_distance(3.0, "l2") == 0.0
+
+
+def test_collection_space_defaults_to_l2():
+    """Test collections without hnsw:space metadata use l2"""
+    vectorstore = Mock()
+    vectorstore._collection.metadata = {"hnsw:space": "cosine"}
+    assert collection_space(vectorstore) == "cosine"
+
+    vectorstore._collection.metadata = None
+    assert collection_space(vectorstore) == "l2"
+
+
+def test_adaptive_cutoff_threshold():
+    """Test results end at the first hit below the minimum score"""
+    kept, reason = adaptive_cutoff(scored(0.8, 0.7, 0.1, 0.05), k_max=5, min_score=0.2, cliff_drop=0.5)
+
+    assert [score for _, score in kept] == [0.8, 0.7]
+    assert reason == "threshold"
+
+
+def test_adaptive_cutoff_cliff():
+    """Test results end after a large score drop"""
+    kept, reason = adaptive_cutoff(scored(0.82, 0.8, 0.55, 0.54), k_max=5, min_score=0.2, cliff_drop=0.15)
+
+    assert len(kept) == 2
+    assert reason == "cliff"
+
+
+def test_adaptive_cutoff_keeps_best_hit_and_caps_k_max():
+    """Test at least one and at most k_max results are returned"""
+    kept, reason = adaptive_cutoff(scored(0.1, 0.09), k_max=5, min_score=0.5)
+    assert len(kept) == 1 and reason == "threshold"
+
+    kept, reason = adaptive_cutoff(scored(0.8, 0.79, 0.78, 0.77), k_max=3, min_score=0.2, cliff_drop=0.15)
+    assert len(kept) == 3 and reason == "k_max"
+
+    assert adaptive_cutoff([], k_max=3) == ([], "empty")
+
+
+def test_retrieval_metrics():
+    """Test per-collection metrics aggregate results, scores and cutoff reasons"""
+    metrics = RetrievalMetrics()
+    metrics.record("technical", 5, [0.9, 0.8], "cliff")
+    metrics.record("technical", 5, [0.7], "threshold")
+
+    stats = metrics.stats()["technical"]
+    assert stats["searches"] == 2
+    assert stats["avg_results"] == 1.5
+    assert stats["avg_k_max"] == 5
+    assert stats["avg_top_score"] == pytest.approx(0.8)
+    assert stats["cutoffs"] == {"cliff": 1, "threshold": 1}
+
+
+def test_search_collection_scored_applies_cutoff():
+    """Test hybrid search returns scored results cut at the cliff"""
+    collection = Mock()
+    collection.get.return_value = None
+    collection._collection.metadata = {"hnsw:space": "cosine"}
+    collection.similarity_search_with_score.return_value = [
+        (doc, 1.0 - score) for doc, score in scored(0.9, 0.85, 0.4)
+    ]
+
+    results = search_collection_scored(collection, config.COLLECTION_TECHNICAL, "pump", k=3)
+
+    assert [round(score, 2) for _, score in results] == [0.9, 0.85]
+
+
+def test_search_collection_scored_without_adaptive_keeps_k():
+    """Test disabling the adaptive cutoff returns every vector hit without scores"""
+    collection = Mock()
+    collection.get.return_value = None
+    collection.similarity_search.return_value = [doc for doc, _ in scored(0.9, 0.1, 0.05)]
+
+    results = search_collection_scored(collection, config.COLLECTION_BILLING, "totals", k=20, adaptive=False)
+
+    collection.similarity_search.assert_called_once_with(query="totals", k=20)
+    assert len(results) == 3
+    assert all(score is None for _, score in results)
+
+
+def test_technical_tool_output_includes_scores():
+    """Test relevance scores appear in the tool output"""
+    collection = Mock()
+    collection.get.return_value = None
+    collection._collection.metadata = {"hnsw:space": "cosine"}
+    collection.similarity_search_with_score.return_value = [
+        (Document(page_content="Pump manual", metadata={"source_file": "manual.pdf"}), 0.2),
+    ]
+    client = Mock()
+    client.get_or_create_collection.return_value = collection
+
+    with patch("app.retrieval.rag_retriever.get_chroma_client", return_value=client):
+        result = search_technical_kb.invoke({"query": "pump"})
+
+    assert "manual.pdf | relevance 0.80" in result
@@ -0,0 +1,113 @@
+"""
+Tests for the pluggable rerank stage
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from app.retrieval.rerank import (
+    LexicalFieldReranker,
+    Reranker,
+    benchmark_reranker,
+    get_reranker,
+    register_reranker,
+    rerank_candidate_count,
+    rerank_results,
+)
+from app.retrieval.search_pipeline import search_collection_scored
+from app.utils.config import config
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+def doc(content, source_file="doc.pdf"):
+    """Helper to build a chunk"""
+    return Document(page_content=content, metadata={"source_file": source_file})
+
+
+def test_lexical_reranker_promotes_term_and_identifier_matches():
+    """Test a chunk naming the queried invoice outranks a slightly closer vector hit"""
+    candidates = [
+        (doc("Invoice template: amount due, payment terms net 30"), 0.82),
+        (doc("Invoice INV-004 amount due $357,500", "Invoice-4-ABC-Company.pdf"), 0.78),
+        (doc("Refund policy for cancelled orders"), 0.60),
+    ]
+
+    reranked = LexicalFieldReranker().rerank("amount due on INV-004", candidates, k=2)
+
+    assert [d.metadata["source_file"] for d, _ in reranked] == ["Invoice-4-ABC-Company.pdf", "doc.pdf"]
+    assert reranked[0][1] > reranked[1][1]
+
+
+def test_lexical_reranker_uses_rank_when_scores_missing():
+    """Test candidates without relevance scores keep retrieval order on ties"""
+    candidates = [(doc("alpha"), None), (doc("beta"), None)]
+
+    reranked = LexicalFieldReranker().rerank("unrelated", candidates, k=2)
+
+    assert [d.page_content for d, _ in reranked] == ["alpha", "beta"]
+
+
+def test_register_custom_reranker():
+    """Test heavier rerankers plug in by name"""
+
+    class ReverseReranker(Reranker):
+        name = "reverse"
+
+        def score(self, query, candidates):
+            return [float(i) for i in range(len(candidates))]
+
+    register_reranker("reverse", ReverseReranker)
+
+    reranked = get_reranker("reverse").rerank("q", [(doc("a"), 0.9), (doc("b"), 0.1)], k=1)
+
+    assert reranked[0][0].page_content == "b"
+    with pytest.raises(ValueError):
+        get_reranker("missing")
+
+
+def test_rerank_disabled_is_passthrough():
+    """Test the stage only truncates to k when reranking is disabled"""
+    candidates = [(doc("a"), 0.9), (doc("b"), 0.8), (doc("c"), 0.7)]
+
+    with patch.object(config, "RERANK_ENABLED", False):
+        assert rerank_candidate_count(2) == 2
+        assert rerank_results("billing", "q", candidates, 2) == candidates[:2]
+
+
+def test_search_overfetches_and_keeps_top_k():
+    """Test enabled reranking fetches RERANK_CANDIDATES and returns k reranked results"""
+    vectorstore = Mock()
+    vectorstore.get.return_value = None
+    vectorstore._collection.metadata = {"hnsw:space": "cosine"}
+    vectorstore.similarity_search_with_score.return_value = [
+        (doc("Generic invoice terms"), 0.10),
+        (doc("Late payment fee is 1.5% per month"), 0.12),
+        (doc("Shipping schedule"), 0.14),
+    ]
+
+    with patch.object(config, "RERANK_ENABLED", True), patch.object(config, "RERANK_CANDIDATES", 10):
+        results = search_collection_scored(vectorstore, config.COLLECTION_BILLING, "late payment fee", 1)
+
+    assert vectorstore.similarity_search_with_score.call_args.kwargs["k"] == 10
+    assert [d.page_content for d, _ in results] == ["Late payment fee is 1.5% per month"]
+
+
+def test_benchmark_reports_cost_and_tokens_saved():
+    """Test the benchmark compares rerank time with tokens removed from the context"""
+    candidates = [(doc("word " * 100), 0.9 - i * 0.01) for i in range(10)]
+
+    result = benchmark_reranker(LexicalFieldReranker(), [("word", candidates)], k=3, repeat=2)
+
+    assert result["queries"] == 1
+    assert result["kept_tokens"] == 3 * 125
+    assert result["tokens_saved"] == 7 * 125
+    assert result["avg_rerank_ms"] >= 0
+    assert result["ms_per_1k_tokens_saved"] is not None
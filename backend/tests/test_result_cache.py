@@ -0,0 +1,201 @@
+"""
+Tests for the retrieval result cache and per-collection generation counters
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.documents import Document
+from app.retrieval.result_cache import (
+    CollectionGenerations,
+    RetrievalResultCache,
+    bump_collection_generation,
+    get_retrieval_result_cache,
+    result_cache_key,
+)
+from app.retrieval.search_pipeline import asearch_collection_scored, search_collection_scored
+from app.utils.config import config
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+def hits(*contents):
+    """Helper to build scored results"""
+    return [(Document(page_content=content, metadata={"source_file": f"{content}.md"}), 0.9) for content in contents]
+
+
+def make_vectorstore():
+    """Helper for a vector store whose similarity search returns one FAQ chunk"""
+    vectorstore = Mock()
+    vectorstore.get.return_value = None
+    vectorstore._collection.metadata = {"hnsw:space": "cosine"}
+    vectorstore.similarity_search_with_score.return_value = [
+        (Document(page_content="Reset the router", metadata={"source_file": "faq.md"}), 0.1),
+    ]
+    return vectorstore
+
+
+def test_result_cache_key_normalizes_query():
+    """Test case and whitespace differences share a key while k and filters do not"""
+    key = result_cache_key("technical", "How do I  reset?", 3, {"adaptive": True})
+
+    assert key == result_cache_key("technical", "how do i reset?", 3, {"adaptive": True})
+    assert key != result_cache_key("technical", "how do i reset?", 5, {"adaptive": True})
+    assert key != result_cache_key("technical", "how do i reset?", 3, {"adaptive": False})
+
+
+def test_stale_generation_is_not_served():
+    """Test an entry stamped with an older generation is dropped on lookup"""
+    cache = RetrievalResultCache(max_size=4)
+    generations = CollectionGenerations()
+    key = result_cache_key("billing", "refund", 5)
+
+    cache.put(key, generations.current("billing"), hits("refund"))
+    assert cache.get(key, generations.current("billing")) is not None
+
+    generations.bump("billing")
+
+    assert cache.get(key, generations.current("billing")) is None
+    stats = cache.stats()
+    assert stats["stale"] == 1
+    assert stats["size"] == 0
+    assert stats["hit_ratio"] == pytest.approx(0.5)
+
+
+def test_generations_are_shared_across_processes(tmp_path):
+    """Test a write recorded by one worker process invalidates another worker's cached results"""
+    path = str(tmp_path / "generations.sqlite3")
+    ingesting = CollectionGenerations(db_path=path)
+    serving = CollectionGenerations(db_path=path)
+    cache = RetrievalResultCache(max_size=4)
+    key = result_cache_key("billing", "refund", 5)
+    cache.put(key, serving.current("billing"), hits("refund"))
+
+    assert ingesting.bump("billing") == 1 and ingesting.bump("billing") == 2
+
+    assert serving.current("billing") == 2
+    assert cache.get(key, serving.current("billing")) is None
+    assert serving.snapshot() == {"billing": 2}
+    assert CollectionGenerations(db_path=path).bump("billing") == 3
+
+
+def test_generation_reads_are_throttled(tmp_path):
+    """Test another process's write is picked up once the check interval has passed"""
+    path = str(tmp_path / "generations.sqlite3")
+    serving = CollectionGenerations(db_path=path, check_seconds=60)
+    assert serving.current("policy") == 0
+
+    CollectionGenerations(db_path=path).bump("policy")
+
+    assert serving.current("policy") == 0
+    with patch("app.retrieval.result_cache.time.monotonic", return_value=10 ** 9):
+        assert serving.current("policy") == 1
+
+
+def test_entries_expire_after_ttl():
+    """Test the TTL bounds staleness for writes that never advanced a generation"""
+    cache = RetrievalResultCache(max_size=4, ttl_seconds=30)
+    key = result_cache_key("technical", "reset", 3)
+
+    with patch("app.retrieval.result_cache.time.monotonic", return_value=1000.0):
+        cache.put(key, 0, hits("reset"))
+    with patch("app.retrieval.result_cache.time.monotonic", return_value=1020.0):
+        assert cache.get(key, 0) is not None
+    with patch("app.retrieval.result_cache.time.monotonic", return_value=1031.0):
+        assert cache.get(key, 0) is None
+
+    assert cache.stats()["stale"] == 1
+
+
+def test_cache_bounded_by_entries_and_bytes():
+    """Test LRU eviction keeps the cache within its entry and memory limits"""
+    cache = RetrievalResultCache(max_size=2)
+    for query in ("a", "b", "c"):
+        cache.put(result_cache_key("policy", query, 3), 0, hits(query))
+
+    assert cache.get(result_cache_key("policy", "a", 3), 0) is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["approx_bytes"] > 0
+
+    small = RetrievalResultCache(max_size=100, max_bytes=cache.stats()["approx_bytes"])
+    for query in ("a", "b", "c"):
+        small.put(result_cache_key("policy", query, 3), 0, hits(query))
+    assert small.stats()["approx_bytes"] <= small.max_bytes
+    assert small.stats()["size"] < 3
+
+
+def test_repeated_search_served_from_cache():
+    """Test a repeated question skips ChromaDB until the collection is written again"""
+    vectorstore = make_vectorstore()
+
+    first = search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "How do I reset the router?", 3)
+    second = search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "how do i reset  the router?", 3)
+
+    assert first == second
+    assert vectorstore.similarity_search_with_score.call_count == 1
+    assert get_retrieval_result_cache().stats()["hits"] == 1
+
+    bump_collection_generation(config.COLLECTION_TECHNICAL)
+    search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "How do I reset the router?", 3)
+
+    assert vectorstore.similarity_search_with_score.call_count == 2
+
+
+def test_generation_is_per_collection():
+    """Test writing one collection keeps cached results of the others"""
+    vectorstore = make_vectorstore()
+    search_collection_scored(vectorstore, config.COLLECTION_POLICY, "return window", 3)
+
+    bump_collection_generation(config.COLLECTION_BILLING)
+    search_collection_scored(vectorstore, config.COLLECTION_POLICY, "return window", 3)
+
+    assert vectorstore.similarity_search_with_score.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_async_search_shares_cache():
+    """Test the async search path reads results cached by the sync path"""
+    vectorstore = make_vectorstore()
+    search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "reset router", 3)
+
+    results = await asearch_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "reset router", 3)
+
+    assert results[0][0].page_content == "Reset the router"
+    vectorstore.similarity_search_by_vector_with_relevance_scores.assert_not_called()
+
+
+def test_cache_can_be_disabled():
+    """Test RETRIEVAL_RESULT_CACHE_ENABLED=false always searches"""
+    vectorstore = make_vectorstore()
+
+    with patch.object(config, "RETRIEVAL_RESULT_CACHE_ENABLED", False):
+        search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "reset router", 3)
+        search_collection_scored(vectorstore, config.COLLECTION_TECHNICAL, "reset router", 3)
+
+    assert vectorstore.similarity_search_with_score.call_count == 2
+
+
+def test_ingest_document_bumps_generation(tmp_path):
+    """Test a successful ingest advances the target collection's generation"""
+    from app.ingestion.ingest_data import ingest_document
+    from app.retrieval.result_cache import get_collection_generations
+
+    file_path = tmp_path / "faq.txt"
+    file_path.write_text("Reset the router by holding the button for ten seconds.")
+    vectorstore = Mock()
+    vectorstore.embeddings.embed_documents.return_value = [[0.1, 0.2]]
+    vectorstore.get.return_value = {"ids": []}
+    client = Mock()
+    client.get_or_create_collection.return_value = vectorstore
+    before = get_collection_generations().current(config.COLLECTION_TECHNICAL)
+
+    with patch("app.ingestion.ingest_data.get_chroma_client", return_value=client):
+        ingest_document(file_path, target_collection=config.COLLECTION_TECHNICAL)
+
+    assert get_collection_generations().current(config.COLLECTION_TECHNICAL) == before + 1
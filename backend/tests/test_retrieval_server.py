@@ -0,0 +1,174 @@
+"""
+Tests for the shared retrieval server and its thin client
+"""
+
+import threading
+import numpy as np
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.retrieval import chroma_client
+from app.retrieval.chroma_client import ChromaDBClient, get_chroma_client
+from app.retrieval.lexical_index import get_lexical_index
+from app.retrieval.result_cache import get_collection_generations
+from app.retrieval.retrieval_server import (
+    RemoteVectorStore,
+    RetrievalClient,
+    RetrievalServer,
+    RetrievalServerError,
+    decode,
+    encode,
+)
+from app.retrieval.search_pipeline import asearch_collection_scored, search_collection_scored
+from app.utils.config import config
+
+
+VOCABULARY = ["invoice", "payment", "engine", "turbine", "refund", "policy"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings over a tiny vocabulary"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(term)) + 0.01 for term in VOCABULARY]
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Fixture for a retrieval server on a temporary socket, served from a background thread"""
+    with patch.object(config, "VECTOR_BACKEND", "chroma"):
+        local = ChromaDBClient(persist_directory=str(tmp_path / "db"))
+    local.embeddings = KeywordEmbeddings()
+    retrieval_server = RetrievalServer(str(tmp_path / "retrieval.sock"), client=local)
+    thread = threading.Thread(target=retrieval_server.serve_forever, daemon=True)
+    thread.start()
+    yield retrieval_server
+    retrieval_server.shutdown()
+    retrieval_server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    """Fixture for a thin client connected to the server"""
+    return RetrievalClient(server.server_address, timeout=10)
+
+
+def test_protocol_round_trip():
+    """Test values, documents and float32 arrays survive encoding"""
+    value = {
+        "hits": [(Document(page_content="net 30", metadata={"page": 2}, id="a"), np.float32(0.25))],
+        "flags": [True, False, None],
+        "count": np.int64(3),
+        "vector": np.arange(4, dtype=np.float64),
+        "matrix": np.ones((2, 3), dtype=np.float32),
+        "raw": b"\x00\x01",
+    }
+
+    decoded = decode(encode(value))
+
+    doc, score = decoded["hits"][0]
+    assert doc == Document(page_content="net 30", metadata={"page": 2}, id="a") and score == 0.25
+    assert decoded["flags"] == [True, False, None] and decoded["count"] == 3
+    assert decoded["vector"].dtype == np.float32 and decoded["vector"].tolist() == [0.0, 1.0, 2.0, 3.0]
+    assert decoded["matrix"].shape == (2, 3)
+    assert decoded["raw"] == b"\x00\x01"
+    with pytest.raises(TypeError):
+        encode({1, 2})
+    with pytest.raises(ValueError):
+        decode(encode("truncated")[:-2])
+
+
+def test_client_reads_and_writes_through_server(server, client):
+    """Test collection management, embeddings and vector search through the socket"""
+    vectorstore = client.get_or_create_collection(config.COLLECTION_TECHNICAL)
+    ids = vectorstore.add_documents(
+        [
+            Document(page_content="engine turbine inspection", metadata={"source_file": "engine.pdf"}),
+            Document(page_content="invoice payment terms", metadata={"source_file": "billing.md"}),
+        ]
+    )
+
+    hits = vectorstore.similarity_search_with_score("turbine engine", k=1)
+    by_vector = vectorstore.similarity_search_by_vector(client.embeddings.embed_query("invoice"), k=1)
+
+    assert len(ids) == 2
+    assert hits[0][0].metadata["source_file"] == "engine.pdf" and isinstance(hits[0][1], float)
+    assert by_vector[0].page_content == "invoice payment terms"
+    assert vectorstore.get(include=["metadatas"])["ids"] == vectorstore._collection.get()["ids"]
+    assert vectorstore._collection.count() == 2
+    assert config.COLLECTION_TECHNICAL in client.list_collections()
+    assert client.ping()["backend"] == "chroma"
+
+
+def test_search_runs_on_server(server, client):
+    """Test search_collection_scored delegates to the server's pipeline, lexical index and cache"""
+    vectorstore = client.get_or_create_collection(config.COLLECTION_BILLING)
+    vectorstore.add_texts(["invoice payment terms", "refund policy"], metadatas=[{"source_file": "a.md"}, {}])
+    generation = get_collection_generations().current(config.COLLECTION_BILLING)
+
+    with patch.object(config, "QUERY_FILTERS_ENABLED", False):
+        results = search_collection_scored(vectorstore, config.COLLECTION_BILLING, "refund policy", 1)
+        local = search_collection_scored(
+            server.client.get_or_create_collection(config.COLLECTION_BILLING), config.COLLECTION_BILLING,
+            "refund policy", 1,
+        )
+
+    assert isinstance(vectorstore, RemoteVectorStore)
+    assert [doc.page_content for doc, _ in results] == [doc.page_content for doc, _ in local] == ["refund policy"]
+    assert get_lexical_index(config.COLLECTION_BILLING).loaded
+
+    vectorstore.delete(ids=vectorstore.get()["ids"][:1])
+    assert len(get_lexical_index(config.COLLECTION_BILLING)) == 1
+    assert get_collection_generations().current(config.COLLECTION_BILLING) == generation + 1
+
+
+@pytest.mark.asyncio
+async def test_async_search_delegates(server, client):
+    """Test the async search also runs on the server"""
+    vectorstore = client.get_or_create_collection(config.COLLECTION_POLICY)
+    vectorstore.add_texts(["refund policy"])
+
+    with patch.object(config, "QUERY_FILTERS_ENABLED", False):
+        results = await asearch_collection_scored(vectorstore, config.COLLECTION_POLICY, "refund", 2)
+
+    assert [doc.page_content for doc, _ in results] == ["refund policy"]
+
+
+def test_errors_are_raised_in_the_client(server, client):
+    """Test server-side failures surface as exceptions and unknown methods are refused"""
+    vectorstore = client.get_or_create_collection(config.COLLECTION_POLICY)
+
+    with pytest.raises(ValueError):
+        client._connection.call("shutdown")
+    with pytest.raises(ValueError):
+        vectorstore._call("persist")
+    with patch.object(server.client.embeddings, "embed_query", side_effect=RuntimeError("rate limited")):
+        with pytest.raises(RetrievalServerError, match="rate limited"):
+            client.embeddings.embed_query("refund")
+
+
+def test_second_server_on_same_socket_is_refused(server):
+    """Test a live socket is not replaced"""
+    with pytest.raises(RuntimeError):
+        RetrievalServer(server.server_address, client=server.client)
+
+
+def test_get_chroma_client_returns_thin_client(tmp_path):
+    """Test RETRIEVAL_SERVER_SOCKET switches the global client to the retrieval server"""
+    with patch.object(config, "RETRIEVAL_SERVER_SOCKET", str(tmp_path / "retrieval.sock")), \
+            patch.object(chroma_client, "_chroma_client", None):
+        assert isinstance(get_chroma_client(), RetrievalClient)
@@ -0,0 +1,86 @@
+"""
+Tests for the shared retrieval pipeline (hybrid lexical + vector search)
+"""
+
+import pytest
+from unittest.mock import Mock
+from langchain_core.documents import Document
+from app.retrieval.search_pipeline import search_collection
+
+
+@pytest.fixture(autouse=True)
+def fresh_lexical_indexes():
+    """Fixture that isolates the global lexical index registry"""
+    import app.retrieval.lexical_index as lexical_module
+    lexical_module._lexical_indexes.clear()
+    yield
+    lexical_module._lexical_indexes.clear()
+
+
+def make_collection(contents, vector_results=None):
+    """Helper to build a mock collection with a full snapshot and vector results"""
+    collection = Mock()
+    collection.get.return_value = {
+        "ids": [str(i) for i in range(len(contents))],
+        "documents": contents,
+        "metadatas": [{"source_file": f"doc{i}.pdf", "chunk_index": 0} for i in range(len(contents))],
+    }
+    collection.similarity_search_with_score.return_value = [(doc, 0.4) for doc in vector_results or []]
+    return collection
+
+
+def test_decisive_identifier_skips_vector_search():
+    """Test that an identifier found in few chunks skips the vector call"""
+    collection = make_collection([
+        "Invoice No: INV-001 TOTAL DUE: $55,000.00",
+        "Invoice No: INV-004 TOTAL DUE: $357,500.00",
+        "Payment terms are net 30 days",
+    ])
+
+    docs = search_collection(collection, "billing_knowledge_base", "Amount due on INV-004?", k=2)
+
+    collection.similarity_search_with_score.assert_not_called()
+    assert "INV-004" in docs[0].page_content
+
+
+def test_non_identifier_query_fuses_vector_and_lexical():
+    """Test that ordinary queries call vector search and fuse both rankings"""
+    vector_doc = Document(
+        page_content="Payment terms are net 30 days",
+        metadata={"source_file": "doc2.pdf", "chunk_index": 0},
+    )
+    collection = make_collection(
+        ["Invoice one", "Invoice two", "Payment terms are net 30 days"],
+        vector_results=[vector_doc],
+    )
+
+    docs = search_collection(collection, "billing_knowledge_base", "payment terms", k=3)
+
+    collection.similarity_search_with_score.assert_called_once_with(query="payment terms", k=3)
+    assert docs[0].page_content == "Payment terms are net 30 days"
+    assert len(docs) == 1
+
+
+def test_number_with_unit_is_not_decisive():
+    """Test that ordinary tokens like "30-day" do not skip the vector search"""
+    vector_doc = Document(
+        page_content="Refunds are issued within thirty days",
+        metadata={"source_file": "doc1.pdf", "chunk_index": 0},
+    )
+    collection = make_collection(["30-day refund window", "Refunds are issued within thirty days"], [vector_doc])
+
+    docs = search_collection(collection, "policy_knowledge_base", "30-day refund", k=2)
+
+    collection.similarity_search_with_score.assert_called_once()
+    assert vector_doc.page_content in [doc.page_content for doc in docs]
+
+
+def test_unloadable_index_falls_back_to_vector_search():
+    """Test that vector results are returned unchanged when no lexical index exists"""
+    collection = Mock()
+    vector_doc = Document(page_content="Vector only", metadata={})
+    collection.similarity_search_with_score.return_value = [(vector_doc, 0.4)]
+
+    docs = search_collection(collection, "technical_knowledge_base", "anything", k=3)
+
+    assert docs == [vector_doc]
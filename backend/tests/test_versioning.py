@@ -0,0 +1,186 @@
+"""
+Tests for replace-by-source versioning and the collection swap lock
+"""
+
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.retrieval.chroma_client import ChromaDBClient
+from app.retrieval.lexical_index import get_lexical_index
+from app.retrieval.result_cache import get_collection_generations
+from app.retrieval.retrieval_server import RetrievalClient, RetrievalServer
+from app.retrieval.versioning import CollectionSwapLock, get_collection_swap_lock, replace_source_chunks
+from app.utils.config import config
+
+
+VOCABULARY = ["invoice", "payment", "engine", "turbine", "refund", "policy"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings over a tiny vocabulary"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(term)) + 0.01 for term in VOCABULARY]
+
+
+@pytest.fixture(autouse=True)
+def clear_lexical_indexes():
+    """Fixture to isolate the process-wide lexical index registry"""
+    from app.retrieval import lexical_index
+    lexical_index._lexical_indexes.clear()
+    yield
+    lexical_index._lexical_indexes.clear()
+
+
+@pytest.fixture
+def local(tmp_path):
+    """Fixture for a local ChromaDB client with keyword embeddings"""
+    with patch.object(config, "VECTOR_BACKEND", "chroma"):
+        chroma = ChromaDBClient(persist_directory=str(tmp_path / "db"))
+    chroma.embeddings = KeywordEmbeddings()
+    return chroma
+
+
+def chunk(text, source="manual.txt"):
+    """Helper for a chunk of a source file"""
+    return Document(page_content=text, metadata={"source_file": source})
+
+
+def test_swap_waits_for_searches_and_blocks_new_ones():
+    """Test a swap waits for running readers and new readers wait for the swap"""
+    swap_lock = CollectionSwapLock()
+    events = []
+    swap_lock.acquire_read()
+
+    def swap():
+        with swap_lock.swapping():
+            events.append("swap")
+
+    swapper = threading.Thread(target=swap)
+    swapper.start()
+    time.sleep(0.05)
+    assert events == [] and not swap_lock.try_acquire_read()
+
+    reader = threading.Thread(target=lambda: (swap_lock.acquire_read(), events.append("read")))
+    reader.start()
+    swap_lock.release_read()
+    swapper.join(timeout=5)
+    reader.join(timeout=5)
+
+    assert events == ["swap", "read"]
+    assert get_collection_swap_lock("billing") is get_collection_swap_lock("billing")
+
+
+def test_replace_removes_stale_chunks_everywhere(local):
+    """Test a swap upserts new chunks, deletes removed ones and updates the lexical index and generation"""
+    collection = config.COLLECTION_TECHNICAL
+    vectorstore = local.get_or_create_collection(collection)
+    get_lexical_index(collection).loaded = True
+    replace_source_chunks(vectorstore, collection, ["a", "b"], [chunk("engine start"), chunk("turbine check")], [])
+    generation = get_collection_generations().current(collection)
+
+    replace_source_chunks(vectorstore, collection, ["c", "c"], [chunk("engine stop"), chunk("engine stop")], ["a"])
+
+    stored = local.client.get_collection(collection).get()
+    assert sorted(stored["ids"]) == ["b", "c"]
+    assert sorted(stored["documents"]) == ["engine stop", "turbine check"]
+    assert len(get_lexical_index(collection)) == 2
+    assert get_collection_generations().current(collection) == generation + 1
+
+
+def test_failed_delete_is_retried_then_rolled_back(local):
+    """Test a transient delete failure is retried, and a persistent one restores the old version"""
+    collection = config.COLLECTION_TECHNICAL
+    vectorstore = local.get_or_create_collection(collection)
+    get_lexical_index(collection).loaded = True
+    replace_source_chunks(vectorstore, collection, ["a"], [chunk("engine start")], [])
+    delete = vectorstore.delete
+    failures = {"ids": ["a"], "count": 1}
+
+    def flaky_delete(ids=None, **kwargs):
+        if ids == failures["ids"] and failures["count"]:
+            failures["count"] -= 1
+            raise RuntimeError("database is locked")
+        return delete(ids=ids, **kwargs)
+
+    with patch("app.retrieval.versioning._RETRY_DELAY_SECONDS", 0), \
+            patch.object(vectorstore, "delete", side_effect=flaky_delete):
+        replace_source_chunks(vectorstore, collection, ["b"], [chunk("engine stop")], ["a"])
+        assert local.client.get_collection(collection).get()["ids"] == ["b"]
+
+        failures.update(ids=["b"], count=10)
+        generation = get_collection_generations().current(collection)
+        with pytest.raises(RuntimeError):
+            replace_source_chunks(vectorstore, collection, ["c"], [chunk("turbine check")], ["b"])
+
+    # Only the delete of the removed chunk failed: the new chunk was rolled back
+    failures["count"] = 0
+    assert local.client.get_collection(collection).get()["ids"] == ["b"]
+    assert get_collection_generations().current(collection) == generation + 1
+    assert not get_lexical_index(collection).loaded
+
+
+def test_failed_upsert_batch_rolls_back_the_batches_already_written(local):
+    """Test an upsert failing part-way removes the chunks already upserted and keeps the old version"""
+    collection = config.COLLECTION_TECHNICAL
+    vectorstore = local.get_or_create_collection(collection)
+    replace_source_chunks(vectorstore, collection, ["a"], [chunk("engine start")], [])
+    upsert = vectorstore.upsert_embedded
+    calls = []
+
+    def failing_upsert(ids, documents, embeddings):
+        calls.append(list(ids))
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        return upsert(ids, documents, embeddings)
+
+    with patch("app.retrieval.versioning._RETRY_DELAY_SECONDS", 0), \
+            patch.object(vectorstore, "upsert_embedded", side_effect=failing_upsert), \
+            pytest.raises(RuntimeError):
+        replace_source_chunks(
+            vectorstore, collection, ["b", "c"], [chunk("engine stop"), chunk("turbine check")], ["a"], batch_size=1
+        )
+
+    assert calls == [["b"], ["c"]]
+    assert local.client.get_collection(collection).get()["ids"] == ["a"]
+
+
+def test_upsert_adapter_on_both_backends(local, tmp_path):
+    """Test both store backends store precomputed vectors through upsert_embedded and update metadata in place"""
+    with patch.object(config, "VECTOR_BACKEND", "numpy"):
+        numpy_client = ChromaDBClient(persist_directory=str(tmp_path / "numpy"))
+    numpy_client.embeddings = KeywordEmbeddings()
+
+    for client in (local, numpy_client):
+        vectorstore = client.get_or_create_collection(config.COLLECTION_BILLING)
+        vectorstore.upsert_embedded(["x"], [chunk("invoice payment", "b.md")], [KeywordEmbeddings().embed_query("invoice payment")])
+        stored = vectorstore.get(ids=["x"])
+        assert stored["documents"] == ["invoice payment"] and stored["metadatas"] == [{"source_file": "b.md"}]
+
+        vectorstore.update_metadata(["x", "missing"], [{"source_file": "b.md", "chunk_index": 1}, {"source_file": "b.md"}])
+        stored = vectorstore.get(include=["documents", "metadatas", "embeddings"])
+        assert stored["ids"] == ["x"] and stored["documents"] == ["invoice payment"]
+        assert stored["metadatas"] == [{"source_file": "b.md", "chunk_index": 1}]
+
+
+def test_replace_through_retrieval_server(local, tmp_path):
+    """Test a thin client's swap is performed by the server"""
+    server = RetrievalServer(str(tmp_path / "retrieval.sock"), client=local)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        remote = RetrievalClient(server.server_address, timeout=10).get_or_create_collection(config.COLLECTION_POLICY)
+        replace_source_chunks(remote, config.COLLECTION_POLICY, ["a"], [chunk("refund policy", "p.md")], [])
+        replace_source_chunks(remote, config.COLLECTION_POLICY, ["b"], [chunk("policy review", "p.md")], ["a"])
+
+        assert local.client.get_collection(config.COLLECTION_POLICY).get()["documents"] == ["policy review"]
+    finally:
+        server.shutdown()
+        server.server_close()